@@ -15,12 +15,12 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import requests
 import xmltodict
 try:
     from urlparse import urlparse
 except ImportError:
     from urllib.parse import urlparse
+from IM.http_pool import HTTPPool
 
 
 class AppDB:
@@ -34,7 +34,7 @@ class AppDB:
         """
         Basic AppDB REST API call
         """
-        resp = requests.request("GET", AppDB.APPDB_URL + path, verify=False)
+        resp = HTTPPool.request("GET", AppDB.APPDB_URL + path, verify=False)
         if resp.status_code == 200:
             resp.text.replace('\n', '')
             return xmltodict.parse(resp.text)
@@ -0,0 +1,225 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Circuit breakers to fail fast when a cloud provider is degraded"""
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from IM.config import Config
+from IM.metrics import Metrics
+
+try:
+    CONNECTION_ERRORS = (socket.timeout, ConnectionError)
+except NameError:
+    # Python 2
+    CONNECTION_ERRORS = (socket.timeout, socket.error)
+
+
+class CircuitBreakerOpenException(Exception):
+    """ The circuit breaker of the endpoint is open """
+
+    def __init__(self, endpoint):
+        msg = "Too many errors calling %s. Calls suspended temporarily." % endpoint
+        Exception.__init__(self, msg)
+        self.message = msg
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of an endpoint (i.e. a cloud provider). If the percentage of
+    calls that fail by a provider side error (timeouts, connection errors or HTTP
+    5xx errors, not the auth or request errors) in the last CIRCUIT_BREAKER_WINDOW secs reaches
+    CIRCUIT_BREAKER_ERROR_RATE (with at least CIRCUIT_BREAKER_MIN_CALLS calls) the
+    circuit is opened and the calls fail fast during CIRCUIT_BREAKER_OPEN_TIME secs.
+    Then one call is allowed to test the endpoint (half open state): if it
+    succeeds the circuit is closed again, otherwise it is opened again.
+    """
+
+    CLOSED = 0
+    """The calls are performed normally."""
+    HALF_OPEN = 1
+    """One call is allowed to test the endpoint."""
+    OPEN = 2
+    """The calls fail fast."""
+
+    breakers = {}
+    """Map from endpoint to its CircuitBreaker."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        """Endpoint protected by the breaker."""
+        self.state = CircuitBreaker.CLOSED
+        """State of the breaker."""
+        self.calls = deque()
+        """Times and results (True if success) of the last calls."""
+        self.opened_at = 0
+        """Time when the breaker was opened."""
+        self._testing = False
+        """Flag to specify that the test call of the half open state is running."""
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get(endpoint):
+        """
+        Get the circuit breaker of an endpoint (created on first use).
+        """
+        with CircuitBreaker._lock:
+            if endpoint not in CircuitBreaker.breakers:
+                CircuitBreaker.breakers[endpoint] = CircuitBreaker(endpoint)
+            return CircuitBreaker.breakers[endpoint]
+
+    @staticmethod
+    def is_enabled():
+        return Config.CIRCUIT_BREAKER_ERROR_RATE > 0
+
+    def _set_state(self, state):
+        if state != self.state:
+            names = {CircuitBreaker.CLOSED: "closed", CircuitBreaker.HALF_OPEN: "half open",
+                     CircuitBreaker.OPEN: "open"}
+            CircuitBreaker.logger.warning("Circuit breaker of %s changed to %s state." %
+                                          (self.endpoint, names[state]))
+            Metrics.inc("im_circuit_breaker_transitions_total", {"endpoint": self.endpoint, "state": names[state]})
+            self.state = state
+            if state == CircuitBreaker.OPEN:
+                self.opened_at = time.time()
+                self.calls.clear()
+
+    def allow(self):
+        """
+        Check if a call to the endpoint can be performed. If it returns True
+        the result of the call must be notified with the record function.
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.OPEN:
+                if time.time() - self.opened_at < Config.CIRCUIT_BREAKER_OPEN_TIME:
+                    return False
+                self._set_state(CircuitBreaker.HALF_OPEN)
+            if self.state == CircuitBreaker.HALF_OPEN:
+                if self._testing:
+                    return False
+                self._testing = True
+            return True
+
+    def record(self, success):
+        """
+        Record the result of a call to the endpoint.
+        """
+        now = time.time()
+        with self._lock:
+            if self.state == CircuitBreaker.HALF_OPEN:
+                self._testing = False
+                self._set_state(CircuitBreaker.CLOSED if success else CircuitBreaker.OPEN)
+                return
+            self.calls.append((now, success))
+            while self.calls and now - self.calls[0][0] > Config.CIRCUIT_BREAKER_WINDOW:
+                self.calls.popleft()
+            if self.state == CircuitBreaker.CLOSED and len(self.calls) >= Config.CIRCUIT_BREAKER_MIN_CALLS:
+                errors = len([res for _, res in self.calls if not res])
+                if errors * 100 >= Config.CIRCUIT_BREAKER_ERROR_RATE * len(self.calls):
+                    self._set_state(CircuitBreaker.OPEN)
+
+    @staticmethod
+    def is_provider_error(ex):
+        """
+        Check if an exception is caused by a failure of the provider (a timeout, a connection
+        error or an HTTP 5xx error), and not by the credentials or the request of the user.
+        """
+        if isinstance(ex, CONNECTION_ERRORS):
+            return True
+        # Check the exceptions of the client libraries (requests, urllib3, botocore, ...) by name
+        for cls in type(ex).__mro__:
+            if cls.__name__.endswith(("Timeout", "TimeoutError", "ConnectionError")):
+                return True
+        codes = [getattr(ex, attr, None) for attr in ["http_code", "code", "status", "status_code"]]
+        codes.append(getattr(getattr(ex, "response", None), "status_code", None))
+        for code in codes:
+            if isinstance(code, int) and 500 <= code < 600:
+                return True
+        return False
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call a function protected by the circuit breaker. It raises a
+        CircuitBreakerOpenException if the circuit is open.
+        """
+        if not CircuitBreaker.is_enabled():
+            return func(*args, **kwargs)
+        if not self.allow():
+            Metrics.inc("im_circuit_breaker_rejected_total", {"endpoint": self.endpoint})
+            raise CircuitBreakerOpenException(self.endpoint)
+        try:
+            res = func(*args, **kwargs)
+        except Exception as ex:
+            # The other errors show that the endpoint is answering
+            self.record(not CircuitBreaker.is_provider_error(ex))
+            raise
+        self.record(True)
+        return res
+
+    @staticmethod
+    def protect(obj, endpoint, methods):
+        """
+        Protect the calls to the specified methods of an object (i.e. a cloud connector)
+        with the circuit breaker of an endpoint. If the object has a get_breaker_endpoint
+        function it is used to get the endpoint of each call (i.e. the region of the VM).
+        """
+        if not CircuitBreaker.is_enabled():
+            return obj
+        get_endpoint = getattr(obj, "get_breaker_endpoint", None)
+        for method in methods:
+            func = getattr(obj, method, None)
+            if func:
+                setattr(obj, method, CircuitBreaker._wrap(endpoint, get_endpoint, method, func))
+        return obj
+
+    @staticmethod
+    def _wrap(endpoint, get_endpoint, method, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            call_endpoint = endpoint
+            if get_endpoint:
+                call_endpoint = get_endpoint(method, *args) or endpoint
+            return CircuitBreaker.get(call_endpoint).call(func, *args, **kwargs)
+        return wrapper
+
+    @staticmethod
+    def get_states():
+        """
+        Get the state of all the circuit breakers (used as metric).
+        """
+        with CircuitBreaker._lock:
+            return dict(((("endpoint", endpoint),), breaker.state)
+                        for endpoint, breaker in CircuitBreaker.breakers.items())
+
+    @staticmethod
+    def _reinit():
+        """Restart the class attributes to initial values."""
+        with CircuitBreaker._lock:
+            CircuitBreaker.breakers = {}
+
+
+Metrics.register_gauge("im_circuit_breaker_state", CircuitBreaker.get_states)
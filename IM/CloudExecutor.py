@@ -0,0 +1,372 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Process-wide executor of the operations with the cloud providers"""
+
+import logging
+import sys
+import threading
+from collections import deque
+
+from IM.config import Config
+from IM.metrics import Metrics
+from IM.tracing import Tracer
+
+
+class CloudTask:
+    """
+    Operation with a cloud provider submitted to the CloudExecutor
+    """
+
+    def __init__(self, key, cloud, func, args):
+        self.key = key
+        """Key of the queue of the task (i.e. the infrastructure ID)."""
+        self.cloud = cloud
+        """CloudInfo of the cloud provider used by the task."""
+        self.func = func
+        """Function to execute."""
+        self.args = args
+        """Arguments of the function."""
+        self.result = None
+        """Value returned by the function."""
+        self.exc_info = None
+        """Exception info raised by the function."""
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception:
+            self.exc_info = sys.exc_info()
+        finally:
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """Wait the task to finish."""
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def get(self):
+        """Wait the task to finish and return its result (or raise its exception)."""
+        self.wait()
+        if self.exc_info:
+            raise self.exc_info[1]
+        return self.result
+
+
+class CloudExecutor:
+    """
+    Executor shared by all the infrastructures to perform the operations with
+    the cloud providers (launch, stop, start and finalize the VMs) using
+    CLOUD_EXECUTOR_THREADS threads. The number of simultaneous operations of
+    each infrastructure is limited with MAX_SIMULTANEOUS_LAUNCHES, the ones
+    to each cloud type and to each endpoint with MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD,
+    and the pending tasks of the infrastructures are served in round robin, so
+    that an infrastructure with a lot of VMs does not delay the operations of the rest.
+    """
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    _queues = {}
+    """Map from queue key (i.e. the infrastructure ID) to a deque of pending CloudTasks."""
+
+    _order = deque()
+    """Keys of the non empty queues in round robin order."""
+
+    _running = {}
+    """Map from queue key, cloud type and endpoint to the number of tasks running."""
+
+    _limits = {}
+    """Map from cloud type, endpoint or "*" to its limit (parsed from MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD)."""
+
+    _limits_source = None
+    """Value of MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD parsed in _limits."""
+
+    _workers = 0
+    """Number of worker threads."""
+
+    _generation = 0
+    """Generation of the worker threads (the workers of old generations finish)."""
+
+    _local = threading.local()
+    """Thread local data to mark the worker threads."""
+
+    _cond = threading.Condition()
+    """Threading Condition to avoid concurrency problems and to wake up the workers."""
+
+    @staticmethod
+    def get_limits(cloud):
+        """
+        Get the maximum number of simultaneous operations to the cloud type
+        and to the endpoint of a cloud provider (0 means no limit).
+
+        Return: a tuple (type limit, endpoint limit).
+        """
+        source = tuple(Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD)
+        if source != CloudExecutor._limits_source:
+            # Parse the limits only when the config value changes
+            limits = {}
+            for item in source:
+                if not item.strip():
+                    continue
+                name, _, value = item.strip().rpartition(":")
+                try:
+                    limits[name] = int(value)
+                except ValueError:
+                    CloudExecutor.logger.warning("Invalid MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD value: %s. "
+                                                 "Ignoring it." % item)
+            CloudExecutor._limits = limits
+            CloudExecutor._limits_source = source
+        limits = CloudExecutor._limits
+        return limits.get(cloud.type, 0), limits.get(cloud.get_endpoint(), limits.get("*", 0))
+
+    @staticmethod
+    def _can_run(cloud, key=None):
+        if key is not None and CloudExecutor._running.get(("key", key), 0) >= Config.MAX_SIMULTANEOUS_LAUNCHES:
+            return False
+        type_limit, endpoint_limit = CloudExecutor.get_limits(cloud)
+        if type_limit > 0 and CloudExecutor._running.get(("type", cloud.type), 0) >= type_limit:
+            return False
+        endpoint = ("endpoint", cloud.get_endpoint())
+        if endpoint_limit > 0 and CloudExecutor._running.get(endpoint, 0) >= endpoint_limit:
+            return False
+        return True
+
+    @staticmethod
+    def _set_running(cloud, inc, key=None):
+        keys = [("type", cloud.type), ("endpoint", cloud.get_endpoint())]
+        if key is not None:
+            keys.append(("key", key))
+        for running_key in keys:
+            value = CloudExecutor._running.get(running_key, 0) + inc
+            if value > 0:
+                CloudExecutor._running[running_key] = value
+            else:
+                # Do not keep an entry per infrastructure ever processed
+                CloudExecutor._running.pop(running_key, None)
+
+    @staticmethod
+    def _next_task():
+        """
+        Get the next task that can be run respecting the limits of the clouds
+        (serving the queues in round robin), or None if there are no one.
+        """
+        for _ in range(len(CloudExecutor._order)):
+            key = CloudExecutor._order.popleft()
+            queue = CloudExecutor._queues[key]
+            for task in queue:
+                if CloudExecutor._can_run(task.cloud, key):
+                    queue.remove(task)
+                    if queue:
+                        CloudExecutor._order.append(key)
+                    else:
+                        del CloudExecutor._queues[key]
+                    CloudExecutor._set_running(task.cloud, 1, key)
+                    return task
+            CloudExecutor._order.append(key)
+        return None
+
+    @staticmethod
+    def _execute(task, key=None):
+        try:
+            task.run()
+        finally:
+            with CloudExecutor._cond:
+                CloudExecutor._set_running(task.cloud, -1, key)
+                CloudExecutor._cond.notify_all()
+
+    @staticmethod
+    def _worker(generation):
+        CloudExecutor._local.worker = True
+        while True:
+            with CloudExecutor._cond:
+                task = None
+                while task is None:
+                    if generation != CloudExecutor._generation:
+                        return
+                    if CloudExecutor._workers > Config.CLOUD_EXECUTOR_THREADS:
+                        # CLOUD_EXECUTOR_THREADS has been reduced
+                        CloudExecutor._workers -= 1
+                        return
+                    task = CloudExecutor._next_task()
+                    if task is None:
+                        CloudExecutor._cond.wait(1)
+            CloudExecutor._execute(task, task.key)
+
+    @staticmethod
+    def _start_workers():
+        while CloudExecutor._workers < Config.CLOUD_EXECUTOR_THREADS:
+            CloudExecutor._workers += 1
+            thread = threading.Thread(name="cloud_executor", target=CloudExecutor._worker,
+                                      args=(CloudExecutor._generation,))
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def _run_inline(task):
+        if getattr(CloudExecutor._local, "worker", False):
+            # Nested task: it already holds the slot of its parent task
+            task.run()
+            return
+        with CloudExecutor._cond:
+            while not CloudExecutor._can_run(task.cloud):
+                CloudExecutor._cond.wait(1)
+            CloudExecutor._set_running(task.cloud, 1)
+        CloudExecutor._local.worker = True
+        try:
+            CloudExecutor._execute(task)
+        finally:
+            CloudExecutor._local.worker = False
+
+    @staticmethod
+    def submit(key, cloud, func, *args):
+        """
+        Submit an operation with a cloud provider.
+
+        Args:
+
+        - key(str): key of the queue of the task (i.e. the infrastructure ID).
+        - cloud(CloudInfo): cloud provider used by the operation.
+        - func(function): function to call.
+        - args: arguments of the function.
+
+        Return(CloudTask): the task submitted. If MAX_SIMULTANEOUS_LAUNCHES is 1 (or it is
+                           called from a task) the operation is performed in the calling thread.
+        """
+        task = CloudTask(key, cloud, Tracer.wrap(func), args)
+        if Config.MAX_SIMULTANEOUS_LAUNCHES <= 1 or getattr(CloudExecutor._local, "worker", False):
+            CloudExecutor._run_inline(task)
+            return task
+
+        with CloudExecutor._cond:
+            if key not in CloudExecutor._queues:
+                CloudExecutor._queues[key] = deque()
+                # The new queues are served first, as they have not had their turn yet
+                CloudExecutor._order.appendleft(key)
+            CloudExecutor._queues[key].append(task)
+            CloudExecutor._start_workers()
+            CloudExecutor._cond.notify_all()
+        return task
+
+    @staticmethod
+    def run(key, tasks):
+        """
+        Perform a list of operations with cloud providers and wait them to finish.
+
+        Args:
+
+        - key(str): key of the queue of the tasks (i.e. the infrastructure ID).
+        - tasks(list of tuple): list of (CloudInfo, function, arguments tuple) to perform.
+
+        Return(list): the values returned by the functions (in the same order). If some
+                      of them raises an exception it is raised when all of them have finished.
+        """
+        submitted = [CloudExecutor.submit(key, cloud, func, *args) for cloud, func, args in tasks]
+        for task in submitted:
+            task.wait()
+        return [task.get() for task in submitted]
+
+    @staticmethod
+    def map(key, cloud, func, items):
+        """
+        Perform an operation with a cloud provider for each item of a list concurrently
+        and wait them to finish. If it is called from a task (i.e. a finalizeBatch call)
+        the calling thread keeps its slot and other threads are only started while the
+        limits of the cloud (and MAX_SIMULTANEOUS_LAUNCHES) have free slots.
+
+        Args:
+
+        - key(str): key of the queue of the tasks (i.e. the infrastructure ID).
+        - cloud(CloudInfo): cloud provider used by the operations.
+        - func(function): function to call with each item.
+        - items(list): list of items.
+
+        Return(list): the values returned by the function (in the same order). If some
+                      of them raises an exception it is raised when all of them have finished.
+        """
+        if not getattr(CloudExecutor._local, "worker", False):
+            return CloudExecutor.run(key, [(cloud, func, (item,)) for item in items])
+
+        results = [None] * len(items)
+        pending = deque(enumerate(items))
+
+        def process(operation):
+            while True:
+                try:
+                    num, item = pending.popleft()
+                except IndexError:
+                    return
+                results[num] = CloudTask(key, cloud, operation, (item,))
+                results[num].run()
+
+        def helper(operation):
+            CloudExecutor._local.worker = True
+            try:
+                process(operation)
+            finally:
+                with CloudExecutor._cond:
+                    CloudExecutor._set_running(cloud, -1)
+                    CloudExecutor._cond.notify_all()
+
+        threads = []
+        for _ in range(min(len(items), Config.MAX_SIMULTANEOUS_LAUNCHES) - 1):
+            with CloudExecutor._cond:
+                if not CloudExecutor._can_run(cloud):
+                    break
+                CloudExecutor._set_running(cloud, 1)
+            thread = threading.Thread(name="cloud_executor_map", target=helper, args=(Tracer.wrap(func),))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        process(func)
+        for thread in threads:
+            thread.join()
+        return [task.get() for task in results]
+
+    @staticmethod
+    def get_queued():
+        """
+        Get the number of tasks waiting per endpoint (used as metric).
+        """
+        res = {}
+        with CloudExecutor._cond:
+            for queue in CloudExecutor._queues.values():
+                for task in queue:
+                    key = (("endpoint", task.cloud.get_endpoint()),)
+                    res[key] = res.get(key, 0) + 1
+        return res
+
+    @staticmethod
+    def get_running():
+        """
+        Get the number of tasks running per endpoint (used as metric).
+        """
+        with CloudExecutor._cond:
+            return dict(((("endpoint", key[1]),), value) for key, value in CloudExecutor._running.items()
+                        if key[0] == "endpoint" and value > 0)
+
+    @staticmethod
+    def _reinit():
+        """Finish the worker threads when they are idle."""
+        with CloudExecutor._cond:
+            CloudExecutor._generation += 1
+            CloudExecutor._workers = 0
+            CloudExecutor._cond.notify_all()
+
+
+Metrics.register_gauge("im_cloud_operations_queued", CloudExecutor.get_queued)
+Metrics.register_gauge("im_cloud_operations_running", CloudExecutor.get_running)
@@ -14,18 +14,32 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import json
+import logging
 try:
     from urlparse import urlparse
 except ImportError:
     from urllib.parse import urlparse
 
+from IM import json_codec
+from IM.CircuitBreaker import CircuitBreaker
+from IM.metrics import Metrics
+from IM.tracing import Tracer
+
 
 class CloudInfo:
     """
     Class to represent the information of a cloud provider
     """
 
+    MEASURED_METHODS = ["concreteSystem", "updateVMInfo", "updateVMInfoBatch", "alterVM", "launch", "finalize",
+                        "finalizeBatch", "start", "stop", "reboot", "create_snapshot", "delete_image"]
+    """Methods of the cloud connectors whose latency is measured."""
+    TRACED_METHODS = MEASURED_METHODS + ["launch_with_retry"]
+    """Methods of the cloud connectors traced."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
     def __init__(self):
         self.id = None
         """Identifier of the cloud provider"""
@@ -40,6 +54,51 @@ class CloudInfo:
         self.path = ""
         """Path to connect to the cloud provider"""
 
+    @staticmethod
+    def get_connector_class(cloud_type):
+        """
+        Import the module of a cloud connector and return its class
+        """
+        if len(cloud_type) > 15 or "." in cloud_type:
+            raise Exception("Not valid cloud provider.")
+        module = __import__('IM.connectors.' + cloud_type, fromlist=[cloud_type + "CloudConnector"])
+        return getattr(module, cloud_type + "CloudConnector")
+
+    @staticmethod
+    def prewarm_connectors(cloud_types):
+        """
+        Import the modules of the specified cloud connectors (and their
+        dependencies) to avoid the delay in the first request that uses them.
+        It also loads the data shared by the connectors (see CloudConnector.prewarm).
+
+        Return: the list of connector types that could not be loaded.
+        """
+        failed = []
+        for cloud_type in cloud_types:
+            cloud_type = cloud_type.strip()
+            if not cloud_type:
+                continue
+            try:
+                CloudInfo.get_connector_class(cloud_type).prewarm()
+            except Exception:
+                CloudInfo.logger.exception("Error loading cloud connector: %s" % cloud_type)
+                failed.append(cloud_type)
+        return failed
+
+    def get_key(self):
+        """
+        Get a tuple identifying the data of the cloud provider (except the ID)
+        """
+        return (self.type, self.server, self.port, self.protocol, self.path)
+
+    def get_endpoint(self):
+        """
+        Get a str identifying the endpoint of the cloud provider (shared by all its users)
+        """
+        if self.server:
+            return "%s@%s" % (self.type, self.server)
+        return self.type
+
     def getCloudConnector(self, inf):
         """
         Returns the appropriate object to contact the cloud provider
@@ -47,10 +106,13 @@ class CloudInfo:
         if len(self.type) > 15 or "." in self.type:
             raise Exception("Not valid cloud provider.")
         try:
-            module = __import__('IM.connectors.' + self.type, fromlist=[self.type + "CloudConnector"])
-            return getattr(module, self.type + "CloudConnector")(self, inf)
+            conn = CloudInfo.get_connector_class(self.type)(self, inf)
         except Exception as ex:
             raise Exception("Cloud provider not supported: %s (error: %s)" % (self.type, str(ex)))
+        conn = CircuitBreaker.protect(conn, self.get_endpoint(), CloudInfo.MEASURED_METHODS)
+        conn = Metrics.instrument_connector(conn, self.type, CloudInfo.MEASURED_METHODS)
+        return Tracer.instrument(conn, self.type, CloudInfo.TRACED_METHODS,
+                                 {"im.cloud_type": self.type, "im.cloud_id": self.id})
 
     def __str__(self):
         res = ""
@@ -113,12 +175,24 @@ class CloudInfo:
 
         return res
 
+    def serialize_dict(self):
+        """
+        Return a dict with the data of the object to be serialized
+        """
+        return self.__dict__.copy()
+
     def serialize(self):
-        return json.dumps(self.__dict__)
+        return json_codec.dumps(self.serialize_dict())
 
     @staticmethod
-    def deserialize(str_data):
-        dic = json.loads(str_data)
+    def deserialize(data):
+        """
+        Create a CloudInfo object from a JSON str or from the already decoded dict
+        """
+        if isinstance(data, dict):
+            dic = dict(data)
+        else:
+            dic = json_codec.loads(data)
         nwecloud = CloudInfo()
         nwecloud.__dict__.update(dic)
         return nwecloud
@@ -55,6 +55,8 @@ from IM.SSH import AuthenticationException
 from IM.SSHRetry import SSHRetry
 from IM.recipe import Recipe
 from IM.config import Config
+from IM.metrics import Metrics
+from IM.tracing import Tracer
 from radl.radl import system, contextualize_item
 
 
@@ -76,6 +78,8 @@ class ConfManager(LoggerMixin, threading.Thread):
         self._stop_thread = False
         self.ansible_process = None
         self.logger = logging.getLogger('ConfManager')
+        self.trace_context = Tracer.get_context()
+        """Trace context of the request that created the thread."""
 
     def check_running_pids(self, vms_configuring):
         """
@@ -138,6 +142,7 @@ class ConfManager(LoggerMixin, threading.Thread):
         success = False
         while not success and wait < timeout and not self._stop_thread:
             success = True
+            vms_to_update = []
             for vm in self.inf.get_vm_list():
 
                 # If the VM is not in a "running" state, ignore it
@@ -151,7 +156,8 @@ class ConfManager(LoggerMixin, threading.Thread):
                     if not vm.getPublicIP():
                         self.log_debug("And it does not have it assigned yet.")
                         success = False
-                        vm.update_status(self.auth)
+                        vms_to_update.append(vm)
+            self.inf.update_vms_status(self.auth, vm_list=vms_to_update)
 
             if not success:
                 self.log_warn("Still waiting all the VMs to have all the requested IPs")
@@ -163,9 +169,8 @@ class ConfManager(LoggerMixin, threading.Thread):
         else:
             self.log_info("All the VMs have all the requested IPs")
             # do a final update of all VMs
-            for vm in self.inf.get_vm_list():
-                if vm.state not in VirtualMachine.NOT_RUNNING_STATES:
-                    vm.update_status(self.auth)
+            self.inf.update_vms_status(self.auth, vm_list=[vm for vm in self.inf.get_vm_list()
+                                                           if vm.state not in VirtualMachine.NOT_RUNNING_STATES])
 
         return success
 
@@ -238,6 +243,11 @@ class ConfManager(LoggerMixin, threading.Thread):
             vm.configured = None
 
     def run(self):
+        Tracer.attach(self.trace_context)
+        with Tracer.span("ConfManager.run", {"im.inf_id": self.inf.id}):
+            self._run()
+
+    def _run(self):
         self.log_info("Starting the ConfManager Thread")
 
         last_step = None
@@ -321,7 +331,7 @@ class ConfManager(LoggerMixin, threading.Thread):
                             vm.configured = None
                             # Launch the ctxt_agent using a thread
                             t = threading.Thread(name="launch_ctxt_agent_" + str(
-                                vm.id), target=self.launch_ctxt_agent, args=(vm, tasks))
+                                vm.id), target=Tracer.wrap(self.launch_ctxt_agent), args=(vm, tasks))
                             t.daemon = True
                             t.start()
                             vm.inf.conf_threads.append(t)
@@ -339,7 +349,7 @@ class ConfManager(LoggerMixin, threading.Thread):
                     # Launch the Infrastructure tasks
                     vm.configured = None
                     for task in tasks:
-                        t = threading.Thread(name=task, target=getattr(self, task))
+                        t = threading.Thread(name=task, target=Tracer.wrap(getattr(self, task)))
                         t.daemon = True
                         t.start()
                         vm.conf_threads.append(t)
@@ -851,7 +861,7 @@ class ConfManager(LoggerMixin, threading.Thread):
                         if self.inf.radl.ansible_hosts:
                             for ansible_host in self.inf.radl.ansible_hosts:
                                 (user, passwd, private_key) = ansible_host.getCredentialValues()
-                                ssh = SSHRetry(ansible_host.getHost(), user, passwd, private_key)
+                                ssh = Tracer.instrument_ssh(SSHRetry(ansible_host.getHost(), user, passwd, private_key))
                                 ssh.sftp_mkdir(Config.REMOTE_CONF_DIR, 0o755)
                                 ssh.sftp_mkdir(remote_dir, 0o700)
                                 ssh.sftp_mkdir(remote_dir + "/IM")
@@ -1035,8 +1045,8 @@ class ConfManager(LoggerMixin, threading.Thread):
             if self.inf.radl.ansible_hosts:
                 for ansible_host in self.inf.radl.ansible_hosts:
                     (user, passwd, private_key) = ansible_host.getCredentialValues()
-                    ssh = SSHRetry(ansible_host.getHost(),
-                                   user, passwd, private_key)
+                    ssh = Tracer.instrument_ssh(SSHRetry(ansible_host.getHost(),
+                                                         user, passwd, private_key))
                     ssh.sftp_mkdir(remote_dir)
                     ssh.sftp_put_files(recipe_files)
             else:
@@ -1525,3 +1535,7 @@ class ConfManager(LoggerMixin, threading.Thread):
         self.log_debug("Ctxt agent vm configuration file: " + json.dumps(conf_data))
         json.dump(conf_data, conf_out, indent=2)
         conf_out.close()
+
+
+Metrics.register_gauge("im_confmanager_threads",
+                       lambda: len([t for t in threading.enumerate() if isinstance(t, ConfManager)]))
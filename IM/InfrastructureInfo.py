@@ -27,16 +27,18 @@ from radl.radl_parse import parse_radl
 from radl.radl_json import radlToSimple
 from IM.openid.JWT import JWT
 from IM.config import Config
+from IM import json_codec
+from IM.tracing import Tracer
+from IM.connectors.CloudConnector import CloudConnector
 try:
     from Queue import PriorityQueue
 except ImportError:
     from queue import PriorityQueue
 from IM.VirtualMachine import VirtualMachine
+from IM.CloudExecutor import CloudExecutor
 from IM.auth import Authentication
-from IM.tosca.Tosca import Tosca
 
-if Config.MAX_SIMULTANEOUS_LAUNCHES > 1:
-    from multiprocessing.pool import ThreadPool
+import multiprocessing.pool
 
 
 class IncorrectVMException(Exception):
@@ -74,6 +76,10 @@ class InfrastructureInfo:
     FAKE_SYSTEM = "F0000__FAKE_SYSTEM__"
     OPENID_USER_PREFIX = "__OPENID__"
 
+    _update_pool = None
+    """Thread pool shared by all the infrastructures to update the status of the VMs."""
+    _update_pool_lock = threading.Lock()
+
     def __init__(self):
         self._lock = threading.Lock()
         """Threading Lock to avoid concurrency problems."""
@@ -117,6 +123,14 @@ class InfrastructureInfo:
         """Flag to specify that this Inf is adding resources """
         self.deleting = False
         """Flag to specify that this Inf is deleting resources """
+        self.launch_times = []
+        """Launch timing of the deploy groups of the last AddResource call."""
+        self.last_auth = None
+        """Authentication data of the last access to this Inf (used by the VMPoller). It is not stored."""
+        self.cloud_connectors = {}
+        """Map from cloud ID to a tuple (cloud key, credentials fingerprint, CloudConnector) shared by the VMs."""
+        self._connectors_lock = threading.Lock()
+        """Threading Lock to create the shared cloud connectors."""
 
     def serialize(self):
         with self._lock:
@@ -130,24 +144,32 @@ class InfrastructureInfo:
         del odict['deleting']
         if 'last_access' in odict:
             del odict['last_access']
+        if 'last_auth' in odict:
+            del odict['last_auth']
+        if 'cloud_connectors' in odict:
+            del odict['cloud_connectors']
+        if '_connectors_lock' in odict:
+            del odict['_connectors_lock']
         if odict['vm_master']:
             odict['vm_master'] = odict['vm_master'].im_id
+        # The VMs and the auth data are stored as native JSON objects
+        # (old versions stored them as JSON encoded strings)
         vm_list = []
         for vm in odict['vm_list']:
-            vm_list.append(vm.serialize())
+            vm_list.append(vm.serialize_dict())
         odict['vm_list'] = vm_list
         if odict['auth']:
-            odict['auth'] = odict['auth'].serialize()
+            odict['auth'] = odict['auth'].auth_list
         if odict['radl']:
             odict['radl'] = str(odict['radl'])
         if odict['extra_info'] and "TOSCA" in odict['extra_info']:
             odict['extra_info'] = {'TOSCA': odict['extra_info']['TOSCA'].serialize()}
-        return json.dumps(odict)
+        return json_codec.dumps(odict)
 
     @staticmethod
     def deserialize(str_data):
         newinf = InfrastructureInfo()
-        dic = json.loads(str_data)
+        dic = json_codec.loads(str_data)
         vm_list = dic['vm_list']
         vm_master_id = dic['vm_master']
         dic['vm_master'] = None
@@ -160,6 +182,8 @@ class InfrastructureInfo:
             dic['radl'] = RADL()
         if 'extra_info' in dic and dic['extra_info'] and "TOSCA" in dic['extra_info']:
             try:
+                # Imported here to load the TOSCA parser only when it is needed
+                from IM.tosca.Tosca import Tosca
                 dic['extra_info']['TOSCA'] = Tosca.deserialize(dic['extra_info']['TOSCA'])
             except Exception:
                 del dic['extra_info']['TOSCA']
@@ -186,7 +210,7 @@ class InfrastructureInfo:
         Only Loads auth data
         """
         newinf = InfrastructureInfo()
-        dic = json.loads(str_data)
+        dic = json_codec.loads(str_data)
         newinf.deleted = dic['deleted']
         newinf.id = dic['id']
         if dic['auth']:
@@ -199,18 +223,31 @@ class InfrastructureInfo:
         """
         delete_list = list(reversed(self.get_vm_list()))
 
+        # The VMs of the cloud providers that implement finalizeBatch are deleted
+        # with a single call, at the position of the last VM of the cloud
+        clouds = {}
+        for vm in delete_list:
+            if not vm.destroy:
+                clouds.setdefault(vm.cloud.id, []).append(vm)
+        groups = []
+        for vm in delete_list:
+            vms = clouds.get(vm.cloud.id, [])
+            if len(vms) > 1 and self._has_batch_finalize(vm.getCloudConnector(auth)):
+                if vm is vms[-1]:
+                    groups.append(vms)
+            else:
+                groups.append([vm])
+
+        def delete_group(vms):
+            if len(vms) > 1:
+                VirtualMachine.delete_batch(vms, delete_list, auth, exceptions)
+            else:
+                vms[0].delete(delete_list, auth, exceptions)
+
         exceptions = []
-        if Config.MAX_SIMULTANEOUS_LAUNCHES > 1:
-            pool = ThreadPool(processes=Config.MAX_SIMULTANEOUS_LAUNCHES)
-            pool.map(
-                lambda vm: vm.delete(delete_list, auth, exceptions),
-                delete_list
-            )
-            pool.close()
-        else:
-            # If IM server is the first VM, then it will be the last destroyed
-            for vm in delete_list:
-                vm.delete(delete_list, auth, exceptions)
+        # If IM server is the first VM, then it will be the last destroyed
+        # (the tasks are started in order)
+        CloudExecutor.run(self.id, [(vms[0].cloud, delete_group, (vms,)) for vms in groups])
 
         if exceptions:
             msg = ""
@@ -308,6 +345,134 @@ class InfrastructureInfo:
             res = [vm for vm in self.vm_list if not vm.destroy]
         return res
 
+    @staticmethod
+    def _get_update_pool():
+        """
+        Get the thread pool used to update the VMs status (created on first use).
+        It returns None if the updates must be done sequentially.
+        """
+        if Config.VM_INFO_UPDATE_THREADS <= 1:
+            return None
+        with InfrastructureInfo._update_pool_lock:
+            if InfrastructureInfo._update_pool is None:
+                pool = multiprocessing.pool.ThreadPool(processes=Config.VM_INFO_UPDATE_THREADS)
+                InfrastructureInfo._update_pool = pool
+            return InfrastructureInfo._update_pool
+
+    @staticmethod
+    def _overrides(conn, name):
+        """
+        Check if a cloud connector implements its own version of a CloudConnector function.
+        """
+        method = getattr(type(conn), name, None)
+        if method is None:
+            return False
+        default = getattr(CloudConnector, name)
+        # In Python 2 they are unbound methods
+        return getattr(method, '__func__', method) is not getattr(default, '__func__', default)
+
+    @staticmethod
+    def _has_batch_update(conn):
+        """
+        Check if a cloud connector implements its own updateVMInfoBatch function.
+        """
+        return InfrastructureInfo._overrides(conn, "updateVMInfoBatch")
+
+    @staticmethod
+    def _has_batch_finalize(conn):
+        """
+        Check if a cloud connector implements its own finalizeBatch function.
+        """
+        return InfrastructureInfo._overrides(conn, "finalizeBatch")
+
+    def _update_vms_group(self, vms, auth, force, batch):
+        """
+        Update the status of a list of VMs of the same cloud provider.
+
+        Args:
+        - vms(list of VirtualMachine): VMs to update.
+        - auth(Authentication): parsed authentication tokens.
+        - force(boolean): force the VMs update
+        - batch(boolean): get the info of all the VMs with a single updateVMInfoBatch call.
+        Return: list of VirtualMachine updated.
+        """
+        update_res = {}
+        if batch:
+            try:
+                res = vms[0].getCloudConnector(auth).updateVMInfoBatch(vms, auth)
+                for vm, vm_res in zip(vms, res):
+                    update_res[id(vm)] = vm_res
+            except Exception:
+                InfrastructureInfo.logger.exception("Inf ID: %s: Error updating the VMs of cloud %s." %
+                                                    (self.id, vms[0].cloud.id))
+
+        updated = []
+        for vm in vms:
+            if vm.update_status(auth, force, update_res.get(id(vm))):
+                updated.append(vm)
+        return updated
+
+    def update_vms_status(self, auth, force=False, vm_list=None, timeout=None):
+        """
+        Update the status of the VMs of the infrastructure.
+        The VMs of each cloud provider that implements updateVMInfoBatch are updated
+        with a single call, and the rest of VMs one by one, all of them concurrently
+        using a thread pool shared by all the infrastructures.
+        The VMs not updated before the timeout maintain the last known status.
+
+        Args:
+        - auth(Authentication): parsed authentication tokens.
+        - force(boolean): force the VMs update
+        - vm_list(list of VirtualMachine): VMs to update (all the not destroyed ones by default).
+        - timeout(int): max time to wait for the updates (Config.VM_INFO_UPDATE_TIMEOUT by default).
+        Return: list of VirtualMachine updated.
+        """
+        if vm_list is None:
+            vm_list = self.get_vm_list()
+        if timeout is None:
+            timeout = Config.VM_INFO_UPDATE_TIMEOUT
+
+        clouds = {}
+        updated = []
+        for vm in vm_list:
+            if vm.need_update(force):
+                clouds.setdefault(vm.cloud.id, []).append(vm)
+            elif vm.update_status(auth, force):
+                # The cloud provider is not called, so there is no need to use the pool
+                updated.append(vm)
+
+        groups = []
+
+        for vms in clouds.values():
+            if len(vms) > 1 and self._has_batch_update(vms[0].getCloudConnector(auth)):
+                groups.append((vms, True))
+            else:
+                groups.extend([([vm], False) for vm in vms])
+
+        pool = self._get_update_pool()
+        if pool is None:
+            for vms, batch in groups:
+                updated.extend(self._update_vms_group(vms, auth, force, batch))
+            return updated
+
+        update_func = Tracer.wrap(self._update_vms_group)
+        results = [(vms, pool.apply_async(update_func, (vms, auth, force, batch))) for vms, batch in groups]
+
+        deadline = time.time() + timeout
+        for vms, res in results:
+            try:
+                if timeout > 0:
+                    updated.extend(res.get(max(deadline - time.time(), 0)))
+                else:
+                    updated.extend(res.get())
+            except multiprocessing.TimeoutError:
+                InfrastructureInfo.logger.warning("Inf ID: %s: Timeout updating the status of the VMs: %s. "
+                                                  "Using last information retrieved." %
+                                                  (self.id, ", ".join([str(vm.im_id) for vm in vms])))
+            except Exception:
+                InfrastructureInfo.logger.exception("Inf ID: %s: Error updating the status of the VMs." % self.id)
+        return updated
+
     def get_vm(self, str_vm_id):
         """
         Get the VM with the specified ID (if it is not destroyed)
@@ -326,6 +491,40 @@ class InfrastructureInfo:
                         raise DeletedVMException()
         raise IncorrectVMException()
 
+    def get_cloud_connector(self, cloud, auth=None):
+        """
+        Get the CloudConnector of a cloud provider shared by all the VMs of this Inf,
+        so that they also share the cached drivers and credentials.
+        A new one is created if the data of the cloud provider with the same ID
+        or the fingerprint of its credentials change.
+
+        Args:
+        - cloud(CloudInfo): cloud provider information.
+        - auth(Authentication): parsed authentication tokens (optional, if not set
+          the current connector is returned whatever its credentials are).
+        """
+        key = cloud.get_key()
+        fingerprint = auth.get_fingerprint(cloud.type, cloud.server) if auth else None
+        with self._connectors_lock:
+            if cloud.id in self.cloud_connectors:
+                conn_key, conn_fingerprint, conn = self.cloud_connectors[cloud.id]
+                if conn_key == key and fingerprint in [None, conn_fingerprint]:
+                    return conn
+                if conn_key == key and conn_fingerprint is None:
+                    # First call with credentials: keep the connector
+                    self.cloud_connectors[cloud.id] = (key, fingerprint, conn)
+                    return conn
+            conn = cloud.getCloudConnector(self)
+            self.cloud_connectors[cloud.id] = (key, fingerprint, conn)
+            return conn
+
+    def reset_cloud_connectors(self):
+        """
+        Discard the shared cloud connectors (and their error messages).
+        """
+        with self._connectors_lock:
+            self.cloud_connectors = {}
+
     def get_vm_list_by_system_name(self):
         """
         Get the list of not destroyed VMs grouped by the name of system.
@@ -595,13 +794,15 @@ class InfrastructureInfo:
             ctxt_task.append((-2, 0, self, ['configure_master', 'wait_all_vm_ips']))
             ctxt_task.append((-1, 0, self, ['generate_playbooks_and_hosts']))
 
-            use_dist = len(self.get_vm_list()) > Config.VM_NUM_USE_CTXT_DIST
-            for cont, vm in enumerate(self.get_vm_list()):
-                # Assure to update the VM status before running the ctxt
-                # process
-                vm.update_status(auth)
+            vm_list = self.get_vm_list()
+            use_dist = len(vm_list) > Config.VM_NUM_USE_CTXT_DIST
+            # Assure to update the VMs status before running the ctxt process
+            self.update_vms_status(auth, vm_list=vm_list)
+            self.reset_cloud_connectors()
+            for cont, vm in enumerate(vm_list):
                 vm.cont_out = ""
                 vm.cloud_connector = None
+                vm.connector_fingerprint = None
                 vm.configured = None
                 tasks = {}
 
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import re
 import sys
 import time
 import logging
@@ -42,6 +43,12 @@ class InfrastructureList():
     infrastructure_auth = {}
     """Map from string to :py:class:`Authentication`."""
 
+    SEARCH_PAGE_SIZE = 100
+    """Number of searchable texts of Infrastructures got from the DB in each query."""
+
+    _search_column_db = None
+    """DB URL already checked to have the search column (to check it only once)."""
+
     @staticmethod
     def add_infrastructure(inf):
         """Add a new Infrastructure."""
@@ -106,6 +113,56 @@ class InfrastructureList():
             InfrastructureList.logger.warning("%s not in list of Inf IDs." % inf_id)
             return None
 
+    @staticmethod
+    def _get_search_text(inf):
+        """
+        Get the searchable text (RADL and TOSCA) of an Infrastructure.
+        """
+        if inf.deleted:
+            return ""
+        text = str(inf.get_radl())
+        tosca_data = inf.extra_info.get("TOSCA")
+        if tosca_data:
+            text += "\n" + tosca_data.serialize()
+        return text
+
+    @staticmethod
+    def search_inf_ids(inf_ids, flt, max_res=None):
+        """
+        Filter a list of Infrastructure IDs using the searchable text stored in the DB
+        with the Infrastructures, so that they are not loaded.
+
+        Args:
+
+        - inf_ids(list of str): IDs of the infrastructures to filter.
+        - flt(str): regular expression (or plain substring) to search in the RADL or TOSCA
+                    of the infrastructures.
+        - max_res(int): Stop searching when this number of infrastructures are found.
+
+        Return(list of str): IDs of the infrastructures that match the filter.
+        """
+        try:
+            regex = re.compile(flt)
+        except re.error:
+            # It is not a valid regex, so search it as a substring
+            regex = re.compile(re.escape(flt))
+
+        res = []
+        for i in range(0, len(inf_ids), InfrastructureList.SEARCH_PAGE_SIZE):
+            page = inf_ids[i:i + InfrastructureList.SEARCH_PAGE_SIZE]
+            texts = InfrastructureList._get_search_texts_from_db(page)
+            for inf_id in page:
+                if max_res is not None and len(res) >= max_res:
+                    return res
+                text = texts.get(inf_id)
+                if text is None:
+                    # Infrastructure stored by an old IM version without searchable text
+                    inf = InfrastructureList.get_infrastructure(inf_id)
+                    text = InfrastructureList._get_search_text(inf) if inf else ""
+                if regex.search(text):
+                    res.append(inf_id)
+        return res
+
     @staticmethod
     def stop():
         """ Stop securely the IM service """
@@ -157,11 +214,24 @@ class InfrastructureList():
                 InfrastructureList.logger.debug("Creating the IM database!.")
                 if db.db_type == DataBase.MYSQL:
                     db.execute("CREATE TABLE inf_list(rowid INTEGER NOT NULL AUTO_INCREMENT UNIQUE,"
-                               " id VARCHAR(255) PRIMARY KEY, deleted INTEGER, date TIMESTAMP, data LONGBLOB)")
+                               " id VARCHAR(255) PRIMARY KEY, deleted INTEGER, date TIMESTAMP, data LONGBLOB,"
+                               " search LONGTEXT)")
                 elif db.db_type == DataBase.SQLITE:
                     db.execute("CREATE TABLE inf_list(id VARCHAR(255) PRIMARY KEY, deleted INTEGER,"
-                               " date TIMESTAMP, data LONGBLOB)")
-                db.close()
+                               " date TIMESTAMP, data LONGBLOB, search TEXT)")
+            elif (InfrastructureList._search_column_db != Config.DATA_DB and
+                  not db.column_exists("inf_list", "search")):
+                # Tables created by old IM versions
+                InfrastructureList.logger.info("Adding the search column to the IM database.")
+                try:
+                    db.execute("ALTER TABLE inf_list ADD COLUMN search %s" %
+                               ("LONGTEXT" if db.db_type == DataBase.MYSQL else "TEXT"))
+                except Exception:
+                    # Other IM instance (in HA mode) may have added it
+                    if not db.column_exists("inf_list", "search"):
+                        raise
+            InfrastructureList._search_column_db = Config.DATA_DB
+            db.close()
             return True
         else:
             InfrastructureList.logger.error("ERROR connecting with the database!.")
@@ -229,12 +299,15 @@ class InfrastructureList():
 
             for inf in infs_to_save.values():
                 data = inf.serialize()
+                # Store the searchable text to filter the infrastructures without loading them
+                search = InfrastructureList._get_search_text(inf)
                 if db.db_type == DataBase.MONGO:
                     res = db.replace("inf_list", {"id": inf.id}, {"id": inf.id, "deleted": int(inf.deleted),
-                                                                  "data": data, "date": time.time()})
+                                                                  "data": data, "date": time.time(),
+                                                                  "search": search})
                 else:
-                    res = db.execute("replace into inf_list (id, deleted, data, date) values (%s, %s, %s, now())",
-                                     (inf.id, int(inf.deleted), data))
+                    res = db.execute("replace into inf_list (id, deleted, data, date, search) values "
+                                     "(%s, %s, %s, now(), %s)", (inf.id, int(inf.deleted), data, search))
 
             db.close()
             return res
@@ -242,6 +315,32 @@ class InfrastructureList():
             InfrastructureList.logger.error("ERROR connecting with the database!.")
             return None
 
+    @staticmethod
+    def _get_search_texts_from_db(inf_ids):
+        """
+        Get the searchable texts of a list of Infrastructures from the DB.
+
+        Return(dict): map from Infrastructure ID to its text (None if it has not been stored).
+        """
+        try:
+            db = DataBase(Config.DATA_DB)
+            if db.connect():
+                if db.db_type == DataBase.MONGO:
+                    res = db.find("inf_list", {"id": {"$in": inf_ids}}, {"id": True, "search": True})
+                    texts = dict((elem['id'], elem.get('search')) for elem in res)
+                else:
+                    res = db.select("select id, search from inf_list where id in (%s)" %
+                                    ", ".join(["%s"] * len(inf_ids)), tuple(inf_ids))
+                    texts = dict((elem[0], elem[1]) for elem in res)
+                db.close()
+                return texts
+            else:
+                InfrastructureList.logger.error("ERROR connecting with the database!.")
+                return {}
+        except Exception:
+            InfrastructureList.logger.exception("ERROR getting the searchable text of the infrastructures.")
+            return {}
+
     @staticmethod
     def _get_inf_ids_from_db():
         try:
@@ -271,6 +370,7 @@ class InfrastructureList():
     def _reinit():
         """Restart the class attributes to initial values."""
         InfrastructureList.infrastructure_list = {}
+        InfrastructureList._search_column_db = None
         InfrastructureList._lock = threading.Lock()
         db = DataBase(Config.DATA_DB)
         if db.connect():
@@ -14,14 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import re
 import yaml
-import json
 import os
 import string
 import random
 import logging
+import multiprocessing.pool
+import sys
 import threading
+import time
 
 import IM.InfrastructureInfo
 import IM.InfrastructureList
@@ -31,6 +32,14 @@ from IM.CloudInfo import CloudInfo
 from IM.auth import Authentication
 from IM.recipe import Recipe
 from IM.config import Config
+from IM.metrics import Metrics
+from IM.tracing import Tracer
+from IM.cache import TTLCache
+from IM.userdb import UserDB
+from IM.VMPoller import VMPoller
+from IM.LaunchScheduler import LaunchScheduler
+from IM.CloudExecutor import CloudExecutor
+from IM.CircuitBreaker import CircuitBreaker, CircuitBreakerOpenException
 from IM.VirtualMachine import VirtualMachine
 
 from radl import radl_parse
@@ -40,10 +49,6 @@ from radl.radl_json import dump_radl as dump_radl_json
 from IM.openid.JWT import JWT
 from IM.openid.OpenIDClient import OpenIDClient
 
-
-if Config.MAX_SIMULTANEOUS_LAUNCHES > 1:
-    from multiprocessing.pool import ThreadPool
-
 try:
     unicode("hola")
 except NameError:
@@ -106,10 +111,33 @@ class InfrastructureManager:
     logger = logging.getLogger('InfrastructureManager')
     """Logger object."""
 
+    oidc_cache = TTLCache("oidc", 10000)
+    """Cache of the OIDC userinfo and introspection requests."""
+
+    concrete_cache = TTLCache("concrete_system", 1000)
+    """Cache of the concrete systems returned by the cloud providers."""
+
+    _concrete_pool = None
+    """Thread pool to concrete the systems with the cloud providers concurrently."""
+
+    _concrete_pool_lock = threading.Lock()
+    """Threading Lock to create the concrete thread pool."""
+
+    MAX_STUCK_CONCRETE_TASKS = 2
+    """Max number of timed out concrete tasks of an endpoint that can be running in the pool."""
+
+    _concrete_stuck = {}
+    """Map from cloud endpoint to the number of timed out concrete tasks still running."""
+
     @staticmethod
     def _reinit():
         """Restart the class attributes to initial values."""
         IM.InfrastructureList.InfrastructureList._reinit()
+        InfrastructureManager.oidc_cache.clear()
+        InfrastructureManager.concrete_cache.clear()
+        CloudExecutor._reinit()
+        CircuitBreaker._reinit()
+        UserDB._reinit()
 
     @staticmethod
     def _compute_deploy_groups(radl):
@@ -165,6 +193,8 @@ class InfrastructureManager:
         return deploy_groups
 
     @staticmethod
+    @Tracer.traced("launch_deploy", lambda sel_inf, deploy, cloud_id, *args: {
+        "im.inf_id": sel_inf.id, "im.deploy_id": deploy.id, "im.cloud_id": cloud_id})
     def _launch_deploy(sel_inf, deploy, cloud_id, cloud, concrete_systems, radl, auth, deployed_vm):
         """Launch a deploy."""
 
@@ -228,6 +258,7 @@ class InfrastructureManager:
                     deploy.cloud_id = cloud_id
 
     @staticmethod
+    @Metrics.operation
     def get_infrastructure(inf_id, auth):
         """Return infrastructure info with some id if valid authorization provided."""
 
@@ -244,9 +275,24 @@ class InfrastructureManager:
         if sel_inf.deleted:
             InfrastructureManager.logger.error("Inf ID: %s is deleted." % inf_id)
             raise DeletedInfrastructureException()
+        if Config.VM_POLLER:
+            sel_inf.last_auth = auth
 
         return sel_inf
 
+    @staticmethod
+    def _update_vms_status(sel_inf, vm_list, auth, refresh=False):
+        """
+        Update the status of the VMs of an infrastructure to return them.
+        If the VMPoller is active, only the VMs that it has not updated
+        recently are updated (unless refresh is set).
+
+        Return: list of VirtualMachine updated.
+        """
+        if VMPoller.is_active() and not refresh:
+            vm_list = VMPoller.get_stale_vms(vm_list)
+        return sel_inf.update_vms_status(auth, force=refresh, vm_list=vm_list)
+
     @staticmethod
     def get_vm_from_inf(inf_id, vm_id, auth):
         """Return VirtualMachie info with some id of an infrastructure if valid authorization provided."""
@@ -254,6 +300,7 @@ class InfrastructureManager:
         return sel_inf.get_vm(vm_id)
 
     @staticmethod
+    @Metrics.operation
     def Reconfigure(inf_id, radl_data, auth, vm_list=None):
         """
         Add and update RADL definitions and reconfigure the infrastructure.
@@ -390,6 +437,7 @@ class InfrastructureManager:
         return concrete_system, score
 
     @staticmethod
+    @Tracer.traced("systems_with_vmrc")
     def systems_with_vmrc(sel_inf, radl, auth):
         """
         Concrete systems using VMRC
@@ -439,6 +487,153 @@ class InfrastructureManager:
 
         return systems_with_vmrc
 
+    @staticmethod
+    def _get_concrete_pool():
+        """
+        Get the thread pool used to concrete the systems (created on first use).
+        It returns None if the clouds must be evaluated sequentially.
+        """
+        if Config.CONCRETE_SYSTEM_THREADS <= 1:
+            return None
+        with InfrastructureManager._concrete_pool_lock:
+            if InfrastructureManager._concrete_pool is None:
+                pool = multiprocessing.pool.ThreadPool(processes=Config.CONCRETE_SYSTEM_THREADS)
+                InfrastructureManager._concrete_pool = pool
+            return InfrastructureManager._concrete_pool
+
+    @staticmethod
+    def _concrete_system(cloud, system, auth):
+        """
+        Concrete a system with a cloud provider, caching the results
+        during CONCRETE_SYSTEM_CACHE_TIME secs.
+        """
+        key = TTLCache.hash_key(cloud.cloud.get_key(), auth.get_fingerprint(cloud.cloud.type, cloud.cloud.server),
+                                system)
+        found, concrete = InfrastructureManager.concrete_cache.get(key)
+        if not found:
+            concrete = cloud.concreteSystem(system, auth)
+            InfrastructureManager.concrete_cache.put(key, [s.clone() for s in concrete],
+                                                     Config.CONCRETE_SYSTEM_CACHE_TIME)
+        else:
+            concrete = [s.clone() for s in concrete]
+        return concrete
+
+    @staticmethod
+    def _concrete_cloud_systems(cloud, systems_with_vmrc, radl, auth):
+        """
+        Concrete the systems with a cloud provider and select the ones with the greatest score.
+
+        Return: dict from system id to a tuple (concrete system, score).
+        """
+        res = {}
+        for system_id, systems in systems_with_vmrc.items():
+            try:
+                concrete = [(s, s0) for s in systems for s0 in InfrastructureManager._concrete_system(cloud, s, auth)]
+            except CircuitBreakerOpenException as ex:
+                # Discard the degraded cloud providers
+                InfrastructureManager.logger.warning("Cloud %s discarded: %s" % (cloud.cloud.id, ex))
+                concrete = []
+            s1 = [InfrastructureManager._compute_score(s.clone().applyFeatures(s0,
+                                                                               conflict="other",
+                                                                               missing="other").concrete(),
+                                                       radl.get_system_by_name(system_id))
+                  for s, s0 in concrete]
+            # Store the concrete system with largest score
+            res[system_id] = max(s1, key=lambda x: x[1]) if s1 else (None, -1e9)
+        return res
+
+    @staticmethod
+    def _concrete_cloud_task(task, cloud, systems_with_vmrc, radl, auth):
+        """
+        Concrete the systems with a cloud provider in the concrete pool.
+
+        Args:
+        - task(dict): state of the task shared with the caller ("submitted", "start",
+          "end" and "stuck" if the caller has stopped waiting it).
+        """
+        endpoint = cloud.cloud.get_endpoint()
+        with InfrastructureManager._concrete_pool_lock:
+            if task.get("stuck"):
+                # Discarded before starting: do not contact the provider
+                return None
+            task["start"] = time.time()
+        try:
+            return InfrastructureManager._concrete_cloud_systems(cloud, systems_with_vmrc, radl, auth)
+        finally:
+            with InfrastructureManager._concrete_pool_lock:
+                task["end"] = time.time()
+                if task.get("stuck"):
+                    InfrastructureManager._concrete_stuck[endpoint] -= 1
+
+    @staticmethod
+    def _wait_concrete_task(task, res):
+        """
+        Wait a concrete task to finish during CONCRETE_SYSTEM_TIMEOUT secs since it
+        starts (or since it is submitted if it has not started yet).
+
+        Return: True if the task has finished.
+        """
+        while not res.ready():
+            with InfrastructureManager._concrete_pool_lock:
+                start = task.get("start", task["submitted"])
+            remaining = start + Config.CONCRETE_SYSTEM_TIMEOUT - time.time()
+            if remaining <= 0:
+                return False
+            # wake up every second to check if the task has started
+            res.wait(min(remaining, 1))
+        return True
+
+    @staticmethod
+    @Tracer.traced("concrete_systems")
+    def concrete_systems(sel_inf, cloud_list, systems_with_vmrc, radl, auth):
+        """
+        Concrete systems with cloud providers and select systems with the greatest score
+        in every cloud. The clouds are evaluated concurrently and the ones that do not
+        answer in CONCRETE_SYSTEM_TIMEOUT secs are discarded. The clouds with more than
+        MAX_STUCK_CONCRETE_TASKS timed out tasks still running are discarded directly.
+
+        Return: dict from cloud id to a dict from system id to a tuple (concrete system, score).
+        """
+        concrete_systems = {}
+        pool = InfrastructureManager._get_concrete_pool()
+        if pool is None or len(cloud_list) <= 1:
+            for cloud_id, cloud in cloud_list.items():
+                concrete_systems[cloud_id] = InfrastructureManager._concrete_cloud_systems(cloud, systems_with_vmrc,
+                                                                                           radl, auth)
+            return concrete_systems
+
+        discarded = dict((system_id, (None, -1e9)) for system_id in systems_with_vmrc)
+        concrete_func = Tracer.wrap(InfrastructureManager._concrete_cloud_task)
+        results = []
+        for cloud_id, cloud in cloud_list.items():
+            endpoint = cloud.cloud.get_endpoint()
+            with InfrastructureManager._concrete_pool_lock:
+                stuck = InfrastructureManager._concrete_stuck.get(endpoint, 0)
+            if stuck >= InfrastructureManager.MAX_STUCK_CONCRETE_TASKS:
+                InfrastructureManager.logger.warning("Inf ID: %s: Cloud %s discarded: %d previous concrete tasks "
+                                                     "are still running." % (sel_inf.id, cloud_id, stuck))
+                concrete_systems[cloud_id] = dict(discarded)
+                continue
+            task = {"submitted": time.time()}
+            results.append((cloud_id, endpoint, task,
+                            pool.apply_async(concrete_func, (task, cloud, systems_with_vmrc, radl, auth))))
+
+        for cloud_id, endpoint, task, res in results:
+            if Config.CONCRETE_SYSTEM_TIMEOUT <= 0 or InfrastructureManager._wait_concrete_task(task, res):
+                concrete_systems[cloud_id] = res.get()
+                continue
+
+            with InfrastructureManager._concrete_pool_lock:
+                if "end" not in task:
+                    task["stuck"] = True
+                    if "start" in task:
+                        stuck = InfrastructureManager._concrete_stuck
+                        stuck[endpoint] = stuck.get(endpoint, 0) + 1
+            InfrastructureManager.logger.warning("Inf ID: %s: Timeout concreting the systems with cloud %s. "
+                                                 "Discarding it." % (sel_inf.id, cloud_id))
+            concrete_systems[cloud_id] = dict(discarded)
+        return concrete_systems
+
     @staticmethod
     def sort_by_score(sel_inf, concrete_systems, cloud_list, deploy_groups, auth):
         """
@@ -491,6 +686,8 @@ class InfrastructureManager:
         return deploys_group_cloud
 
     @staticmethod
+    @Metrics.operation
+    @Tracer.traced("AddResource", lambda inf_id, *args, **kwargs: {"im.inf_id": inf_id})
     def AddResource(inf_id, radl_data, auth, context=True):
         """
         Add the resources in the RADL to the infrastructure.
@@ -532,6 +729,7 @@ class InfrastructureManager:
                 sel_inf.add_cont_msg("Infrastructure without any deploy. Exiting.")
                 if sel_inf.configured is None:
                     sel_inf.configured = False
+                IM.InfrastructureList.InfrastructureList.save_data(inf_id)
                 return []
         except Exception as ex:
             sel_inf.configured = False
@@ -568,18 +766,8 @@ class InfrastructureManager:
 
         # Concrete systems with cloud providers and select systems with the greatest score
         # in every cloud
-        cloud_list = dict([(c.id, c.getCloudConnector(sel_inf)) for c in CloudInfo.get_cloud_list(auth)])
-        concrete_systems = {}
-        for cloud_id, cloud in cloud_list.items():
-            for system_id, systems in systems_with_vmrc.items():
-                s1 = [InfrastructureManager._compute_score(s.clone().applyFeatures(s0,
-                                                                                   conflict="other",
-                                                                                   missing="other").concrete(),
-                                                           radl.get_system_by_name(system_id))
-                      for s in systems for s0 in cloud.concreteSystem(s, auth)]
-                # Store the concrete system with largest score
-                concrete_systems.setdefault(cloud_id, {})[system_id] = (
-                    max(s1, key=lambda x: x[1]) if s1 else (None, -1e9))
+        cloud_list = dict([(c.id, sel_inf.get_cloud_connector(c, auth)) for c in CloudInfo.get_cloud_list(auth)])
+        concrete_systems = InfrastructureManager.concrete_systems(sel_inf, cloud_list, systems_with_vmrc, radl, auth)
 
         # Group virtual machines to deploy by network dependencies
         deploy_groups = InfrastructureManager._compute_deploy_groups(radl)
@@ -590,34 +778,31 @@ class InfrastructureManager:
         deploys_group_cloud = InfrastructureManager.sort_by_score(sel_inf, concrete_systems, cloud_list,
                                                                   deploy_groups, auth)
 
+        if not all(deploy_groups):
+            InfrastructureManager.logger.warning("Inf ID: %s: No VMs to deploy!" % sel_inf.id)
+            sel_inf.add_cont_msg("No VMs to deploy. Exiting.")
+            if sel_inf.configured is None:
+                sel_inf.configured = False
+            return []
+
         # We are going to start adding resources
         sel_inf.set_adding()
 
-        # Launch every group in the same cloud provider
+        # Launch every group in the same cloud provider (the groups are launched concurrently)
         deployed_vm = {}
+        groups = []
         for deploy_group in deploy_groups:
-            if not deploy_group:
-                InfrastructureManager.logger.warning("Inf ID: %s: No VMs to deploy!" % sel_inf.id)
-                sel_inf.add_cont_msg("No VMs to deploy. Exiting.")
-                if sel_inf.configured is None:
-                    sel_inf.configured = False
-                return []
-
             cloud_id = deploys_group_cloud[id(deploy_group)]
-            cloud = cloud_list[cloud_id]
-            if Config.MAX_SIMULTANEOUS_LAUNCHES > 1:
-                pool = ThreadPool(processes=Config.MAX_SIMULTANEOUS_LAUNCHES)
-                pool.map(
-                    lambda deploy: InfrastructureManager._launch_deploy(sel_inf, deploy, cloud_id,
-                                                                        cloud, concrete_systems, radl, auth,
-                                                                        deployed_vm),
-                    deploy_group)
-                pool.close()
-            else:
-                for deploy in deploy_group:
-                    InfrastructureManager._launch_deploy(sel_inf, deploy, cloud_id,
-                                                         cloud, concrete_systems, radl,
-                                                         auth, deployed_vm)
+            groups.append((deploy_group, cloud_id, cloud_list[cloud_id]))
+
+        def launch_deploy(deploy, cloud_id, cloud):
+            InfrastructureManager._launch_deploy(sel_inf, deploy, cloud_id, cloud, concrete_systems,
+                                                 radl, auth, deployed_vm)
+        sel_inf.launch_times = LaunchScheduler.launch(sel_inf.id, groups, launch_deploy)
+        for group_times in sel_inf.launch_times:
+            InfrastructureManager.logger.info("Inf ID: %s: Deploys %s launched in cloud %s in %.2f secs." %
+                                              (sel_inf.id, group_times["deploys"], group_times["cloud_id"],
+                                               group_times["duration"]))
 
         # We make this to maintain the order of the VMs in the sel_inf.vm_list
         # according to the deploys shown in the RADL
@@ -686,6 +871,7 @@ class InfrastructureManager:
         return [vm.im_id for vm in new_vms]
 
     @staticmethod
+    @Metrics.operation
     def RemoveResource(inf_id, vm_list, auth, context=True):
         """
         Remove a list of resources from the infrastructure.
@@ -740,6 +926,7 @@ class InfrastructureManager:
         return cont
 
     @staticmethod
+    @Metrics.operation
     def GetVMProperty(inf_id, vm_id, property_name, auth):
         """
         Get a particular property about a virtual machine in an infrastructure.
@@ -763,7 +950,8 @@ class InfrastructureManager:
         return res
 
     @staticmethod
-    def GetVMInfo(inf_id, vm_id, auth, json_res=False):
+    @Metrics.operation
+    def GetVMInfo(inf_id, vm_id, auth, json_res=False, refresh=False):
         """
         Get information about a virtual machine in an infrastructure.
 
@@ -773,6 +961,7 @@ class InfrastructureManager:
         - vm_id(str): virtual machine id.
         - auth(Authentication): parsed authentication tokens.
         - json_res(bool): Flag to return the info in RADL JSON format
+        - refresh(bool): Flag to force the update of the VM info from the cloud provider.
 
         Return: the RADL with the information about the VM or a str with the JSON data if json_res flag.
         """
@@ -783,7 +972,7 @@ class InfrastructureManager:
 
         vm = InfrastructureManager.get_vm_from_inf(inf_id, vm_id, auth)
 
-        success = vm.update_status(auth)
+        success = InfrastructureManager._update_vms_status(vm.inf, [vm], auth, refresh)
         if not success:
             InfrastructureManager.logger.debug(
                 "Inf ID: " + str(inf_id) + ": " +
@@ -795,6 +984,7 @@ class InfrastructureManager:
             return vm.get_vm_info()
 
     @staticmethod
+    @Metrics.operation
     def GetVMContMsg(inf_id, vm_id, auth):
         """
         Get the contextualization log of a virtual machine in an infrastructure.
@@ -820,6 +1010,7 @@ class InfrastructureManager:
         return cont_msg
 
     @staticmethod
+    @Metrics.operation
     def AlterVM(inf_id, vm_id, radl_data, auth):
         """
         Get information about a virtual machine in an infrastructure.
@@ -863,6 +1054,7 @@ class InfrastructureManager:
         return vm.info
 
     @staticmethod
+    @Metrics.operation
     def GetInfrastructureRADL(inf_id, auth):
         """
         Get the original RADL of an infrastructure.
@@ -885,6 +1077,7 @@ class InfrastructureManager:
         return radl
 
     @staticmethod
+    @Metrics.operation
     def GetInfrastructureInfo(inf_id, auth):
         """
         Get information about an infrastructure.
@@ -907,6 +1100,7 @@ class InfrastructureManager:
         return res
 
     @staticmethod
+    @Metrics.operation
     def GetInfrastructureContMsg(inf_id, auth, headeronly=False):
         """
         Get cont msg of an infrastructure.
@@ -937,7 +1131,8 @@ class InfrastructureManager:
         return res
 
     @staticmethod
-    def GetInfrastructureState(inf_id, auth):
+    @Metrics.operation
+    def GetInfrastructureState(inf_id, auth, refresh=False):
         """
         Get the aggregated state of an infrastructure.
 
@@ -945,6 +1140,7 @@ class InfrastructureManager:
 
         - inf_id(str): infrastructure id.
         - auth(Authentication): parsed authentication tokens.
+        - refresh(bool): Flag to force the update of the VMs info from the cloud providers.
 
         Return: a dict with two elements:
             - 'state': str with the aggregated state of the infrastructure
@@ -957,10 +1153,10 @@ class InfrastructureManager:
         sel_inf = InfrastructureManager.get_infrastructure(inf_id, auth)
 
         vm_list = sel_inf.get_vm_list()
+        # First try to update the status of the VMs
+        InfrastructureManager._update_vms_status(sel_inf, vm_list, auth, refresh)
         vm_states = {}
         for vm in vm_list:
-            # First try to update the status of the VM
-            vm.update_status(auth)
             vm_states[str(vm.im_id)] = vm.state
 
         state = None
@@ -1018,6 +1214,7 @@ class InfrastructureManager:
             exceptions.append(msg)
 
     @staticmethod
+    @Metrics.operation
     def StopInfrastructure(inf_id, auth):
         """
         Stop all virtual machines in an infrastructure.
@@ -1038,17 +1235,9 @@ class InfrastructureManager:
 
         sel_inf = InfrastructureManager.get_infrastructure(inf_id, auth)
         exceptions = []
-        if Config.MAX_SIMULTANEOUS_LAUNCHES > 1:
-            pool = ThreadPool(processes=Config.MAX_SIMULTANEOUS_LAUNCHES)
-            pool.map(
-                lambda vm: InfrastructureManager._stop_vm(
-                    vm, auth, exceptions),
-                reversed(sel_inf.get_vm_list())
-            )
-            pool.close()
-        else:
-            for vm in sel_inf.get_vm_list():
-                InfrastructureManager._stop_vm(vm, auth, exceptions)
+        # The front-end (the first VM) is processed the last
+        CloudExecutor.run(sel_inf.id, [(vm.cloud, InfrastructureManager._stop_vm, (vm, auth, exceptions))
+                                       for vm in reversed(sel_inf.get_vm_list())])
 
         if exceptions:
             msg = ""
@@ -1072,6 +1261,7 @@ class InfrastructureManager:
             exceptions.append(msg)
 
     @staticmethod
+    @Metrics.operation
     def StartInfrastructure(inf_id, auth):
         """
         Start all virtual machines in an infrastructure previously stopped.
@@ -1092,17 +1282,9 @@ class InfrastructureManager:
 
         sel_inf = InfrastructureManager.get_infrastructure(inf_id, auth)
         exceptions = []
-        if Config.MAX_SIMULTANEOUS_LAUNCHES > 1:
-            pool = ThreadPool(processes=Config.MAX_SIMULTANEOUS_LAUNCHES)
-            pool.map(
-                lambda vm: InfrastructureManager._start_vm(
-                    vm, auth, exceptions),
-                reversed(sel_inf.get_vm_list())
-            )
-            pool.close()
-        else:
-            for vm in sel_inf.get_vm_list():
-                InfrastructureManager._start_vm(vm, auth, exceptions)
+        # The front-end (the first VM) is processed the last
+        CloudExecutor.run(sel_inf.id, [(vm.cloud, InfrastructureManager._start_vm, (vm, auth, exceptions))
+                                       for vm in reversed(sel_inf.get_vm_list())])
 
         if exceptions:
             msg = ""
@@ -1114,6 +1296,7 @@ class InfrastructureManager:
         return ""
 
     @staticmethod
+    @Metrics.operation
     def StartVM(inf_id, vm_id, auth):
         """
         Start the specified virtual machine in an infrastructure previously stopped.
@@ -1152,6 +1335,7 @@ class InfrastructureManager:
             return ""
 
     @staticmethod
+    @Metrics.operation
     def StopVM(inf_id, vm_id, auth):
         """
         Stop the specified virtual machine in an infrastructure
@@ -1192,6 +1376,7 @@ class InfrastructureManager:
             return ""
 
     @staticmethod
+    @Metrics.operation
     def RebootVM(inf_id, vm_id, auth):
         """
         Reboot the specified virtual machine in an infrastructure
@@ -1232,6 +1417,7 @@ class InfrastructureManager:
             return ""
 
     @staticmethod
+    @Metrics.operation
     def DestroyInfrastructure(inf_id, auth, force=False, async_call=False):
         """
         Destroy all virtual machines in an infrastructure.
@@ -1257,7 +1443,7 @@ class InfrastructureManager:
 
         if async_call:
             t = threading.Thread(name="DestroyResource-%s" % sel_inf.id,
-                                 target=sel_inf.destroy,
+                                 target=Tracer.wrap(sel_inf.destroy),
                                  args=(auth, force))
             t.daemon = True
             t.start()
@@ -1276,24 +1462,33 @@ class InfrastructureManager:
         Return(bool): true if the user is valid or false otherwise.
         """
         if Config.USER_DB:
-            if os.path.isfile(Config.USER_DB):
-                try:
-                    found = False
-                    user_db = json.load(open(Config.USER_DB, "r"))
-                    for user in user_db['users']:
-                        if user['username'] == auth[0]['username'] and user['password'] == auth[0]['password']:
-                            found = True
-                            break
-                    return found
-                except Exception:
-                    InfrastructureManager.logger.exception("Incorrect format in the User DB file %s" % Config.USER_DB)
-                    return False
-            else:
-                InfrastructureManager.logger.error("User DB file %s not found" % Config.USER_DB)
-                return False
+            return UserDB.check_user(Config.USER_DB, auth[0].get('username'), auth[0].get('password'))
         else:
             return True
 
+    @staticmethod
+    def _oidc_cached_request(request_type, decoded_token, cache_time, func, token, *args):
+        """
+        Call an OIDC request function (that returns a tuple (success, result)) using the OIDC cache.
+        Successful results are cached cache_time secs (OIDC_CACHE_TIME if None) and failed ones
+        OIDC_NEGATIVE_CACHE_TIME secs, but never beyond the expiration time of the token.
+        """
+        key = TTLCache.hash_key(request_type, token, *args)
+        found, res = InfrastructureManager.oidc_cache.get(key)
+        if found:
+            return res
+
+        res = func(token, *args)
+        try:
+            validity = int(decoded_token['exp']) - time.time()
+        except Exception:
+            validity = 0
+        if cache_time is None:
+            cache_time = Config.OIDC_CACHE_TIME
+        ttl = cache_time if res[0] else Config.OIDC_NEGATIVE_CACHE_TIME
+        InfrastructureManager.oidc_cache.put(key, res, min(ttl, validity))
+        return res
+
     @staticmethod
     def check_oidc_token(im_auth):
         token = im_auth["token"]
@@ -1310,11 +1505,22 @@ class InfrastructureManager:
             InfrastructureManager.logger.error("Incorrect OIDC issuer: %s" % decoded_token['iss'])
             raise InvaliddUserException("Invalid InfrastructureManager credentials. Issuer not accepted.")
 
+        # Verify locally the signature of the token with the keys of the issuer
+        if Config.OIDC_VERIFY_SIGNATURE:
+            verified, msg = OpenIDClient.verify_token(token, Config.OIDC_ISSUERS, Config.OIDC_AUDIENCE,
+                                                      Config.OIDC_JWKS_CACHE_TIME)
+            if not verified:
+                InfrastructureManager.logger.error("Error verifying OIDC auth token: %s" % msg)
+                raise InvaliddUserException("Invalid InfrastructureManager credentials. %s." % msg)
+
         # Now check the audience
         if Config.OIDC_AUDIENCE:
             if 'aud' in decoded_token and decoded_token['aud']:
                 found = False
-                for aud in decoded_token['aud'].split(","):
+                token_auds = decoded_token['aud']
+                if not isinstance(token_auds, list):
+                    token_auds = token_auds.split(",")
+                for aud in token_auds:
                     if aud == Config.OIDC_AUDIENCE:
                         found = True
                         break
@@ -1328,9 +1534,10 @@ class InfrastructureManager:
                 raise InvaliddUserException("Invalid InfrastructureManager credentials. Audience not accepted.")
 
         if Config.OIDC_SCOPES and Config.OIDC_CLIENT_ID and Config.OIDC_CLIENT_SECRET:
-            success, res = OpenIDClient.get_token_introspection(token,
-                                                                Config.OIDC_CLIENT_ID,
-                                                                Config.OIDC_CLIENT_SECRET)
+            success, res = InfrastructureManager._oidc_cached_request("introspect", decoded_token, None,
+                                                                      OpenIDClient.get_token_introspection,
+                                                                      token, Config.OIDC_CLIENT_ID,
+                                                                      Config.OIDC_CLIENT_SECRET)
             if not success:
                 raise InvaliddUserException("Invalid InfrastructureManager credentials. "
                                             "Invalid token or Client credentials.")
@@ -1353,7 +1560,10 @@ class InfrastructureManager:
 
         try:
             # Now try to get user info
-            success, userinfo = OpenIDClient.get_user_info_request(token)
+            # If the token signature has been verified the user info is requested once per token
+            cache_time = sys.maxsize if Config.OIDC_VERIFY_SIGNATURE else None
+            success, userinfo = InfrastructureManager._oidc_cached_request("userinfo", decoded_token, cache_time,
+                                                                           OpenIDClient.get_user_info_request, token)
             if success:
                 # convert to username to use it in the rest of the IM
                 im_auth['username'] = IM.InfrastructureInfo.InfrastructureInfo.OPENID_USER_PREFIX
@@ -1373,6 +1583,8 @@ class InfrastructureManager:
             raise InvaliddUserException("Invalid InfrastructureManager credentials. %s." % userinfo)
 
     @staticmethod
+    @Metrics.operation
+    @Tracer.traced("check_auth_data")
     def check_auth_data(auth):
         # First check if it is configured to check the users from a list
         im_auth = auth.getAuthInfo("InfrastructureManager")
@@ -1413,6 +1625,8 @@ class InfrastructureManager:
         return auth
 
     @staticmethod
+    @Metrics.operation
+    @Tracer.traced("CreateInfrastructure")
     def CreateInfrastructure(radl_data, auth, async_call=False):
         """
         Create a new infrastructure.
@@ -1454,7 +1668,7 @@ class InfrastructureManager:
             if async_call:
                 InfrastructureManager.logger.debug("Inf ID: " + str(inf.id) + " created Async.")
                 t = threading.Thread(name="AddResource-%s" % inf.id,
-                                     target=InfrastructureManager.AddResource,
+                                     target=Tracer.wrap(InfrastructureManager.AddResource),
                                      args=(inf.id, radl, auth))
                 t.daemon = True
                 t.start()
@@ -1492,7 +1706,8 @@ class InfrastructureManager:
         return inf.id
 
     @staticmethod
-    def GetInfrastructureList(auth, flt=None):
+    @Metrics.operation
+    def GetInfrastructureList(auth, flt=None, limit=None, offset=0):
         """
         Return the infrastructure ids associated to IM tokens.
 
@@ -1500,7 +1715,9 @@ class InfrastructureManager:
 
         - auth(Authentication): parsed authentication tokens.
         - flt(string): string to filter the list of returned infrastructures.
-                          A regex to be applied in the RADL or TOSCA of the infra.
+                          A regex (or a plain substring) to be applied in the RADL or TOSCA of the infra.
+        - limit(int): maximum number of infrastructure ids to return (optional).
+        - offset(int): number of infrastructure ids to skip (optional).
 
         Return(list of int): list of infrastructure ids.
         """
@@ -1513,23 +1730,29 @@ class InfrastructureManager:
             InfrastructureManager.logger.error("No correct auth data has been specified.")
             raise InvaliddUserException()
 
+        if limit is not None and limit < 0:
+            raise Exception("Incorrect value for limit: %s. It must be a positive integer." % limit)
+        if offset is None:
+            offset = 0
+        if offset < 0:
+            raise Exception("Incorrect value for offset: %s. It must be a positive integer." % offset)
+
         inf_ids = IM.InfrastructureList.InfrastructureList.get_inf_ids(auth)
         if flt:
-            res = []
-            for infid in inf_ids:
-                inf = InfrastructureManager.get_infrastructure(infid, auth)
-                radl = str(inf.get_radl())
-                tosca = ""
-                if "TOSCA" in inf.extra_info:
-                    tosca = inf.extra_info["TOSCA"].serialize()
-
-                if re.search(flt, radl) or re.search(flt, tosca):
-                    res.append(infid)
+            max_res = None
+            if limit is not None:
+                max_res = offset + limit
+            res = IM.InfrastructureList.InfrastructureList.search_inf_ids(inf_ids, flt, max_res)
         else:
             res = inf_ids
-        return res
+
+        if limit is not None:
+            return res[offset:offset + limit]
+        else:
+            return res[offset:]
 
     @staticmethod
+    @Metrics.operation
     def ExportInfrastructure(inf_id, delete, auth_data):
         if delete and Config.BOOT_MODE == 1:
             raise DisabledFunctionException()
@@ -1547,6 +1770,7 @@ class InfrastructureManager:
         return str_inf
 
     @staticmethod
+    @Metrics.operation
     def ImportInfrastructure(str_inf, auth_data):
         if Config.BOOT_MODE in [1, 2]:
             raise DisabledFunctionException()
@@ -1569,6 +1793,7 @@ class InfrastructureManager:
         return new_inf.id
 
     @staticmethod
+    @Metrics.operation
     def CreateDiskSnapshot(inf_id, vm_id, disk_num, image_name, auto_delete, auth):
         """
         Create a snapshot of the specified num disk in a
@@ -1604,4 +1829,5 @@ class InfrastructureManager:
 
     @staticmethod
     def stop():
+        VMPoller.stop()
         IM.InfrastructureList.InfrastructureList.stop()
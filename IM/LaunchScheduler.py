@@ -0,0 +1,77 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scheduler of the launches of the deploy groups"""
+
+import time
+
+from IM.CloudExecutor import CloudExecutor
+from IM.metrics import Metrics
+
+
+class LaunchScheduler:
+    """
+    Launch the deploy groups of the AddResource calls. The deploys of all the
+    groups (that are independent between them) are launched concurrently in the
+    CloudExecutor shared by all the infrastructures, that limits the number of
+    simultaneous launches to the same cloud provider.
+    """
+
+    @staticmethod
+    def _launch(launch_func, deploy, cloud_id, cloud):
+        init = time.time()
+        launch_func(deploy, cloud_id, cloud)
+        return init, time.time()
+
+    @staticmethod
+    def launch(inf_id, groups, launch_func):
+        """
+        Launch the deploys of a list of deploy groups.
+
+        Args:
+
+        - inf_id(str): ID of the infrastructure.
+        - groups(list of tuple): list of (deploy group, cloud ID, cloud connector) to launch.
+        - launch_func(function): function to launch a deploy: launch_func(deploy, cloud_id, cloud).
+
+        Return(list of dict): the launch timing of every group, with the cloud ID, the deploy IDs,
+                              the start and end times and the duration (in secs).
+        """
+        # Interleave the deploys of the groups to start all of them as soon as possible
+        tasks = []
+        for i in range(max([len(group) for group, _, _ in groups] + [0])):
+            for num, (group, cloud_id, cloud) in enumerate(groups):
+                if i < len(group):
+                    tasks.append((num, group[i], cloud_id, cloud))
+
+        results = CloudExecutor.run(inf_id, [(cloud.cloud, LaunchScheduler._launch,
+                                              (launch_func, deploy, cloud_id, cloud))
+                                             for _, deploy, cloud_id, cloud in tasks])
+
+        times = []
+        for num, (group, cloud_id, cloud) in enumerate(groups):
+            group_times = [res for (task_num, _, _, _), res in zip(tasks, results) if task_num == num]
+            if not group_times:
+                continue
+            start = min([init for init, _ in group_times])
+            end = max([end for _, end in group_times])
+            times.append({"cloud_id": cloud_id,
+                          "deploys": [deploy.id for deploy in group],
+                          "start": start,
+                          "end": end,
+                          "duration": end - start})
+            Metrics.observe("im_deploy_group_launch_seconds", end - start, {"cloud_type": cloud.cloud.type})
+        return times
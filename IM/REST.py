@@ -18,6 +18,8 @@ import logging
 import threading
 import json
 import base64
+import types
+import zlib
 import bottle
 
 from IM.InfrastructureInfo import IncorrectVMException, DeletedVMException, IncorrectStateException
@@ -26,10 +28,18 @@ from IM.InfrastructureManager import (InfrastructureManager, DeletedInfrastructu
                                       InvaliddUserException, DisabledFunctionException)
 from IM.auth import Authentication
 from IM.config import Config
+from IM.metrics import Metrics
+from IM.profiler import Profiler
+from IM.tracing import Tracer
 from IM import get_ex_error
+from IM import json_codec
 from radl.radl_json import parse_radl as parse_radl_json, dump_radl as dump_radl_json, featuresToSimple, radlToSimple
 from radl.radl import RADL, Features, Feature
-from IM.tosca.Tosca import Tosca
+
+try:
+    unicode("hola")
+except NameError:
+    unicode = str
 
 logger = logging.getLogger('InfrastructureManager')
 
@@ -38,6 +48,8 @@ AUTH_LINE_SEPARATOR = '\\n'
 # Combination of chars used to separate the lines inside the auth data
 # (i.e. in a certificate)
 AUTH_NEW_LINE_SEPARATOR = '\\\\n'
+# Size of the chunks used to send the streamed responses
+STREAM_CHUNK_SIZE = 65536
 
 HTML_ERROR_TEMPLATE = """<!DOCTYPE HTML PUBLIC "-//IETF//DTD HTML 2.0//EN">
 <html>
@@ -234,7 +246,94 @@ def get_auth_header():
     return Authentication(Authentication.read_auth_data(auth_data))
 
 
-def format_output_json(res, field_name=None, list_field_name=None):
+def get_output_size(res):
+    """
+    Estimate the size of an API response to decide if it must be streamed
+    """
+    if isinstance(res, (str, unicode, bytes)):
+        return len(res)
+    elif isinstance(res, RADL):
+        # Approximate size of the features plus the size of the recipes
+        size = sum(len(elem.props) * 64 for elem in res.ansible_hosts + res.networks + res.systems)
+        return size + sum(len(conf.recipes or "") for conf in res.configures)
+    elif isinstance(res, dict):
+        return sum(get_output_size(k) + get_output_size(v) for k, v in res.items())
+    elif isinstance(res, (list, tuple)):
+        return sum(get_output_size(elem) for elem in res)
+    else:
+        return 0
+
+
+def join_chunks(chunks):
+    """
+    Generator that groups the chunks in blocks of (at least) STREAM_CHUNK_SIZE chars
+    """
+    buff = []
+    size = 0
+    for chunk in chunks:
+        buff.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buff)
+            buff = []
+            size = 0
+    if buff:
+        yield "".join(buff)
+
+
+def stream_text_output(res):
+    """
+    Generator to send a text response (or a list of lines) in chunks
+    """
+    def lines_chunks(lines):
+        for num, line in enumerate(lines):
+            if num > 0:
+                yield "\n"
+            yield line
+
+    if isinstance(res, list):
+        for chunk in join_chunks(lines_chunks(res)):
+            yield chunk
+    elif isinstance(res, RADL):
+        # Serialize the RADL element by element (as RADL.__str__ does)
+        if res.description:
+            yield str(res.description) + "\n"
+        elems = [res.ansible_hosts, res.networks, res.systems, res.configures, [res.contextualize], res.deploys]
+        elems = (str(elem) for elem_list in elems for elem in elem_list)
+        for chunk in join_chunks(lines_chunks(elems)):
+            yield chunk
+    else:
+        info = res if isinstance(res, (str, unicode)) else "%s" % res
+        for pos in range(0, len(info), STREAM_CHUNK_SIZE):
+            yield info[pos:pos + STREAM_CHUNK_SIZE]
+
+
+def iter_json(obj, depth=3):
+    """
+    Generator to serialize an object to JSON in chunks: the dicts and lists of
+    the first depth levels are serialized item by item, so the whole document
+    is never built in memory, and the rest of items with the fastest JSON library
+    """
+    if depth > 0 and isinstance(obj, dict):
+        yield "{"
+        for num, (key, value) in enumerate(obj.items()):
+            yield '%s%s: ' % (", " if num > 0 else "", json.dumps("%s" % key))
+            for chunk in iter_json(value, depth - 1):
+                yield chunk
+        yield "}"
+    elif depth > 0 and isinstance(obj, (list, tuple)):
+        yield "["
+        for num, elem in enumerate(obj):
+            if num > 0:
+                yield ", "
+            for chunk in iter_json(elem, depth - 1):
+                yield chunk
+        yield "]"
+    else:
+        yield json_codec.dumps(obj)
+
+
+def format_output_json(res, field_name=None, list_field_name=None, stream=False):
     res_dict = res
     if field_name:
         if list_field_name and isinstance(res, list):
@@ -244,14 +343,19 @@ def format_output_json(res, field_name=None, list_field_name=None):
         else:
             res_dict = {field_name: res}
 
-    return json.dumps(res_dict)
+    if stream:
+        return join_chunks(iter_json(res_dict))
+    else:
+        return json.dumps(res_dict)
 
 
 def format_output(res, default_type="text/plain", field_name=None, list_field_name=None):
     """
     Format the output of the API responses
+    Big responses are returned as a generator to be streamed in chunks
     """
     accept = get_media_type('Accept')
+    stream = Config.REST_STREAMING_MIN_SIZE > 0 and get_output_size(res) >= Config.REST_STREAMING_MIN_SIZE
 
     if accept:
         content_type = None
@@ -260,7 +364,9 @@ def format_output(res, default_type="text/plain", field_name=None, list_field_na
                 if isinstance(res, RADL):
                     if field_name:
                         res_dict = {field_name: radlToSimple(res)}
-                        info = json.dumps(res_dict)
+                        info = join_chunks(iter_json(res_dict)) if stream else json.dumps(res_dict)
+                    elif stream:
+                        info = join_chunks(iter_json(radlToSimple(res), 2))
                     else:
                         info = dump_radl_json(res, enter="", indent="")
                 # This is the case of the "contains" properties
@@ -274,12 +380,14 @@ def format_output(res, default_type="text/plain", field_name=None, list_field_na
                 else:
                     # Always return a complex object to make easier parsing
                     # steps
-                    info = format_output_json(res, field_name, list_field_name)
+                    info = format_output_json(res, field_name, list_field_name, stream)
                 content_type = "application/json"
                 break
             elif accept_item in [default_type, "*/*", "text/*"]:
                 if default_type == "application/json":
-                    info = format_output_json(res, field_name, list_field_name)
+                    info = format_output_json(res, field_name, list_field_name, stream)
+                elif stream:
+                    info = stream_text_output(res)
                 else:
                     if isinstance(res, list):
                         info = "\n".join(res)
@@ -294,7 +402,9 @@ def format_output(res, default_type="text/plain", field_name=None, list_field_na
             return return_error(415, "Unsupported Accept Media Types: %s" % ",".join(accept))
     else:
         if default_type == "application/json":
-            info = format_output_json(res, field_name, list_field_name)
+            info = format_output_json(res, field_name, list_field_name, stream)
+        elif stream:
+            info = stream_text_output(res)
         else:
             if isinstance(res, list):
                 info = "\n".join(res)
@@ -305,6 +415,133 @@ def format_output(res, default_type="text/plain", field_name=None, list_field_na
     return info
 
 
+def get_accept_encoding():
+    """
+    Get the content coding (gzip or deflate) to compress the response
+    according to the Accept-Encoding header. Returns None if none of them is accepted.
+    """
+    qvalues = {}
+    accept = bottle.request.headers.get('Accept-Encoding')
+    if accept:
+        for item in accept.split(","):
+            parts = item.split(";")
+            qvalue = 1.0
+            for param in parts[1:]:
+                param = param.strip()
+                if param.startswith("q="):
+                    try:
+                        qvalue = float(param[2:])
+                    except ValueError:
+                        qvalue = 0.0
+            qvalues[parts[0].strip().lower()] = qvalue
+
+    res = None
+    max_qvalue = 0.0
+    for coding in ["gzip", "deflate"]:
+        qvalue = qvalues.get(coding, qvalues.get("*", 0.0))
+        if qvalue > max_qvalue:
+            res = coding
+            max_qvalue = qvalue
+    return res
+
+
+def compress_chunks(chunks, coding):
+    """
+    Generator that compresses a list (or generator) of chunks with the specified content coding
+    """
+    if coding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS)
+
+    for chunk in chunks:
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_output(callback):
+    """
+    Bottle plugin to compress (gzip or deflate) the API responses
+    if the client supports it and they are bigger than REST_COMPRESSION_MIN_SIZE
+    """
+    def wrapper(*args, **kwargs):
+        body = callback(*args, **kwargs)
+
+        if not Config.REST_COMPRESSION or 'Content-Encoding' in bottle.response.headers:
+            return body
+
+        stream = isinstance(body, types.GeneratorType)
+        if not stream and (not isinstance(body, (bytes, unicode)) or len(body) < Config.REST_COMPRESSION_MIN_SIZE):
+            return body
+
+        bottle.response.set_header('Vary', 'Accept-Encoding')
+        coding = get_accept_encoding()
+        if not coding:
+            return body
+
+        bottle.response.set_header('Content-Encoding', coding)
+        if stream:
+            return compress_chunks(body, coding)
+        else:
+            return b"".join(compress_chunks([body], coding))
+
+    return wrapper
+
+
+def set_metrics_transport(callback):
+    """
+    Bottle plugin to label the metrics of the operations called from the REST API
+    """
+    def wrapper(*args, **kwargs):
+        Metrics.set_transport(Metrics.TRANSPORT_REST)
+        return callback(*args, **kwargs)
+
+    return wrapper
+
+
+def trace_request(callback):
+    """
+    Bottle plugin to create the root span of the requests,
+    using the W3C traceparent header as parent context (if set)
+    """
+    def wrapper(*args, **kwargs):
+        if not Tracer.exporter:
+            return callback(*args, **kwargs)
+        context = Tracer.parse_traceparent(bottle.request.headers.get('traceparent'))
+        attributes = {"http.method": bottle.request.method, "http.target": bottle.request.path}
+        with Tracer.span(callback.__name__, attributes, context):
+            return callback(*args, **kwargs)
+
+    return wrapper
+
+
+def profile_request(callback):
+    """
+    Bottle plugin to profile the requests with the correct secret in the X-IM-Profile header
+    (or sampled according to the PROFILE_SAMPLE_RATE option)
+    """
+    def wrapper(*args, **kwargs):
+        if Profiler.must_profile(bottle.request.headers.get('X-IM-Profile')):
+            req_id, res = Profiler.run(callback.__name__, callback, *args, **kwargs)
+            if req_id:
+                bottle.response.set_header('X-IM-Profile-Id', req_id)
+            return res
+        return callback(*args, **kwargs)
+
+    return wrapper
+
+
+app.install(compress_output)
+app.install(set_metrics_transport)
+app.install(trace_request)
+# It must be the last one to profile the route callback
+app.install(profile_request)
+
+
 @app.route('/infrastructures/:infid', method='DELETE')
 def RESTDestroyInfrastructure(infid=None):
     try:
@@ -415,8 +652,18 @@ def RESTGetInfrastructureProperty(infid=None, prop=None):
             accept = get_media_type('Accept')
             if accept and "application/json" not in accept and "*/*" not in accept and "application/*" not in accept:
                 return return_error(415, "Unsupported Accept Media Types: %s" % accept)
+            refresh = False
+            if "refresh" in bottle.request.params.keys():
+                str_refresh = bottle.request.params.get("refresh").lower()
+                if str_refresh in ['yes', 'true', '1']:
+                    refresh = True
+                elif str_refresh in ['no', 'false', '0']:
+                    refresh = False
+                else:
+                    return return_error(400, "Incorrect value in refresh parameter")
+
             bottle.response.content_type = "application/json"
-            res = InfrastructureManager.GetInfrastructureState(infid, auth)
+            res = InfrastructureManager.GetInfrastructureState(infid, auth, refresh)
             return format_output(res, default_type="application/json", field_name="state")
         elif prop == "outputs":
             accept = get_media_type('Accept')
@@ -475,7 +722,25 @@ def RESTGetInfrastructureList():
         if "filter" in bottle.request.params.keys():
             flt = bottle.request.params.get("filter")
 
-        inf_ids = InfrastructureManager.GetInfrastructureList(auth, flt)
+        limit = None
+        if "limit" in bottle.request.params.keys():
+            try:
+                limit = int(bottle.request.params.get("limit"))
+            except ValueError:
+                return return_error(400, "Incorrect value in limit parameter")
+            if limit < 0:
+                return return_error(400, "Incorrect value in limit parameter")
+
+        offset = 0
+        if "offset" in bottle.request.params.keys():
+            try:
+                offset = int(bottle.request.params.get("offset"))
+            except ValueError:
+                return return_error(400, "Incorrect value in offset parameter")
+            if offset < 0:
+                return return_error(400, "Incorrect value in offset parameter")
+
+        inf_ids = InfrastructureManager.GetInfrastructureList(auth, flt, limit, offset)
         res = []
 
         for inf_id in inf_ids:
@@ -515,6 +780,7 @@ def RESTCreateInfrastructure():
             if "application/json" in content_type:
                 radl_data = parse_radl_json(radl_data)
             elif "text/yaml" in content_type:
+                from IM.tosca.Tosca import Tosca
                 tosca_data = Tosca(radl_data)
                 _, radl_data = tosca_data.to_radl()
             elif "text/plain" in content_type or "*/*" in content_type or "text/*" in content_type:
@@ -581,7 +847,17 @@ def RESTGetVMInfo(infid=None, vmid=None):
         return return_error(401, "No authentication data provided")
 
     try:
-        radl = InfrastructureManager.GetVMInfo(infid, vmid, auth)
+        refresh = False
+        if "refresh" in bottle.request.params.keys():
+            str_refresh = bottle.request.params.get("refresh").lower()
+            if str_refresh in ['yes', 'true', '1']:
+                refresh = True
+            elif str_refresh in ['no', 'false', '0']:
+                refresh = False
+            else:
+                return return_error(400, "Incorrect value in refresh parameter")
+
+        radl = InfrastructureManager.GetVMInfo(infid, vmid, auth, refresh=refresh)
         return format_output(radl, field_name="radl")
     except DeletedInfrastructureException as ex:
         return return_error(404, "Error Getting VM. info: %s" % get_ex_error(ex))
@@ -729,6 +1005,7 @@ def RESTAddResource(infid=None):
             if "application/json" in content_type:
                 radl_data = parse_radl_json(radl_data)
             elif "text/yaml" in content_type:
+                from IM.tosca.Tosca import Tosca
                 tosca_data = Tosca(radl_data)
                 auth = InfrastructureManager.check_auth_data(auth)
                 sel_inf = InfrastructureManager.get_infrastructure(infid, auth)
@@ -822,6 +1099,7 @@ def RESTAlterVM(infid=None, vmid=None):
             if "application/json" in content_type:
                 radl_data = parse_radl_json(radl_data)
             elif "text/yaml" in content_type:
+                from IM.tosca.Tosca import Tosca
                 tosca_data = Tosca(radl_data)
                 _, radl_data = tosca_data.to_radl()
             elif "text/plain" in content_type or "*/*" in content_type or "text/*" in content_type:
@@ -1029,6 +1307,52 @@ def RESTGeVersion():
         return return_error(400, "Error getting IM version: %s" % get_ex_error(ex))
 
 
+@app.route('/metrics', method='GET')
+def RESTGetMetrics():
+    if not Config.ACTIVATE_METRICS:
+        return return_error(404, "Metrics are not activated")
+    if not Metrics.check_token(bottle.request.headers.get('Authorization')):
+        return return_error(401, "Incorrect metrics token")
+    try:
+        bottle.response.content_type = Metrics.CONTENT_TYPE
+        return Metrics.generate_latest()
+    except Exception as ex:
+        logger.exception("Error getting IM metrics")
+        return return_error(400, "Error getting IM metrics: %s" % get_ex_error(ex))
+
+
+# The profiles requests are not profiled, to avoid evicting the stored ones
+@app.route('/profiles', method='GET', skip=[profile_request])
+def RESTGetProfiles():
+    if not Profiler.check_secret(bottle.request.headers.get('X-IM-Profile')):
+        return return_error(403, "Incorrect profiling secret")
+    try:
+        return format_output(Profiler.get_profile_list(), default_type="application/json", field_name="profiles")
+    except Exception as ex:
+        logger.exception("Error getting profiles")
+        return return_error(400, "Error getting profiles: %s" % get_ex_error(ex))
+
+
+@app.route('/profiles/:reqid', method='GET', skip=[profile_request])
+def RESTGetProfile(reqid=None):
+    if not Profiler.check_secret(bottle.request.headers.get('X-IM-Profile')):
+        return return_error(403, "Incorrect profiling secret")
+    try:
+        text = "text/plain" in get_media_type('Accept')
+        res = Profiler.get_profile(reqid, text)
+        if res is None:
+            return return_error(404, "Profile %s does not exist" % reqid)
+        if text:
+            bottle.response.content_type = "text/plain"
+        else:
+            bottle.response.content_type = "application/octet-stream"
+            bottle.response.set_header('Content-Disposition', 'attachment; filename="%s.prof"' % reqid)
+        return res
+    except Exception as ex:
+        logger.exception("Error getting profile")
+        return return_error(400, "Error getting profile: %s" % get_ex_error(ex))
+
+
 @app.route('/infrastructures/:infid/vms/:vmid/disks/:disknum/snapshot', method='PUT')
 def RESTCreateDiskSnapshot(infid=None, vmid=None, disknum=None):
     try:
@@ -25,73 +25,74 @@ class SSHRetry(SSH):
     TRIES = 5
     DELAY = 3
     BACKOFF = 2
+    MAX_DELAY = 30
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def execute(self, command, timeout=None):
         return SSH.execute(self, command, timeout)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_get(self, src, dest):
         return SSH.sftp_get(self, src, dest)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_get_files(self, src, dest):
         return SSH.sftp_get_files(self, src, dest)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_put_files(self, files):
         return SSH.sftp_put_files(self, files)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_put(self, src, dest):
         return SSH.sftp_put(self, src, dest)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_put_dir(self, src, dest):
         return SSH.sftp_put_dir(self, src, dest)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_get_dir(self, src, dest):
         return SSH.sftp_get_dir(self, src, dest)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_put_content(self, content, dest):
         return SSH.sftp_put_content(self, content, dest)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_mkdir(self, directory, mode=0o777):
         return SSH.sftp_mkdir(self, directory, mode)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_list(self, directory):
         return SSH.sftp_list(self, directory)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_list_attr(self, directory):
         return SSH.sftp_list_attr(self, directory)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def getcwd(self):
         return SSH.getcwd(self)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_remove(self, path):
         return SSH.sftp_remove(self, path)
 
     @retry(Exception, (AuthenticationException, paramiko.AuthenticationException),
-           tries=TRIES, delay=DELAY, backoff=BACKOFF)
+           tries=TRIES, delay=DELAY, backoff=BACKOFF, max_delay=MAX_DELAY, jitter=True)
     def sftp_chmod(self, path, mode):
         return SSH.sftp_chmod(self, path, mode)
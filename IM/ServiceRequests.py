@@ -21,6 +21,9 @@ import logging
 from IM.request import Request, AsyncRequest
 import IM.InfrastructureManager
 from IM.config import Config
+from IM.metrics import Metrics
+from IM.profiler import Profiler
+from IM.tracing import Tracer
 from IM.auth import Authentication
 from IM import __version__ as version
 from IM import get_ex_error
@@ -110,6 +113,8 @@ class IMBaseRequest(AsyncRequest):
     def __init__(self, arguments=(), priority=Request.PRIORITY_NORMAL):
         AsyncRequest.__init__(self, arguments, priority)
         self._error_mesage = "Error."
+        self.profile_id = None
+        """ID of the profile of the request (if it has been profiled)."""
 
     def _call_function(self):
         """
@@ -117,9 +122,33 @@ class IMBaseRequest(AsyncRequest):
         """
         raise NotImplementedError("Should have implemented this")
 
+    def _get_profile_secret(self):
+        """
+        Get (and remove) the profiling secret set in the "profile"
+        field of the InfrastructureManager auth item.
+
+        Return: a tuple with the secret and the username of the auth item.
+        """
+        for arg in self.arguments:
+            if isinstance(arg, list):
+                for auth in arg:
+                    if isinstance(auth, dict) and auth.get('type') == 'InfrastructureManager' and 'profile' in auth:
+                        return auth.pop('profile'), auth.get('username')
+        return None, None
+
     def _execute(self):
         try:
-            res = self._call_function()
+            Metrics.set_transport(Metrics.TRANSPORT_XMLRPC)
+            operation = self.__class__.__name__.replace("Request_", "")
+            with Tracer.span(operation, {"rpc.system": "xmlrpc"}):
+                secret, username = self._get_profile_secret()
+                if Profiler.must_profile(secret):
+                    self.profile_id, res = Profiler.run(operation, self._call_function)
+                    # The XML-RPC API cannot return it, so log it to enable the user to get the profile
+                    logger.info("XML-RPC %s request of user %s profiled with ID: %s" %
+                                (operation, username, self.profile_id))
+                else:
+                    res = self._call_function()
             self.set(res)
             return True
         except Exception as ex:
@@ -255,8 +284,9 @@ class Request_GetInfrastructureList(IMBaseRequest):
 
     def _call_function(self):
         self._error_mesage = "Error Getting Inf. List."
-        (auth_data, flt) = self.arguments
-        return IM.InfrastructureManager.InfrastructureManager.GetInfrastructureList(Authentication(auth_data), flt)
+        (auth_data, flt, limit, offset) = self.arguments
+        return IM.InfrastructureManager.InfrastructureManager.GetInfrastructureList(Authentication(auth_data), flt,
+                                                                                    limit, offset)
 
 
 class Request_Reconfigure(IMBaseRequest):
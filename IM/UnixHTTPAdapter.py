@@ -65,6 +65,8 @@ class UnixHTTPAdapter(HTTPAdapter):
     def __init__(self, timeout=60):
         super(UnixHTTPAdapter, self).__init__()
         self.timeout = timeout
+        # Connection pools indexed by socket path, to reuse the connections
+        self.pools = {}
 
     def get_connection(self, socket_path, proxies=None):
         proxies = proxies or {}
@@ -73,7 +75,22 @@ class UnixHTTPAdapter(HTTPAdapter):
         if proxy:
             raise ValueError('%s does not support specifying proxies'
                              % self.__class__.__name__)
-        return UnixHTTPConnectionPool(socket_path, self.timeout)
+        netloc = urlparse(socket_path).netloc
+        pool = self.pools.get(netloc)
+        if pool is None:
+            pool = UnixHTTPConnectionPool(socket_path, self.timeout)
+            self.pools[netloc] = pool
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        # Used instead of get_connection in newer versions of requests
+        return self.get_connection(request.url, proxies)
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+        self.pools = {}
+        super(UnixHTTPAdapter, self).close()
 
     def request_url(self, request, proxies):
         return request.path_url
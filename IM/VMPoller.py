@@ -0,0 +1,149 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Background service to keep the state of the VMs updated"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import IM.InfrastructureList
+from IM.config import Config
+from IM.VirtualMachine import VirtualMachine
+
+
+class VMPoller:
+    """
+    Background thread that periodically updates the state of the VMs of the
+    loaded infrastructures, so that the API calls can return it without
+    waiting for the cloud providers. The VMs are polled every
+    VM_POLLER_FAST_INTERVAL secs while they are pending or being contextualized
+    and every VM_POLLER_SLOW_INTERVAL secs otherwise. The infrastructures not
+    accessed in VM_POLLER_IDLE_TIME secs are not polled.
+    """
+
+    CHECK_INTERVAL = 1
+    """Time (in secs) between two checks of the VMs to poll."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    _thread = None
+    """Polling thread."""
+
+    _stop = threading.Event()
+    """Event to stop the polling thread."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    _last_poll = {}
+    """Map from (inf ID, VM ID) to the time of the last poll of the VM (successful or not)."""
+
+    @staticmethod
+    def start():
+        """
+        Start the polling thread (if it is not already running).
+        """
+        with VMPoller._lock:
+            if VMPoller.is_active():
+                return
+            VMPoller._stop.clear()
+            VMPoller._thread = threading.Thread(name="vm_poller", target=VMPoller._run)
+            VMPoller._thread.daemon = True
+            VMPoller._thread.start()
+        VMPoller.logger.info("VM poller started.")
+
+    @staticmethod
+    def stop():
+        """
+        Stop the polling thread.
+        """
+        with VMPoller._lock:
+            thread = VMPoller._thread
+            VMPoller._thread = None
+            VMPoller._stop.set()
+        if thread and thread is not threading.current_thread():
+            thread.join(VMPoller.CHECK_INTERVAL * 5)
+
+    @staticmethod
+    def is_active():
+        """
+        Check if the polling thread is running.
+        """
+        return VMPoller._thread is not None and VMPoller._thread.is_alive()
+
+    @staticmethod
+    def get_interval(vm):
+        """
+        Get the polling interval of a VM according to its state.
+        """
+        if vm.state == VirtualMachine.PENDING or vm.is_configured() is None:
+            return Config.VM_POLLER_FAST_INTERVAL
+        else:
+            return Config.VM_POLLER_SLOW_INTERVAL
+
+    @staticmethod
+    def is_idle(inf):
+        """
+        Check if an infrastructure has not been accessed in VM_POLLER_IDLE_TIME secs.
+        """
+        return datetime.now() - inf.last_access > timedelta(seconds=Config.VM_POLLER_IDLE_TIME)
+
+    @staticmethod
+    def get_stale_vms(vm_list):
+        """
+        Get the VMs of the list that the poller has not updated recently
+        (i.e. the ones of idle infrastructures).
+        """
+        now = int(time.time())
+        return [vm for vm in vm_list if now - vm.last_update > 2 * VMPoller.get_interval(vm)]
+
+    @staticmethod
+    def poll():
+        """
+        Update the VMs that have reached their polling interval.
+        """
+        now = int(time.time())
+        last_poll = {}
+        infs = list(IM.InfrastructureList.InfrastructureList.infrastructure_list.values())
+        for inf in infs:
+            if inf.deleted or not inf.last_auth or VMPoller.is_idle(inf):
+                continue
+            vm_list = []
+            for vm in inf.get_vm_list():
+                key = (inf.id, vm.im_id)
+                # Do not retry the VMs that failed to update before their interval
+                last_poll[key] = max(vm.last_update, VMPoller._last_poll.get(key, 0))
+                if vm.need_update(True) and now - last_poll[key] >= VMPoller.get_interval(vm):
+                    last_poll[key] = now
+                    vm_list.append(vm)
+            if vm_list:
+                try:
+                    inf.update_vms_status(inf.last_auth, force=True, vm_list=vm_list)
+                except Exception:
+                    VMPoller.logger.exception("Inf ID: %s: Error polling the state of the VMs." % inf.id)
+        VMPoller._last_poll = last_poll
+
+    @staticmethod
+    def _run():
+        while not VMPoller._stop.wait(VMPoller.CHECK_INTERVAL):
+            try:
+                VMPoller.poll()
+            except Exception:
+                VMPoller.logger.exception("Error polling the state of the VMs.")
+        VMPoller.logger.info("VM poller stopped.")
@@ -29,6 +29,8 @@ from IM.LoggerMixin import LoggerMixin
 from IM.SSH import SSH
 from IM.SSHRetry import SSHRetry
 from IM.config import Config
+from IM import json_codec
+from IM.tracing import Tracer
 from IM import get_user_pass_host_port
 import IM.CloudInfo
 
@@ -90,6 +92,8 @@ class VirtualMachine(LoggerMixin):
         """Number of errors in the ssh connection trying to get the state of the ctxt pid """
         self.cloud_connector = cloud_connector
         """CloudConnector object to connect with the IaaS platform"""
+        self.connector_fingerprint = None
+        """Fingerprint of the credentials used to get the cloud_connector"""
         self.creating = True
         """Flag to specify that this VM is creation process"""
         self.error_msg = None
@@ -97,12 +101,16 @@ class VirtualMachine(LoggerMixin):
         self.deleting = False
         """Flag to specify that this VM is deletion process"""
 
-    def serialize(self):
+    def serialize_dict(self):
+        """
+        Return a dict with the data of the VM to be serialized
+        """
         with self._lock:
             odict = self.__dict__.copy()
         # Quit the lock to the data to be store by pickle
         del odict['_lock']
         del odict['cloud_connector']
+        del odict['connector_fingerprint']
         del odict['inf']
         # To avoid errors tests with Mock objects
         if 'get_ssh' in odict:
@@ -115,12 +123,21 @@ class VirtualMachine(LoggerMixin):
         if odict['requested_radl']:
             odict['requested_radl'] = str(odict['requested_radl'])
         if odict['cloud']:
-            odict['cloud'] = odict['cloud'].serialize()
-        return json.dumps(odict)
+            odict['cloud'] = odict['cloud'].serialize_dict()
+        return odict
+
+    def serialize(self):
+        return json_codec.dumps(self.serialize_dict())
 
     @staticmethod
-    def deserialize(str_data):
-        dic = json.loads(str_data)
+    def deserialize(data):
+        """
+        Create a VirtualMachine object from a JSON str or from the already decoded dict
+        """
+        if isinstance(data, dict):
+            dic = dict(data)
+        else:
+            dic = json_codec.loads(data)
         if dic['cloud']:
             dic['cloud'] = IM.CloudInfo.CloudInfo.deserialize(dic['cloud'])
         if dic['info']:
@@ -138,12 +155,28 @@ class VirtualMachine(LoggerMixin):
             newvm.configured = False
         return newvm
 
-    def getCloudConnector(self):
+    def getCloudConnector(self, auth=None):
         """
         Get the CloudConnector for this VM
-        """
-        if not self.cloud_connector:
+
+        Args:
+        - auth(Authentication): parsed authentication tokens (optional). If the credentials
+          of the cloud provider change, a new connector is created.
+        """
+        fingerprint = auth.get_fingerprint(self.cloud.type, self.cloud.server) if auth else None
+        if self.cloud_connector and fingerprint in [None, self.connector_fingerprint]:
+            return self.cloud_connector
+        if self.cloud_connector and self.connector_fingerprint is None:
+            # First call with credentials: keep the connector
+            self.connector_fingerprint = fingerprint
+            return self.cloud_connector
+
+        if self.inf:
+            # Use the connector shared by all the VMs of the same cloud and credentials
+            self.cloud_connector = self.inf.get_cloud_connector(self.cloud, auth)
+        else:
             self.cloud_connector = self.cloud.getCloudConnector(self.inf)
+        self.connector_fingerprint = fingerprint
         return self.cloud_connector
 
     def delete(self, delete_list, auth, exceptions):
@@ -163,7 +196,7 @@ class VirtualMachine(LoggerMixin):
             VirtualMachine.logger.info("Inf ID: " + self.inf.id + ": Finalizing the VM id: " + str(self.id))
 
             self.kill_check_ctxt_process()
-            (success, msg) = self.getCloudConnector().finalize(self, last, auth)
+            (success, msg) = self.getCloudConnector(auth).finalize(self, last, auth)
         except Exception as e:
             msg = str(e)
         finally:
@@ -179,6 +212,39 @@ class VirtualMachine(LoggerMixin):
             exceptions.append(msg)
         return success
 
+    @staticmethod
+    def delete_batch(vms, delete_list, auth, exceptions):
+        """
+        Delete a list of VMs of the same cloud provider with a single finalizeBatch call
+        """
+        vms = [vm for vm in vms if not vm.destroy]
+        if not vms:
+            return
+
+        remain_vms = [v for v in vms[0].inf.get_vm_list() if v not in delete_list]
+        last = vms[-1].is_last_in_cloud(delete_list, remain_vms)
+        try:
+            for vm in vms:
+                vm.deleting = True
+                VirtualMachine.logger.info("Inf ID: " + vm.inf.id + ": Finalizing the VM id: " + str(vm.id))
+                vm.kill_check_ctxt_process()
+            results = vms[0].getCloudConnector(auth).finalizeBatch(vms, last, auth)
+        except Exception as e:
+            results = [(False, str(e))] * len(vms)
+        finally:
+            for vm in vms:
+                vm.deleting = False
+
+        for vm, (success, msg) in zip(vms, results):
+            if success:
+                vm.destroy = True
+            # force the update of the information
+            vm.last_update = 0
+
+            if not success:
+                VirtualMachine.logger.info("Inf ID: " + vm.inf.id + ": The VM cannot be finalized: %s" % msg)
+                exceptions.append(msg)
+
     def alter(self, radl, auth):
         """
         Modify the features of the the VM
@@ -189,7 +255,7 @@ class VirtualMachine(LoggerMixin):
         if not s:
             raise Exception("Incorrect RADL no system with name %s provided." % self.info.systems[0].name)
         new_radl.systems = [s]
-        (success, alter_res) = self.getCloudConnector().alterVM(self, new_radl, auth)
+        (success, alter_res) = self.getCloudConnector(auth).alterVM(self, new_radl, auth)
         # force the update of the information
         self.last_update = 0
         return (success, alter_res)
@@ -198,7 +264,7 @@ class VirtualMachine(LoggerMixin):
         """
         Stop the VM
         """
-        (success, msg) = self.getCloudConnector().stop(self, auth)
+        (success, msg) = self.getCloudConnector(auth).stop(self, auth)
         # force the update of the information
         self.last_update = 0
         return (success, msg)
@@ -207,7 +273,7 @@ class VirtualMachine(LoggerMixin):
         """
         Start the VM
         """
-        (success, msg) = self.getCloudConnector().start(self, auth)
+        (success, msg) = self.getCloudConnector(auth).start(self, auth)
         # force the update of the information
         self.last_update = 0
         return (success, msg)
@@ -216,7 +282,7 @@ class VirtualMachine(LoggerMixin):
         """
         Reboot the VM
         """
-        (success, msg) = self.getCloudConnector().reboot(self, auth)
+        (success, msg) = self.getCloudConnector(auth).reboot(self, auth)
         # force the update of the information
         self.last_update = 0
         return (success, msg)
@@ -225,7 +291,7 @@ class VirtualMachine(LoggerMixin):
         """
         Create a snapshot of one disk of the VM
         """
-        return self.getCloudConnector().create_snapshot(self, disk_num, image_name, auto_delete, auth)
+        return self.getCloudConnector(auth).create_snapshot(self, disk_num, image_name, auto_delete, auth)
 
     def getRequestedSystem(self):
         """
@@ -506,13 +572,25 @@ class VirtualMachine(LoggerMixin):
             self.info.systems[0].setValue(
                 'net_interface.' + str(num_net) + '.connection', public_net.id)
 
-    def update_status(self, auth, force=False):
+    def need_update(self, force=False):
+        """
+        Check if the info of this virtual machine has to be requested to the cloud provider.
+        Args:
+        - force(boolean): force the VM update
+        """
+        if (self.state == VirtualMachine.FAILED and self.id is None) or self.deleting:
+            return False
+        return force or int(time.time()) - self.last_update > Config.VM_INFO_UPDATE_FREQUENCY
+
+    def update_status(self, auth, force=False, update_res=None):
         """
         Update the status of this virtual machine.
         Only performs the update with UPDATE_FREQUENCY secs.
         Args:
         - auth(Authentication): parsed authentication tokens.
         - force(boolean): force the VM update
+        - update_res(tuple): result of the updateVMInfo call if it has already been
+          performed (i.e. using updateVMInfoBatch).
         Return:
         - boolean: True if the information has been updated, false otherwise
         """
@@ -529,10 +607,12 @@ class VirtualMachine(LoggerMixin):
             state = self.state
             updated = False
             # To avoid to refresh the information too quickly
-            if force or now - self.last_update > Config.VM_INFO_UPDATE_FREQUENCY:
+            if update_res is not None or force or now - self.last_update > Config.VM_INFO_UPDATE_FREQUENCY:
                 success = False
                 try:
-                    (success, new_vm) = self.getCloudConnector().updateVMInfo(self, auth)
+                    if update_res is None:
+                        update_res = self.getCloudConnector(auth).updateVMInfo(self, auth)
+                    (success, new_vm) = update_res
                     if success:
                         state = new_vm.state
                         updated = True
@@ -754,9 +834,9 @@ class VirtualMachine(LoggerMixin):
             self.log_warn("VM ID %s does not have IP. Do not return SSH Object." % self.im_id)
             return None
         if retry:
-            return SSHRetry(ip, user, passwd, private_key, self.getSSHPort(), proxy_host)
+            return Tracer.instrument_ssh(SSHRetry(ip, user, passwd, private_key, self.getSSHPort(), proxy_host))
         else:
-            return SSH(ip, user, passwd, private_key, self.getSSHPort(), proxy_host)
+            return Tracer.instrument_ssh(SSH(ip, user, passwd, private_key, self.getSSHPort(), proxy_host))
 
     def is_ctxt_process_running(self):
         """ Return the PID of the running process or None if it is not running """
@@ -1016,9 +1096,9 @@ class VirtualMachine(LoggerMixin):
         if ansible_host:
             (user, passwd, private_key) = ansible_host.getCredentialValues()
             if retry:
-                return SSHRetry(ansible_host.getHost(), user, passwd, private_key)
+                return Tracer.instrument_ssh(SSHRetry(ansible_host.getHost(), user, passwd, private_key))
             else:
-                return SSH(ansible_host.getHost(), user, passwd, private_key)
+                return Tracer.instrument_ssh(SSH(ansible_host.getHost(), user, passwd, private_key))
         else:
             if self.inf.vm_master:
                 return self.inf.vm_master.get_ssh(retry=retry)
@@ -1034,8 +1114,8 @@ class VirtualMachine(LoggerMixin):
             res = self.error_msg + "\n" + self.cont_out
         else:
             res = self.cont_out
-        if self.cloud_connector and self.cloud_connector.error_messages:
-            res += self.cloud_connector.error_messages
+        if self.cloud_connector:
+            res += self.cloud_connector.get_error_messages(self)
         return res
 
     def is_last_in_cloud(self, delete_list, remain_vms):
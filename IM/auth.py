@@ -14,9 +14,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
 import json
 import re
 
+from IM import json_codec
+
 
 class Authentication:
     """
@@ -31,21 +34,56 @@ class Authentication:
     id = oshost; type = OpenStack; host = oshost:8773; username = ACCESS_KEY; key = SECRET_KEY
     id = occi; type = OCCI; host = occiserver:4567; username = user; password = pass
 
+    The auth items are indexed by type and id when the object is created, together with
+    a fingerprint of the credentials of each item (used in :py:meth:`compare`).
+    The fingerprints identify the credentials as they were provided, so later changes
+    in the auth dicts (e.g. credentials obtained from a TTS) are not considered.
+
     Arguments:
         - auth_data(list of dicts or :py:class:`IM.Authentication`): Data to initialize the Authentication object
     """
 
+    ID_PATTERN = re.compile(r'[a-zA-Z_.][\w\d_.-]*')
+
     def __init__(self, auth_data):
         if isinstance(auth_data, Authentication):
             self.auth_list = auth_data.auth_list
-        else:
-            self.auth_list = auth_data
+            self._type_index = auth_data._type_index
+            self._id_index = auth_data._id_index
+            return
+
+        self.auth_list = auth_data
+        self._type_index = {}
+        """Map from auth type to a list of tuples (auth item, fingerprint)."""
+        self._id_index = {}
+        """Map from auth id to the list of auth items."""
 
         for auth in self.auth_list:
             if 'id' in auth and auth['id']:
-                pattern = re.compile(r'[a-zA-Z_.][\w\d_.-]*')
-                if not pattern.match(auth['id']):
+                if not self.ID_PATTERN.match(auth['id']):
                     raise Exception('Incorrect value in auth item id: %s' % auth['id'])
+            if 'id' in auth:
+                self._id_index.setdefault(auth['id'], []).append(auth)
+            if 'type' in auth:
+                self._type_index.setdefault(auth['type'], []).append((auth, self.get_item_fingerprint(auth)))
+
+    @staticmethod
+    def get_item_fingerprint(auth):
+        """
+        Get a stable fingerprint of the credentials of an auth item (all the fields except the id)
+        """
+        data = dict((key, value) for key, value in auth.items() if key != "id")
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _get_items(self, auth_type, host=None):
+        res = []
+        for auth, fingerprint in self._type_index.get(auth_type, []):
+            if host:
+                if 'host' in auth and auth['host'].find(host) != -1:
+                    res.append((auth, fingerprint))
+            else:
+                res.append((auth, fingerprint))
+        return res
 
     def getAuthInfo(self, auth_type, host=None):
         """
@@ -57,16 +95,7 @@ class Authentication:
 
         Returns: a list with all the auth data for the specified type
         """
-        res = []
-        for auth in self.auth_list:
-            if 'type' in auth and auth['type'] == auth_type:
-                if host:
-                    if 'host' in auth and auth['host'].find(host) != -1:
-                        res.append(auth)
-                else:
-                    res.append(auth)
-
-        return res
+        return [auth for auth, _ in self._get_items(auth_type, host)]
 
     def getAuthInfoByID(self, auth_id):
         """
@@ -77,11 +106,25 @@ class Authentication:
 
         Returns: a list with all the auth data for the specified id
         """
-        res = []
-        for auth in self.auth_list:
-            if 'id' in auth and auth['id'] == auth_id:
-                res.append(auth)
-        return res
+        return list(self._id_index.get(auth_id, []))
+
+    def get_fingerprint(self, auth_type, host=None):
+        """
+        Get the fingerprint of the credentials of the first auth item of the specified type
+
+        Arguments:
+           - auth_type(str): The auth type
+           - host(str): The host of the auth (optional)
+
+        Returns: a str with the fingerprint or None if there are no auth data of the specified type
+        """
+        try:
+            items = self._get_items(auth_type, host)
+        except Exception:
+            return None
+        if items:
+            return items[0][1]
+        return None
 
     def compare(self, other_auth, auth_type, host=None):
         """
@@ -95,44 +138,11 @@ class Authentication:
         Returns: True if the auth are equal or False otherwise
         """
         try:
-            auth_with_type = None
-            for auth in self.auth_list:
-                if auth['type'] == auth_type:
-                    if host:
-                        if 'host' in auth and auth['host'].find(host) != -1:
-                            auth_with_type = auth
-                            break
-                    else:
-                        auth_with_type = auth
-                        break
-
-            other_auth_with_type = None
-            for auth in other_auth.auth_list:
-                if auth['type'] == auth_type:
-                    if host:
-                        if 'host' in auth and auth['host'].find(host) != -1:
-                            other_auth_with_type = auth
-                            break
-                    else:
-                        other_auth_with_type = auth
-                        break
-
-            if auth_with_type is not None and other_auth_with_type is not None:
-                if len(auth_with_type) != len(other_auth_with_type):
-                    return False
-
-                for key in auth_with_type.keys():
-                    if key != "id":
-                        if auth_with_type[key] != other_auth_with_type[key]:
-                            return False
-            else:
-                return False
-
+            fingerprint = self.get_fingerprint(auth_type, host)
+            return fingerprint is not None and fingerprint == other_auth.get_fingerprint(auth_type, host)
         except Exception:
             return False
 
-        return True
-
     @staticmethod
     def split_line(line):
         """
@@ -215,8 +225,13 @@ class Authentication:
         return res
 
     def serialize(self):
-        return json.dumps(self.auth_list, sort_keys=True)
+        return json_codec.dumps(self.auth_list, sort_keys=True)
 
     @staticmethod
-    def deserialize(str_data):
-        return Authentication(json.loads(str_data))
+    def deserialize(data):
+        """
+        Create an Authentication object from a JSON str or from the already decoded list of dicts
+        """
+        if isinstance(data, list):
+            return Authentication(data)
+        return Authentication(json_codec.loads(data))
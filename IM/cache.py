@@ -0,0 +1,99 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Thread safe in-memory cache with expiration time"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from IM.metrics import Metrics
+
+
+class TTLCache:
+    """
+    Thread safe cache where each entry has its own expiration time.
+    The hits and misses are counted in the im_cache_hits_total and
+    im_cache_misses_total metrics using the name of the cache as label.
+    """
+
+    def __init__(self, name, max_size=1000):
+        self.name = name
+        """Name of the cache (used in the metrics)."""
+        self.max_size = max_size
+        """Max number of entries stored."""
+        self._data = OrderedDict()
+        """Map from key to a tuple (expiration time, value)."""
+        self._lock = threading.Lock()
+        """Threading Lock to avoid concurrency problems."""
+
+    @staticmethod
+    def hash_key(*args):
+        """
+        Get a key from a set of (possibly sensitive) values, i.e. tokens or passwords,
+        to avoid storing them in memory.
+        """
+        return hashlib.sha256("\n".join(str(arg) for arg in args).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Get an element of the cache.
+
+        Return: a tuple (found, value).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] < now:
+                del self._data[key]
+                entry = None
+        if entry:
+            Metrics.inc("im_cache_hits_total", {"cache": self.name})
+            return True, entry[1]
+        Metrics.inc("im_cache_misses_total", {"cache": self.name})
+        return False, None
+
+    def put(self, key, value, ttl):
+        """
+        Store an element in the cache during ttl seconds.
+        Elements with a ttl lower or equal to 0 are not stored.
+        """
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (now + ttl, value)
+            if len(self._data) > self.max_size:
+                for k in [k for k, v in self._data.items() if v[0] < now]:
+                    del self._data[k]
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove an element of the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all the elements of the cache."""
+        with self._lock:
+            self._data = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
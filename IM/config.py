@@ -68,6 +68,8 @@ class Config:
     RECIPES_DB_FILE = CONTEXTUALIZATION_DIR + '/recipes_ansible.db'
     MAX_CONTEXTUALIZATION_TIME = 7200
     MAX_SIMULTANEOUS_LAUNCHES = 1
+    MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = []
+    CLOUD_EXECUTOR_THREADS = 20
     DATA_DB = '/etc/im/inf.dat'
     XMLRCP_SSL = False
     XMLRCP_SSL_KEYFILE = "/etc/im/pki/server-key.pem"
@@ -81,6 +83,15 @@ class Config:
     VM_INFO_UPDATE_FREQUENCY = 10
     # This value must be always higher than VM_INFO_UPDATE_FREQUENCY
     VM_INFO_UPDATE_ERROR_GRACE_PERIOD = 120
+    VM_INFO_UPDATE_THREADS = 10
+    VM_INFO_UPDATE_TIMEOUT = 30
+    CONCRETE_SYSTEM_THREADS = 10
+    CONCRETE_SYSTEM_TIMEOUT = 60
+    CONCRETE_SYSTEM_CACHE_TIME = 60
+    VM_POLLER = False
+    VM_POLLER_FAST_INTERVAL = 5
+    VM_POLLER_SLOW_INTERVAL = 60
+    VM_POLLER_IDLE_TIME = 1800
     REMOTE_CONF_DIR = "/var/tmp/.im"
     MAX_SSH_ERRORS = 5
     PRIVATE_NET_MASKS = ["10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16",
@@ -100,13 +111,41 @@ class Config:
     OIDC_CLIENT_ID = None
     OIDC_CLIENT_SECRET = None
     OIDC_SCOPES = []
+    OIDC_CACHE_TIME = 60
+    OIDC_NEGATIVE_CACHE_TIME = 10
+    OIDC_VERIFY_SIGNATURE = False
+    OIDC_JWKS_CACHE_TIME = 3600
     VM_NUM_USE_CTXT_DIST = 30
     DELAY_BETWEEN_VM_RETRIES = 5
+    RETRY_MAX_DELAY = 60
+    RETRY_MAX_ELAPSED_TIME = 600
+    CIRCUIT_BREAKER_ERROR_RATE = 50
+    CIRCUIT_BREAKER_MIN_CALLS = 10
+    CIRCUIT_BREAKER_WINDOW = 60
+    CIRCUIT_BREAKER_OPEN_TIME = 30
     VERIFI_SSL = False
     SSH_REVERSE_TUNNELS = True
     ACTIVATE_XMLRPC = True
     FORCE_OIDC_AUTH = False
     BOOT_MODE = 0  # It can be 0-Normal, 1-ReadOnly, 2-ReadDelete
+    REST_COMPRESSION = True
+    REST_COMPRESSION_MIN_SIZE = 1024
+    REST_STREAMING_MIN_SIZE = 1048576
+    ACTIVATE_METRICS = False
+    METRICS_TOKEN = ""
+    PROFILE_SECRET = ""
+    PROFILE_SAMPLE_RATE = 0
+    PROFILE_MAX_STORED = 20
+    TRACING_EXPORTER = ""
+    TRACING_FILE = "/var/log/im/im_traces.json"
+    PREWARM_CONNECTORS = []
+    PREWARM_TOSCA = False
+    EC2_INSTANCE_TYPES_FILE = "/var/tmp/im_ec2_instance_types.json"
+    EC2_INSTANCE_TYPES_TTL = 86400
+    OPENSTACK_CACHE_TIME = 300
+    HTTP_KEEP_ALIVE = True
+    HTTP_POOL_SIZE = 10
+    HTTP_RETRIES = 0
 
 
 config = ConfigParser()
@@ -88,36 +88,37 @@ class AzureCloudConnector(CloudConnector):
         CloudConnector.__init__(self, cloud_info, inf)
 
     def get_credentials(self, auth_data):
-        auths = auth_data.getAuthInfo(self.type)
-        if not auths:
-            raise Exception("No auth data has been specified to Azure.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type)
+            if not auths:
+                raise Exception("No auth data has been specified to Azure.")
+            else:
+                auth = auths[0]
 
-        if 'subscription_id' in auth and 'username' in auth and 'password' in auth:
-            subscription_id = auth['subscription_id']
+            if 'subscription_id' in auth and 'username' in auth and 'password' in auth:
+                subscription_id = auth['subscription_id']
 
-            if self.credentials and self.auth.compare(auth_data, self.type):
-                return self.credentials, subscription_id
-            else:
-                self.auth = auth_data
-                self.credentials = UserPassCredentials(auth['username'], auth['password'])
-        elif 'subscription_id' in auth and 'client_id' in auth and 'secret' in auth and 'tenant' in auth:
-            subscription_id = auth['subscription_id']
+                if self.credentials and self.auth.compare(auth_data, self.type):
+                    return self.credentials, subscription_id
+                else:
+                    self.auth = auth_data
+                    self.credentials = UserPassCredentials(auth['username'], auth['password'])
+            elif 'subscription_id' in auth and 'client_id' in auth and 'secret' in auth and 'tenant' in auth:
+                subscription_id = auth['subscription_id']
 
-            if self.credentials and self.auth.compare(auth_data, self.type):
-                return self.credentials, subscription_id
+                if self.credentials and self.auth.compare(auth_data, self.type):
+                    return self.credentials, subscription_id
+                else:
+                    self.auth = auth_data
+                    self.credentials = ServicePrincipalCredentials(client_id=auth['client_id'],
+                                                                   secret=auth['secret'],
+                                                                   tenant=auth['tenant'])
             else:
-                self.auth = auth_data
-                self.credentials = ServicePrincipalCredentials(client_id=auth['client_id'],
-                                                               secret=auth['secret'],
-                                                               tenant=auth['tenant'])
-        else:
-            raise Exception("No correct auth data has been specified to Azure: "
-                            "subscription_id, username and password or"
-                            "subscription_id, client_id, secret and tenant")
+                raise Exception("No correct auth data has been specified to Azure: "
+                                "subscription_id, username and password or"
+                                "subscription_id, client_id, secret and tenant")
 
-        return self.credentials, subscription_id
+            return self.credentials, subscription_id
 
     @staticmethod
     def get_instance_type_by_name(instance_name, location, credentials, subscription_id):
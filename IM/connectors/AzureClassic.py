@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import base64
-import requests
 import time
 import os
 import uuid
@@ -29,6 +28,7 @@ from IM.VirtualMachine import VirtualMachine
 from .CloudConnector import CloudConnector
 from radl.radl import UserPassCredential, Feature
 from IM.config import Config
+from IM.http_pool import HTTPPool
 
 # Set of classes to parse the output of the REST API
 
@@ -160,7 +160,7 @@ class AzureClassicCloudConnector(CloudConnector):
         subscription_id = self.get_subscription_id(auth_data)
         url = "https://%s:%d/%s%s" % (self.AZURE_SERVER, self.AZURE_PORT, subscription_id, url)
         cert = self.get_user_cert_data(auth)
-        resp = requests.request(method, url, verify=self.verify_ssl, cert=cert, headers=headers, data=body)
+        resp = HTTPPool.request(method, url, verify=self.verify_ssl, cert=cert, headers=headers, data=body)
 
         return resp
 
@@ -16,6 +16,7 @@
 
 import logging
 import operator
+import threading
 import time
 import yaml
 
@@ -24,7 +25,10 @@ from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
 
 from radl.radl import Feature
+from IM import get_ex_error
 from IM.config import Config
+from IM.CircuitBreaker import CircuitBreakerOpenException
+from IM.retry import RetryPolicy
 from IM.LoggerMixin import LoggerMixin
 from netaddr import IPNetwork, spanning_cidr
 
@@ -50,8 +54,10 @@ class CloudConnector(LoggerMixin):
         """Infrastructure this CloudConnector is associated with."""
         self.logger = logging.getLogger('CloudConnector')
         """Logger object."""
-        self.error_messages = ""
-        """String with error messages to be shown to the user."""
+        self.error_messages = {}
+        """Map from the IM ID of a VM to a str with the error messages to be shown to the user."""
+        self._lock = threading.RLock()
+        """Threading Lock to avoid concurrency problems with the state shared by the VMs (drivers, credentials)."""
         self.verify_ssl = Config.VERIFI_SSL
         """Verify SSL connections """
         if not self.verify_ssl:
@@ -70,6 +76,39 @@ class CloudConnector(LoggerMixin):
             except Exception:
                 pass
 
+    def add_error_message(self, vm, msg):
+        """
+        Add an error message to be shown to the user in the contextualization log of a VM
+        """
+        with self._lock:
+            self.error_messages[vm.im_id] = self.error_messages.get(vm.im_id, "") + msg
+
+    def get_error_messages(self, vm):
+        """
+        Get the error messages to be shown to the user in the contextualization log of a VM
+        """
+        return self.error_messages.get(vm.im_id, "")
+
+    def get_breaker_endpoint(self, method, *args):
+        """
+        Get the endpoint of the circuit breaker that protects a call to this cloud provider.
+
+        Arguments:
+           - method(str): name of the method called.
+           - args: arguments of the call.
+
+        Returns: a str with the endpoint, or None to use the one of the cloud provider.
+        """
+        return None
+
+    @staticmethod
+    def prewarm():
+        """
+        Load in advance the data shared by all the connectors of this type.
+        It is called at boot time for the connectors set in PREWARM_CONNECTORS.
+        """
+        pass
+
     def concreteSystem(self, radl_system, auth_data):
         """
         Return a list of compatible systems with the cloud
@@ -138,6 +177,40 @@ class CloudConnector(LoggerMixin):
 
         raise NotImplementedError("Should have implemented this")
 
+    def updateVMInfoBatch(self, vms, auth_data):
+        """
+        Updates the information of a list of VMs of this cloud provider.
+        By default it calls updateVMInfo for each VM, but the connectors may
+        override it to get the info of all the VMs with one or a few list calls.
+
+        Arguments:
+           - vms(list of :py:class:`IM.VirtualMachine`): VMs to update.
+           - auth_data(:py:class:`dict` of str objects): Authentication data to access cloud provider.
+
+        Returns: a list with a tuple (success, vm) (as returned by updateVMInfo) per each VM,
+                 in the same order.
+        """
+        return [self.update_vm_locked(vm, self.updateVMInfo, auth_data) for vm in vms]
+
+    def update_vm_locked(self, vm, func, *args):
+        """
+        Call a function that updates the info of a VM holding the VM lock (as
+        VirtualMachine.update_status does with updateVMInfo), so that the updateVMInfoBatch
+        implementations do not modify the VM while other operation is using it.
+
+        Arguments:
+           - vm(:py:class:`IM.VirtualMachine`): VM to update.
+           - func(function): function to call with the VM and the rest of arguments.
+
+        Returns: a tuple (success, vm) as returned by updateVMInfo.
+        """
+        with vm._lock:
+            try:
+                return func(vm, *args)
+            except Exception as ex:
+                self.log_exception("Error updating VM %s info." % vm.id)
+                return (False, "Error updating VM info: %s" % get_ex_error(ex))
+
     def alterVM(self, vm, radl, auth_data):
         """
         Modifies the features of a VM
@@ -185,7 +258,7 @@ class CloudConnector(LoggerMixin):
         - num_vm(int): number of instances to deploy.
         - auth_data(Authentication): Authentication data to access cloud provider.
         - max_num: Number of retries.
-        - delay: a sleep time between retries
+        - delay: initial sleep time between retries (it grows exponentially with a random jitter).
 
                 Returns: a list of tuples with the format (success, vm).
            - The first value is True if the operation finished successfully or false otherwise.
@@ -195,13 +268,24 @@ class CloudConnector(LoggerMixin):
         res_ok = []
         res_err = {}
         retries = 0
+        policy = RetryPolicy(max_num, delay, max_delay=Config.RETRY_MAX_DELAY,
+                             max_elapsed=Config.RETRY_MAX_ELAPSED_TIME)
+        delays = policy.delays()
         while len(res_ok) < num_vm and retries < max_num:
             if retries != 0:
-                time.sleep(delay)
+                next_delay = next(delays, None)
+                if next_delay is None:
+                    break
+                time.sleep(next_delay)
             retries += 1
             err_count = 0
             try:
                 vms = self.launch(inf, radl, requested_radl, num_vm - len(res_ok), auth_data)
+            except CircuitBreakerOpenException as ex:
+                # The cloud provider is degraded, do not retry
+                self.log_warn(str(ex))
+                vms = [(False, "Error: %s" % ex)] * (num_vm - len(res_ok))
+                retries = max_num
             except Exception as ex:
                 self.log_exception("Error launching some of the VMs")
                 vms = []
@@ -245,6 +329,32 @@ class CloudConnector(LoggerMixin):
 
         raise NotImplementedError("Should have implemented this")
 
+    def finalizeBatch(self, vms, last, auth_data):
+        """
+        Terminates a list of VMs of this cloud provider.
+        By default it calls finalize for each VM (setting the last flag only in the
+        last one), but the connectors may override it to terminate all the VMs with
+        one or a few calls and clean the shared resources (networks, security groups, ...)
+        only once, after all the VMs are terminated.
+
+        Arguments:
+           - vms(list of :py:class:`IM.VirtualMachine`): VMs to terminate.
+           - last(boolean): Flag that specifies that these are the last VMs in this cloud provider,
+             to clean all related resources.
+           - auth_data(:py:class:`dict` of str objects): Authentication data to access cloud provider.
+
+        Returns: a list with a tuple (success, msg) (as returned by finalize) per each VM,
+                 in the same order.
+        """
+        res = []
+        for i, vm in enumerate(vms):
+            try:
+                res.append(self.finalize(vm, last and i == len(vms) - 1, auth_data))
+            except Exception as ex:
+                self.log_exception("Error finalizing VM %s." % vm.id)
+                res.append((False, str(ex)))
+        return res
+
     def start(self, vm, auth_data):
         """ Starts a (previously stopped) VM
 
@@ -59,34 +59,35 @@ class CloudStackCloudConnector(LibCloudCloudConnector):
 
         Returns: a :py:class:`libcloud.compute.base.NodeDriver` or None in case of error
         """
-        auths = auth_data.getAuthInfo(self.type, self.cloud.server)
-        if not auths:
-            raise Exception("No auth data has been specified to CloudStack.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type, self.cloud.server)
+            if not auths:
+                raise Exception("No auth data has been specified to CloudStack.")
+            else:
+                auth = auths[0]
 
-        if self.driver and self.auth.compare(auth_data, self.type, self.cloud.server):
-            return self.driver
-        else:
-            self.auth = auth_data
-            if 'username' in auth and 'password' in auth:
-                apikey = auth['username']
-                secretkey = auth['password']
-
-                protocol = self.cloud.protocol
-                if not protocol:
-                    protocol = "http"
-                port = "" if self.cloud.port == -1 else ":" % self.cloud.port
-                url = protocol + "://" + self.cloud.server + port + self.cloud.path
-
-                Driver = get_driver(Provider.CLOUDSTACK)
-                driver = Driver(key=apikey, secret=secretkey, url=url)
-                self.driver = driver
-
-                return driver
+            if self.driver and self.auth.compare(auth_data, self.type, self.cloud.server):
+                return self.driver
             else:
-                self.log_error("Incorrect auth data")
-                return None
+                self.auth = auth_data
+                if 'username' in auth and 'password' in auth:
+                    apikey = auth['username']
+                    secretkey = auth['password']
+
+                    protocol = self.cloud.protocol
+                    if not protocol:
+                        protocol = "http"
+                    port = "" if self.cloud.port == -1 else ":" % self.cloud.port
+                    url = protocol + "://" + self.cloud.server + port + self.cloud.path
+
+                    Driver = get_driver(Provider.CLOUDSTACK)
+                    driver = Driver(key=apikey, secret=secretkey, url=url)
+                    self.driver = driver
+
+                    return driver
+                else:
+                    self.log_error("Incorrect auth data")
+                    return None
 
     def concrete_system(self, radl_system, str_url, auth_data):
         url = urlparse(str_url)
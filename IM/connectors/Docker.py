@@ -19,7 +19,6 @@ import time
 import tempfile
 import json
 import socket
-import requests
 import random
 import uuid
 try:
@@ -28,9 +27,9 @@ except ImportError:
     from urllib.parse import urlparse
 from IM.VirtualMachine import VirtualMachine
 from IM.config import Config
+from IM.http_pool import HTTPPool
 from .CloudConnector import CloudConnector
 from radl.radl import Feature
-from IM import UnixHTTPAdapter
 
 
 class DockerCloudConnector(CloudConnector):
@@ -65,9 +64,7 @@ class DockerCloudConnector(CloudConnector):
             url = "http+unix://%%2F%s%s%s" % (self.cloud.server.replace("/", "%2F"),
                                               self.cloud.path.replace("/", "%2F"),
                                               url)
-            session = requests.Session()
-            session.mount('http+unix://', UnixHTTPAdapter.UnixHTTPAdapter())
-            resp = session.request(method, url, verify=self.verify_ssl, headers=headers, data=body)
+            resp = HTTPPool.request(method, url, verify=self.verify_ssl, headers=headers, data=body)
         else:
             url = "%s://%s:%d%s%s" % (self.cloud.protocol, self.cloud.server, self.cloud.port, self.cloud.path, url)
             if 'public_key' in auth and 'private_key' in auth:
@@ -76,7 +73,7 @@ class DockerCloudConnector(CloudConnector):
                 cert = None
 
             try:
-                resp = requests.request(method, url, verify=self.verify_ssl, cert=cert, headers=headers, data=body)
+                resp = HTTPPool.request(method, url, verify=self.verify_ssl, cert=cert, headers=headers, data=body)
             finally:
                 if cert:
                     try:
@@ -14,6 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
+import logging
+import os
+import threading
 import time
 import requests
 from netaddr import IPNetwork, spanning_cidr
@@ -72,6 +76,248 @@ class InstanceTypeInfo:
         self.gpu = gpu
 
 
+class InstanceTypeCatalog:
+    """
+    Catalog of the EC2 instance types (obtained from ec2instances.info) shared
+    by all the EC2 connectors. It is stored in EC2_INSTANCE_TYPES_FILE and it is
+    always downloaded in a background thread (when there is no copy of it or it is
+    older than EC2_INSTANCE_TYPES_TTL secs), so the requests never wait for it.
+    Meanwhile the seed catalog shipped with the IM (SEED_FILE) is used.
+    """
+
+    INFO_URL = "https://raw.githubusercontent.com/powdahound/ec2instances.info/master/www/instances.json"
+    """URL of the ec2instances.info data."""
+    REFRESH_RETRY_INTERVAL = 600
+    """Time (in secs) to wait to retry a failed refresh of the catalog."""
+    SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ec2_instance_types.json")
+    """Catalog shipped with the IM, used until the first download finishes."""
+
+    instance_types = []
+    """List of :py:class:`InstanceTypeInfo` sorted by price."""
+    by_name = {}
+    """Map from name to :py:class:`InstanceTypeInfo`."""
+    by_arch = {}
+    """Map from cpu arch to the list of :py:class:`InstanceTypeInfo` supporting it sorted by price."""
+    last_update = 0
+    """Time when the catalog was downloaded."""
+
+    logger = logging.getLogger('CloudConnector')
+    """Logger object."""
+
+    _last_refresh = 0
+    """Time of the last refresh attempt."""
+    _refresh_thread = None
+    """Background refresh thread."""
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    @staticmethod
+    def download(retries=3, delay=5):
+        """
+        Download the ec2instances.info data.
+
+        Returns: a list with the JSON data or None in case of error
+        """
+        cont = 0
+        data = None
+        while cont < retries and not data:
+            cont += 1
+            try:
+                resp = requests.get(InstanceTypeCatalog.INFO_URL)
+                if resp.status_code == 200:
+                    data = resp.json()
+                else:
+                    time.sleep(delay)
+            except Exception as ex:
+                InstanceTypeCatalog.logger.warning("Error getting ec2instances info: %s. (%s/%s)" % (ex, cont, retries))
+                time.sleep(delay)
+        return data
+
+    @staticmethod
+    def parse(data):
+        """
+        Get the list of :py:class:`InstanceTypeInfo` from the ec2instances.info data
+        """
+        instance_list = []
+        for instance_type in data:
+            price = 50
+            if instance_type['pricing']:
+                price = float(instance_type['pricing']['us-east-1']['linux']['ondemand'])
+            disks = 0
+            disk_space = 0
+            if instance_type['storage']:
+                disks = instance_type['storage']['devices']
+                disk_space = instance_type['storage']['size']
+            cpu_perf = instance_type['ECU']
+            if cpu_perf == 'variable':
+                cpu_perf = 0
+            instance_list.append(InstanceTypeInfo(name=instance_type['instance_type'],
+                                                  cpu_arch=instance_type['arch'],
+                                                  num_cpu=instance_type['vCPU'],
+                                                  cores_per_cpu=1,
+                                                  mem=instance_type['memory'] * 1024,
+                                                  price=price,
+                                                  cpu_perf=cpu_perf,
+                                                  disks=disks,
+                                                  disk_space=disk_space,
+                                                  vpc_only=instance_type['vpc_only'],
+                                                  gpu=instance_type['GPU']))
+        return instance_list
+
+    @staticmethod
+    def set_instance_types(instance_list, last_update):
+        """
+        Set the instance types of the catalog and build its indexes
+        """
+        # the sort is stable, so the original order is kept between types with the same price
+        instance_types = sorted(instance_list, key=lambda inst_type: inst_type.price)
+        by_arch = {}
+        for inst_type in instance_types:
+            for arch in inst_type.cpu_arch:
+                by_arch.setdefault(arch, []).append(inst_type)
+        InstanceTypeCatalog.by_name = dict((inst_type.name, inst_type) for inst_type in instance_types)
+        InstanceTypeCatalog.by_arch = by_arch
+        InstanceTypeCatalog.instance_types = instance_types
+        InstanceTypeCatalog.last_update = last_update
+
+    @staticmethod
+    def load_file(filename=None):
+        """
+        Load the catalog from a file (EC2_INSTANCE_TYPES_FILE by default)
+
+        Returns: True if the catalog has been loaded
+        """
+        if filename is None:
+            filename = Config.EC2_INSTANCE_TYPES_FILE
+        if not filename or not os.path.isfile(filename):
+            return False
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+            instance_list = [InstanceTypeInfo(**inst_type) for inst_type in data['instance_types']]
+            InstanceTypeCatalog.set_instance_types(instance_list, data['last_update'])
+            return True
+        except Exception:
+            InstanceTypeCatalog.logger.exception("Error loading EC2 instance types file: %s." % filename)
+            return False
+
+    @staticmethod
+    def save_file():
+        """
+        Store the catalog in EC2_INSTANCE_TYPES_FILE
+        """
+        if not Config.EC2_INSTANCE_TYPES_FILE:
+            return
+        try:
+            data = {'last_update': InstanceTypeCatalog.last_update,
+                    'instance_types': [inst_type.__dict__ for inst_type in InstanceTypeCatalog.instance_types]}
+            # write it in a temp file and rename it to avoid reading partial files
+            tmp_file = "%s.%d.tmp" % (Config.EC2_INSTANCE_TYPES_FILE, os.getpid())
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.rename(tmp_file, Config.EC2_INSTANCE_TYPES_FILE)
+        except Exception:
+            InstanceTypeCatalog.logger.exception("Error saving EC2 instance types file.")
+
+    @staticmethod
+    def refresh(retries=3, delay=5):
+        """
+        Download the catalog and store it
+
+        Returns: True if the catalog has been refreshed
+        """
+        InstanceTypeCatalog._last_refresh = time.time()
+        data = InstanceTypeCatalog.download(retries, delay)
+        if not data:
+            InstanceTypeCatalog.logger.error("Error getting ec2instances info.")
+            return False
+        InstanceTypeCatalog.set_instance_types(InstanceTypeCatalog.parse(data), time.time())
+        InstanceTypeCatalog.save_file()
+        return True
+
+    @staticmethod
+    def refresh_async(retries=3, delay=5):
+        """
+        Refresh the catalog in a background thread (if it is not already running)
+        """
+        with InstanceTypeCatalog._lock:
+            thread = InstanceTypeCatalog._refresh_thread
+            if thread and thread.is_alive():
+                return thread
+            InstanceTypeCatalog._last_refresh = time.time()
+            thread = threading.Thread(name="ec2_instance_types", target=InstanceTypeCatalog.refresh,
+                                      args=(retries, delay))
+            thread.daemon = True
+            thread.start()
+            InstanceTypeCatalog._refresh_thread = thread
+            return thread
+
+    @staticmethod
+    def need_refresh():
+        """
+        Check if the catalog is older than EC2_INSTANCE_TYPES_TTL secs
+        (and it has not been tried to refresh it recently)
+        """
+        now = time.time()
+        return (now - InstanceTypeCatalog.last_update > Config.EC2_INSTANCE_TYPES_TTL and
+                now - InstanceTypeCatalog._last_refresh > InstanceTypeCatalog.REFRESH_RETRY_INTERVAL)
+
+    @staticmethod
+    def load(retries=3, delay=5):
+        """
+        Load the catalog (if it is not loaded) from EC2_INSTANCE_TYPES_FILE.
+        If there is no copy of it (or it is expired) it is downloaded in background,
+        and meanwhile the seed catalog is used.
+        """
+        if not InstanceTypeCatalog.instance_types:
+            with InstanceTypeCatalog._lock:
+                if not InstanceTypeCatalog.instance_types and not InstanceTypeCatalog.load_file():
+                    if InstanceTypeCatalog.load_file(InstanceTypeCatalog.SEED_FILE):
+                        # The seed catalog is replaced by the downloaded one as soon as possible
+                        InstanceTypeCatalog.last_update = 0
+                    else:
+                        InstanceTypeCatalog.logger.error("No EC2 instance types catalog available.")
+        if InstanceTypeCatalog.need_refresh():
+            InstanceTypeCatalog.refresh_async(retries, delay)
+
+    @staticmethod
+    def get_instance_types(retries=3, delay=5):
+        """
+        Get all the EC2 instance types sorted by price
+
+        Returns: a list of :py:class:`InstanceTypeInfo` (empty if the catalog is not available)
+        """
+        InstanceTypeCatalog.load(retries, delay)
+        return InstanceTypeCatalog.instance_types
+
+    @staticmethod
+    def get_instance_types_by_arch(arch):
+        """
+        Get the EC2 instance types that support the specified cpu arch sorted by price
+
+        Returns: a list of :py:class:`InstanceTypeInfo`
+        """
+        InstanceTypeCatalog.load()
+        return InstanceTypeCatalog.by_arch.get(arch, [])
+
+    @staticmethod
+    def get_instance_type_by_name(name):
+        """
+        Get the EC2 instance type with the specified name
+
+        Returns: an :py:class:`InstanceTypeInfo` or None if the type is not found
+        """
+        InstanceTypeCatalog.load()
+        return InstanceTypeCatalog.by_name.get(name)
+
+    @staticmethod
+    def _reinit():
+        """Restart the class attributes to initial values."""
+        InstanceTypeCatalog.set_instance_types([], 0)
+        InstanceTypeCatalog._last_refresh = 0
+        InstanceTypeCatalog._refresh_thread = None
+
+
 class EC2CloudConnector(CloudConnector):
     """
     Cloud Launcher to the EC2 platform
@@ -81,6 +327,9 @@ class EC2CloudConnector(CloudConnector):
     """str with the name of the provider."""
     INSTANCE_TYPE = 't1.micro'
     """str with the name of the default instance type to launch."""
+    NO_CATALOG_ERROR = ("The EC2 instance types catalog is not available, so the instance type "
+                        "requirements cannot be checked. Retry when it has been downloaded.")
+    """str with the error returned if the instance types catalog is not available."""
 
     VM_STATE_MAP = {
         'pending': VirtualMachine.PENDING,
@@ -94,11 +343,9 @@ class EC2CloudConnector(CloudConnector):
     DEFAULT_USER = 'cloudadm'
     """ default user to SSH access the VM """
 
-    instance_type_list = []
-    """ Information about the instance types """
-
     def __init__(self, cloud_info, inf):
-        self.connection = None
+        # boto connections indexed by region name
+        self.connections = {}
         self.route53_connection = None
         self.auth = None
         CloudConnector.__init__(self, cloud_info, inf)
@@ -109,6 +356,10 @@ class EC2CloudConnector(CloudConnector):
 
         if protocol == "aws":
 
+            if not self.get_all_instance_types():
+                # Raise an error instead of returning no systems, as they are cached
+                raise Exception(self.NO_CATALOG_ERROR)
+
             instance_type = self.get_instance_type(radl_system)
             if not instance_type:
                 self.log_error("Error launching the VM, no instance type available for the requirements.")
@@ -164,15 +415,20 @@ class EC2CloudConnector(CloudConnector):
            - auth_data(:py:class:`dict` of str objects): Authentication data to access cloud provider.
         Returns: a :py:class:`boto.ec2.connection` or None in case of error
         """
-        auths = auth_data.getAuthInfo(self.type)
-        if not auths:
-            raise Exception("No auth data has been specified to EC2.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type)
+            if not auths:
+                raise Exception("No auth data has been specified to EC2.")
+            else:
+                auth = auths[0]
+
+            if self.auth and self.auth.compare(auth_data, self.type):
+                if region_name in self.connections:
+                    return self.connections[region_name]
+            else:
+                # The credentials have changed, discard the previous connections
+                self.connections = {}
 
-        if self.connection and self.auth.compare(auth_data, self.type):
-            return self.connection
-        else:
             self.auth = auth_data
             conn = None
             try:
@@ -197,7 +453,7 @@ class EC2CloudConnector(CloudConnector):
                 raise Exception("Error getting the region " +
                                 region_name + ": " + str(ex))
 
-            self.connection = conn
+            self.connections[region_name] = conn
             return conn
 
     # Get the Route53 connection object
@@ -210,34 +466,35 @@ class EC2CloudConnector(CloudConnector):
            - auth_data(:py:class:`dict` of str objects): Authentication data to access cloud provider.
         Returns: a :py:class:`boto.route53.connection` or None in case of error
         """
-        auths = auth_data.getAuthInfo(self.type)
-        if not auths:
-            raise Exception("No auth data has been specified to EC2.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type)
+            if not auths:
+                raise Exception("No auth data has been specified to EC2.")
+            else:
+                auth = auths[0]
 
-        if self.route53_connection and self.auth.compare(auth_data, self.type):
-            return self.route53_connection
-        else:
-            self.auth = auth_data
-            conn = None
-            try:
-                if 'username' in auth and 'password' in auth:
-                    conn = boto.route53.connect_to_region(region_name,
-                                                          aws_access_key_id=auth['username'],
-                                                          aws_secret_access_key=auth['password'])
-                else:
-                    self.log_error("No correct auth data has been specified to EC2: "
-                                   "username (Access Key) and password (Secret Key)")
-                    raise Exception("No correct auth data has been specified to EC2: "
-                                    "username (Access Key) and password (Secret Key)")
+            if self.route53_connection and self.auth.compare(auth_data, self.type):
+                return self.route53_connection
+            else:
+                self.auth = auth_data
+                conn = None
+                try:
+                    if 'username' in auth and 'password' in auth:
+                        conn = boto.route53.connect_to_region(region_name,
+                                                              aws_access_key_id=auth['username'],
+                                                              aws_secret_access_key=auth['password'])
+                    else:
+                        self.log_error("No correct auth data has been specified to EC2: "
+                                       "username (Access Key) and password (Secret Key)")
+                        raise Exception("No correct auth data has been specified to EC2: "
+                                        "username (Access Key) and password (Secret Key)")
 
-            except Exception as ex:
-                self.log_exception("Error conneting Route53 in region " + region_name)
-                raise Exception("Error conneting Route53 in region" + region_name + ": " + str(ex))
+                except Exception as ex:
+                    self.log_exception("Error conneting Route53 in region " + region_name)
+                    raise Exception("Error conneting Route53 in region" + region_name + ": " + str(ex))
 
-            self.route53_connection = conn
-            return conn
+                self.route53_connection = conn
+                return conn
 
     # path format: aws://eu-west-1/ami-00685b74
     @staticmethod
@@ -254,6 +511,33 @@ class EC2CloudConnector(CloudConnector):
 
         return (region, ami)
 
+    def get_breaker_endpoint(self, method, *args):
+        """
+        Get the endpoint of the circuit breaker that protects a call: the EC2 region
+        (as the EC2 cloud providers have no server).
+        """
+        region = None
+        try:
+            if method == "concreteSystem":
+                image_urls = args[0].getValue("disk.0.image.url")
+                if isinstance(image_urls, list) and len(image_urls) == 1:
+                    image_urls = image_urls[0]
+                if image_urls and not isinstance(image_urls, list):
+                    region = self.getAMIData(image_urls)[0]
+            elif method == "launch":
+                region = self.getAMIData(args[1].systems[0].getValue("disk.0.image.url"))[0]
+            elif method == "delete_image":
+                region = self.getAMIData(args[0])[0]
+            elif method in ["updateVMInfoBatch", "finalizeBatch"]:
+                region = args[0][0].id.split(";")[0]
+            else:
+                region = args[0].id.split(";")[0]
+        except Exception:
+            self.log_debug("Error getting the region of the %s call." % method)
+        if region:
+            return "%s@%s" % (self.type, region)
+        return None
+
     def get_instance_type(self, radl):
         """
         Get the name of the instance type to launch to EC2
@@ -279,28 +563,36 @@ class EC2CloudConnector(CloudConnector):
                 self.log_warn("Performance unit unknown: " + cpu_perf.unit + ". Ignore it")
         performance_op = CloudConnector.OPERATORSMAP.get(performance_op_str)
 
-        instace_types = self.get_all_instance_types()
+        if instance_type_name:
+            instace_type = InstanceTypeCatalog.get_instance_type_by_name(instance_type_name)
+            instace_types = [instace_type] if instace_type and arch in instace_type.cpu_arch else []
+        else:
+            instace_types = InstanceTypeCatalog.get_instance_types_by_arch(arch)
 
         res = None
+        # the types are sorted by price: stop when a more expensive one is found
         for instace_type in instace_types:
-            # get the instance type with the lowest price
-            if res is None or (instace_type.price <= res.price):
+            if res is not None and instace_type.price > res.price:
+                break
 
-                comparison = arch in instace_type.cpu_arch
-                comparison = comparison and cpu_op(instace_type.cores_per_cpu * instace_type.num_cpu, cpu)
-                comparison = comparison and memory_op(instace_type.mem, memory)
-                comparison = comparison and disk_free_op(instace_type.disks * instace_type.disk_space, disk_free)
-                comparison = comparison and performance_op(instace_type.cpu_perf, performance)
+            comparison = cpu_op(instace_type.cores_per_cpu * instace_type.num_cpu, cpu)
+            comparison = comparison and memory_op(instace_type.mem, memory)
+            comparison = comparison and disk_free_op(instace_type.disks * instace_type.disk_space, disk_free)
+            comparison = comparison and performance_op(instace_type.cpu_perf, performance)
 
-                if comparison:
-                    if not instance_type_name or instace_type.name == instance_type_name:
-                        res = instace_type
+            # get the instance type with the lowest price
+            if comparison:
+                res = instace_type
 
         if res is None:
             self.get_instance_type_by_name(self.INSTANCE_TYPE)
         else:
             return res
 
+    @staticmethod
+    def prewarm():
+        InstanceTypeCatalog.load()
+
     @staticmethod
     def set_net_provider_id(radl, vpc, subnet):
         """
@@ -622,12 +914,19 @@ class EC2CloudConnector(CloudConnector):
                 res.append((False, "Error connecting with EC2, check the credentials"))
             return res
 
+        if not self.get_all_instance_types():
+            self.log_error(self.NO_CATALOG_ERROR)
+            for i in range(num_vm):
+                res.append((False, self.NO_CATALOG_ERROR))
+            return res
+
         instance_type = self.get_instance_type(system)
         if not instance_type:
             self.log_error("Error no instance type available for the requirements.")
             self.log_debug(system)
             for i in range(num_vm):
                 res.append((False, "Error no instance type available for the requirements."))
+            return res
 
         image = conn.get_image(ami)
         if not image:
@@ -1175,6 +1474,25 @@ class EC2CloudConnector(CloudConnector):
                 # sometime if you try to update a recently created instance
                 # this operation fails
                 instance.update()
+            except Exception as ex:
+                self.log_exception("Error updating the instance " + instance_id)
+                return (False, "Error updating the instance " + instance_id + ": " + str(ex))
+
+        return self._update_vm_info_from_instance(vm, instance, instance_id, conn, auth_data)
+
+    def _update_vm_info_from_instance(self, vm, instance, instance_id, conn, auth_data):
+        """
+        Update the VM info with the data of the EC2 instance
+
+        Arguments:
+           - vm(:py:class:`IM.VirtualMachine`): VM information to update.
+           - instance(:py:class:`boto.ec2.instance`): instance info.
+           - instance_id(str): ID of the EC2 instance.
+           - conn(:py:class:`boto.ec2.connection`): connection to the region of the instance.
+           - auth_data(:py:class:`dict` of str objects): Authentication data to access cloud provider.
+        """
+        if instance:
+            try:
                 if "IM-USER" not in instance.tags:
                     im_username = "im_user"
                     if auth_data.getAuthInfo('InfrastructureManager'):
@@ -1190,7 +1508,8 @@ class EC2CloudConnector(CloudConnector):
             vm.state = self.VM_STATE_MAP.get(instance.state, VirtualMachine.UNKNOWN)
 
             instance_type = self.get_instance_type_by_name(instance.instance_type)
-            self.update_system_info_from_instance(vm.info.systems[0], instance_type)
+            if instance_type:
+                self.update_system_info_from_instance(vm.info.systems[0], instance_type)
 
             self.setIPsFromInstance(vm, instance)
             self.add_dns_entries(vm, auth_data)
@@ -1209,6 +1528,38 @@ class EC2CloudConnector(CloudConnector):
 
         return (True, vm)
 
+    def updateVMInfoBatch(self, vms, auth_data):
+        """
+        Get the info of the instances of each region with a single get_all_instances call.
+        The spot requests and the instances not found are updated with updateVMInfo.
+        """
+        regions = {}
+        for vm in vms:
+            region, instance_id = vm.id.split(";")
+            if not instance_id.startswith("s"):
+                regions.setdefault(region, []).append(instance_id)
+
+        instances = {}
+        for region, instance_ids in regions.items():
+            try:
+                conn = self.get_connection(region, auth_data)
+                for reservation in conn.get_all_instances(instance_ids):
+                    for instance in reservation.instances:
+                        instances[region + ";" + instance.id] = (instance, conn)
+            except Exception as ex:
+                self.log_warn("Error getting the instances of region %s: %s. Updating them one by one." %
+                              (region, ex))
+
+        res = []
+        for vm in vms:
+            if vm.id in instances:
+                instance, conn = instances[vm.id]
+                res.append(self.update_vm_locked(vm, self._update_vm_info_from_instance, instance, instance.id,
+                                                 conn, auth_data))
+            else:
+                res.append(self.update_vm_locked(vm, self.updateVMInfo, auth_data))
+        return res
+
     def add_dns_entries(self, vm, auth_data):
         """
         Add the required entries in the AWS Route53 service
@@ -1410,6 +1761,106 @@ class EC2CloudConnector(CloudConnector):
 
         return (error_msg == "", error_msg)
 
+    def _wait_instances_terminated(self, conn, instance_ids, timeout=120, delay=5):
+        """
+        Wait the instances to be terminated
+
+        Arguments:
+           - conn(:py:class:`boto.ec2.connection`): object to connect to EC2 API.
+           - instance_ids(list of str): IDs of the instances.
+        """
+        wait = 0
+        while instance_ids and wait < timeout:
+            try:
+                instances = conn.get_only_instances(instance_ids)
+                if all(instance.state == "terminated" for instance in instances):
+                    return True
+            except Exception as ex:
+                self.log_warn("Error getting the state of the instances: %s" % ex)
+            time.sleep(delay)
+            wait += delay
+        return not instance_ids
+
+    def finalizeBatch(self, vms, last, auth_data):
+        """
+        Terminate all the instances of each region with a single terminate_instances
+        call, and delete the SGs and networks once all of them are terminated.
+        """
+        # first delete the snapshots to avoid problems in EC3 deleting the IM front-end
+        if last:
+            self.delete_snapshots(vms[-1], auth_data)
+
+        error_msgs = dict((id(vm), "") for vm in vms)
+        regions = {}
+        for vm in vms:
+            if vm.id is None:
+                self.log_info("VM with no ID. Ignore.")
+            else:
+                regions.setdefault(vm.id.split(";")[0], []).append(vm)
+
+        conns = {}
+        for region_name, region_vms in regions.items():
+            conn = conns[region_name] = self.get_connection(region_name, auth_data)
+
+            # Terminate the instances (the spot requests are canceled later)
+            instance_vms = dict((vm.id.split(";")[1], vm) for vm in region_vms)
+            instance_ids = [vm.id.split(";")[1] for vm in region_vms if not vm.id.split(";")[1].startswith("s")]
+            if instance_ids:
+                try:
+                    conn.terminate_instances(instance_ids)
+                except Exception as ex:
+                    # Some of them may not exist: terminate them one by one
+                    self.log_warn("Error terminating the instances: %s. Terminate them one by one." % ex)
+                    for instance_id in instance_ids:
+                        try:
+                            instance = self.get_instance_by_id(instance_id, region_name, auth_data)
+                            if instance is not None:
+                                instance.terminate()
+                        except Exception as ex:
+                            self.log_exception("Error terminating instance %s." % instance_id)
+                            error_msgs[id(instance_vms[instance_id])] += "Error terminating the instance: %s. " % ex
+
+            for vm in region_vms:
+                try:
+                    self.delete_elastic_ips(conn, vm)
+                except Exception as ex:
+                    self.log_exception("Error deleting elastic IPs")
+                    error_msgs[id(vm)] += "Error deleting elastic IPs: %s. " % ex
+
+                try:
+                    self.cancel_spot_requests(conn, vm)
+                except Exception as ex:
+                    self.log_exception("Error canceling spot requests.")
+                    error_msgs[id(vm)] += "Error canceling spot requests: %s. " % ex
+
+                try:
+                    self.del_dns_entries(vm, auth_data)
+                except Exception as ex:
+                    self.log_exception("Error deleting DNS entries")
+                    error_msgs[id(vm)] += "Error deleting DNS entries: %s. " % ex
+
+            if last and not self._wait_instances_terminated(conn, instance_ids):
+                self.log_warn("Timeout waiting the instances to be terminated.")
+
+        # if these are the last VMs
+        if last:
+            for region_name, region_vms in regions.items():
+                # Delete the SG
+                try:
+                    self.delete_security_groups(conns[region_name], region_vms[-1])
+                except Exception as ex:
+                    self.log_exception("Error deleting security group.")
+                    error_msgs[id(vms[-1])] += "Error deleting security group: %s. " % ex
+
+                # And nets
+                try:
+                    self.delete_networks(conns[region_name], region_vms[-1])
+                except Exception as ex:
+                    self.log_exception("Error deleting networks.")
+                    error_msgs[id(vms[-1])] += "Error deleting networks: %s. " % ex
+
+        return [(error_msgs[id(vm)] == "", error_msgs[id(vm)]) for vm in vms]
+
     def _get_security_groups(self, conn, vm):
         """
         Get all the SGs where the VM is included
@@ -1529,6 +1980,10 @@ class EC2CloudConnector(CloudConnector):
 
         success = True
         if radl.systems:
+            if not self.get_all_instance_types():
+                self.log_error(self.NO_CATALOG_ERROR)
+                return (False, self.NO_CATALOG_ERROR)
+
             instance_type = self.get_instance_type(radl.systems[0])
 
             if instance_type and instance.instance_type != instance_type.name:
@@ -1553,57 +2008,7 @@ class EC2CloudConnector(CloudConnector):
 
         Returns: a list of :py:class:`InstanceTypeInfo`
         """
-        # Get info from http://www.ec2instances.info/
-        # https://raw.githubusercontent.com/powdahound/ec2instances.info/master/www/instances.json
-
-        if EC2CloudConnector.instance_type_list:
-            return EC2CloudConnector.instance_type_list
-
-        cont = 0
-        data = None
-        while cont < retries and not data:
-            cont += 1
-            try:
-                info_url = "https://raw.githubusercontent.com/powdahound/ec2instances.info/master/www/instances.json"
-                resp = requests.get(info_url)
-                if resp.status_code == 200:
-                    data = resp.json()
-                else:
-                    time.sleep(delay)
-            except Exception as ex:
-                self.log_warn("Error getting ec2instances info: %s. (%s/%s)" % (ex, cont, retries))
-                time.sleep(delay)
-
-        instance_list = []
-        if not data:
-            self.log_error("Error getting ec2instances info.")
-        else:
-            for instance_type in data:
-                price = 50
-                if instance_type['pricing']:
-                    price = float(instance_type['pricing']['us-east-1']['linux']['ondemand'])
-                disks = 0
-                disk_space = 0
-                if instance_type['storage']:
-                    disks = instance_type['storage']['devices']
-                    disk_space = instance_type['storage']['size']
-                cpu_perf = instance_type['ECU']
-                if cpu_perf == 'variable':
-                    cpu_perf = 0
-                instance_list.append(InstanceTypeInfo(name=instance_type['instance_type'],
-                                                      cpu_arch=instance_type['arch'],
-                                                      num_cpu=instance_type['vCPU'],
-                                                      cores_per_cpu=1,
-                                                      mem=instance_type['memory'] * 1024,
-                                                      price=price,
-                                                      cpu_perf=cpu_perf,
-                                                      disks=disks,
-                                                      disk_space=disk_space,
-                                                      vpc_only=instance_type['vpc_only'],
-                                                      gpu=instance_type['GPU']))
-            EC2CloudConnector.instance_type_list = instance_list
-
-        return instance_list
+        return InstanceTypeCatalog.get_instance_types(retries, delay)
 
     def get_instance_type_by_name(self, name):
         """
@@ -1611,10 +2016,7 @@ class EC2CloudConnector(CloudConnector):
 
         Returns: an :py:class:`InstanceTypeInfo` or None if the type is not found
         """
-        for inst_type in self.get_all_instance_types():
-            if inst_type.name == name:
-                return inst_type
-        return None
+        return InstanceTypeCatalog.get_instance_type_by_name(name)
 
     def create_snapshot(self, vm, disk_num, image_name, auto_delete, auth_data):
         """
@@ -16,12 +16,14 @@
 
 import json
 import os
-import requests
 import time
 from uuid import uuid1
 from netaddr import IPNetwork, IPAddress
 
+from IM.auth import Authentication
+from IM.cache import TTLCache
 from IM.config import Config
+from IM.http_pool import HTTPPool
 
 try:
     from urlparse import urlparse
@@ -60,9 +62,18 @@ class FogBowCloudConnector(CloudConnector):
 
     MAX_ADD_IP_COUNT = 5
     """ Max number of retries to get a public IP """
+    TOKEN_TTL = 3600
+    """ Time (in secs) to reuse the tokens obtained from the AS (they are renewed before if rejected) """
+    PUBLIC_KEY_TTL = 86400
+    """ Time (in secs) to cache the public key of the FogBow servers """
+    token_cache = TTLCache("fogbow_token", 1000)
+    """ Cache of the tokens by AS host and credentials (shared by all the connectors) """
+    public_key_cache = TTLCache("fogbow_public_key", 100)
+    """ Cache of the public key of the FogBow servers """
 
     def __init__(self, cloud_info, inf):
-        self.add_public_ip_count = 0
+        # Number of failed attempts to add a public IP to each VM
+        self.add_public_ip_count = {}
         self.token = None
         CloudConnector.__init__(self, cloud_info, inf)
 
@@ -88,7 +99,17 @@ class FogBowCloudConnector(CloudConnector):
                 headers = {}
             headers.update(auth_header)
 
-        resp = requests.request(method, self.get_full_url(url), verify=self.verify_ssl, headers=headers, data=body)
+        resp = HTTPPool.request(method, self.get_full_url(url), verify=self.verify_ssl, headers=headers, data=body)
+
+        if resp.status_code == 401:
+            auth = auth_data.getAuthInfo(FogBowCloudConnector.type)
+            if 'token' not in auth[0]:
+                # The cached token is not valid. Request for a new one and retry once
+                self.log_debug("Token rejected. Request for a new one.")
+                self.invalidate_token(auth[0], headers['Fogbow-User-Token'])
+                headers.update(self.get_auth_header(auth_data))
+                resp = HTTPPool.request(method, self.get_full_url(url), verify=self.verify_ssl,
+                                        headers=headers, data=body)
 
         return resp
 
@@ -147,38 +168,69 @@ class FogBowCloudConnector(CloudConnector):
 
         return None
 
-    def get_token(self, auth_data):
-        headers = {'Content-Type': 'application/json'}
-
-        if self.token:
-            self.log_debug("We have a token. Check if it is valid.")
-            resp = requests.request('HEAD', self.get_full_url('/clouds/'), verify=self.verify_ssl,
-                                    headers={'Fogbow-User-Token': self.token})
-            if resp.status_code in [200, 201]:
-                return self.token
-            else:
-                self.log_debug("It is not valid. Request for a new one.")
-                self.token = None
-
+    def get_as_host(self, auth_data):
         if 'as_host' in auth_data:
-            # if no as_host specified assume the same host and default path /as
-            as_host = auth_data['as_host']
+            return auth_data['as_host']
         else:
-            as_host = self.get_full_url('/as', True)
+            # if no as_host specified assume the same host and default path /as
+            return self.get_full_url('/as', True)
+
+    def get_public_key(self):
+        """
+        Get the public key of the FogBow server (cached during PUBLIC_KEY_TTL secs).
+        """
+        url = self.get_full_url('/publicKey/')
+        found, public_key = FogBowCloudConnector.public_key_cache.get(url)
+        if found:
+            return public_key
 
-        resp = requests.request('GET', self.get_full_url('/publicKey/'), verify=self.verify_ssl)
+        resp = HTTPPool.request('GET', url, verify=self.verify_ssl)
         if resp.status_code == 200:
             public_key = resp.json()['publicKey']
+            FogBowCloudConnector.public_key_cache.put(url, public_key, FogBowCloudConnector.PUBLIC_KEY_TTL)
+            return public_key
+        else:
+            self.log_error("Error getting public key: %s. %s" % (resp.reason, resp.text))
+            raise Exception("Error getting public key: %s. %s" % (resp.reason, resp.text))
+
+    def get_token_key(self, auth_data):
+        return TTLCache.hash_key(self.get_as_host(auth_data), Authentication.get_item_fingerprint(auth_data))
+
+    def invalidate_token(self, auth_data, token):
+        """
+        Remove a token rejected by the FogBow server from the cache.
+        """
+        self.token = None
+        key = self.get_token_key(auth_data)
+        found, cached_token = FogBowCloudConnector.token_cache.get(key)
+        # it may have been already renewed by other connector
+        if found and cached_token == token:
+            FogBowCloudConnector.token_cache.invalidate(key)
+
+    def get_token(self, auth_data):
+        """
+        Get a token from the AS. The tokens are reused during TOKEN_TTL secs
+        by all the connectors with the same credentials.
+        """
+        key = self.get_token_key(auth_data)
+        found, token = FogBowCloudConnector.token_cache.get(key)
+        if found:
+            self.token = token
+            return token
+
+        public_key = self.get_public_key()
 
         body = {'publicKey': public_key, 'credentials': {}}
-        for key, value in auth_data.items():
-            if key not in ['id', 'type', 'host', 'as_host']:
-                body['credentials'][key] = value
+        for key_name, value in auth_data.items():
+            if key_name not in ['id', 'type', 'host', 'as_host']:
+                body['credentials'][key_name] = value
 
-        resp = requests.request('POST', '%s/tokens/' % as_host, verify=self.verify_ssl,
+        headers = {'Content-Type': 'application/json'}
+        resp = HTTPPool.request('POST', '%s/tokens/' % self.get_as_host(auth_data), verify=self.verify_ssl,
                                 headers=headers, data=json.dumps(body))
         if resp.status_code in [200, 201]:
             self.token = resp.json()['token']
+            FogBowCloudConnector.token_cache.put(key, self.token, FogBowCloudConnector.TOKEN_TTL)
             return self.token
         else:
             self.log_error("Error getting token: %s. %s" % (resp.reason, resp.text))
@@ -577,9 +629,9 @@ class FogBowCloudConnector(CloudConnector):
         """
         Get a public IP if needed.
         """
-        if self.add_public_ip_count >= self.MAX_ADD_IP_COUNT:
+        if self.add_public_ip_count.get(vm.id, 0) >= self.MAX_ADD_IP_COUNT:
             self.log_error("Error adding a floating IP: Max number of retries reached.")
-            self.error_messages += "Error adding a floating IP: Max number of retries reached.\n"
+            self.add_error_message(vm, "Error adding a floating IP: Max number of retries reached.\n")
             return None
 
         if not public_ips and vm.hasPublicNet() and vm.state == VirtualMachine.RUNNING:
@@ -598,11 +650,11 @@ class FogBowCloudConnector(CloudConnector):
                         self.create_security_rules('publicIps', net, ip_info['id'], auth_data)
                 return ip_info['ip']
             else:
-                self.add_public_ip_count += 1
-                self.log_warn("Error adding a floating IP the VM: (%d/%d)\n" % (self.add_public_ip_count,
+                self.add_public_ip_count[vm.id] = self.add_public_ip_count.get(vm.id, 0) + 1
+                self.log_warn("Error adding a floating IP the VM: (%d/%d)\n" % (self.add_public_ip_count[vm.id],
                                                                                 self.MAX_ADD_IP_COUNT))
-                self.error_messages += "Error adding a floating IP: (%d/%d)\n" % (self.add_public_ip_count,
-                                                                                  self.MAX_ADD_IP_COUNT)
+                self.add_error_message(vm, "Error adding a floating IP: (%d/%d)\n" % (self.add_public_ip_count[vm.id],
+                                                                                      self.MAX_ADD_IP_COUNT))
                 return None
 
     def updateVMInfo(self, vm, auth_data):
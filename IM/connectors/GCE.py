@@ -69,36 +69,37 @@ class GCECloudConnector(LibCloudCloudConnector):
 
         Returns: a :py:class:`libcloud.compute.base.NodeDriver` or None in case of error
         """
-        auths = auth_data.getAuthInfo(self.type)
-        if not auths:
-            raise Exception("No auth data has been specified to GCE.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type)
+            if not auths:
+                raise Exception("No auth data has been specified to GCE.")
+            else:
+                auth = auths[0]
 
-        if self.driver and self.auth.compare(auth_data, self.type) and self.datacenter == datacenter:
-            return self.driver
-        else:
-            self.auth = auth_data
-            self.datacenter = datacenter
-
-            if 'username' in auth and 'password' in auth and 'project' in auth:
-                cls = libcloud_get_driver(Provider.GCE)
-                # Patch to solve some client problems with \\n
-                auth['password'] = auth['password'].replace('\\n', '\n')
-                lines = len(auth['password'].replace(" ", "").split())
-                if lines < 2:
-                    raise Exception("The certificate provided to the GCE plugin has an incorrect format."
-                                    " Check that it has more than one line.")
-
-                driver = cls(auth['username'], auth['password'], project=auth['project'], datacenter=datacenter)
-
-                self.driver = driver
-                return driver
+            if self.driver and self.auth.compare(auth_data, self.type) and self.datacenter == datacenter:
+                return self.driver
             else:
-                self.log_error("No correct auth data has been specified to GCE: username, password and project")
-                self.log_debug(auth)
-                raise Exception(
-                    "No correct auth data has been specified to GCE: username, password and project")
+                self.auth = auth_data
+                self.datacenter = datacenter
+
+                if 'username' in auth and 'password' in auth and 'project' in auth:
+                    cls = libcloud_get_driver(Provider.GCE)
+                    # Patch to solve some client problems with \\n
+                    auth['password'] = auth['password'].replace('\\n', '\n')
+                    lines = len(auth['password'].replace(" ", "").split())
+                    if lines < 2:
+                        raise Exception("The certificate provided to the GCE plugin has an incorrect format."
+                                        " Check that it has more than one line.")
+
+                    driver = cls(auth['username'], auth['password'], project=auth['project'], datacenter=datacenter)
+
+                    self.driver = driver
+                    return driver
+                else:
+                    self.log_error("No correct auth data has been specified to GCE: username, password and project")
+                    self.log_debug(auth)
+                    raise Exception(
+                        "No correct auth data has been specified to GCE: username, password and project")
 
     def get_dns_driver(self, auth_data):
         """
@@ -109,35 +110,36 @@ class GCECloudConnector(LibCloudCloudConnector):
 
         Returns: a :py:class:`libcloud.dns.base.DNSDriver` or None in case of error
         """
-        auths = auth_data.getAuthInfo(self.type)
-        if not auths:
-            raise Exception("No auth data has been specified to GCE.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type)
+            if not auths:
+                raise Exception("No auth data has been specified to GCE.")
+            else:
+                auth = auths[0]
 
-        if self.dns_driver and self.auth.compare(auth_data, self.type):
-            return self.dns_driver
-        else:
-            self.auth = auth_data
+            if self.dns_driver and self.auth.compare(auth_data, self.type):
+                return self.dns_driver
+            else:
+                self.auth = auth_data
 
-            if 'username' in auth and 'password' in auth and 'project' in auth:
-                cls = get_dns_driver(DNSProvider.GOOGLE)
-                # Patch to solve some client problems with \\n
-                auth['password'] = auth['password'].replace('\\n', '\n')
-                lines = len(auth['password'].replace(" ", "").split())
-                if lines < 2:
-                    raise Exception("The certificate provided to the GCE plugin has an incorrect format."
-                                    " Check that it has more than one line.")
+                if 'username' in auth and 'password' in auth and 'project' in auth:
+                    cls = get_dns_driver(DNSProvider.GOOGLE)
+                    # Patch to solve some client problems with \\n
+                    auth['password'] = auth['password'].replace('\\n', '\n')
+                    lines = len(auth['password'].replace(" ", "").split())
+                    if lines < 2:
+                        raise Exception("The certificate provided to the GCE plugin has an incorrect format."
+                                        " Check that it has more than one line.")
 
-                driver = cls(auth['username'], auth['password'], project=auth['project'])
+                    driver = cls(auth['username'], auth['password'], project=auth['project'])
 
-                self.dns_driver = driver
-                return driver
-            else:
-                self.log_error("No correct auth data has been specified to GCE: username, password and project")
-                self.log_debug(auth)
-                raise Exception(
-                    "No correct auth data has been specified to GCE: username, password and project")
+                    self.dns_driver = driver
+                    return driver
+                else:
+                    self.log_error("No correct auth data has been specified to GCE: username, password and project")
+                    self.log_debug(auth)
+                    raise Exception(
+                        "No correct auth data has been specified to GCE: username, password and project")
 
     def concrete_system(self, radl_system, str_url, auth_data):
         url = urlparse(str_url)
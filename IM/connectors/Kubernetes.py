@@ -16,7 +16,6 @@
 
 import base64
 import json
-import requests
 try:
     from urlparse import urlparse
 except ImportError:
@@ -25,6 +24,7 @@ from IM.VirtualMachine import VirtualMachine
 from .CloudConnector import CloudConnector
 from radl.radl import Feature
 from IM.config import Config
+from IM.http_pool import HTTPPool
 
 
 class KubernetesCloudConnector(CloudConnector):
@@ -59,7 +59,7 @@ class KubernetesCloudConnector(CloudConnector):
             headers.update(auth_header)
 
         url = "%s://%s:%d%s%s" % (self.cloud.protocol, self.cloud.server, self.cloud.port, self.cloud.path, url)
-        resp = requests.request(method, url, verify=self.verify_ssl, headers=headers, data=body)
+        resp = HTTPPool.request(method, url, verify=self.verify_ssl, headers=headers, data=body)
 
         return resp
 
@@ -394,17 +394,45 @@ class KubernetesCloudConnector(CloudConnector):
     def updateVMInfo(self, vm, auth_data):
         success, status, output = self._get_pod(vm, auth_data)
         if success:
-            output = json.loads(output)
-            vm.state = self.VM_STATE_MAP.get(
-                output["status"]["phase"], VirtualMachine.UNKNOWN)
-
-            # Update the network info
-            self.setIPs(vm, output)
-            return (True, vm)
+            return self._update_vm_info_from_pod(vm, json.loads(output))
         else:
             self.log_error("Error getting info about the POD: code: %s, msg: %s" % (status, output))
             return (False, "Error getting info about the POD: code: %s, msg: %s" % (status, output))
 
+    def _update_vm_info_from_pod(self, vm, pod_info):
+        vm.state = self.VM_STATE_MAP.get(pod_info["status"]["phase"], VirtualMachine.UNKNOWN)
+
+        # Update the network info
+        self.setIPs(vm, pod_info)
+        return (True, vm)
+
+    def updateVMInfoBatch(self, vms, auth_data):
+        """
+        Get the info of all the PODs of each namespace with a single list call.
+        The PODs not found in the list are updated with updateVMInfo.
+        """
+        pods = {}
+        try:
+            apiVersion = self.get_api_version(auth_data)
+            for namespace in set(vm.inf.id for vm in vms):
+                uri = "/api/" + apiVersion + "/namespaces/" + namespace + "/pods"
+                resp = self.create_request('GET', uri, auth_data)
+                if resp.status_code != 200:
+                    raise Exception("code: %s, msg: %s" % (resp.status_code, resp.text))
+                for pod_info in json.loads(resp.text)["items"]:
+                    pods[(namespace, pod_info["metadata"]["name"])] = pod_info
+        except Exception as ex:
+            self.log_warn("Error listing the PODs: %s. Updating them one by one." % ex)
+            return CloudConnector.updateVMInfoBatch(self, vms, auth_data)
+
+        res = []
+        for vm in vms:
+            if (vm.inf.id, vm.id) in pods:
+                res.append(self.update_vm_locked(vm, self._update_vm_info_from_pod, pods[(vm.inf.id, vm.id)]))
+            else:
+                res.append(self.update_vm_locked(vm, self.updateVMInfo, auth_data))
+        return res
+
     @staticmethod
     def setIPs(vm, pod_info):
         """
@@ -66,42 +66,43 @@ class LibCloudCloudConnector(CloudConnector):
 
         Returns: a :py:class:`libcloud.compute.base.NodeDriver` or None in case of error
         """
-        if self.driver:
-            return self.driver
-        else:
-            auth = auth_data.getAuthInfo(LibCloudCloudConnector.type)
-            if auth and 'driver' in auth[0]:
-                cls = get_driver(getattr(Provider, auth[0]['driver']))
+        with self._lock:
+            if self.driver:
+                return self.driver
+            else:
+                auth = auth_data.getAuthInfo(LibCloudCloudConnector.type)
+                if auth and 'driver' in auth[0]:
+                    cls = get_driver(getattr(Provider, auth[0]['driver']))
 
-                MAP = {"username": "key", "password": "secret"}
+                    MAP = {"username": "key", "password": "secret"}
 
-                params = {}
-                for key, value in auth[0].items():
-                    if key not in ["type", "driver", "id"]:
-                        params[MAP[key]] = value
+                    params = {}
+                    for key, value in auth[0].items():
+                        if key not in ["type", "driver", "id"]:
+                            params[MAP[key]] = value
 
-                if auth[0]['driver'] == "OPENSTACK":
-                    if 'host' in auth[0]:
-                        params["ex_force_auth_url"] = auth[0]['host']
+                    if auth[0]['driver'] == "OPENSTACK":
+                        if 'host' in auth[0]:
+                            params["ex_force_auth_url"] = auth[0]['host']
+                        else:
+                            self.log_error("Host data is needed in OpenStack")
+                            return None
                     else:
-                        self.log_error("Host data is needed in OpenStack")
-                        return None
+                        if 'host' in auth[0]:
+                            uri = urlparse(auth[0]['host'])
+                            if uri[1].find(":"):
+                                parts = uri[1].split(":")
+                                params["host"] = parts[0]
+                                params["port"] = int(parts[1])
+                            else:
+                                params["host"] = uri[1]
+
+                    driver = cls(**params)
+                    self.driver = driver
+                    return driver
                 else:
-                    if 'host' in auth[0]:
-                        uri = urlparse(auth[0]['host'])
-                        if uri[1].find(":"):
-                            parts = uri[1].split(":")
-                            params["host"] = parts[0]
-                            params["port"] = int(parts[1])
-                        else:
-                            params["host"] = uri[1]
-
-                driver = cls(**params)
-                self.driver = driver
-                return driver
-            else:
-                self.log_error("Incorrect auth data")
-                return None
+                    self.log_error("Incorrect auth data")
+                    return None
 
     def get_instance_type(self, sizes, radl):
         """
@@ -545,8 +546,8 @@ class LibCloudCloudConnector(CloudConnector):
                         except Exception as getex:
                             success = False
                             self.log_exception("Error getting volume ID %s" % volume_id)
-                            self.error_messages += "Error getting volume ID %s: %s\n" % (volume_id,
-                                                                                         getex.args[0])
+                            self.add_error_message(vm, "Error getting volume ID %s: %s\n" % (volume_id,
+                                                                                             getex.args[0]))
                     else:
                         self.log_debug("Creating a %d GB volume for the disk %d" % (int(disk_size), cont))
                         volume_name = "im-%s" % str(uuid.uuid1())
@@ -573,7 +574,7 @@ class LibCloudCloudConnector(CloudConnector):
 
                 except Exception as ex:
                     self.log_exception("Error creating volume %s." % cont)
-                    self.error_messages += "Error creating volume %s: %s\n" % (cont, ex.args[0])
+                    self.add_error_message(vm, "Error creating volume %s: %s\n" % (cont, ex.args[0]))
                     success = False
                     if volume and not disk_url:
                         self.log_error("Destroying it.")
@@ -22,7 +22,7 @@ import base64
 import tempfile
 import uuid
 import json
-import requests
+from datetime import datetime
 from netaddr import IPNetwork, IPAddress
 try:
     from urlparse import urlparse
@@ -31,7 +31,10 @@ except ImportError:
 from IM.VirtualMachine import VirtualMachine
 from .CloudConnector import CloudConnector
 from IM.AppDB import AppDB
+from IM.auth import Authentication
+from IM.cache import TTLCache
 from IM.config import Config
+from IM.http_pool import HTTPPool
 
 
 class OCCICloudConnector(CloudConnector):
@@ -59,7 +62,8 @@ class OCCICloudConnector(CloudConnector):
     PUBLIC_NET_NAMES = ["public", "PUBLIC", "floating"]
 
     def __init__(self, cloud_info, inf):
-        self.add_public_ip_count = 0
+        # Number of failed attempts to add a public IP to each VM
+        self.add_public_ip_count = {}
         self.keystone_token = None
         if cloud_info.path.endswith("/"):
             cloud_info.path = cloud_info.path[:-1]
@@ -81,7 +85,7 @@ class OCCICloudConnector(CloudConnector):
             headers.update({'Authorization': 'Bearer ' + auth["token"]})
 
         try:
-            resp = requests.request(method, url, verify=verify, cert=cert, headers=headers, data=body)
+            resp = HTTPPool.request(method, url, verify=verify, cert=cert, headers=headers, data=body)
         finally:
             if cert:
                 try:
@@ -107,35 +111,48 @@ class OCCICloudConnector(CloudConnector):
         else:
             auth = None
 
-        return self.create_request_static(method, url, auth, headers, self.verify_ssl, body)
+        resp = self.create_request_static(method, url, auth, headers, self.verify_ssl, body)
+
+        if resp.status_code == 401 and auth and 'X-Auth-Token' in headers:
+            # The Keystone token may have been revoked: retry once with a fresh one
+            self.log_warn("Keystone token rejected by the OCCI server. Retrying with a new one.")
+            KeyStoneAuth.invalidate_token(self, auth, headers['X-Auth-Token'])
+            auth_header = self.get_auth_header(auth_data)
+            if auth_header:
+                headers.update(auth_header)
+                resp = self.create_request_static(method, url, auth, headers, self.verify_ssl, body)
+
+        return resp
 
     def get_auth_header(self, auth_data):
         """
         Generate the auth header needed to contact with the OCCI server.
         I supports Keystone tokens and basic auth.
         """
-        auths = auth_data.getAuthInfo(self.type, self.cloud.server)
-        if not auths:
-            raise Exception("No correct auth data has been specified to OCCI.")
-        else:
-            auth = auths[0]
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type, self.cloud.server)
+            if not auths:
+                raise Exception("No correct auth data has been specified to OCCI.")
+            else:
+                auth = auths[0]
 
-        auth_header = None
-        keystone_uri, keystone_token = KeyStoneAuth.get_keystone_uri(self)
+            auth_header = None
+            keystone_token = KeyStoneAuth.get_cached_token(self, auth)
+            if not keystone_token:
+                keystone_uri, keystone_token = KeyStoneAuth.get_keystone_uri(self)
+                if not keystone_token and keystone_uri:
+                    keystone_token = KeyStoneAuth.get_keystone_token(self, keystone_uri, auth)
 
-        if keystone_token:
-            auth_header = {'X-Auth-Token': keystone_token}
-        elif keystone_uri:
-            keystone_token = KeyStoneAuth.get_keystone_token(self, keystone_uri, auth)
-            auth_header = {'X-Auth-Token': keystone_token}
-        else:
-            if 'username' in auth and 'password' in auth:
-                passwd = auth['password']
-                user = auth['username']
-                auth_header = {'Authorization': 'Basic ' +
-                               (base64.encodestring((user + ':' + passwd).encode('utf-8'))).strip().decode('utf-8')}
+            if keystone_token:
+                auth_header = {'X-Auth-Token': keystone_token}
+            else:
+                if 'username' in auth and 'password' in auth:
+                    passwd = auth['password']
+                    user = auth['username']
+                    auth_header = {'Authorization': 'Basic ' +
+                                   (base64.encodestring((user + ':' + passwd).encode('utf-8'))).strip().decode('utf-8')}
 
-        return auth_header
+            return auth_header
 
     def concrete_system(self, radl_system, str_url, auth_data):
         url = urlparse(str_url)
@@ -240,18 +257,17 @@ class OCCICloudConnector(CloudConnector):
         Manage public IPs in the VM
         """
         self.log_info("The VM does not have public IP trying to add one.")
-        if self.add_public_ip_count < self.MAX_ADD_IP_COUNT:
+        if self.add_public_ip_count.get(vm.id, 0) < self.MAX_ADD_IP_COUNT:
             success, msgs = self.add_public_ip(vm, auth_data, auth_header)
             if success:
                 self.log_info("Public IP successfully added.")
             else:
-                self.add_public_ip_count += 1
+                self.add_public_ip_count[vm.id] = self.add_public_ip_count.get(vm.id, 0) + 1
                 self.log_warn("Error adding public IP the VM: %s (%d/%d)\n" % (msgs,
-                                                                               self.add_public_ip_count,
+                                                                               self.add_public_ip_count[vm.id],
                                                                                self.MAX_ADD_IP_COUNT))
-                self.error_messages += "Error adding public IP the VM: %s (%d/%d)\n" % (msgs,
-                                                                                        self.add_public_ip_count,
-                                                                                        self.MAX_ADD_IP_COUNT)
+                self.add_error_message(vm, "Error adding public IP the VM: %s (%d/%d)\n" %
+                                       (msgs, self.add_public_ip_count[vm.id], self.MAX_ADD_IP_COUNT))
         else:
             self.log_error("Error adding public IP the VM: Max number of retries reached.")
             # self.error_messages += "Error adding public IP the VM: Max number of retries reached.\n"
@@ -537,7 +553,7 @@ class OCCICloudConnector(CloudConnector):
         """
         return self.get_scheme(occi_info, os_tpl, 'os_tpl')
 
-    def create_volumes(self, system, auth_data, auth_header):
+    def create_volumes(self, system, auth_data, auth_header, vm):
         """
         Attach the required volumes (in the RADL) to the launched instance
 
@@ -572,13 +588,13 @@ class OCCICloudConnector(CloudConnector):
                     if not wait_ok:
                         self.log_error("Error waiting volume %s. Deleting it." % volume_id)
                         self.delete_volume(volume_id, auth_data, auth_header)
-                        self.error_messages += "Error waiting volume: %s. Deleting it." % volume_id
+                        self.add_error_message(vm, "Error waiting volume: %s. Deleting it." % volume_id)
                     else:
                         volumes.append((True, disk_device, volume_id))
                         system.setValue("disk." + str(cont) + ".provider_id", volume_id)
                 else:
                     self.log_error("Error creating volume: %s" % volume_id)
-                    self.error_messages += "Error creating volume: %s. Deleting it." % volume_id
+                    self.add_error_message(vm, "Error creating volume: %s. Deleting it." % volume_id)
 
             cont += 1
 
@@ -817,8 +833,13 @@ class OCCICloudConnector(CloudConnector):
         while i < num_vm:
             volumes = []
             try:
+                # Create the VM to get the nodename (and to show the volume errors)
+                vm = VirtualMachine(inf, None, self.cloud, radl, requested_radl, self)
+                vm.destroy = True
+                inf.add_vm(vm)
+
                 # First create the volumes
-                volumes = self.create_volumes(system, auth_data, auth_header)
+                volumes = self.create_volumes(system, auth_data, auth_header, vm)
 
                 body = 'Category: compute; scheme="http://schemas.ogf.org/occi/infrastructure#"; class="kind"\n'
                 body += 'Category: ' + os_tpl + '; scheme="' + os_tpl_scheme + '"; class="mixin"\n'
@@ -841,10 +862,6 @@ class OCCICloudConnector(CloudConnector):
                 body += 'X-OCCI-Attribute: occi.core.title="' + name + '"\n'
 
                 # Set the hostname defined in the RADL
-                # Create the VM to get the nodename
-                vm = VirtualMachine(inf, None, self.cloud, radl, requested_radl, self)
-                vm.destroy = True
-                inf.add_vm(vm)
                 (nodename, _) = vm.getRequestedName(default_hostname=Config.DEFAULT_VM_NAME,
                                                     default_domain=Config.DEFAULT_DOMAIN)
 
@@ -1259,9 +1276,77 @@ class OCCICloudConnector(CloudConnector):
 
 class KeyStoneAuth:
     """
-    Class to manage the Keystone auth tokens used in OpenStack
+    Class to manage the Keystone auth tokens used in OpenStack.
+    The scoped tokens are cached per Keystone server and credentials (shared
+    by all the OCCI connectors) until shortly before they expire.
     """
 
+    TOKEN_TTL = 3600
+    """Time (in secs) to cache the tokens if Keystone does not return their expiration date."""
+    TOKEN_EXPIRATION_MARGIN = 300
+    """Time (in secs) before their expiration date to stop using the cached tokens."""
+    KEYSTONE_URI_TTL = 3600
+    """Time (in secs) to cache the Keystone server URI of each OCCI endpoint."""
+    uri_cache = TTLCache("occi_keystone_uri", 1000)
+    """Cache of the Keystone server URI of each OCCI endpoint."""
+    token_cache = TTLCache("occi_keystone_token", 1000)
+    """Cache of the scoped tokens by Keystone server URI and credentials."""
+
+    @staticmethod
+    def get_endpoint(occi):
+        """
+        Get the URL of the OCCI endpoint of the connector
+        """
+        return "%s://%s:%d%s" % (occi.cloud.protocol, occi.cloud.server, occi.cloud.port, occi.cloud.path)
+
+    @staticmethod
+    def get_token_key(keystone_uri, auth):
+        """
+        Get the key of the token cache for the specified Keystone server and credentials
+        """
+        return TTLCache.hash_key(keystone_uri, Authentication.get_item_fingerprint(auth))
+
+    @staticmethod
+    def get_token_ttl(expires):
+        """
+        Get the time (in secs) to cache a token from its expiration date
+        (ISO 8601 in UTC as returned by Keystone)
+        """
+        try:
+            expiration = datetime.strptime(expires[:19], "%Y-%m-%dT%H:%M:%S")
+            ttl = (expiration - datetime.utcnow()).total_seconds()
+        except Exception:
+            ttl = KeyStoneAuth.TOKEN_TTL
+        return ttl - KeyStoneAuth.TOKEN_EXPIRATION_MARGIN
+
+    @staticmethod
+    def get_cached_token(occi, auth):
+        """
+        Get the cached token of the Keystone server of the OCCI endpoint
+        for the specified credentials or None if it is not cached.
+        """
+        found, keystone_uri = KeyStoneAuth.uri_cache.get(KeyStoneAuth.get_endpoint(occi))
+        if found:
+            found, token = KeyStoneAuth.token_cache.get(KeyStoneAuth.get_token_key(keystone_uri, auth))
+            if found:
+                occi.keystone_token = token
+                return token
+        return None
+
+    @staticmethod
+    def invalidate_token(occi, auth, token):
+        """
+        Remove a token rejected by the OCCI server from the cache
+        """
+        occi.keystone_token = None
+        found, keystone_uri = KeyStoneAuth.uri_cache.get(KeyStoneAuth.get_endpoint(occi))
+        if found:
+            key = KeyStoneAuth.get_token_key(keystone_uri, auth)
+            found, cached_token = KeyStoneAuth.token_cache.get(key)
+            # it may have been already renewed by other connector
+            if found and cached_token == token:
+                KeyStoneAuth.token_cache.invalidate(key)
+
     @staticmethod
     def get_keystone_uri(occi):
         """
@@ -1289,6 +1374,8 @@ class KeyStoneAuth:
                     keystone_uri = keystone_uri[:-5]
                 if keystone_uri.endswith("/v3"):
                     keystone_uri = keystone_uri[:-3]
+                KeyStoneAuth.uri_cache.put(KeyStoneAuth.get_endpoint(occi), keystone_uri,
+                                           KeyStoneAuth.KEYSTONE_URI_TTL)
                 return keystone_uri, None
             else:
                 return None, None
@@ -1304,16 +1391,20 @@ class KeyStoneAuth:
 
         if version == 2:
             occi.log_info("Getting Keystone v2 token")
-            occi.keystone_token = KeyStoneAuth.get_keystone_token_v2(occi, keystone_uri, auth)
-            return occi.keystone_token
+            token, expires = KeyStoneAuth.get_keystone_token_v2(occi, keystone_uri, auth)
         elif version == 3:
             occi.log_info("Getting Keystone v3 token")
-            occi.keystone_token = KeyStoneAuth.get_keystone_token_v3(occi, keystone_uri, auth)
-            return occi.keystone_token
+            token, expires = KeyStoneAuth.get_keystone_token_v3(occi, keystone_uri, auth)
         else:
             # this must never happen
             raise Exception("Error obtaining Keystone Token: Unknown version %d" % version)
 
+        occi.keystone_token = token
+        if token:
+            KeyStoneAuth.token_cache.put(KeyStoneAuth.get_token_key(keystone_uri, auth), token,
+                                         KeyStoneAuth.get_token_ttl(expires))
+        return token
+
     @staticmethod
     def get_keystone_version(occi, keystone_uri, auth):
         """
@@ -1394,6 +1485,7 @@ class KeyStoneAuth:
             tenants = output['tenants']
 
             tenant_token_id = None
+            expires = None
 
             # retry for each available tenant (usually only one)
             for tenant in tenants:
@@ -1417,11 +1509,12 @@ class KeyStoneAuth:
                     if 'access' in output:
                         occi.log_info("Using tenant: %s" % tenant["name"])
                         tenant_token_id = str(output['access']['token']['id'])
+                        expires = output['access']['token'].get('expires')
                         break
 
             if not tenant_token_id:
                 raise Exception("Error obtaining Keystone v2 Token: No tenant scoped token.")
-            return tenant_token_id
+            return tenant_token_id, expires
         except Exception as ex:
             occi.log_exception("Error obtaining Keystone v2 Token.")
             raise Exception("Error obtaining Keystone v2 Token: %s" % str(ex))
@@ -1471,6 +1564,7 @@ class KeyStoneAuth:
                         occi.log_warn("Keystone 3 project %s not found." % auth["project"])
 
             scoped_token = None
+            expires = None
             for project in projects:
                 # get scoped token for allowed project
                 headers = {'Accept': 'application/json', 'Content-Type': 'application/json',
@@ -1482,12 +1576,16 @@ class KeyStoneAuth:
                 if resp.status_code in [200, 201, 202]:
                     occi.log_info("Using project: %s" % project["name"])
                     scoped_token = resp.headers['X-Subject-Token']
+                    try:
+                        expires = resp.json()['token']['expires_at']
+                    except Exception:
+                        occi.log_warn("Keystone v3 token expiration date not obtained.")
                     break
 
             if not scoped_token:
                 occi.log_error("Not project accesible for the user.")
 
-            return scoped_token
+            return scoped_token, expires
         except Exception as ex:
             occi.log_exception("Error obtaining Keystone v3 Token.")
             raise Exception("Error obtaining Keystone v3 Token: %s" % str(ex))
@@ -18,9 +18,9 @@ import defusedxml.xmlrpc
 defusedxml.xmlrpc.monkey_patch()
 
 try:
-    from xmlrpclib import ServerProxy
+    from xmlrpclib import ServerProxy, MultiCall
 except ImportError:
-    from xmlrpc.client import ServerProxy
+    from xmlrpc.client import ServerProxy, MultiCall
 
 import os.path
 import time
@@ -88,6 +88,10 @@ class VM(XMLObject):
     numeric = ['ID', 'UID', 'STATE', 'LCM_STATE', 'STIME', 'ETIME']
 
 
+class VM_POOL(XMLObject):
+    tuples_lists = {'VM': VM}
+
+
 class LEASE(XMLObject):
     values = ['IP', 'MAC', 'USED']
 
@@ -165,6 +169,8 @@ class OpenNebulaCloudConnector(CloudConnector):
     """str with the name of the provider."""
     DEFAULT_USER = 'root'
     """ default user to SSH access the VM """
+    VM_POOL_RANGE = 100
+    """Max number of consecutive VM IDs requested in each vmpool call."""
 
     def __init__(self, cloud_info, inf):
         CloudConnector.__init__(self, cloud_info, inf)
@@ -295,57 +301,119 @@ class OpenNebulaCloudConnector(CloudConnector):
 
         success, res_info = server.one.vm.info(session_id, int(vm.id))[0:2]
         if success:
-            res_vm = VM(res_info)
+            return self._update_vm_info_from_one_vm(vm, VM(res_info))
+        else:
+            return (success, res_info)
 
-            vm.info.systems[0].setValue('instance_name', res_vm.NAME)
+    def _update_vm_info_from_one_vm(self, vm, res_vm):
+        """
+        Update the VM info with the data of the ONE VM
 
-            # update the state of the VM
-            if res_vm.STATE < 3:
+        Arguments:
+           - vm(:py:class:`IM.VirtualMachine`): VM information to update.
+           - res_vm(:py:class:`VM`): ONE VM info.
+        """
+        vm.info.systems[0].setValue('instance_name', res_vm.NAME)
+
+        # update the state of the VM
+        if res_vm.STATE < 3:
+            res_state = VirtualMachine.PENDING
+        elif res_vm.STATE == 3:
+            if res_vm.LCM_STATE < 3:
                 res_state = VirtualMachine.PENDING
-            elif res_vm.STATE == 3:
-                if res_vm.LCM_STATE < 3:
-                    res_state = VirtualMachine.PENDING
-                elif res_vm.LCM_STATE == 5 or res_vm.LCM_STATE == 6:
-                    res_state = VirtualMachine.STOPPED
-                elif res_vm.LCM_STATE == [14, 44, 61]:
-                    res_state = VirtualMachine.FAILED
-                elif res_vm.LCM_STATE == 16:
-                    res_state = VirtualMachine.UNKNOWN
-                elif res_vm.LCM_STATE == 12 or res_vm.LCM_STATE == 13 or res_vm.LCM_STATE == 18:
-                    res_state = VirtualMachine.OFF
-                elif res_vm.LCM_STATE >= 36 and res_vm.LCM_STATE <= 42:
-                    res_state = VirtualMachine.FAILED
-                elif res_vm.LCM_STATE >= 46 and res_vm.LCM_STATE <= 50:
-                    res_state = VirtualMachine.FAILED
-                else:
-                    res_state = VirtualMachine.RUNNING
-            elif res_vm.STATE == 4 or res_vm.STATE == 5:
+            elif res_vm.LCM_STATE == 5 or res_vm.LCM_STATE == 6:
                 res_state = VirtualMachine.STOPPED
-            elif res_vm.STATE == 7:
+            elif res_vm.LCM_STATE == [14, 44, 61]:
                 res_state = VirtualMachine.FAILED
-            elif res_vm.STATE == 6 or res_vm.STATE == 8 or res_vm.STATE == 9:
+            elif res_vm.LCM_STATE == 16:
+                res_state = VirtualMachine.UNKNOWN
+            elif res_vm.LCM_STATE == 12 or res_vm.LCM_STATE == 13 or res_vm.LCM_STATE == 18:
                 res_state = VirtualMachine.OFF
+            elif res_vm.LCM_STATE >= 36 and res_vm.LCM_STATE <= 42:
+                res_state = VirtualMachine.FAILED
+            elif res_vm.LCM_STATE >= 46 and res_vm.LCM_STATE <= 50:
+                res_state = VirtualMachine.FAILED
             else:
-                res_state = VirtualMachine.UNKNOWN
-            vm.state = res_state
+                res_state = VirtualMachine.RUNNING
+        elif res_vm.STATE == 4 or res_vm.STATE == 5:
+            res_state = VirtualMachine.STOPPED
+        elif res_vm.STATE == 7:
+            res_state = VirtualMachine.FAILED
+        elif res_vm.STATE == 6 or res_vm.STATE == 8 or res_vm.STATE == 9:
+            res_state = VirtualMachine.OFF
+        else:
+            res_state = VirtualMachine.UNKNOWN
+        vm.state = res_state
 
-            # Update network data
-            self.setIPsFromTemplate(vm, res_vm.TEMPLATE)
+        # Update network data
+        self.setIPsFromTemplate(vm, res_vm.TEMPLATE)
 
-            # Update disks data
-            self.setDisksFromTemplate(vm, res_vm.TEMPLATE)
+        # Update disks data
+        self.setDisksFromTemplate(vm, res_vm.TEMPLATE)
 
-            vm.info.systems[0].addFeature(Feature(
-                "cpu.count", "=", res_vm.TEMPLATE.CPU), conflict="other", missing="other")
-            vm.info.systems[0].addFeature(Feature(
-                "memory.size", "=", res_vm.TEMPLATE.MEMORY, 'M'), conflict="other", missing="other")
+        vm.info.systems[0].addFeature(Feature(
+            "cpu.count", "=", res_vm.TEMPLATE.CPU), conflict="other", missing="other")
+        vm.info.systems[0].addFeature(Feature(
+            "memory.size", "=", res_vm.TEMPLATE.MEMORY, 'M'), conflict="other", missing="other")
 
-            if res_vm.STIME > 0:
-                vm.info.systems[0].setValue('launch_time', res_vm.STIME)
+        if res_vm.STIME > 0:
+            vm.info.systems[0].setValue('launch_time', res_vm.STIME)
 
-            return (success, vm)
-        else:
-            return (success, res_info)
+        return (True, vm)
+
+    @staticmethod
+    def _get_id_ranges(vm_ids):
+        """
+        Split a list of VM IDs in ranges (start, end) of at most VM_POOL_RANGE consecutive IDs.
+        """
+        ranges = []
+        for vm_id in sorted(set(vm_ids)):
+            if ranges and vm_id - ranges[-1][0] < OpenNebulaCloudConnector.VM_POOL_RANGE:
+                ranges[-1][1] = vm_id
+            else:
+                ranges.append([vm_id, vm_id])
+        return [tuple(id_range) for id_range in ranges]
+
+    def updateVMInfoBatch(self, vms, auth_data):
+        """
+        Get the info of the VMs of the user with one.vmpool.infoextended (or one.vmpool.info
+        in old ONE versions) calls, one per each range of VM_POOL_RANGE consecutive IDs.
+        The VMs not found in the pool are updated with updateVMInfo.
+        """
+        try:
+            server = ServerProxy(self.server_url, allow_none=True)
+            session_id = self.getSessionID(auth_data)
+            if session_id is None:
+                msg = "Incorrect auth data, username and password must be specified for OpenNebula provider."
+                return [(False, msg)] * len(vms)
+
+            one_vms = {}
+            extended = True
+            for start, end in self._get_id_ranges([int(vm.id) for vm in vms]):
+                # Only get the VMs of the user (filter -3) to avoid getting unrelated VMs in the range
+                if extended:
+                    try:
+                        # The vmpool.info function of ONE >= 5.8 does not return the full template
+                        success, res_info = server.one.vmpool.infoextended(session_id, -3, start, end, -1)[0:2]
+                    except Exception:
+                        extended = False
+                if not extended:
+                    success, res_info = server.one.vmpool.info(session_id, -3, start, end, -1)[0:2]
+                if not success:
+                    raise Exception(res_info)
+                for one_vm in VM_POOL(res_info).VM:
+                    one_vms[str(one_vm.ID)] = one_vm
+        except Exception as ex:
+            self.log_warn("Error getting the VM pool info: %s. Updating them one by one." % ex)
+            return CloudConnector.updateVMInfoBatch(self, vms, auth_data)
+
+        res = []
+        for vm in vms:
+            if str(vm.id) in one_vms:
+                res.append(self.update_vm_locked(vm, self._update_vm_info_from_one_vm, one_vms[str(vm.id)]))
+            else:
+                res.append(self.update_vm_locked(vm, self.updateVMInfo, auth_data))
+        return res
 
     def _get_security_group(self, sg_name, auth_data):
         server = ServerProxy(self.server_url, allow_none=True)
@@ -520,6 +588,55 @@ class OpenNebulaCloudConnector(CloudConnector):
 
         return (success, err)
 
+    def finalizeBatch(self, vms, last, auth_data):
+        """
+        Delete all the VMs with a single system.multicall call (or one by one
+        if the ONE server does not support it) and then the SGs only once.
+        """
+        server = ServerProxy(self.server_url, allow_none=True)
+        session_id = self.getSessionID(auth_data)
+        if session_id is None:
+            msg = "Incorrect auth data, username and password must be specified for OpenNebula provider."
+            return [(False, msg)] * len(vms)
+
+        # first delete the snapshots to avoid problems in EC3 deleting the IM front-end
+        if last:
+            self.delete_snapshots(vms[-1], auth_data)
+
+        vms_with_id = [vm for vm in vms if vm.id]
+        results = {}
+        try:
+            multicall = MultiCall(server)
+            for vm in vms_with_id:
+                multicall.one.vm.action(session_id, 'delete', int(vm.id))
+            multicall_res = multicall()
+        except Exception as ex:
+            self.log_warn("Error deleting the VMs with system.multicall: %s. Deleting them one by one." % ex)
+            multicall_res = None
+
+        for i, vm in enumerate(vms_with_id):
+            try:
+                if multicall_res is not None:
+                    results[id(vm)] = tuple(multicall_res[i][0:2])
+                else:
+                    results[id(vm)] = tuple(server.one.vm.action(session_id, 'delete', int(vm.id))[0:2])
+            except Exception as ex:
+                results[id(vm)] = (False, str(ex))
+
+        res = []
+        for vm in vms:
+            if not vm.id:
+                self.log_warn("No VM ID. Ignoring")
+            res.append(results.get(id(vm), (True, "")))
+
+        if last and all([success for success, _ in res]):
+            one_ver = self.getONEVersion(auth_data)
+            # Security Groups appears in version 4.12.0
+            if one_ver >= LooseVersion("4.12.0"):
+                self.delete_security_groups(vms[-1].inf, auth_data)
+
+        return res
+
     def stop(self, vm, auth_data):
         return self.vm_action(vm, 'suspend', auth_data)
 
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
 import uuid
 import time
 from netaddr import IPNetwork, IPAddress
@@ -24,13 +25,17 @@ from libcloud.common.exceptions import BaseHTTPError
 try:
     from libcloud.compute.types import Provider
     from libcloud.compute.providers import get_driver
-    from libcloud.compute.base import NodeAuthSSHKey
+    from libcloud.compute.base import NodeAuthSSHKey, NodeDriver
     from libcloud.compute.drivers.openstack import OpenStack_2_NodeDriver, OpenStack_2_SubNet, OpenStackSecurityGroup
+    from libcloud.compute.drivers.openstack import OpenStack_1_1_FloatingIpPool, OpenStack_2_FloatingIpPool
 except Exception as ex:
     print("WARN: libcloud library not correctly installed. OpenStackCloudConnector will not work!.")
     print(ex)
 
 from IM.connectors.LibCloud import LibCloudCloudConnector
+from IM.auth import Authentication
+from IM.CloudExecutor import CloudExecutor
+from IM.cache import TTLCache
 from IM.config import Config
 try:
     from urlparse import urlparse
@@ -55,10 +60,15 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
     """ Max number of retries to get a public IP """
     CONFIG_DRIVE = False
     """ Enable config drive """
+    NETWORK_RESOURCES = ["ex_list_networks", "ex_list_subnets", "ex_list_routers"]
+    """ Driver methods that list the network resources """
+    catalog_cache = TTLCache("openstack", 1000)
+    """ Cache of flavors, images, networks, subnets, routers and floating IP pools by site and credentials """
 
     def __init__(self, cloud_info, inf):
         self.auth = None
-        self.add_public_ip_count = 0
+        # Number of failed attempts to add a public IP to each VM
+        self.add_public_ip_count = {}
         LibCloudCloudConnector.__init__(self, cloud_info, inf)
 
     def get_node_with_id(self, node_id, auth_data):
@@ -83,107 +93,164 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
         Returns: a :py:class:`libcloud.compute.base.NodeDriver` or None in case of error
         """
-        auths = auth_data.getAuthInfo(self.type, self.cloud.server)
-        if not auths:
-            raise Exception("No auth data has been specified to OpenStack.")
-        else:
-            auth = auths[0]
-
-        if self.driver and self.auth.compare(auth_data, self.type, self.cloud.server):
-            return self.driver
-        else:
-            self.auth = auth_data
-
-            protocol = self.cloud.protocol
-            if not protocol:
-                protocol = "http"
-            port = self.cloud.port
-            if port == -1:
-                if protocol == "http":
-                    port = 80
-                elif protocol == "https":
-                    port = 443
-                else:
-                    raise Exception("Invalid port/protocol specified for OpenStack site: %s" % self.cloud.server)
-
-            parameters = {"auth_version": '2.0_password',
-                          "auth_url": protocol + "://" + self.cloud.server + ":" + str(port),
-                          "auth_token": None,
-                          "service_type": None,
-                          "service_name": None,
-                          "service_region": None,
-                          "base_url": None,
-                          "network_url": None,
-                          "image_url": None,
-                          "volume_url": None,
-                          "api_version": "2.0",
-                          "domain": None}
-
-            if 'username' in auth and 'password' in auth and 'tenant' in auth:
-                username = auth['username']
-                password = auth['password']
-                tenant = auth['tenant']
-                for param in parameters:
-                    if param in auth:
-                        parameters[param] = auth[param]
-            elif 'proxy' in auth:
-                (fproxy, proxy_filename) = tempfile.mkstemp()
-                os.write(fproxy, auth['proxy'].encode())
-                os.close(fproxy)
-                username = ''
-                password = proxy_filename
-                tenant = None
-                if 'tenant' in auth:
-                    tenant = auth['tenant']
-                parameters["auth_version"] = '2.0_voms'
+        with self._lock:
+            auths = auth_data.getAuthInfo(self.type, self.cloud.server)
+            if not auths:
+                raise Exception("No auth data has been specified to OpenStack.")
+            else:
+                auth = auths[0]
 
-                for param in parameters:
-                    if param in auth:
-                        parameters[param] = auth[param]
+            if self.driver and self.auth.compare(auth_data, self.type, self.cloud.server):
+                return self.driver
             else:
-                self.log_error(
-                    "No correct auth data has been specified to OpenStack: username, password and tenant or proxy")
-                raise Exception(
-                    "No correct auth data has been specified to OpenStack: username, password and tenant or proxy")
-
-            if not self.verify_ssl:
-                # To avoid errors with host certificates
-                # if you want to do it in a more secure way check this:
-                # http://libcloud.readthedocs.org/en/latest/other/ssl-certificate-validation.html
-                import libcloud.security
-                libcloud.security.VERIFY_SSL_CERT = False
-
-            kwargs = {}
-            for key, value in parameters.items():
-                if value:
-                    if key in ['base_url', 'auth_token', 'service_type', 'image_url', 'volume_url',
-                               'network_url', 'service_region', 'auth_version', 'auth_url']:
-                        key = 'ex_force_%s' % key
-                    elif key == 'domain':
-                        key = 'ex_domain_name'
-                    kwargs[key] = value
-
-            # Workaround to OTC to enable to set service_name as None
-            if parameters["service_name"] is not None and parameters["service_name"] != "None":
-                kwargs['ex_force_service_name'] = parameters["service_name"]
-
-            cls = get_driver(Provider.OPENSTACK)
-            driver = cls(username, password, ex_tenant_name=tenant, **kwargs)
-
-            # Workaround to OTC to enable to set service_name as None
-            if parameters["service_name"] == "None":
-                driver.connection.service_name = None
-            # Workaround to unset default service_region (RegionOne)
-            if parameters["service_region"] is None:
-                driver.connection.service_region = None
-                if isinstance(driver, OpenStack_2_NodeDriver):
+                self.auth = auth_data
+
+                protocol = self.cloud.protocol
+                if not protocol:
+                    protocol = "http"
+                port = self.cloud.port
+                if port == -1:
+                    if protocol == "http":
+                        port = 80
+                    elif protocol == "https":
+                        port = 443
+                    else:
+                        raise Exception("Invalid port/protocol specified for OpenStack site: %s" % self.cloud.server)
+
+                parameters = {"auth_version": '2.0_password',
+                              "auth_url": protocol + "://" + self.cloud.server + ":" + str(port),
+                              "auth_token": None,
+                              "service_type": None,
+                              "service_name": None,
+                              "service_region": None,
+                              "base_url": None,
+                              "network_url": None,
+                              "image_url": None,
+                              "volume_url": None,
+                              "api_version": "2.0",
+                              "domain": None}
+
+                if 'username' in auth and 'password' in auth and 'tenant' in auth:
+                    username = auth['username']
+                    password = auth['password']
+                    tenant = auth['tenant']
+                    for param in parameters:
+                        if param in auth:
+                            parameters[param] = auth[param]
+                elif 'proxy' in auth:
+                    (fproxy, proxy_filename) = tempfile.mkstemp()
+                    os.write(fproxy, auth['proxy'].encode())
+                    os.close(fproxy)
+                    username = ''
+                    password = proxy_filename
+                    tenant = None
+                    if 'tenant' in auth:
+                        tenant = auth['tenant']
+                    parameters["auth_version"] = '2.0_voms'
+
+                    for param in parameters:
+                        if param in auth:
+                            parameters[param] = auth[param]
+                else:
+                    self.log_error(
+                        "No correct auth data has been specified to OpenStack: username, password and tenant or proxy")
+                    raise Exception(
+                        "No correct auth data has been specified to OpenStack: username, password and tenant or proxy")
+
+                if not self.verify_ssl:
+                    # To avoid errors with host certificates
+                    # if you want to do it in a more secure way check this:
+                    # http://libcloud.readthedocs.org/en/latest/other/ssl-certificate-validation.html
+                    import libcloud.security
+                    libcloud.security.VERIFY_SSL_CERT = False
+
+                kwargs = {}
+                for key, value in parameters.items():
+                    if value:
+                        if key in ['base_url', 'auth_token', 'service_type', 'image_url', 'volume_url',
+                                   'network_url', 'service_region', 'auth_version', 'auth_url']:
+                            key = 'ex_force_%s' % key
+                        elif key == 'domain':
+                            key = 'ex_domain_name'
+                        kwargs[key] = value
+
+                # Workaround to OTC to enable to set service_name as None
+                if parameters["service_name"] is not None and parameters["service_name"] != "None":
+                    kwargs['ex_force_service_name'] = parameters["service_name"]
+
+                cls = get_driver(Provider.OPENSTACK)
+                driver = cls(username, password, ex_tenant_name=tenant, **kwargs)
+
+                # Workaround to OTC to enable to set service_name as None
+                if parameters["service_name"] == "None":
+                    driver.connection.service_name = None
+                # Workaround to unset default service_region (RegionOne)
+                if parameters["service_region"] is None:
                     driver.connection.service_region = None
-                    driver.image_connection.service_region = None
-                    driver.network_connection.service_region = None
-                    driver.volumev2_connection.service_region = None
+                    if isinstance(driver, OpenStack_2_NodeDriver):
+                        driver.connection.service_region = None
+                        driver.image_connection.service_region = None
+                        driver.network_connection.service_region = None
+                        driver.volumev2_connection.service_region = None
 
-            self.driver = driver
-            return driver
+                self.driver = driver
+                return driver
+
+    def _get_catalog_key(self, driver, method, *args):
+        """
+        Get the key of the catalog cache for the result of the driver method,
+        or None if the driver is not the one of the current credentials.
+        """
+        if Config.OPENSTACK_CACHE_TIME <= 0 or driver is not self.driver or not self.auth:
+            return None
+        auth = self.auth.getAuthInfo(self.type, self.cloud.server)[0]
+        return TTLCache.hash_key(self.cloud.get_key(), Authentication.get_item_fingerprint(auth), method, *args)
+
+    def get_cached(self, driver, method, *args):
+        """
+        Call a driver method to get a rarely changing resource (list_sizes, get_image,
+        ex_list_networks, ...) caching the result during OPENSTACK_CACHE_TIME secs.
+        """
+        key = self._get_catalog_key(driver, method, *args)
+        if key:
+            found, res = self.catalog_cache.get(key)
+            if found:
+                # The cached objects may have been obtained by the driver of other connector
+                if isinstance(res, list):
+                    return [self._bind_object(obj, driver) for obj in res]
+                return self._bind_object(res, driver)
+        res = getattr(driver, method)(*args)
+        if key:
+            self.catalog_cache.put(key, res, Config.OPENSTACK_CACHE_TIME)
+            if isinstance(res, list):
+                res = list(res)
+        return res
+
+    @staticmethod
+    def _bind_object(obj, driver):
+        """
+        Get a copy of a libcloud object (floating IP pool, size, image, network, ...)
+        bound to the specified driver.
+        """
+        if isinstance(obj, OpenStack_2_FloatingIpPool):
+            obj = copy.copy(obj)
+            obj.connection = driver.network_connection
+        elif isinstance(obj, OpenStack_1_1_FloatingIpPool):
+            obj = copy.copy(obj)
+            obj.connection = driver.connection
+        elif isinstance(getattr(obj, "driver", None), NodeDriver):
+            obj = copy.copy(obj)
+            obj.driver = driver
+        return obj
+
+    def invalidate_networks_cache(self, driver):
+        """
+        Remove the network resources from the catalog cache (after creating or deleting networks)
+        """
+        for method in self.NETWORK_RESOURCES:
+            key = self._get_catalog_key(driver, method)
+            if key:
+                self.catalog_cache.invalidate(key)
 
     def get_instance_type(self, sizes, radl):
         """
@@ -231,7 +298,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
             driver = self.get_driver(auth_data)
 
             res_system = radl_system.clone()
-            instance_type = self.get_instance_type(driver.list_sizes(), res_system)
+            instance_type = self.get_instance_type(self.get_cached(driver, "list_sizes"), res_system)
             self.update_system_info_from_instance(res_system, instance_type)
 
             username = res_system.getValue('disk.0.os.credentials.username')
@@ -356,13 +423,27 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
     def updateVMInfo(self, vm, auth_data):
         node = self.get_node_with_id(vm.id, auth_data)
+        return self._update_vm_info_from_node(vm, node)
+
+    def _update_vm_info_from_node(self, vm, node, sizes=None):
+        """
+        Update the VM info with the data of the node
+
+        Arguments:
+           - vm(:py:class:`IM.VirtualMachine`): VM information to update.
+           - node(:py:class:`libcloud.compute.base.Node`): node info.
+           - sizes(dict): cache of the flavors info, indexed by ID.
+        """
         if node:
             vm.state = self.VM_STATE_MAP.get(node.state, VirtualMachine.UNKNOWN)
 
             try:
                 flavorId = node.extra['flavorId']
-                instance_type = node.driver.ex_get_size(flavorId)
-                self.update_system_info_from_instance(vm.info.systems[0], instance_type)
+                if sizes is None:
+                    sizes = {}
+                if flavorId not in sizes:
+                    sizes[flavorId] = node.driver.ex_get_size(flavorId)
+                self.update_system_info_from_instance(vm.info.systems[0], sizes[flavorId])
             except Exception as ex:
                 self.log_warn("Error updating VM info from flavor ID: %s" % get_ex_error(ex))
 
@@ -375,6 +456,27 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
         return (True, vm)
 
+    def updateVMInfoBatch(self, vms, auth_data):
+        """
+        Get the info of all the nodes with a single list_nodes call.
+        The VMs not found in the list are updated with updateVMInfo.
+        """
+        try:
+            driver = self.get_driver(auth_data)
+            nodes = dict((node.id, node) for node in driver.list_nodes())
+        except Exception as ex:
+            self.log_warn("Error listing the nodes: %s. Updating them one by one." % get_ex_error(ex))
+            return LibCloudCloudConnector.updateVMInfoBatch(self, vms, auth_data)
+
+        res = []
+        sizes = {}
+        for vm in vms:
+            if vm.id in nodes:
+                res.append(self.update_vm_locked(vm, self._update_vm_info_from_node, nodes[vm.id], sizes))
+            else:
+                res.append(self.update_vm_locked(vm, self.updateVMInfo, auth_data))
+        return res
+
     @staticmethod
     def map_radl_ost_networks(vm, ost_nets):
         """
@@ -446,7 +548,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
         """
         ips = []
         try:
-            for pool in node.driver.ex_list_floating_ip_pools():
+            for pool in self.get_cached(node.driver, "ex_list_floating_ip_pools"):
                 for ip in pool.list_floating_ips():
                     if ip.node_id == node.id:
                         ips.append(ip.ip_address)
@@ -542,11 +644,11 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
             vm.setIps(public_ips, private_ips, True)
 
         if vm.state == VirtualMachine.RUNNING:
-            if self.add_public_ip_count < self.MAX_ADD_IP_COUNT:
+            if self.add_public_ip_count.get(vm.id, 0) < self.MAX_ADD_IP_COUNT:
                 self.manage_elastic_ips(vm, node, public_ips)
             else:
                 self.log_error("Error adding a floating IP: Max number of retries reached.")
-                self.error_messages += "Error adding a floating IP: Max number of retries reached.\n"
+                self.add_error_message(vm, "Error adding a floating IP: Max number of retries reached.\n")
         else:
             self.log_info("The VM is not running, not adding Elastic/Floating IPs.")
 
@@ -559,24 +661,22 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
             if instance_type.vcpus:
                 system.addFeature(Feature("cpu.count", "=", instance_type.vcpus), conflict="me", missing="other")
 
-    @staticmethod
-    def get_ost_net(driver, name=None, netid=None):
+    def get_ost_net(self, driver, name=None, netid=None):
         """
         Get a OST network
         """
-        for ost_net in driver.ex_list_networks():
+        for ost_net in self.get_cached(driver, "ex_list_networks"):
             if name and ost_net.name == name:
                 return ost_net
             if netid and ost_net.id == netid:
                 return ost_net
         return None
 
-    @staticmethod
-    def get_ost_network_info(driver, pool_names):
-        ost_nets = driver.ex_list_networks()
+    def get_ost_network_info(self, driver, pool_names):
+        ost_nets = self.get_cached(driver, "ex_list_networks")
         get_subnets = False
         if "ex_list_subnets" in dir(driver):
-            ost_subnets = driver.ex_list_subnets()
+            ost_subnets = self.get_cached(driver, "ex_list_subnets")
             get_subnets = True
 
             for ost_net in ost_nets:
@@ -650,14 +750,14 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
             # Get the OST public net ids and names
             pub_nets = {}
-            for net in driver.ex_list_networks():
+            for net in self.get_cached(driver, "ex_list_networks"):
                 if 'router:external' in net.extra and net.extra['router:external']:
                     pub_nets[net.id] = net.name
 
             # Get the routers associated with public nets
             routers = {}
             try:
-                for router in driver.ex_list_routers():
+                for router in self.get_cached(driver, "ex_list_routers"):
                     if router.extra['external_gateway_info']:
                         if router.extra['external_gateway_info']['network_id'] in pub_nets:
                             routers[pub_nets[router.extra['external_gateway_info']['network_id']]] = router
@@ -718,6 +818,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
                     self.log_info("Deleting net %s." % ost_net.name)
                     driver.ex_delete_network(ost_net)
+                    self.invalidate_networks_cache(driver)
 
         return res, msg
 
@@ -727,6 +828,8 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
         """
         try:
             i = 0
+            # Get the current networks to avoid creating duplicated ones
+            self.invalidate_networks_cache(driver)
             router = self.get_router_public(driver, radl)
 
             while radl.systems[0].getValue("net_interface." + str(i) + ".connection"):
@@ -765,6 +868,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
                     try:
                         self.log_info("Creating ost network: %s" % ost_net_name)
                         ost_net = driver.ex_create_network(ost_net_name)
+                        self.invalidate_networks_cache(driver)
                     except Exception as ex:
                         self.log_exception("Error creating ost network for net %s." % net_name)
                         raise Exception("Error creating ost network for net %s: %s" % (net_name,
@@ -816,7 +920,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
         Get the list of networks to connect the VM
         """
         nets = []
-        pool_names = [pool.name for pool in driver.ex_list_floating_ip_pools()]
+        pool_names = [pool.name for pool in self.get_cached(driver, "ex_list_floating_ip_pools")]
         get_subnets, ost_nets = self.get_ost_network_info(driver, pool_names)
 
         if get_subnets:
@@ -951,9 +1055,9 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
                 raise Exception("Error in appdb image: %s" % msg)
         else:
             image_id = self.get_image_id(system.getValue("disk.0.image.url"))
-        image = driver.get_image(image_id)
+        image = self.get_cached(driver, "get_image", image_id)
 
-        instance_type = self.get_instance_type(driver.list_sizes(), system)
+        instance_type = self.get_instance_type(self.get_cached(driver, "list_sizes"), system)
         if not instance_type:
             raise Exception("No flavor found for the specified VM requirements.")
 
@@ -1047,12 +1151,11 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
         return res
 
-    @staticmethod
-    def get_ip_pool(driver, pool_name=None):
+    def get_ip_pool(self, driver, pool_name=None):
         """
         Return the most suitable IP pool
         """
-        pools = driver.ex_list_floating_ip_pools()
+        pools = self.get_cached(driver, "ex_list_floating_ip_pools")
 
         if pool_name:
             for pool in pools:
@@ -1101,13 +1204,12 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
                     success, msg = self.add_elastic_ip_from_pool(vm, node, None, pool_name)
 
             if not success:
-                self.add_public_ip_count += 1
+                self.add_public_ip_count[vm.id] = self.add_public_ip_count.get(vm.id, 0) + 1
                 self.log_warn("Error adding a floating IP the VM: %s (%d/%d)\n" % (msg,
-                                                                                   self.add_public_ip_count,
+                                                                                   self.add_public_ip_count[vm.id],
                                                                                    self.MAX_ADD_IP_COUNT))
-                self.error_messages += "Error adding a floating IP: %s (%d/%d)\n" % (msg,
-                                                                                     self.add_public_ip_count,
-                                                                                     self.MAX_ADD_IP_COUNT)
+                self.add_error_message(vm, "Error adding a floating IP: %s (%d/%d)\n" %
+                                       (msg, self.add_public_ip_count[vm.id], self.MAX_ADD_IP_COUNT))
 
     def get_floating_ip(self, pool):
         """
@@ -1147,7 +1249,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
                 return False, msg
 
             found = False
-            if node.driver.ex_list_floating_ip_pools():
+            if self.get_cached(node.driver, "ex_list_floating_ip_pools"):
                 if fixed_ip:
                     floating_ip = node.driver.ex_get_floating_ip(fixed_ip)
                     if floating_ip:
@@ -1291,7 +1393,11 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
 
         return res
 
-    def finalize(self, vm, last, auth_data):
+    def _destroy_node(self, vm, auth_data):
+        """
+        Destroy the node of a VM and its elastic IPs and volumes.
+        Returns: a tuple (list of success flags, list of messages).
+        """
         if vm.id:
             node = self.get_node_with_id(vm.id, auth_data)
         else:
@@ -1332,31 +1438,90 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
         else:
             self.log_warn("VM " + str(vm.id) + " not found.")
 
+        return success, msgs
+
+    def _delete_inf_resources(self, driver, inf):
+        """
+        Delete the SGs and networks created for an infrastructure.
+        Returns: a tuple (list of success flags, list of messages).
+        """
+        success = []
+        msgs = []
+        # Delete the SG if this is the last VM
+        try:
+            res, msg = self.delete_security_groups(driver, inf)
+        except Exception as ex:
+            res = False
+            msg = get_ex_error(ex)
+        success.append(res)
+        msgs.append(msg)
+
+        # Delete the created networks
+        try:
+            res, msg = self.delete_networks(driver, inf)
+        except Exception as ex:
+            res = False
+            msg = get_ex_error(ex)
+        success.append(res)
+        msgs.append(msg)
+        return success, msgs
+
+    def finalize(self, vm, last, auth_data):
+        success, msgs = self._destroy_node(vm, auth_data)
+
         driver = self.get_driver(auth_data)
 
         if last:
-            # Delete the SG if this is the last VM
+            res, msg = self._delete_inf_resources(driver, vm.inf)
+            success.extend(res)
+            msgs.extend(msg)
+        else:
+            # If this is not the last vm, we skip this step
+            self.log_info("There are active instances. Not removing the SGs or nets.")
+
+        return (all(success), "\n ".join(msgs))
+
+    def wait_nodes_deleted(self, driver, node_ids, timeout=120, delay=5):
+        """
+        Wait the nodes to be deleted
+        """
+        wait = 0
+        while node_ids and wait < timeout:
             try:
-                res, msg = self.delete_security_groups(driver, vm.inf)
+                node_ids = [node_id for node_id in node_ids if driver.ex_get_node_details(node_id)]
             except Exception as ex:
-                res = False
-                msg = get_ex_error(ex)
-            success.append(res)
-            msgs.append(msg)
+                self.log_warn("Error getting the nodes details: %s" % get_ex_error(ex))
+            if node_ids:
+                time.sleep(delay)
+                wait += delay
+        return not node_ids
 
-            # Delete the created networks
+    def finalizeBatch(self, vms, last, auth_data):
+        """
+        Destroy all the nodes in parallel and delete the SGs and networks once all of them are deleted.
+        """
+        def destroy_node(vm):
             try:
-                res, msg = self.delete_networks(driver, vm.inf)
+                return self._destroy_node(vm, auth_data)
             except Exception as ex:
-                res = False
-                msg = get_ex_error(ex)
-            success.append(res)
-            msgs.append(msg)
+                self.log_exception("Error destroying VM %s." % vm.id)
+                return [False], [get_ex_error(ex)]
+
+        # Respect the limits of simultaneous operations of the site
+        results = CloudExecutor.map(vms[0].inf.id, self.cloud, destroy_node, vms)
+
+        if last:
+            driver = self.get_driver(auth_data)
+            if not self.wait_nodes_deleted(driver, [vm.id for vm in vms if vm.id]):
+                self.log_warn("Timeout waiting the nodes to be deleted.")
+            success, msgs = results[-1]
+            res, msg = self._delete_inf_resources(driver, vms[-1].inf)
+            results[-1] = (success + res, msgs + msg)
         else:
-            # If this is not the last vm, we skip this step
+            # If these are not the last vms, we skip this step
             self.log_info("There are active instances. Not removing the SGs or nets.")
 
-        return (all(success), "\n ".join(msgs))
+        return [(all(success), "\n ".join(msgs)) for success, msgs in results]
 
     def delete_security_groups(self, driver, inf, timeout=180, delay=10):
         """
@@ -1448,6 +1613,9 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
             return (False, "Error getting image %s: %s" % (image_id, get_ex_error(ex)))
         try:
             driver.delete_image(image)
+            key = self._get_catalog_key(driver, "get_image", image_id)
+            if key:
+                self.catalog_cache.invalidate(key)
             return True, ""
         except Exception as ex:
             self.log_exception("Error deleting image.")
@@ -1489,7 +1657,7 @@ class OpenStackCloudConnector(LibCloudCloudConnector):
                 self.log_debug("No memory nor cpu nor instance_type specified. VM not resized.")
                 return (True, "")
             else:
-                instance_type = self.get_instance_type(node.driver.list_sizes(), radl.systems[0])
+                instance_type = self.get_instance_type(self.get_cached(node.driver, "list_sizes"), radl.systems[0])
                 if instance_type is None:
                     return (False, "Error resizing VM: No instance type found.")
                 if node.extra['flavorId'] != instance_type.id:
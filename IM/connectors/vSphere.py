@@ -120,24 +120,25 @@ class vSphereCloudConnector(CloudConnector):
 
         Returns: a :py:class:`vim.connect.SmartConnect` or None in case of error
         """
-        if self.connection:
-            return self.connection
-        else:
-            auth = auth_data.getAuthInfo(self.type)
+        with self._lock:
+            if self.connection:
+                return self.connection
+            else:
+                auth = auth_data.getAuthInfo(self.type)
 
-            if auth and 'username' in auth[0] and 'password' in auth[0]:
+                if auth and 'username' in auth[0] and 'password' in auth[0]:
 
-                connection = SmartConnect(host=self.cloud.server,
-                                          user=auth[0]['username'],
-                                          pwd=auth[0]['password'],
-                                          port=self.cloud.port)
+                    connection = SmartConnect(host=self.cloud.server,
+                                              user=auth[0]['username'],
+                                              pwd=auth[0]['password'],
+                                              port=self.cloud.port)
 
-                self.connection = connection
-                return connection
-            else:
-                self.log_error("No correct auth data has been specified to vSpere: username, password")
-                self.log_debug(auth)
-                raise Exception("No correct auth data has been specified to vSpere: username, password")
+                    self.connection = connection
+                    return connection
+                else:
+                    self.log_error("No correct auth data has been specified to vSpere: username, password")
+                    self.log_debug(auth)
+                    raise Exception("No correct auth data has been specified to vSpere: username, password")
 
     def concrete_system(self, radl_system, str_url, auth_data):
         url = urlparse(str_url)
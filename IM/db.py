@@ -17,6 +17,9 @@
 """Class to manage DB operations"""
 import time
 
+from IM.metrics import Metrics
+from IM.tracing import Tracer
+
 try:
     from urlparse import urlparse
 except ImportError:
@@ -203,7 +206,9 @@ class DataBase:
         """
         if self.db_type == DataBase.MONGO:
             raise Exception("Operation not supported in MongoDB")
-        return self._execute_retry(sql, args)
+        with Metrics.timer("im_db_query_duration_seconds", {"db_type": self.db_type, "operation": "execute"}), \
+             Tracer.span("db.execute", {"db.system": self.db_type}):
+            return self._execute_retry(sql, args)
 
     def select(self, sql, args=None):
         """ Executes a SQL sentence that returns results
@@ -217,7 +222,9 @@ class DataBase:
         """
         if self.db_type == DataBase.MONGO:
             raise Exception("Operation not supported in MongoDB")
-        return self._execute_retry(sql, args, fetch=True)
+        with Metrics.timer("im_db_query_duration_seconds", {"db_type": self.db_type, "operation": "select"}), \
+             Tracer.span("db.select", {"db.system": self.db_type}):
+            return self._execute_retry(sql, args, fetch=True)
 
     def close(self):
         """ Closes the DB connection """
@@ -258,6 +265,30 @@ class DataBase:
         else:
             return True
 
+    def column_exists(self, table_name, column_name):
+        """ Checks if a column exists in a table of the DB
+
+            Arguments:
+            - table_name: The name of the table
+            - column_name: The name of the column
+
+            Returns: True if the column exists or False otherwise
+        """
+        if self.db_type == DataBase.SQLITE:
+            res = [elem for elem in self.select('PRAGMA table_info(%s)' % table_name) if elem[1] == column_name]
+        elif self.db_type == DataBase.MYSQL:
+            uri = urlparse(self.db_url)
+            db = uri[2][1:]
+            res = self.select('SELECT * FROM information_schema.columns WHERE table_name = %s and '
+                              'table_schema = %s and column_name = %s', (table_name, db, column_name))
+        elif self.db_type == DataBase.MONGO:
+            # The MongoDB collections do not have a fixed schema
+            return True
+        else:
+            return False
+
+        return len(res) > 0
+
     def find(self, table_name, filt=None, projection=None, sort=None):
         """ find elements """
         if self.db_type != DataBase.MONGO:
@@ -268,7 +299,9 @@ class DataBase:
         else:
             if projection:
                 projection.update({'_id': False})
-            return list(self.connection[table_name].find(filt, projection, sort=sort))
+            with Metrics.timer("im_db_query_duration_seconds", {"db_type": self.db_type, "operation": "find"}), \
+                 Tracer.span("db.find", {"db.system": self.db_type}):
+                return list(self.connection[table_name].find(filt, projection, sort=sort))
 
     def replace(self, table_name, filt, replacement):
         """ insert/replace elements """
@@ -278,7 +311,9 @@ class DataBase:
         if self.connection is None:
             raise Exception("DataBase object not connected")
         else:
-            res = self.connection[table_name].replace_one(filt, replacement, True)
+            with Metrics.timer("im_db_query_duration_seconds", {"db_type": self.db_type, "operation": "replace"}), \
+                 Tracer.span("db.replace", {"db.system": self.db_type}):
+                res = self.connection[table_name].replace_one(filt, replacement, True)
             return res.modified_count == 1 or res.upserted_id is not None
 
     def delete(self, table_name, filt):
@@ -289,7 +324,9 @@ class DataBase:
         if self.connection is None:
             raise Exception("DataBase object not connected")
         else:
-            return self.connection[table_name].delete_many(filt).deleted_count
+            with Metrics.timer("im_db_query_duration_seconds", {"db_type": self.db_type, "operation": "delete"}), \
+                 Tracer.span("db.delete", {"db.system": self.db_type}):
+                return self.connection[table_name].delete_many(filt).deleted_count
 
 
 try:
@@ -0,0 +1,101 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Pooled HTTP sessions shared by the REST based clients"""
+
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from cookielib import DefaultCookiePolicy
+try:
+    from urlparse import urlparse
+except ImportError:
+    from urllib.parse import urlparse
+
+from IM.config import Config
+from IM.UnixHTTPAdapter import UnixHTTPAdapter
+
+
+class HTTPPool:
+    """
+    Pool of requests sessions, one per endpoint (scheme, host and port), shared
+    by all the threads so that the HTTP connections (and their TCP and TLS
+    handshakes) are reused between calls. The sessions do not store cookies
+    and are not used with client certificates to avoid sharing them between
+    different users of the same endpoint.
+    """
+
+    sessions = {}
+    """Map from (scheme, netloc) to the requests.Session of the endpoint."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    @staticmethod
+    def _create_session(scheme):
+        session = requests.Session()
+        # Do not share cookies between calls
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if scheme == "http+unix":
+            session.mount("http+unix://", UnixHTTPAdapter())
+        else:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.HTTP_POOL_SIZE,
+                                  max_retries=Config.HTTP_RETRIES)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def get_session(url):
+        """
+        Get the session of the endpoint of the specified URL.
+        """
+        uri = urlparse(url)
+        key = (uri.scheme.lower(), uri.netloc.lower())
+        with HTTPPool._lock:
+            if key not in HTTPPool.sessions:
+                HTTPPool.logger.debug("Creating HTTP session for %s://%s" % key)
+                HTTPPool.sessions[key] = HTTPPool._create_session(key[0])
+            return HTTPPool.sessions[key]
+
+    @staticmethod
+    def request(method, url, **kwargs):
+        """
+        Perform an HTTP request (same arguments than requests.request) using
+        the pooled session of the endpoint. If HTTP_KEEP_ALIVE is disabled
+        a new connection is used in every call.
+        The requests with a client certificate are never pooled, as the TLS
+        connections of the endpoint are shared by all the users.
+        """
+        if kwargs.get("cert") or (not Config.HTTP_KEEP_ALIVE and not url.startswith("http+unix://")):
+            return requests.request(method, url, **kwargs)
+        return HTTPPool.get_session(url).request(method, url, **kwargs)
+
+    @staticmethod
+    def _reinit():
+        """Close the sessions and restart the class attributes to initial values."""
+        with HTTPPool._lock:
+            for session in HTTPPool.sessions.values():
+                session.close()
+            HTTPPool.sessions = {}
@@ -0,0 +1,84 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+JSON codec used to serialize the IM objects. It uses the fastest
+JSON library available (orjson, ujson or the standard json module).
+"""
+
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
+
+try:
+    import ujson
+    UJSON_AVAILABLE = True
+except Exception:
+    UJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    JSON_LIBRARY = "orjson"
+elif UJSON_AVAILABLE:
+    JSON_LIBRARY = "ujson"
+else:
+    JSON_LIBRARY = "json"
+"""Name of the JSON library used."""
+
+
+def dumps(obj, sort_keys=False, library=None):
+    """
+    Serialize an object to a JSON str.
+
+    Args:
+
+    - obj(object): object to serialize.
+    - sort_keys(bool): sort the keys of the dicts.
+    - library(str): JSON library to use (optional, by default the fastest one available).
+    """
+    library = library or JSON_LIBRARY
+    try:
+        if library == "orjson":
+            option = orjson.OPT_SORT_KEYS if sort_keys else 0
+            return orjson.dumps(obj, option=option).decode("utf-8")
+        elif library == "ujson":
+            return ujson.dumps(obj, sort_keys=sort_keys, ensure_ascii=False, escape_forward_slashes=False)
+    except (TypeError, OverflowError):
+        # Some types are not supported by the fast libraries (e.g. big integers)
+        pass
+    return json.dumps(obj, sort_keys=sort_keys)
+
+
+def loads(data, library=None):
+    """
+    Deserialize a JSON str (or bytes) to a Python object.
+
+    Args:
+
+    - data(str): JSON document.
+    - library(str): JSON library to use (optional, by default the fastest one available).
+    """
+    library = library or JSON_LIBRARY
+    if library == "orjson":
+        return orjson.loads(data)
+    elif library == "ujson":
+        return ujson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return json.loads(data)
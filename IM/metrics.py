@@ -0,0 +1,285 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Module to collect the IM service metrics and export them in Prometheus text format"""
+
+import hmac
+import time
+import threading
+import logging
+from functools import wraps
+from contextlib import contextmanager
+
+from IM.config import Config
+
+
+class Metrics:
+    """
+    Class to store the counters, histograms and gauges of the IM service
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    """Content type of the Prometheus text exposition format."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+    """Upper bounds (in seconds) of the latency histograms buckets."""
+
+    HELP = {
+        "im_operation_duration_seconds": "Time spent in the InfrastructureManager operations.",
+        "im_operation_errors_total": "Number of InfrastructureManager operations that raised an error.",
+        "im_db_query_duration_seconds": "Time spent in the DB operations.",
+        "im_connector_call_duration_seconds": "Time spent in the cloud connector calls.",
+        "im_connector_call_errors_total": "Number of cloud connector calls that raised an error.",
+        "im_request_queue_size": "Number of requests waiting in the IM request queue.",
+        "im_confmanager_threads": "Number of live ConfManager threads.",
+        "im_cache_hits_total": "Number of hits in the IM internal caches.",
+        "im_cache_misses_total": "Number of misses in the IM internal caches.",
+        "im_deploy_group_launch_seconds": "Time spent launching the deploy groups.",
+        "im_circuit_breaker_state": "State of the circuit breakers of the cloud providers "
+                                    "(0 closed, 1 half open, 2 open).",
+        "im_circuit_breaker_transitions_total": "Number of state changes of the circuit breakers.",
+        "im_circuit_breaker_rejected_total": "Number of calls rejected by the circuit breakers.",
+        "im_cloud_operations_queued": "Number of operations waiting to be sent to the cloud providers.",
+        "im_cloud_operations_running": "Number of operations running in the cloud providers.",
+    }
+    """Help text of the metrics."""
+
+    TRANSPORT_NONE = "internal"
+    TRANSPORT_REST = "REST"
+    TRANSPORT_XMLRPC = "XML-RPC"
+
+    counters = {}
+    """Map from metric name to a dict of label tuples to values."""
+    histograms = {}
+    """Map from metric name to a dict of label tuples to [bucket counts, sum, count]."""
+    gauges = {}
+    """Map from metric name to the function that returns its current value."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+    _local = threading.local()
+    """Thread local data to store the transport of the current request."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    @staticmethod
+    def set_transport(transport):
+        """Set the transport (REST or XML-RPC) used by the request processed in the current thread."""
+        Metrics._local.transport = transport
+
+    @staticmethod
+    def get_transport():
+        """Get the transport used by the request processed in the current thread."""
+        return getattr(Metrics._local, "transport", Metrics.TRANSPORT_NONE)
+
+    @staticmethod
+    def _labels_key(labels):
+        if not labels:
+            return ()
+        return tuple(sorted(labels.items()))
+
+    @staticmethod
+    def inc(name, labels=None, value=1):
+        """Increment the value of a counter."""
+        if not Config.ACTIVATE_METRICS:
+            return
+        key = Metrics._labels_key(labels)
+        with Metrics._lock:
+            values = Metrics.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    @staticmethod
+    def observe(name, value, labels=None):
+        """Add a new observation to a histogram."""
+        if not Config.ACTIVATE_METRICS:
+            return
+        key = Metrics._labels_key(labels)
+        with Metrics._lock:
+            values = Metrics.histograms.setdefault(name, {})
+            if key not in values:
+                values[key] = [[0] * len(Metrics.BUCKETS), 0.0, 0]
+            hist = values[key]
+            for i, bound in enumerate(Metrics.BUCKETS):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    @staticmethod
+    def check_token(auth_header):
+        """
+        Check if the Authorization header of a request has the METRICS_TOKEN as Bearer token
+        """
+        if not Config.METRICS_TOKEN or not auth_header or not auth_header.startswith("Bearer "):
+            return False
+        return hmac.compare_digest(auth_header[7:].strip().encode("utf-8"), Config.METRICS_TOKEN.encode("utf-8"))
+
+    @staticmethod
+    def register_gauge(name, func):
+        """
+        Register a function that returns the current value of a gauge
+        (or a dict from label tuples to values).
+        """
+        with Metrics._lock:
+            Metrics.gauges[name] = func
+
+    @staticmethod
+    @contextmanager
+    def timer(name, labels=None):
+        """Context manager to measure the time spent in a block of code."""
+        init = time.time()
+        try:
+            yield
+        finally:
+            Metrics.observe(name, time.time() - init, labels)
+
+    @staticmethod
+    def timed(name, labels, errors_name=None, func=None):
+        """
+        Decorator to measure the time spent in a function.
+
+        Args:
+
+        - name(str): name of the histogram.
+        - labels(dict or function): labels of the metric, or a function that returns them.
+        - errors_name(str): name of the counter incremented if the function raises an exception (optional).
+        - func(function): function to decorate (optional, to use it without decorator syntax).
+        """
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if not Config.ACTIVATE_METRICS:
+                    return f(*args, **kwargs)
+                if callable(labels):
+                    metric_labels = labels()
+                else:
+                    metric_labels = labels
+                init = time.time()
+                try:
+                    return f(*args, **kwargs)
+                except Exception:
+                    if errors_name:
+                        Metrics.inc(errors_name, metric_labels)
+                    raise
+                finally:
+                    Metrics.observe(name, time.time() - init, metric_labels)
+            return wrapper
+
+        if func:
+            return decorator(func)
+        return decorator
+
+    @staticmethod
+    def operation(func):
+        """Decorator to measure the InfrastructureManager operations."""
+        return Metrics.timed("im_operation_duration_seconds",
+                             lambda: {"op": func.__name__, "transport": Metrics.get_transport()},
+                             "im_operation_errors_total")(func)
+
+    @staticmethod
+    def instrument_connector(conn, cloud_type, methods):
+        """
+        Measure the calls to the specified methods of a cloud connector object.
+        """
+        if not Config.ACTIVATE_METRICS:
+            return conn
+        for method in methods:
+            func = getattr(conn, method, None)
+            if func:
+                setattr(conn, method, Metrics.timed("im_connector_call_duration_seconds",
+                                                    {"cloud_type": cloud_type, "method": method},
+                                                    "im_connector_call_errors_total", func))
+        return conn
+
+    @staticmethod
+    def _format_labels(key, extra=None):
+        labels = list(key)
+        if extra:
+            labels.append(extra)
+        if not labels:
+            return ""
+        values = []
+        for name, value in labels:
+            value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            values.append('%s="%s"' % (name, value))
+        return "{%s}" % ",".join(values)
+
+    @staticmethod
+    def _format_value(value):
+        if isinstance(value, float):
+            return repr(value)
+        return str(value)
+
+    @staticmethod
+    def _get_header(name, metric_type):
+        res = []
+        if name in Metrics.HELP:
+            res.append("# HELP %s %s" % (name, Metrics.HELP[name]))
+        res.append("# TYPE %s %s" % (name, metric_type))
+        return res
+
+    @staticmethod
+    def generate_latest():
+        """
+        Return a str with all the metrics in the Prometheus text exposition format.
+        """
+        res = []
+        with Metrics._lock:
+            counters = dict((name, dict(values)) for name, values in Metrics.counters.items())
+            histograms = dict((name, dict((k, [list(v[0]), v[1], v[2]]) for k, v in values.items()))
+                              for name, values in Metrics.histograms.items())
+            gauges = dict(Metrics.gauges)
+
+        for name in sorted(gauges):
+            try:
+                value = gauges[name]()
+            except Exception:
+                Metrics.logger.exception("Error getting the value of metric: %s" % name)
+                continue
+            res.extend(Metrics._get_header(name, "gauge"))
+            if isinstance(value, dict):
+                # Map from label tuples to values
+                for key in sorted(value):
+                    res.append("%s%s %s" % (name, Metrics._format_labels(key), Metrics._format_value(value[key])))
+            else:
+                res.append("%s %s" % (name, Metrics._format_value(value)))
+
+        for name in sorted(counters):
+            res.extend(Metrics._get_header(name, "counter"))
+            for key in sorted(counters[name]):
+                res.append("%s%s %s" % (name, Metrics._format_labels(key), counters[name][key]))
+
+        for name in sorted(histograms):
+            res.extend(Metrics._get_header(name, "histogram"))
+            for key in sorted(histograms[name]):
+                buckets, total, count = histograms[name][key]
+                for bound, bucket_count in zip(Metrics.BUCKETS, buckets):
+                    res.append("%s_bucket%s %d" % (name, Metrics._format_labels(key, ("le", repr(bound))),
+                                                   bucket_count))
+                res.append("%s_bucket%s %d" % (name, Metrics._format_labels(key, ("le", "+Inf")), count))
+                res.append("%s_sum%s %s" % (name, Metrics._format_labels(key), repr(total)))
+                res.append("%s_count%s %d" % (name, Metrics._format_labels(key), count))
+
+        return "\n".join(res) + "\n"
+
+    @staticmethod
+    def _reinit():
+        """Restart the class attributes to initial values."""
+        with Metrics._lock:
+            Metrics.counters = {}
+            Metrics.histograms = {}
+            Metrics._local = threading.local()
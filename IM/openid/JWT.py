@@ -18,8 +18,19 @@ Class to unpack the JWT IAM tokens
 """
 import json
 import base64
+import binascii
 import re
 
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import rsa, ec, padding
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+    CRYPTOGRAPHY_AVAILABLE = True
+except Exception:
+    CRYPTOGRAPHY_AVAILABLE = False
+
 
 class JWT(object):
 
@@ -71,3 +82,75 @@ class JWT(object):
         part = tuple(token.encode("utf-8").split(b"."))
         part = [JWT.b64d(p) for p in part]
         return json.loads(part[1].decode("utf-8"))
+
+    @staticmethod
+    def get_header(token):
+        """
+        Returns the JSON decoded header of a JWT (where the "alg" and "kid" are stored).
+
+        :param token: The JWT token
+        """
+        part = token.encode("utf-8").split(b".")
+        return json.loads(JWT.b64d(part[0]).decode("utf-8"))
+
+    @staticmethod
+    def _b64_to_int(data):
+        return int(binascii.hexlify(JWT.b64d(data.encode("utf-8"))), 16)
+
+    @staticmethod
+    def get_public_key(jwk):
+        """
+        Get the public key object from a JSON Web Key (RSA or EC).
+
+        :param jwk: dict with the JSON Web Key
+        """
+        if not CRYPTOGRAPHY_AVAILABLE:
+            raise Exception("The cryptography library is needed to verify the JWT signatures.")
+        if jwk.get("kty") == "RSA":
+            numbers = rsa.RSAPublicNumbers(JWT._b64_to_int(jwk["e"]), JWT._b64_to_int(jwk["n"]))
+        elif jwk.get("kty") == "EC":
+            curves = {"P-256": ec.SECP256R1, "P-384": ec.SECP384R1, "P-521": ec.SECP521R1}
+            if jwk.get("crv") not in curves:
+                raise Exception("Unsupported EC curve: %s" % jwk.get("crv"))
+            numbers = ec.EllipticCurvePublicNumbers(JWT._b64_to_int(jwk["x"]), JWT._b64_to_int(jwk["y"]),
+                                                    curves[jwk["crv"]]())
+        else:
+            raise Exception("Unsupported key type: %s" % jwk.get("kty"))
+        return numbers.public_key(default_backend())
+
+    @staticmethod
+    def verify_signature(token, jwk):
+        """
+        Verifies the signature of a JWT (signed with RS256/384/512 or ES256/384/512)
+        using a JSON Web Key.
+
+        :param token: The JWT token
+        :param jwk: dict with the JSON Web Key
+        :return: True if the signature is valid or False otherwise
+        """
+        if not CRYPTOGRAPHY_AVAILABLE:
+            raise Exception("The cryptography library is needed to verify the JWT signatures.")
+        alg = JWT.get_header(token).get("alg", "")
+        hash_algs = {"256": hashes.SHA256, "384": hashes.SHA384, "512": hashes.SHA512}
+        if alg[:2] not in ["RS", "ES"] or alg[2:] not in hash_algs:
+            raise Exception("Unsupported JWT signature algorithm: %s" % alg)
+
+        signing_input, signature = token.encode("utf-8").rsplit(b".", 1)
+        signature = JWT.b64d(signature)
+        public_key = JWT.get_public_key(jwk)
+        try:
+            if alg.startswith("RS"):
+                if not isinstance(public_key, rsa.RSAPublicKey):
+                    return False
+                public_key.verify(signature, signing_input, padding.PKCS1v15(), hash_algs[alg[2:]]())
+            else:
+                if not isinstance(public_key, ec.EllipticCurvePublicKey):
+                    return False
+                # The JWS EC signatures are the concatenation of r and s
+                size = len(signature) // 2
+                der_signature = encode_dss_signature(int(binascii.hexlify(signature[:size]), 16),
+                                                     int(binascii.hexlify(signature[size:]), 16))
+                public_key.verify(der_signature, signing_input, ec.ECDSA(hash_algs[alg[2:]]()))
+            return True
+        except InvalidSignature:
+            return False
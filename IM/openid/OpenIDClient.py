@@ -18,14 +18,29 @@ Class to contact with an OpenID server
 '''
 import requests
 import json
+import logging
+import threading
 import time
 from .JWT import JWT
+from IM.http_pool import HTTPPool
 
 
 class OpenIDClient(object):
 
     VERIFY_SSL = False
 
+    JWKS_MIN_REFRESH_TIME = 60
+    """Min time (in secs) between two JWKS refreshes forced by an unknown key ID."""
+
+    jwks = {}
+    """Map from issuer to a tuple (time, list of JSON Web Keys)."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
     @staticmethod
     def get_user_info_request(token):
         """
@@ -35,7 +50,7 @@ class OpenIDClient(object):
             decoded_token = JWT().get_info(token)
             headers = {'Authorization': 'Bearer %s' % token}
             url = "%s%s" % (decoded_token['iss'], "/userinfo")
-            resp = requests.request("GET", url, verify=OpenIDClient.VERIFY_SSL, headers=headers)
+            resp = HTTPPool.request("GET", url, verify=OpenIDClient.VERIFY_SSL, headers=headers)
             if resp.status_code != 200:
                 return False, "Code: %d. Message: %s." % (resp.status_code, resp.text)
             return True, json.loads(resp.text)
@@ -50,7 +65,7 @@ class OpenIDClient(object):
         try:
             decoded_token = JWT().get_info(token)
             url = "%s%s" % (decoded_token['iss'], "/introspect?token=%s&token_type_hint=access_token" % token)
-            resp = requests.request("GET", url, verify=OpenIDClient.VERIFY_SSL,
+            resp = HTTPPool.request("GET", url, verify=OpenIDClient.VERIFY_SSL,
                                     auth=requests.auth.HTTPBasicAuth(client_id, client_secret))
             if resp.status_code != 200:
                 return False, "Code: %d. Message: %s." % (resp.status_code, resp.text)
@@ -77,3 +92,109 @@ class OpenIDClient(object):
                 return True, "Error getting token info"
         else:
             return True, "No token specified"
+
+    @staticmethod
+    def get_openid_configuration(issuer):
+        """
+        Get the OpenID Connect discovery document of an issuer
+        """
+        try:
+            url = "%s/.well-known/openid-configuration" % issuer.rstrip("/")
+            resp = HTTPPool.request("GET", url, verify=OpenIDClient.VERIFY_SSL)
+            if resp.status_code != 200:
+                return False, "Code: %d. Message: %s." % (resp.status_code, resp.text)
+            return True, json.loads(resp.text)
+        except Exception as ex:
+            return False, str(ex)
+
+    @staticmethod
+    def get_jwks(issuer, cache_time=3600, force=False):
+        """
+        Get the JSON Web Keys of an issuer (using the jwks_uri of its discovery document).
+        The keys are cached cache_time secs. If force is set the keys are refreshed
+        (to support key rotation) but not more than once every JWKS_MIN_REFRESH_TIME secs.
+        """
+        now = time.time()
+        with OpenIDClient._lock:
+            cached = OpenIDClient.jwks.get(issuer)
+        if cached:
+            age = now - cached[0]
+            if (not force and age < cache_time) or (force and age < OpenIDClient.JWKS_MIN_REFRESH_TIME):
+                return cached[1]
+
+        try:
+            success, conf = OpenIDClient.get_openid_configuration(issuer)
+            if not success:
+                raise Exception("Error getting OpenID configuration: %s" % conf)
+            resp = HTTPPool.request("GET", conf["jwks_uri"], verify=OpenIDClient.VERIFY_SSL)
+            if resp.status_code != 200:
+                raise Exception("Code: %d. Message: %s." % (resp.status_code, resp.text))
+            keys = json.loads(resp.text)["keys"]
+        except Exception as ex:
+            if cached:
+                OpenIDClient.logger.warning("Error getting JWKS of issuer %s: %s. Using the cached ones." %
+                                            (issuer, ex))
+                return cached[1]
+            raise Exception("Error getting JWKS of issuer %s: %s" % (issuer, ex))
+
+        with OpenIDClient._lock:
+            OpenIDClient.jwks[issuer] = (now, keys)
+        return keys
+
+    @staticmethod
+    def _find_key(keys, kid):
+        keys = [key for key in keys if key.get("use", "sig") == "sig"]
+        if kid:
+            keys = [key for key in keys if key.get("kid") == kid]
+        if len(keys) == 1 or (kid and keys):
+            return keys[0]
+        return None
+
+    @staticmethod
+    def verify_token(token, issuers, audience=None, jwks_cache_time=3600):
+        """
+        Verify locally the signature of a token using the JWKS of its issuer,
+        and check the issuer, the audience and the expiration time.
+
+        Returns: a tuple (success, decoded token or error message)
+        """
+        try:
+            header = JWT.get_header(token)
+            decoded_token = JWT.get_info(token)
+        except Exception as ex:
+            return False, "Error decoding token: %s" % ex
+
+        issuer = decoded_token.get('iss')
+        if issuer not in issuers:
+            return False, "Issuer not accepted"
+
+        try:
+            kid = header.get("kid")
+            key = OpenIDClient._find_key(OpenIDClient.get_jwks(issuer, jwks_cache_time), kid)
+            if not key:
+                # The keys may have been rotated
+                key = OpenIDClient._find_key(OpenIDClient.get_jwks(issuer, jwks_cache_time, True), kid)
+            if not key:
+                return False, "Signing key %s not found" % kid
+            if not JWT.verify_signature(token, key):
+                return False, "Invalid token signature"
+        except Exception as ex:
+            return False, "Error verifying token signature: %s" % ex
+
+        now = time.time()
+        try:
+            if int(decoded_token['exp']) < now:
+                return False, "Token expired"
+        except Exception:
+            return False, "Invalid token expiration time"
+        if 'nbf' in decoded_token and int(decoded_token['nbf']) > now:
+            return False, "Token not valid yet"
+
+        if audience:
+            aud = decoded_token.get('aud') or []
+            if not isinstance(aud, list):
+                aud = aud.split(",")
+            if audience not in aud:
+                return False, "Audience not accepted"
+
+        return True, decoded_token
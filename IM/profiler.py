@@ -0,0 +1,158 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Module to profile the IM requests on demand"""
+
+import cProfile
+import hmac
+import logging
+import marshal
+import pstats
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid1
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from IM.config import Config
+
+
+class Profiler:
+    """
+    Class to run IM requests under cProfile and store the profiles
+    """
+
+    profiles = OrderedDict()
+    """Map from request ID to a tuple (time, operation, marshalled stats)."""
+
+    _requests = 0
+    """Number of requests checked to be sampled."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    @staticmethod
+    def check_secret(secret):
+        """
+        Check if the secret provided by the user matches with the PROFILE_SECRET
+        """
+        if not Config.PROFILE_SECRET or not secret:
+            return False
+        return hmac.compare_digest(secret.encode("utf-8"), Config.PROFILE_SECRET.encode("utf-8"))
+
+    @staticmethod
+    def must_profile(secret=None):
+        """
+        Check if a request must be profiled: it provides the correct secret
+        or it is sampled (1 out of PROFILE_SAMPLE_RATE requests).
+        """
+        if secret and Profiler.check_secret(secret):
+            return True
+        if Config.PROFILE_SAMPLE_RATE > 0:
+            with Profiler._lock:
+                Profiler._requests += 1
+                return Profiler._requests % Config.PROFILE_SAMPLE_RATE == 0
+        return False
+
+    @staticmethod
+    def run(operation, func, *args, **kwargs):
+        """
+        Call a function under cProfile and store the profile.
+
+        Args:
+
+        - operation(str): name of the operation profiled.
+        - func(function): function to call.
+
+        Return: a tuple with the ID of the stored profile and the value returned by the function.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active in this thread
+            Profiler.logger.warn("Error enabling the profiler for operation %s." % operation)
+            return None, func(*args, **kwargs)
+
+        req_id = str(uuid1())
+        try:
+            return req_id, func(*args, **kwargs)
+        finally:
+            profile.disable()
+            Profiler._store(req_id, operation, profile)
+
+    @staticmethod
+    def _store(req_id, operation, profile):
+        profile.create_stats()
+        data = marshal.dumps(profile.stats)
+        with Profiler._lock:
+            Profiler.profiles[req_id] = (time.time(), operation, data)
+            while len(Profiler.profiles) > max(Config.PROFILE_MAX_STORED, 1):
+                Profiler.profiles.popitem(last=False)
+        Profiler.logger.info("Operation %s profiled with request ID: %s" % (operation, req_id))
+
+    @staticmethod
+    def get_profile_list():
+        """
+        Return a list of dicts with the request ID, time and operation of the stored profiles.
+        """
+        with Profiler._lock:
+            return [{"id": req_id, "time": prof[0], "operation": prof[1]}
+                    for req_id, prof in Profiler.profiles.items()]
+
+    @staticmethod
+    def get_profile(req_id, text=False):
+        """
+        Get a stored profile.
+
+        Args:
+
+        - req_id(str): ID of the profiled request.
+        - text(bool): Return the stats as text (sorted by cumulative time)
+                      instead of the binary format used by the pstats module.
+
+        Return: the profile data or None if it does not exist.
+        """
+        with Profiler._lock:
+            prof = Profiler.profiles.get(req_id)
+        if not prof:
+            return None
+        if not text:
+            return prof[2]
+
+        # The pstats module needs a source object with a create_stats method
+        class StatsLoader:
+            def create_stats(self):
+                self.stats = marshal.loads(prof[2])
+
+        out = StringIO()
+        stats = pstats.Stats(StatsLoader(), stream=out)
+        stats.sort_stats("cumulative").print_stats(100)
+        return out.getvalue()
+
+    @staticmethod
+    def _reinit():
+        """Restart the class attributes to initial values."""
+        with Profiler._lock:
+            Profiler.profiles = OrderedDict()
+            Profiler._requests = 0
@@ -33,6 +33,7 @@ except ImportError:
 
 from IM.timedcall import TimedCall
 from IM.config import Config
+from IM.metrics import Metrics
 from IM.xmlrpcssl import SSLSimpleXMLRPCServer
 
 
@@ -133,6 +134,9 @@ def get_system_queue():
     return SYSTEM_REQUESTS_QUEUE
 
 
+Metrics.register_gauge("im_request_queue_size", lambda: get_system_queue().qsize())
+
+
 class Request(object):
     """
     Clase generica para modelar las peticiones que se van a hacer al sistema. Al crear la peticion, esta se
@@ -1,8 +1,63 @@
+import random
 import time
 from functools import wraps
 
 
-def retry(ExceptionToCheck, ExceptionToAvoid, tries=4, delay=3, backoff=2, logger=None, quiet=True):
+class RetryPolicy:
+    """
+    Retry policy with exponential backoff and (full) jitter: the delay before
+    the retry N is a random value between 0 and min(max_delay, delay * backoff ** N),
+    so that the clients that failed at the same time do not retry at the same time.
+
+    :param tries: number of times to try (not retry) before giving up (None for no limit)
+    :type tries: int
+    :param delay: initial delay between retries in seconds
+    :type delay: int
+    :param backoff: backoff multiplier e.g. value of 2 will double the delay
+        each retry
+    :type backoff: int
+    :param max_delay: max delay between retries in seconds (None for no limit)
+    :type max_delay: int
+    :param max_elapsed: max time in seconds since the first try to perform a retry (None for no limit)
+    :type max_elapsed: int
+    :param jitter: flag to randomize the delays
+    :type jitter: bool
+    """
+
+    def __init__(self, tries=4, delay=3, backoff=2, max_delay=None, max_elapsed=None, jitter=True):
+        self.tries = tries
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.jitter = jitter
+
+    def get_delay(self, retry_num):
+        """Get the delay before the retry number retry_num (starting in 0)."""
+        delay = self.delay * self.backoff ** retry_num
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def delays(self):
+        """
+        Generator that returns the delay before every retry. It finishes when
+        the number of tries or the max elapsed time is reached.
+        """
+        init = time.time()
+        retry_num = 0
+        while self.tries is None or retry_num < self.tries - 1:
+            delay = self.get_delay(retry_num)
+            if self.max_elapsed is not None and time.time() - init + delay > self.max_elapsed:
+                return
+            yield delay
+            retry_num += 1
+
+
+def retry(ExceptionToCheck, ExceptionToAvoid, tries=4, delay=3, backoff=2, logger=None, quiet=True,
+          max_delay=None, jitter=False):
     """Retry calling the decorated function using an exponential backoff.
 
     http://www.saltycrane.com/blog/2009/11/trying-out-retry-decorator-python/
@@ -25,13 +80,17 @@ def retry(ExceptionToCheck, ExceptionToAvoid, tries=4, delay=3, backoff=2, logge
         :type logger: logging.Logger instance
         :param quiet: flat to specify not to print any message.
         :type quit: bool
+    :param max_delay: max delay between retries in seconds
+    :type max_delay: int
+    :param jitter: flag to randomize the delays (see RetryPolicy)
+    :type jitter: bool
     """
     def deco_retry(f):
 
         @wraps(f)
         def f_retry(*args, **kwargs):
-            mtries, mdelay = tries, delay
-            while mtries > 1:
+            policy = RetryPolicy(tries, delay, backoff, max_delay, jitter=jitter)
+            for mdelay in policy.delays():
                 try:
                     return f(*args, **kwargs)
                 except ExceptionToAvoid as a:
@@ -45,8 +104,6 @@ def retry(ExceptionToCheck, ExceptionToAvoid, tries=4, delay=3, backoff=2, logge
                         else:
                             print(msg)
                     time.sleep(mdelay)
-                    mtries -= 1
-                    mdelay *= backoff
             return f(*args, **kwargs)
 
         return f_retry  # true decorator
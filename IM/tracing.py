@@ -0,0 +1,330 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Lightweight tracing module. The spans are exported using the
+OpenTelemetry (OTLP JSON) span format and the W3C traceparent header
+is used to propagate the trace context.
+"""
+
+import binascii
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from contextlib import contextmanager
+
+from IM.config import Config
+
+
+def _new_id(size):
+    """Generate a random hex ID of the specified number of bytes."""
+    return binascii.hexlify(os.urandom(size)).decode()
+
+
+class Span:
+    """
+    Class to represent a timed operation inside a trace
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        """Name of the operation."""
+        self.trace_id = trace_id
+        """ID of the trace (32 hex chars)."""
+        self.span_id = _new_id(8)
+        """ID of the span (16 hex chars)."""
+        self.parent_id = parent_id
+        """ID of the parent span."""
+        self.attributes = dict(attributes or {})
+        """Dict of attributes of the span."""
+        self.start_time = time.time()
+        """Start time of the span."""
+        self.end_time = None
+        """End time of the span."""
+        self.error = None
+        """Error message if the operation has failed."""
+
+    def set_attribute(self, key, value):
+        """Set the value of an attribute of the span."""
+        self.attributes[key] = value
+
+    def end(self):
+        """Mark the span as finished."""
+        self.end_time = time.time()
+
+    def to_dict(self):
+        """
+        Return the span as a dict in OTLP JSON format
+        """
+        res = {"traceId": self.trace_id,
+               "spanId": self.span_id,
+               "name": self.name,
+               "kind": "SPAN_KIND_INTERNAL",
+               "startTimeUnixNano": str(int(self.start_time * 1e9)),
+               "endTimeUnixNano": str(int((self.end_time or time.time()) * 1e9)),
+               "attributes": [{"key": key, "value": {"stringValue": str(value)}}
+                              for key, value in sorted(self.attributes.items())]}
+        if self.parent_id:
+            res["parentSpanId"] = self.parent_id
+        if self.error:
+            res["status"] = {"code": "STATUS_CODE_ERROR", "message": self.error}
+        else:
+            res["status"] = {"code": "STATUS_CODE_OK"}
+        return res
+
+
+class InMemorySpanExporter:
+    """
+    Span exporter that stores the finished spans in memory (for testing purposes)
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def get_finished_spans(self):
+        with self._lock:
+            return list(self.spans)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+
+class FileSpanExporter:
+    """
+    Span exporter that writes the finished spans in a file (one OTLP JSON span per line)
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            with open(self.filename, 'a') as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    """
+    Class to create the spans and propagate the trace context between threads
+    """
+
+    SSH_METHODS = ["execute", "execute_timeout", "sftp_get", "sftp_get_files", "sftp_put_files",
+                   "sftp_put", "sftp_put_dir", "sftp_put_content", "sftp_mkdir"]
+    """Methods of the SSH clients traced."""
+
+    exporter = None
+    """Span exporter used. If None the tracing is disabled."""
+
+    _local = threading.local()
+    """Thread local data to store the current span stack and the attached context."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    @staticmethod
+    def configure():
+        """
+        Set the span exporter according to the TRACING_EXPORTER option
+        """
+        if Config.TRACING_EXPORTER == "file":
+            Tracer.exporter = FileSpanExporter(Config.TRACING_FILE)
+        elif Config.TRACING_EXPORTER == "memory":
+            Tracer.exporter = InMemorySpanExporter()
+        else:
+            if Config.TRACING_EXPORTER:
+                Tracer.logger.warn("Unknown TRACING_EXPORTER: %s. Tracing disabled." % Config.TRACING_EXPORTER)
+            Tracer.exporter = None
+
+    @staticmethod
+    def _get_stack():
+        if not hasattr(Tracer._local, "stack"):
+            Tracer._local.stack = []
+        return Tracer._local.stack
+
+    @staticmethod
+    def get_context():
+        """
+        Get the context (trace ID, span ID) of the current span to propagate it to other threads
+        """
+        stack = Tracer._get_stack()
+        if stack:
+            return (stack[-1].trace_id, stack[-1].span_id)
+        return getattr(Tracer._local, "context", None)
+
+    @staticmethod
+    def attach(context):
+        """
+        Set the context (trace ID, span ID) of the parent span of the new spans created in this thread
+        """
+        Tracer._local.context = context
+
+    @staticmethod
+    def get_traceparent():
+        """
+        Get the W3C traceparent header of the current span
+        """
+        context = Tracer.get_context()
+        if context:
+            return "00-%s-%s-01" % context
+        return None
+
+    @staticmethod
+    def parse_traceparent(header):
+        """
+        Get the context (trace ID, span ID) from a W3C traceparent header
+        """
+        if header:
+            parts = header.strip().split("-")
+            if len(parts) >= 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                return (parts[1], parts[2])
+        return None
+
+    @staticmethod
+    @contextmanager
+    def span(name, attributes=None, context=None):
+        """
+        Context manager to create a new span as child of the current one.
+
+        Args:
+
+        - name(str): name of the operation.
+        - attributes(dict): attributes of the span (optional).
+        - context(tuple): context (trace ID, span ID) of the parent span.
+                          If not set, the current span of the thread is used (optional).
+        """
+        exporter = Tracer.exporter
+        if not exporter:
+            yield None
+            return
+
+        if not context:
+            context = Tracer.get_context()
+        if context:
+            new_span = Span(name, context[0], context[1], attributes)
+        else:
+            new_span = Span(name, _new_id(16), None, attributes)
+
+        stack = Tracer._get_stack()
+        stack.append(new_span)
+        try:
+            yield new_span
+        except Exception as ex:
+            new_span.error = str(ex)
+            raise
+        finally:
+            new_span.end()
+            stack.remove(new_span)
+            try:
+                exporter.export(new_span)
+            except Exception:
+                Tracer.logger.exception("Error exporting span %s." % name)
+
+    @staticmethod
+    def traced(name, attributes=None):
+        """
+        Decorator to create a span for each call to the function.
+
+        Args:
+
+        - name(str): name of the span.
+        - attributes(dict or function): attributes of the span, or a function that gets
+                                        them from the arguments of the decorated function (optional).
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not Tracer.exporter:
+                    return func(*args, **kwargs)
+                span_attrs = attributes
+                if callable(attributes):
+                    try:
+                        span_attrs = attributes(*args, **kwargs)
+                    except Exception:
+                        span_attrs = None
+                with Tracer.span(name, span_attrs):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def wrap(func):
+        """
+        Wrap a function to be called in other thread with the current trace context
+        """
+        context = Tracer.get_context()
+        if not Tracer.exporter or not context:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            Tracer.attach(context)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                Tracer.attach(None)
+        return wrapper
+
+    @staticmethod
+    def instrument(obj, prefix, methods, attributes=None):
+        """
+        Create spans for the calls to the specified methods of an object
+        (i.e. cloud connectors or SSH clients).
+
+        Args:
+
+        - obj(object): object to instrument.
+        - prefix(str): prefix of the name of the spans.
+        - methods(list of str): name of the methods to trace.
+        - attributes(dict): attributes of the spans (optional).
+
+        Return: the same object.
+        """
+        if not Tracer.exporter or obj is None:
+            return obj
+        for method in methods:
+            func = getattr(obj, method, None)
+            if func:
+                setattr(obj, method, Tracer.traced("%s.%s" % (prefix, method), attributes)(func))
+        return obj
+
+    @staticmethod
+    def instrument_ssh(ssh):
+        """
+        Create spans for the commands and file transfers of an SSH client object.
+        """
+        if ssh is None:
+            return ssh
+        return Tracer.instrument(ssh, "SSH", Tracer.SSH_METHODS, {"net.peer.name": ssh.host})
+
+    @staticmethod
+    def _reinit():
+        """Restart the class attributes to initial values."""
+        Tracer.configure()
+        Tracer._local = threading.local()
+
+
+Tracer.configure()
@@ -0,0 +1,165 @@
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Access to the IM user DB file (USER_DB)"""
+
+import hmac
+import json
+import logging
+import os
+import threading
+
+from IM.cache import TTLCache
+
+try:
+    import bcrypt
+    BCRYPT_AVAILABLE = True
+except Exception:
+    BCRYPT_AVAILABLE = False
+
+try:
+    from argon2 import PasswordHasher
+    ARGON2_AVAILABLE = True
+except Exception:
+    ARGON2_AVAILABLE = False
+
+
+class UserDB:
+    """
+    IM user DB. The JSON file is loaded in a dict indexed by username and it
+    is only read again when the file changes (path, inode, mtime or size).
+    The passwords can be stored in plain text or hashed with bcrypt or argon2.
+    """
+
+    VERIFY_CACHE_TIME = 3600
+    """Time (in secs) to cache the successful verifications of hashed passwords."""
+
+    users = None
+    """Map from username to the user data."""
+
+    file_id = None
+    """Tuple identifying the version of the file loaded."""
+
+    verify_cache = TTLCache("user_db", 1000)
+    """Cache of successful verifications of hashed passwords."""
+
+    _lock = threading.Lock()
+    """Threading Lock to avoid concurrency problems."""
+
+    logger = logging.getLogger('InfrastructureManager')
+    """Logger object."""
+
+    @staticmethod
+    def _reinit():
+        """Restart the class attributes to initial values."""
+        UserDB.users = None
+        UserDB.file_id = None
+        UserDB.verify_cache.clear()
+
+    @staticmethod
+    def get_users(filename):
+        """
+        Get the dict of users of the DB file, loading it only if it has changed.
+        Returns None if the file does not exist or has an incorrect format.
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            UserDB.logger.error("User DB file %s not found" % filename)
+            return None
+
+        file_id = (filename, stat.st_ino, stat.st_mtime, stat.st_size)
+        with UserDB._lock:
+            if UserDB.file_id == file_id:
+                return UserDB.users
+
+            try:
+                with open(filename, "r") as f:
+                    user_db = json.load(f)
+                users = {}
+                for user in user_db['users']:
+                    users[user['username']] = user
+            except Exception:
+                UserDB.logger.exception("Incorrect format in the User DB file %s" % filename)
+                UserDB.users = None
+                UserDB.file_id = None
+                return None
+
+            UserDB.logger.debug("User DB file %s loaded." % filename)
+            UserDB.users = users
+            UserDB.file_id = file_id
+            return users
+
+    @staticmethod
+    def verify_password(stored_password, password):
+        """
+        Check a password against the one stored in the user DB
+        (in plain text or hashed with bcrypt or argon2).
+        """
+        if stored_password is None or password is None:
+            return False
+        stored_password = str(stored_password)
+        password = str(password)
+
+        if stored_password.startswith(("$2a$", "$2b$", "$2y$")):
+            if not BCRYPT_AVAILABLE:
+                UserDB.logger.error("The bcrypt library is needed to check the bcrypt hashed passwords.")
+                return False
+            try:
+                return bcrypt.checkpw(password.encode("utf-8"), stored_password.encode("utf-8"))
+            except Exception:
+                UserDB.logger.exception("Error checking bcrypt hashed password.")
+                return False
+        elif stored_password.startswith("$argon2"):
+            if not ARGON2_AVAILABLE:
+                UserDB.logger.error("The argon2-cffi library is needed to check the argon2 hashed passwords.")
+                return False
+            try:
+                return PasswordHasher().verify(stored_password, password)
+            except Exception:
+                return False
+        else:
+            return hmac.compare_digest(stored_password.encode("utf-8"), password.encode("utf-8"))
+
+    @staticmethod
+    def check_user(filename, username, password):
+        """
+        Check if the user with the specified password appears in the user DB file.
+
+        Args:
+        - filename(str): path of the user DB file.
+        - username(str): username to check.
+        - password(str): password to check.
+
+        Return(bool): true if the user is valid or false otherwise.
+        """
+        users = UserDB.get_users(filename)
+        if not users or username not in users:
+            return False
+
+        stored_password = users[username].get('password')
+        if stored_password is None or not str(stored_password).startswith("$"):
+            return UserDB.verify_password(stored_password, password)
+
+        # The verification of the hashed passwords is expensive on purpose, so cache it
+        key = TTLCache.hash_key(username, stored_password, password)
+        found, _ = UserDB.verify_cache.get(key)
+        if found:
+            return True
+        if UserDB.verify_password(stored_password, password):
+            UserDB.verify_cache.put(key, True, UserDB.VERIFY_CACHE_TIME)
+            return True
+        return False
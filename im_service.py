@@ -25,12 +25,15 @@ import signal
 import subprocess
 import time
 import argparse
+import threading
 
 from IM.request import Request, AsyncXMLRPCServer, get_system_queue
 from IM.config import Config
 from IM.InfrastructureManager import InfrastructureManager
 from IM.InfrastructureList import InfrastructureList
 from IM.ServiceRequests import IMBaseRequest
+from IM.CloudInfo import CloudInfo
+from IM.VMPoller import VMPoller
 from IM import __version__ as version
 
 if sys.version_info <= (2, 6):
@@ -125,9 +128,9 @@ def CreateInfrastructure(radl_data, auth_data, async_call=False):
     return WaitRequest(request)
 
 
-def GetInfrastructureList(auth_data, flt=None):
+def GetInfrastructureList(auth_data, flt=None, limit=None, offset=0):
     request = IMBaseRequest.create_request(
-        IMBaseRequest.GET_INFRASTRUCTURE_LIST, (auth_data, flt))
+        IMBaseRequest.GET_INFRASTRUCTURE_LIST, (auth_data, flt, limit, offset))
     return WaitRequest(request)
 
 
@@ -202,6 +205,21 @@ def CreateDiskSnapshot(inf_id, vm_id, disk_num, image_name, auto_delete, auth_da
     return WaitRequest(request)
 
 
+def prewarm_modules():
+    """
+    Load the modules of the connectors set in PREWARM_CONNECTORS
+    (and the TOSCA parser if PREWARM_TOSCA is set)
+    """
+    init = time.time()
+    CloudInfo.prewarm_connectors(Config.PREWARM_CONNECTORS)
+    if Config.PREWARM_TOSCA:
+        try:
+            import IM.tosca.Tosca
+        except Exception:
+            InfrastructureManager.logger.exception("Error loading the TOSCA parser.")
+    InfrastructureManager.logger.info("Modules prewarmed in %.2f secs." % (time.time() - init))
+
+
 def launch_daemon():
     """
     Launch the IM daemon
@@ -249,6 +267,14 @@ def launch_daemon():
     InfrastructureManager.logger.info(
         '************ Start Infrastructure Manager daemon (v.%s) ************' % version)
 
+    if Config.PREWARM_CONNECTORS or Config.PREWARM_TOSCA:
+        t = threading.Thread(name="prewarm_modules", target=prewarm_modules)
+        t.daemon = True
+        t.start()
+
+    if Config.VM_POLLER:
+        VMPoller.start()
+
     if Config.ACTIVATE_REST:
         # If specified launch the REST server
         import IM.REST
@@ -59,6 +59,7 @@ setup(name="IM", version=version,
       url='http://www.grycap.upv.es/im',
       include_package_data=True,
       packages=['IM', 'IM.ansible_utils', 'IM.connectors', 'IM.tosca', 'IM.openid', 'IM.tts'],
+      package_data={'IM.connectors': ['ec2_instance_types.json']},
       scripts=["im_service.py"],
       data_files=datafiles,
       license="GPL version 3, http://www.gnu.org/licenses/gpl-3.0.txt",
@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import sys
+import time
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(TESTS_PATH, "..", ".."))
+sys.path.append(os.path.join(TESTS_PATH, "..", "unit"))
+
+from IM import json_codec
+from json_codec import get_infrastructure, serialize_old_format
+
+
+def bench(func, times=3):
+    """Return the mean time (in secs) spent calling a function"""
+    init = time.time()
+    for _ in range(times):
+        func()
+    return (time.time() - init) / times
+
+
+def main(num_vms=200):
+    """
+    Compare the time spent serializing an infrastructure with the VMs as nested
+    JSON strings (old format) and as native nested objects with each JSON library
+    """
+    inf = get_infrastructure(num_vms)
+    old_data = serialize_old_format(inf)
+    dic = json.loads(inf.serialize())
+    vm_dicts = [vm.serialize_dict() for vm in inf.vm_list]
+
+    def old_encode():
+        vm_list = []
+        for vm_dict in vm_dicts:
+            vm_dict = dict(vm_dict)
+            vm_dict['cloud'] = json.dumps(vm_dict['cloud'])
+            vm_list.append(json.dumps(vm_dict))
+        return json.dumps(dict(dic, vm_list=vm_list))
+
+    def old_decode():
+        old_dic = json.loads(old_data)
+        return [json.loads(vm) for vm in old_dic['vm_list']]
+
+    print("Infrastructure with %d VMs (%d bytes)." % (num_vms, len(old_data)))
+    print("Nested JSON strings (json): encode %.4f secs, decode %.4f secs." % (
+        bench(old_encode), bench(old_decode)))
+    libraries = ["json"]
+    if json_codec.ORJSON_AVAILABLE:
+        libraries.append("orjson")
+    if json_codec.UJSON_AVAILABLE:
+        libraries.append("ujson")
+    for library in libraries:
+        str_inf = json_codec.dumps(dic, library=library)
+        print("Native nested objects (%s): encode %.4f secs, decode %.4f secs." % (
+            library, bench(lambda: json_codec.dumps(dic, library=library)),
+            bench(lambda: json_codec.loads(str_inf, library=library))))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -76,7 +76,7 @@ class TestAppDB(unittest.TestCase):
 
         return resp
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_site_id(self, requests):
         requests.side_effect = self.get_response
         res = AppDB.get_site_id("RECAS-BARI", "openstack")
@@ -84,7 +84,7 @@ class TestAppDB(unittest.TestCase):
         res = AppDB.get_site_id("RECAS-BARI", "occi")
         self.assertEqual(res, "8015G0")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_site_url(self, requests):
         requests.side_effect = self.get_response
         res = AppDB.get_site_url("8016G0", "openstack")
@@ -92,19 +92,19 @@ class TestAppDB(unittest.TestCase):
         res = AppDB.get_site_url("8015G0", "occi")
         self.assertEqual(res, "http://cloud.recas.ba.infn.it:8787/occi/")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_image_id(self, requests):
         requests.side_effect = self.get_response
         res = AppDB.get_image_id("8016G0", "egi.ubuntu.16.04", "fedcloud.egi.eu")
         self.assertEqual(res, "image_id2")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_image_id_from_uri(self, requests):
         requests.side_effect = self.get_response
         res = AppDB.get_image_id_from_uri("8016G0", "83d5e854-a128-5b1f-9457-d32e10a720a6:8135")
         self.assertEqual(res, "image_id3")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_image_data(self, requests):
         requests.side_effect = self.get_response
         str_url = "appdb://RECAS-BARI/egi.ubuntu.16.04?fedcloud.egi.eu"
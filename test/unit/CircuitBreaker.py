@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import socket
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.CircuitBreaker import CircuitBreaker, CircuitBreakerOpenException
+from IM.CloudInfo import CloudInfo
+from IM.config import Config
+from IM.connectors.CloudConnector import CloudConnector
+from IM.InfrastructureInfo import InfrastructureInfo
+from IM.metrics import Metrics
+from mock import Mock
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Class to test the CircuitBreaker class
+    """
+
+    def setUp(self):
+        Config.ACTIVATE_METRICS = True
+        CircuitBreaker._reinit()
+        Metrics._reinit()
+
+    def tearDown(self):
+        Config.ACTIVATE_METRICS = False
+        Config.CIRCUIT_BREAKER_OPEN_TIME = 30
+        CircuitBreaker._reinit()
+
+    def test_call(self):
+        breaker = CircuitBreaker.get("OpenStack@server.com")
+        self.assertIs(CircuitBreaker.get("OpenStack@server.com"), breaker)
+        func = Mock(side_effect=socket.timeout("timed out"))
+
+        # Errors below the rate do not open the circuit
+        for _ in range(Config.CIRCUIT_BREAKER_MIN_CALLS):
+            breaker.call(lambda: True)
+        for _ in range(Config.CIRCUIT_BREAKER_MIN_CALLS - 1):
+            self.assertRaises(Exception, breaker.call, func)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        self.assertRaises(Exception, breaker.call, func)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        # Now the calls fail fast
+        self.assertRaises(CircuitBreakerOpenException, breaker.call, func)
+        self.assertEqual(func.call_count, Config.CIRCUIT_BREAKER_MIN_CALLS)
+
+        # After the open time a test call is allowed
+        Config.CIRCUIT_BREAKER_OPEN_TIME = 0
+        self.assertRaises(Exception, breaker.call, func)
+        self.assertEqual(func.call_count, Config.CIRCUIT_BREAKER_MIN_CALLS + 1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.call(lambda: True))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        metrics = Metrics.generate_latest()
+        self.assertIn('im_circuit_breaker_state{endpoint="OpenStack@server.com"} 0', metrics)
+        self.assertIn('im_circuit_breaker_transitions_total{endpoint="OpenStack@server.com",state="open"} 2',
+                      metrics)
+        self.assertIn('im_circuit_breaker_rejected_total{endpoint="OpenStack@server.com"} 1', metrics)
+
+    def test_provider_errors(self):
+        class InvalidCredsError(Exception):
+            http_code = 401
+
+        class ServerError(Exception):
+            code = 503
+
+        class ReadTimeout(IOError):
+            pass
+
+        self.assertTrue(CircuitBreaker.is_provider_error(ServerError()))
+        self.assertTrue(CircuitBreaker.is_provider_error(ReadTimeout()))
+        self.assertFalse(CircuitBreaker.is_provider_error(InvalidCredsError()))
+        self.assertFalse(CircuitBreaker.is_provider_error(Exception("Invalid image")))
+
+        # The auth and request errors do not open the circuit
+        breaker = CircuitBreaker.get("OpenStack@server.com")
+        for _ in range(Config.CIRCUIT_BREAKER_MIN_CALLS * 2):
+            self.assertRaises(InvalidCredsError, breaker.call, Mock(side_effect=InvalidCredsError()))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_endpoint(self):
+        cloud_info = CloudInfo()
+        cloud_info.type = "Mock"
+        conn = CloudConnector(cloud_info, InfrastructureInfo())
+        conn.get_breaker_endpoint = lambda method, vm: "Mock@%s" % vm
+        conn.updateVMInfo = Mock(side_effect=socket.timeout("timed out"))
+        conn = CircuitBreaker.protect(conn, cloud_info.get_endpoint(), ["updateVMInfo"])
+        for _ in range(Config.CIRCUIT_BREAKER_MIN_CALLS):
+            self.assertRaises(socket.timeout, conn.updateVMInfo, "region1")
+        self.assertEqual(CircuitBreaker.get("Mock@region1").state, CircuitBreaker.OPEN)
+        # The breakers of the other regions are not affected
+        self.assertRaises(socket.timeout, conn.updateVMInfo, "region2")
+        self.assertEqual(CircuitBreaker.get("Mock@region2").state, CircuitBreaker.CLOSED)
+        self.assertNotIn("Mock", CircuitBreaker.breakers)
+
+    def test_launch_with_retry(self):
+        cloud_info = CloudInfo()
+        cloud_info.type = "Mock"
+        cloud_info.server = "server.com"
+        breaker = CircuitBreaker.get(cloud_info.get_endpoint())
+        breaker._set_state(CircuitBreaker.OPEN)
+
+        conn = CloudConnector(cloud_info, InfrastructureInfo())
+        conn.launch = Mock(return_value=[(True, "vm")])
+        conn = CircuitBreaker.protect(conn, cloud_info.get_endpoint(), ["launch"])
+        res = conn.launch_with_retry(InfrastructureInfo(), None, None, 2, None, 3, 10)
+        # It does not retry when the circuit is open
+        self.assertEqual(len(res), 2)
+        self.assertFalse(res[0][0])
+        self.assertIn("Calls suspended temporarily", res[0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.CloudExecutor import CloudExecutor
+from IM.CloudInfo import CloudInfo
+from IM.config import Config
+from mock import patch
+
+
+class TestCloudExecutor(unittest.TestCase):
+    """
+    Class to test the CloudExecutor class
+    """
+
+    def setUp(self):
+        CloudExecutor._reinit()
+
+    def tearDown(self):
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 1
+        Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = []
+        CloudExecutor._reinit()
+
+    @staticmethod
+    def get_cloud(cloud_type, server="server.com"):
+        cloud = CloudInfo()
+        cloud.type = cloud_type
+        cloud.server = server
+        return cloud
+
+    def test_get_limits(self):
+        ost = self.get_cloud("OpenStack")
+        self.assertEqual(CloudExecutor.get_limits(ost), (0, 0))
+        Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = ["OpenStack:5", " EC2:2", "*:10", "Kubernetes:x",
+                                                     "OpenStack@server.com:3", ""]
+        self.assertEqual(CloudExecutor.get_limits(ost), (5, 3))
+        self.assertEqual(CloudExecutor.get_limits(self.get_cloud("OpenStack", "other.com")), (5, 10))
+        self.assertEqual(CloudExecutor.get_limits(self.get_cloud("EC2")), (2, 10))
+        self.assertEqual(CloudExecutor.get_limits(self.get_cloud("Kubernetes")), (0, 10))
+        # The value is only parsed (and the invalid items reported) once
+        with patch.object(CloudExecutor.logger, "warning") as warning:
+            for _ in range(3):
+                CloudExecutor.get_limits(ost)
+            self.assertEqual(warning.call_count, 0)
+            Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = ["OpenStack:x"]
+            self.assertEqual(CloudExecutor.get_limits(ost), (0, 0))
+            CloudExecutor.get_limits(ost)
+            self.assertEqual(warning.call_count, 1)
+
+    def test_run(self):
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 10
+        Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = ["OpenStack:3", "OpenStack@server.com:2"]
+        running = {}
+        max_running = {}
+        lock = threading.Lock()
+
+        def operation(endpoint, value):
+            with lock:
+                running[endpoint] = running.get(endpoint, 0) + 1
+                max_running[endpoint] = max(max_running.get(endpoint, 0), running[endpoint])
+            time.sleep(0.2)
+            with lock:
+                running[endpoint] -= 1
+            return value
+
+        clouds = [self.get_cloud("OpenStack"), self.get_cloud("OpenStack", "other.com"), self.get_cloud("EC2")]
+        tasks = [(cloud, operation, (cloud.get_endpoint(), i)) for i in range(4) for cloud in clouds]
+        self.assertEqual(CloudExecutor.run("inf1", tasks), [i for i in range(4) for _ in clouds])
+        # The limits of the endpoints and the types are respected
+        self.assertEqual(max_running["OpenStack@server.com"], 2)
+        self.assertLessEqual(max_running["OpenStack@server.com"] + max_running["OpenStack@other.com"], 4)
+        self.assertEqual(max_running["EC2@server.com"], 4)
+        self.assertEqual(CloudExecutor.get_running(), {})
+
+        # The errors are raised when all the tasks have finished
+        def error():
+            raise Exception("Operation error")
+        tasks = [(clouds[2], error, ()), (clouds[2], operation, ("EC2@server.com", 0))]
+        self.assertRaises(Exception, CloudExecutor.run, "inf1", tasks)
+        self.assertEqual(running["EC2@server.com"], 0)
+
+        # Nested operations are performed in the worker thread
+        tasks = [(clouds[0], lambda: CloudExecutor.run("inf1", [(clouds[0], operation, ("nested", 1))]), ())]
+        self.assertEqual(CloudExecutor.run("inf1", tasks), [[1]])
+
+    def test_infrastructure_limit(self):
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 2
+        running = {}
+        max_running = {}
+        lock = threading.Lock()
+
+        def operation(inf_id):
+            with lock:
+                running[inf_id] = running.get(inf_id, 0) + 1
+                max_running[inf_id] = max(max_running.get(inf_id, 0), running[inf_id])
+            time.sleep(0.1)
+            with lock:
+                running[inf_id] -= 1
+
+        cloud = self.get_cloud("OpenStack")
+        tasks = [CloudExecutor.submit(inf_id, cloud, operation, inf_id) for inf_id in ["inf1", "inf2"] * 4]
+        for task in tasks:
+            task.get()
+        # MAX_SIMULTANEOUS_LAUNCHES limits each infrastructure, not the executor
+        self.assertEqual(max_running, {"inf1": 2, "inf2": 2})
+        self.assertGreater(CloudExecutor._workers, 2)
+        # The counters of the finished operations are removed
+        for _ in range(100):
+            if not CloudExecutor._running:
+                break
+            time.sleep(0.01)
+        self.assertEqual(CloudExecutor._running, {})
+
+    def test_fairness(self):
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 2
+        Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = ["*:1"]
+        cloud = self.get_cloud("OpenStack")
+        order = []
+        event = threading.Event()
+
+        def operation(inf_id):
+            event.wait(5)
+            order.append(inf_id)
+
+        tasks = [CloudExecutor.submit("inf1", cloud, operation, "inf1") for _ in range(3)]
+        while not CloudExecutor.get_running():
+            time.sleep(0.01)
+        tasks += [CloudExecutor.submit("inf2", cloud, operation, "inf2") for _ in range(2)]
+        self.assertEqual(CloudExecutor.get_running(), {(("endpoint", "OpenStack@server.com"),): 1})
+        self.assertEqual(CloudExecutor.get_queued(), {(("endpoint", "OpenStack@server.com"),): 4})
+        event.set()
+        for task in tasks:
+            task.get()
+        # The queues of the infrastructures are served in turns
+        self.assertEqual(order, ["inf1", "inf2", "inf1", "inf2", "inf1"])
+        self.assertEqual(CloudExecutor.get_queued(), {})
+
+    def test_map(self):
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 10
+        Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = ["OpenStack@server.com:3"]
+        cloud = self.get_cloud("OpenStack")
+        running = [0]
+        max_running = [0]
+        lock = threading.Lock()
+
+        def operation(value):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.1)
+            with lock:
+                running[0] -= 1
+            return value * 2
+
+        def batch_operation():
+            return CloudExecutor.map("inf1", cloud, operation, list(range(6)))
+
+        # From a task the operations use its slot and the free slots of the endpoint
+        other = CloudExecutor.submit("inf2", cloud, time.sleep, 0.5)
+        while not CloudExecutor.get_running():
+            time.sleep(0.01)
+        self.assertEqual(CloudExecutor.run("inf1", [(cloud, batch_operation, ())]), [[0, 2, 4, 6, 8, 10]])
+        self.assertEqual(max_running[0], 2)
+        other.get()
+        self.assertEqual(CloudExecutor.get_running(), {})
+
+        # Outside a task they are submitted to the executor
+        max_running[0] = 0
+        self.assertEqual(CloudExecutor.map("inf1", cloud, operation, [1, 2, 3, 4]), [2, 4, 6, 8])
+        self.assertEqual(max_running[0], 3)
+
+    def test_inline(self):
+        # With one thread the operations are performed in the calling thread
+        thread = threading.current_thread()
+        cloud = self.get_cloud("OpenStack")
+        task = CloudExecutor.submit("inf1", cloud, threading.current_thread)
+        self.assertIs(task.get(), thread)
+        self.assertEqual(CloudExecutor._workers, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
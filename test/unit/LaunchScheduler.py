@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.CloudExecutor import CloudExecutor
+from IM.LaunchScheduler import LaunchScheduler
+from IM.config import Config
+from mock import MagicMock
+
+
+class TestLaunchScheduler(unittest.TestCase):
+    """
+    Class to test the LaunchScheduler class
+    """
+
+    def setUp(self):
+        CloudExecutor._reinit()
+
+    def tearDown(self):
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 1
+        CloudExecutor._reinit()
+
+    @staticmethod
+    def get_cloud(cloud_type, server="server.com"):
+        cloud = MagicMock()
+        cloud.cloud.type = cloud_type
+        cloud.cloud.server = server
+        return cloud
+
+    @staticmethod
+    def get_deploy(deploy_id):
+        deploy = MagicMock()
+        deploy.id = deploy_id
+        return deploy
+
+    def test_launch(self):
+        launched = []
+
+        def launch(deploy, cloud_id, cloud):
+            launched.append((deploy.id, cloud_id))
+
+        groups = [([self.get_deploy("s0"), self.get_deploy("s1")], "cloud0", self.get_cloud("OpenStack")),
+                  ([self.get_deploy("s2")], "cloud1", self.get_cloud("EC2"))]
+
+        # The deploys of the groups are interleaved
+        times = LaunchScheduler.launch("infid", groups, launch)
+        self.assertEqual(launched, [("s0", "cloud0"), ("s2", "cloud1"), ("s1", "cloud0")])
+        self.assertEqual([(t["cloud_id"], t["deploys"]) for t in times],
+                         [("cloud0", ["s0", "s1"]), ("cloud1", ["s2"])])
+
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 3
+        launched = []
+        LaunchScheduler.launch("infid", groups, launch)
+        self.assertEqual(sorted(launched), [("s0", "cloud0"), ("s1", "cloud0"), ("s2", "cloud1")])
+
+        # The errors are raised to the caller
+        def launch_error(deploy, cloud_id, cloud):
+            raise Exception("Launch error")
+        self.assertRaises(Exception, LaunchScheduler.launch, "infid", groups, launch_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,6 +18,7 @@
 
 import os
 import json
+import zlib
 import unittest
 import sys
 from io import BytesIO
@@ -26,6 +27,7 @@ from IM.InfrastructureInfo import InfrastructureInfo
 from IM.auth import Authentication
 from IM.VirtualMachine import VirtualMachine
 from radl.radl_parse import parse_radl
+from radl.radl_json import radlToSimple
 
 sys.path.append("..")
 sys.path.append(".")
@@ -54,10 +56,17 @@ from IM.REST import (RESTDestroyInfrastructure,
                      RESTStopVM,
                      RESTRebootVM,
                      RESTGeVersion,
+                     RESTGetMetrics,
+                     RESTGetProfiles,
+                     RESTGetProfile,
+                     profile_request,
+                     trace_request,
                      RESTCreateDiskSnapshot,
                      RESTImportInfrastructure,
                      return_error,
-                     format_output)
+                     format_output,
+                     compress_output,
+                     app)
 
 
 def read_file_as_bytes(file_name):
@@ -87,6 +96,21 @@ class TestREST(unittest.TestCase):
         self.assertEqual(res, ('{"uri-list": [{"uri": "http://imserver.com/infrastructures/1"},'
                                ' {"uri": "http://imserver.com/infrastructures/2"}]}'))
 
+        bottle_request.params = {'filter': 'hadoop', 'limit': '1', 'offset': '1'}
+        GetInfrastructureList.return_value = ["2"]
+        res = RESTGetInfrastructureList()
+        self.assertEqual(res, '{"uri-list": [{"uri": "http://imserver.com/infrastructures/2"}]}')
+        self.assertEqual(GetInfrastructureList.call_args_list[1][0][1:], ('hadoop', 1, 1))
+
+        bottle_request.params = {'limit': 'a'}
+        res = RESTGetInfrastructureList()
+        self.assertEqual(json.loads(res), {"message": "Incorrect value in limit parameter", "code": 400})
+
+        bottle_request.params = {'offset': '-1'}
+        res = RESTGetInfrastructureList()
+        self.assertEqual(json.loads(res), {"message": "Incorrect value in offset parameter", "code": 400})
+
+        bottle_request.params = {}
         GetInfrastructureList.side_effect = InvaliddUserException()
         res = RESTGetInfrastructureList()
         res = json.loads(res)
@@ -191,6 +215,13 @@ class TestREST(unittest.TestCase):
 
         res = RESTGetInfrastructureProperty("1", "state")
         self.assertEqual(json.loads(res)["state"]["state"], "running")
+        self.assertFalse(GetInfrastructureState.call_args_list[0][0][2])
+
+        bottle_request.params = {'refresh': 'yes'}
+        res = RESTGetInfrastructureProperty("1", "state")
+        self.assertEqual(json.loads(res)["state"]["state"], "running")
+        self.assertTrue(GetInfrastructureState.call_args_list[1][0][2])
+        bottle_request.params = {}
 
         res = RESTGetInfrastructureProperty("1", "contmsg")
         self.assertEqual(res, "contmsg")
@@ -355,6 +386,12 @@ class TestREST(unittest.TestCase):
         bottle_request.headers["Accept"] = "text/*"
         res = RESTGetVMInfo("1", "1")
         self.assertEqual(res, 'system test (\ncpu.count = 1\n)\n\n')
+        self.assertFalse(GetVMInfo.call_args_list[0][1]["refresh"])
+
+        bottle_request.params = {'refresh': 'true'}
+        res = RESTGetVMInfo("1", "1")
+        self.assertEqual(res, 'system test (\ncpu.count = 1\n)\n\n')
+        self.assertTrue(GetVMInfo.call_args_list[2][1]["refresh"])
 
         GetVMInfo.side_effect = DeletedInfrastructureException()
         res = RESTGetVMInfo("1", "1")
@@ -822,6 +859,98 @@ class TestREST(unittest.TestCase):
         res = RESTImportInfrastructure()
         self.assertEqual(res, "http://imserver.com/infrastructures/newid")
 
+    @patch("IM.metrics.Metrics.generate_latest")
+    @patch("bottle.request")
+    def test_GetMetrics(self, bottle_request, generate_latest):
+        """Test REST GetMetrics."""
+        bottle_request.headers = {"Accept": "application/json"}
+        generate_latest.return_value = "im_request_queue_size 0\n"
+        res = RESTGetMetrics()
+        self.assertEqual(json.loads(res), {"message": "Metrics are not activated", "code": 404})
+
+        Config.ACTIVATE_METRICS = True
+        Config.METRICS_TOKEN = "metricstoken"
+        try:
+            res = RESTGetMetrics()
+            self.assertEqual(json.loads(res), {"message": "Incorrect metrics token", "code": 401})
+            bottle_request.headers["Authorization"] = "Bearer othertoken"
+            res = RESTGetMetrics()
+            self.assertEqual(json.loads(res), {"message": "Incorrect metrics token", "code": 401})
+
+            bottle_request.headers["Authorization"] = "Bearer metricstoken"
+            res = RESTGetMetrics()
+            self.assertEqual(res, "im_request_queue_size 0\n")
+        finally:
+            Config.ACTIVATE_METRICS = False
+            Config.METRICS_TOKEN = ""
+
+    @patch("bottle.response")
+    @patch("bottle.request")
+    def test_profile(self, bottle_request, bottle_response):
+        """Test REST profiling."""
+        from IM.profiler import Profiler
+        Profiler._reinit()
+        Config.PROFILE_SECRET = "secret"
+
+        def RESTTest():
+            return "res"
+
+        bottle_request.headers = {"Accept": "application/json", "X-IM-Profile": "other"}
+        self.assertEqual(profile_request(RESTTest)(), "res")
+        self.assertEqual(RESTGetProfiles(), '{"message": "Incorrect profiling secret", "code": 403}')
+
+        bottle_request.headers = {"Accept": "application/json", "X-IM-Profile": "secret"}
+        self.assertEqual(profile_request(RESTTest)(), "res")
+        self.assertEqual(bottle_response.set_header.call_args_list[0][0][0], 'X-IM-Profile-Id')
+        req_id = bottle_response.set_header.call_args_list[0][0][1]
+
+        res = json.loads(RESTGetProfiles())
+        self.assertEqual(len(res["profiles"]), 1)
+        self.assertEqual(res["profiles"][0]["id"], req_id)
+        self.assertEqual(res["profiles"][0]["operation"], "RESTTest")
+
+        bottle_request.headers = {"Accept": "text/plain", "X-IM-Profile": "secret"}
+        res = RESTGetProfile(req_id)
+        self.assertIn("function calls", res)
+        res = RESTGetProfile("noid")
+        self.assertEqual(res, "Profile noid does not exist")
+
+        # The requests to the profiles routes are not profiled
+        for rule in ['/profiles', '/profiles/:reqid']:
+            route = [r for r in app.routes if r.rule == rule][0]
+            self.assertNotIn(profile_request, route.all_plugins())
+        bottle_request.headers = {"Accept": "application/json", "X-IM-Profile": "secret"}
+        route = [r for r in app.routes if r.rule == '/profiles'][0]
+        res = json.loads(route.call())
+        self.assertEqual([p["id"] for p in res["profiles"]], [req_id])
+        self.assertEqual(len(json.loads(RESTGetProfiles())["profiles"]), 1)
+        Config.PROFILE_SECRET = ""
+
+    @patch("bottle.request")
+    def test_trace_request(self, bottle_request):
+        """Test REST tracing."""
+        from IM.tracing import Tracer
+        Config.TRACING_EXPORTER = "memory"
+        Tracer._reinit()
+
+        def RESTTest():
+            with Tracer.span("child"):
+                return "res"
+
+        bottle_request.headers = {"traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"}
+        bottle_request.method = "GET"
+        bottle_request.path = "/test"
+        self.assertEqual(trace_request(RESTTest)(), "res")
+        child, root = Tracer.exporter.get_finished_spans()
+        Config.TRACING_EXPORTER = ""
+        Tracer._reinit()
+
+        self.assertEqual(root.name, "RESTTest")
+        self.assertEqual(root.trace_id, "0af7651916cd43dd8448eb211c80319c")
+        self.assertEqual(root.parent_id, "b7ad6b7169203331")
+        self.assertEqual(root.attributes, {"http.method": "GET", "http.target": "/test"})
+        self.assertEqual(child.parent_id, root.span_id)
+
     @patch("IM.REST.get_media_type")
     def test_return_error(self, get_media_type):
         get_media_type.return_value = ["application/json"]
@@ -872,6 +1001,65 @@ class TestREST(unittest.TestCase):
         info = format_output(["1", "2"])
         self.assertEqual(info, 'Unsupported Accept Media Types: application/zip')
 
+    @patch("IM.REST.get_media_type")
+    def test_format_output_stream(self, get_media_type):
+        old_size = Config.REST_STREAMING_MIN_SIZE
+        Config.REST_STREAMING_MIN_SIZE = 10
+        try:
+            get_media_type.return_value = ["application/json"]
+            info = format_output({"out1": "value1", "out2": "value2"}, field_name="outputs")
+            self.assertNotIsInstance(info, str)
+            self.assertEqual(json.loads("".join(info)), {"outputs": {"out1": "value1", "out2": "value2"}})
+
+            get_media_type.return_value = ["text/*"]
+            info = format_output(["line1", "line2"])
+            self.assertEqual("".join(info), 'line1\nline2')
+            info = format_output("contmsg" * 20000, field_name="contmsg")
+            chunks = list(info)
+            self.assertEqual(len(chunks), 3)
+            self.assertEqual("".join(chunks), "contmsg" * 20000)
+
+            # The RADL documents are serialized element by element
+            radl = parse_radl("network net (outbound = 'yes')\n"
+                              "system s0 (net_interface.0.connection = 'net')\n"
+                              "system s1 (net_interface.0.connection = 'net')\n"
+                              "deploy s0 1")
+            info = format_output(radl, field_name="radl")
+            self.assertNotIsInstance(info, str)
+            self.assertEqual("".join(info), str(radl))
+            get_media_type.return_value = ["application/json"]
+            info = format_output(radl, field_name="radl")
+            self.assertNotIsInstance(info, str)
+            self.assertEqual(json.loads("".join(info)), {"radl": radlToSimple(radl)})
+
+            res = [{"uri": "http://server.com/infrastructures/%d" % i} for i in range(10)]
+            info = format_output(res, default_type="application/json", field_name="uri-list")
+            self.assertEqual(json.loads("".join(info)), {"uri-list": res})
+        finally:
+            Config.REST_STREAMING_MIN_SIZE = old_size
+
+    @patch("bottle.response")
+    @patch("bottle.request")
+    def test_compress_output(self, bottle_request, bottle_response):
+        bottle_response.headers = {}
+        body = "contmsg" * 1000
+
+        bottle_request.headers = {}
+        res = compress_output(lambda: body)()
+        self.assertEqual(res, body)
+
+        bottle_request.headers = {"Accept-Encoding": "gzip, deflate"}
+        res = compress_output(lambda: "small")()
+        self.assertEqual(res, "small")
+        res = compress_output(lambda: body)()
+        self.assertEqual(zlib.decompress(res, 16 + zlib.MAX_WBITS).decode(), body)
+        self.assertEqual(bottle_response.set_header.call_args_list[-1][0], ('Content-Encoding', 'gzip'))
+
+        bottle_request.headers = {"Accept-Encoding": "gzip;q=0, deflate"}
+        res = compress_output(lambda: (chunk for chunk in [body, body]))()
+        self.assertEqual(zlib.decompress(b"".join(res)).decode(), body + body)
+        self.assertEqual(bottle_response.set_header.call_args_list[-1][0], ('Content-Encoding', 'deflate'))
+
     @patch("IM.VirtualMachine.SSH")
     @patch("IM.InfrastructureManager.InfrastructureManager.get_infrastructure")
     @patch("IM.InfrastructureManager.InfrastructureManager.check_auth_data")
@@ -79,7 +79,7 @@ class TestServiceRequests(unittest.TestCase):
     def test_list(self, inflist):
         import IM.ServiceRequests
         req = IM.ServiceRequests.IMBaseRequest.create_request(IM.ServiceRequests.IMBaseRequest.GET_INFRASTRUCTURE_LIST,
-                                                              ("", ".*"))
+                                                              ("", ".*", None, 0))
         req._call_function()
 
     @patch('IM.InfrastructureManager.InfrastructureManager')
@@ -179,6 +179,25 @@ class TestServiceRequests(unittest.TestCase):
         req = IM.ServiceRequests.IMBaseRequest.create_request(IM.ServiceRequests.IMBaseRequest.GET_VERSION)
         req._call_function()
 
+    @patch('IM.InfrastructureManager.InfrastructureManager')
+    def test_profile(self, inflist):
+        import IM.ServiceRequests
+        from IM.config import Config
+        from IM.profiler import Profiler
+        Profiler._reinit()
+        Config.PROFILE_SECRET = "secret"
+        auth = [{"type": "InfrastructureManager", "username": "user", "password": "pass", "profile": "secret"}]
+        req = IM.ServiceRequests.IMBaseRequest.create_request(IM.ServiceRequests.IMBaseRequest.GET_INFRASTRUCTURE_INFO,
+                                                              ("", auth))
+        self.assertTrue(req._execute())
+        Config.PROFILE_SECRET = ""
+        self.assertNotIn("profile", auth[0])
+        profiles = Profiler.get_profile_list()
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]["operation"], "GetInfrastructureInfo")
+        self.assertEqual(req.profile_id, profiles[0]["id"])
+        self.assertIn("function calls", Profiler.get_profile(profiles[0]["id"], True))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from datetime import datetime, timedelta
+from IM.VMPoller import VMPoller
+from IM.VirtualMachine import VirtualMachine
+from IM.InfrastructureInfo import InfrastructureInfo
+from IM.InfrastructureList import InfrastructureList
+from IM.InfrastructureManager import InfrastructureManager as IM
+from IM.auth import Authentication
+from IM.config import Config
+from mock import patch, MagicMock
+
+
+class TestVMPoller(unittest.TestCase):
+    """
+    Class to test the VMPoller class
+    """
+
+    def setUp(self):
+        VMPoller._last_poll = {}
+        self.auth = Authentication([{'type': 'InfrastructureManager', 'username': 'user', 'password': 'pass'},
+                                    {'id': 'one', 'type': 'Dummy'}])
+        self.inf = InfrastructureInfo()
+        self.inf.auth = Authentication([self.auth.getAuthInfo('InfrastructureManager')[0]])
+        self.vms = []
+        for i, state in enumerate([VirtualMachine.PENDING, VirtualMachine.RUNNING]):
+            vm = MagicMock()
+            vm.im_id = i
+            vm.state = state
+            vm.destroy = False
+            vm.last_update = 0
+            vm.need_update.return_value = True
+            vm.is_configured.return_value = True
+            self.vms.append(vm)
+        self.inf.vm_list = self.vms
+        InfrastructureList.infrastructure_list = {self.inf.id: self.inf}
+
+    def tearDown(self):
+        VMPoller.stop()
+        InfrastructureList.infrastructure_list = {}
+
+    def test_get_interval(self):
+        self.assertEqual(VMPoller.get_interval(self.vms[0]), Config.VM_POLLER_FAST_INTERVAL)
+        self.assertEqual(VMPoller.get_interval(self.vms[1]), Config.VM_POLLER_SLOW_INTERVAL)
+        # VM being contextualized
+        self.vms[1].is_configured.return_value = None
+        self.assertEqual(VMPoller.get_interval(self.vms[1]), Config.VM_POLLER_FAST_INTERVAL)
+
+    @patch('IM.InfrastructureInfo.InfrastructureInfo.update_vms_status')
+    def test_poll(self, update_vms_status):
+        # Infrastructures without auth data are not polled
+        VMPoller.poll()
+        self.assertEqual(update_vms_status.call_count, 0)
+
+        self.inf.last_auth = self.auth
+        VMPoller.poll()
+        self.assertEqual(update_vms_status.call_count, 1)
+        self.assertEqual(update_vms_status.call_args[1]["vm_list"], self.vms)
+
+        # Failed updates are not retried before the interval
+        VMPoller.poll()
+        self.assertEqual(update_vms_status.call_count, 1)
+
+        # Only the pending VM reaches its interval
+        now = int(time.time())
+        self.vms[0].last_update = now - Config.VM_POLLER_FAST_INTERVAL
+        self.vms[1].last_update = now - Config.VM_POLLER_FAST_INTERVAL
+        VMPoller._last_poll = {}
+        VMPoller.poll()
+        self.assertEqual(update_vms_status.call_count, 2)
+        self.assertEqual(update_vms_status.call_args[1]["vm_list"], [self.vms[0]])
+
+        # Idle infrastructures are not polled
+        VMPoller._last_poll = {}
+        self.inf.last_access = datetime.now() - timedelta(seconds=Config.VM_POLLER_IDLE_TIME + 1)
+        VMPoller.poll()
+        self.assertEqual(update_vms_status.call_count, 2)
+
+    @patch('IM.InfrastructureInfo.InfrastructureInfo.update_vms_status')
+    def test_get_state(self, update_vms_status):
+        now = int(time.time())
+        for vm in self.vms:
+            vm.last_update = now
+        Config.VM_POLLER = True
+        try:
+            with patch('IM.InfrastructureManager.InfrastructureManager.check_auth_data', side_effect=lambda a: a):
+                with patch('IM.InfrastructureList.InfrastructureList.get_inf_ids', return_value=[self.inf.id]):
+                    VMPoller.start()
+                    self.assertTrue(VMPoller.is_active())
+                    # the VMs updated recently are not requested to the cloud provider
+                    res = IM.GetInfrastructureState(self.inf.id, self.auth)
+                    self.assertEqual(res["state"], VirtualMachine.PENDING)
+                    self.assertEqual(update_vms_status.call_args[1]["vm_list"], [])
+                    self.assertEqual(self.inf.last_auth, self.auth)
+
+                    res = IM.GetInfrastructureState(self.inf.id, self.auth, refresh=True)
+                    self.assertEqual(update_vms_status.call_args[1]["vm_list"], self.vms)
+                    self.assertTrue(update_vms_status.call_args[1]["force"])
+
+                    VMPoller.stop()
+                    self.assertFalse(VMPoller.is_active())
+                    res = IM.GetInfrastructureState(self.inf.id, self.auth)
+                    self.assertEqual(update_vms_status.call_args[1]["vm_list"], self.vms)
+                    self.assertFalse(update_vms_status.call_args[1]["force"])
+        finally:
+            Config.VM_POLLER = False
+
+
+if __name__ == '__main__':
+    unittest.main()
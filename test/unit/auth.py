@@ -16,6 +16,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import itertools
 import unittest
 import os
 import shutil
@@ -23,6 +24,35 @@ import shutil
 from IM.auth import Authentication
 
 
+def old_get_auth_info(auth_list, auth_type, host=None):
+    """Previous implementation of Authentication.getAuthInfo (linear scan)"""
+    res = []
+    for auth in auth_list:
+        if 'type' in auth and auth['type'] == auth_type:
+            if host:
+                if 'host' in auth and auth['host'].find(host) != -1:
+                    res.append(auth)
+            else:
+                res.append(auth)
+    return res
+
+
+def old_compare(auth_list, other_auth_list, auth_type, host=None):
+    """Previous implementation of Authentication.compare (field by field)"""
+    auth_with_type = old_get_auth_info(auth_list, auth_type, host)
+    other_auth_with_type = old_get_auth_info(other_auth_list, auth_type, host)
+    if not auth_with_type or not other_auth_with_type:
+        return False
+    auth_with_type = auth_with_type[0]
+    other_auth_with_type = other_auth_with_type[0]
+    if len(auth_with_type) != len(other_auth_with_type):
+        return False
+    for key in auth_with_type.keys():
+        if key != "id" and auth_with_type[key] != other_auth_with_type.get(key):
+            return False
+    return True
+
+
 class TestAuth(unittest.TestCase):
     """
     Class to test the Authentication class
@@ -66,6 +96,61 @@ class TestAuth(unittest.TestCase):
             auth = Authentication(Authentication.read_auth_data(auth_lines))
         self.assertEqual("Incorrect value in auth item id: 1a", str(ex.exception))
 
+    def test_index_equivalence(self):
+        auth_lists = [
+            [{'id': 'one', 'type': 'OpenNebula', 'host': 'server.com:2633', 'username': 'user', 'password': 'pass'},
+             {'id': 'one2', 'type': 'OpenNebula', 'host': 'other.com:2633', 'username': 'user', 'password': 'pass'},
+             {'id': 'ost', 'type': 'OpenStack', 'host': 'https://os.com:5000', 'username': 'u', 'password': 'p',
+              'tenant': 't'},
+             {'type': 'InfrastructureManager', 'username': 'user', 'password': 'pass'}],
+            [{'id': 'one_b', 'type': 'OpenNebula', 'host': 'server.com:2633', 'username': 'user', 'password': 'pass'},
+             {'id': 'ost', 'type': 'OpenStack', 'host': 'https://os.com:5000', 'username': 'u', 'password': 'p2',
+              'tenant': 't'},
+             {'id': 'ec2', 'type': 'EC2', 'username': 'ak', 'password': 'sk'}],
+            [{'id': 'one', 'type': 'OpenNebula', 'host': 'other.com:2633', 'username': 'user', 'password': 'pass'},
+             {'id': 'ost', 'type': 'OpenStack', 'host': 'https://os.com:5000', 'username': 'u', 'password': 'p',
+              'tenant': 't', 'domain': 'd'},
+             {'id': 'ec2', 'type': 'EC2', 'username': 'ak', 'password': 'sk'}],
+            [],
+        ]
+        queries = [("OpenNebula", None), ("OpenNebula", "server.com"), ("OpenNebula", "other.com"),
+                   ("OpenNebula", "none.com"), ("OpenStack", None), ("OpenStack", "os.com"), ("EC2", None),
+                   ("InfrastructureManager", None), ("Kubernetes", None)]
+
+        for auth_list in auth_lists:
+            auth = Authentication(auth_list)
+            for auth_type, host in queries:
+                self.assertEqual(auth.getAuthInfo(auth_type, host), old_get_auth_info(auth_list, auth_type, host))
+            for auth_id in ["one", "one2", "ost", "ec2", "none"]:
+                self.assertEqual(auth.getAuthInfoByID(auth_id),
+                                 [a for a in auth_list if 'id' in a and a['id'] == auth_id])
+            # An Authentication created from other shares the index
+            self.assertEqual(Authentication(auth).getAuthInfo("OpenStack"), auth.getAuthInfo("OpenStack"))
+
+        for auth_list, other_auth_list in itertools.product(auth_lists, repeat=2):
+            auth = Authentication(auth_list)
+            other_auth = Authentication(other_auth_list)
+            for auth_type, host in queries:
+                self.assertEqual(auth.compare(other_auth, auth_type, host),
+                                 old_compare(auth_list, other_auth_list, auth_type, host),
+                                 "Different result comparing %s (%s)" % (auth_type, host))
+
+    def test_fingerprint(self):
+        auth_data = {'id': 'one', 'type': 'OpenNebula', 'host': 'server.com', 'username': 'user', 'password': 'pass'}
+        auth = Authentication([auth_data])
+        other_auth = Authentication([dict(auth_data, id="other")])
+        self.assertEqual(auth.get_fingerprint("OpenNebula"), other_auth.get_fingerprint("OpenNebula"))
+        self.assertEqual(auth.get_fingerprint("OpenNebula"),
+                         Authentication.get_item_fingerprint(dict(reversed(list(auth_data.items())))))
+        self.assertIsNone(auth.get_fingerprint("EC2"))
+        self.assertIsNone(auth.get_fingerprint("OpenNebula", "other.com"))
+        self.assertNotIn("pass", auth.get_fingerprint("OpenNebula"))
+
+        # The fingerprint identifies the credentials as they were provided
+        auth_data["password"] = "new_pass"
+        self.assertEqual(auth.get_fingerprint("OpenNebula"), other_auth.get_fingerprint("OpenNebula"))
+        self.assertTrue(auth.compare(other_auth, "OpenNebula"))
+
 
 if __name__ == '__main__':
     unittest.main()
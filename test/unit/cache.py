@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.cache import TTLCache
+from IM.config import Config
+from IM.metrics import Metrics
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Class to test the TTLCache class
+    """
+
+    def setUp(self):
+        Config.ACTIVATE_METRICS = True
+
+    def tearDown(self):
+        Config.ACTIVATE_METRICS = False
+
+    def test_cache(self):
+        Metrics._reinit()
+        cache = TTLCache("test", max_size=2)
+        cache.put("key1", "value1", 0.5)
+        cache.put("key2", None, 10)
+        cache.put("key3", "value3", 0)
+        self.assertEqual(cache.get("key1"), (True, "value1"))
+        self.assertEqual(cache.get("key2"), (True, None))
+        self.assertEqual(cache.get("key3"), (False, None))
+
+        time.sleep(0.6)
+        self.assertEqual(cache.get("key1"), (False, None))
+
+        cache.put("key1", "value1", 10)
+        cache.put("key3", "value3", 10)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("key2"), (False, None))
+        cache.invalidate("key1")
+        self.assertEqual(cache.get("key1"), (False, None))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+        self.assertNotEqual(TTLCache.hash_key("token"), "token")
+        self.assertEqual(TTLCache.hash_key("a", "b"), TTLCache.hash_key("a", "b"))
+
+        res = Metrics.generate_latest()
+        self.assertIn('im_cache_hits_total{cache="test"} 2\n', res)
+        self.assertIn('im_cache_misses_total{cache="test"} 4\n', res)
+
+
+if __name__ == '__main__':
+    unittest.main()
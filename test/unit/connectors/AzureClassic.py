@@ -49,7 +49,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
         cloud = AzureClassicCloudConnector(cloud_info, inf)
         return cloud
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_10_concrete(self, requests):
         radl_data = """
             network net ()
@@ -137,7 +137,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
 
         return resp
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('time.sleep')
     @patch('IM.InfrastructureList.InfrastructureList.save_data')
     def test_20_launch(self, save_data, sleep, requests):
@@ -172,7 +172,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: launching a VM.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_30_updateVMInfo(self, requests):
         radl_data = """
             network net (outbound = 'yes')
@@ -204,7 +204,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: updating VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('time.sleep')
     def test_40_stop(self, sleep, requests):
         auth = Authentication([{'id': 'azure', 'type': 'AzureClassic', 'subscription_id': 'user',
@@ -221,7 +221,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: stopping VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('time.sleep')
     def test_50_start(self, sleep, requests):
         auth = Authentication([{'id': 'azure', 'type': 'AzureClassic', 'subscription_id': 'user',
@@ -238,7 +238,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: stopping VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('time.sleep')
     def test_55_alter(self, sleep, requests):
         radl_data = """
@@ -277,7 +277,7 @@ class TestAzureClassicConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: modifying VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('time.sleep')
     def test_60_finalize(self, sleep, requests):
         auth = Authentication([{'id': 'azure', 'type': 'AzureClassic', 'subscription_id': 'user',
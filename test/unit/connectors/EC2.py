@@ -16,7 +16,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import shutil
 import sys
+import tempfile
+import threading
+import time
 import unittest
 
 sys.path.append(".")
@@ -27,7 +32,8 @@ from IM.auth import Authentication
 from radl import radl_parse
 from IM.VirtualMachine import VirtualMachine
 from IM.InfrastructureInfo import InfrastructureInfo
-from IM.connectors.EC2 import EC2CloudConnector
+from IM.connectors.EC2 import EC2CloudConnector, InstanceTypeInfo, InstanceTypeCatalog
+from IM.config import Config
 from mock import patch, MagicMock, call
 
 
@@ -45,6 +51,12 @@ class TestEC2Connector(TestCloudConnectorBase):
         cloud = EC2CloudConnector(cloud_info, inf)
         return cloud
 
+    @classmethod
+    def tearDownClass(cls):
+        # Wait the catalog download started in background, so that it does not log in other tests
+        if InstanceTypeCatalog._refresh_thread:
+            InstanceTypeCatalog._refresh_thread.join()
+
     def test_10_concrete(self):
         radl_data = """
             network net ()
@@ -70,6 +82,10 @@ class TestEC2Connector(TestCloudConnectorBase):
 
     def test_15_get_all_instance_types(self):
         ec2_cloud = self.get_ec2_cloud()
+        # The catalog is downloaded in background
+        InstanceTypeCatalog.load()
+        if InstanceTypeCatalog._refresh_thread:
+            InstanceTypeCatalog._refresh_thread.join()
         instances = ec2_cloud.get_all_instance_types()
         self.assertGreater(len(instances), 20)
 
@@ -83,6 +99,125 @@ class TestEC2Connector(TestCloudConnectorBase):
                 self.assertEqual(instance.cores_per_cpu, 1)
                 self.assertEqual(instance.disk_space, 160)
 
+    @staticmethod
+    def get_ec2instances_data():
+        data = []
+        for name, vcpu, memory, price in [("t3.small", 2, 2, "0.02"), ("t3a.small", 2, 2, "0.0188"),
+                                          ("m5.large", 2, 8, "0.096"), ("t3.micro", 2, 1, "0.0104")]:
+            data.append({"instance_type": name, "arch": ["x86_64"], "vCPU": vcpu, "memory": memory,
+                         "pricing": {"us-east-1": {"linux": {"ondemand": price}}}, "storage": None,
+                         "ECU": "variable", "vpc_only": True, "GPU": 0})
+        return data
+
+    @patch('requests.get')
+    def test_16_instance_type_catalog(self, requests_get):
+        tmp_dir = tempfile.mkdtemp()
+        old_file = Config.EC2_INSTANCE_TYPES_FILE
+        Config.EC2_INSTANCE_TYPES_FILE = os.path.join(tmp_dir, "ec2_instance_types.json")
+        InstanceTypeCatalog._reinit()
+        requests_get.return_value.status_code = 200
+        requests_get.return_value.json.return_value = self.get_ec2instances_data()
+        try:
+            ec2_cloud = self.get_ec2_cloud()
+            # There is no copy of the catalog: it is downloaded in background
+            # and meanwhile the seed catalog is used
+            downloading = threading.Event()
+            requests_get.side_effect = lambda url: downloading.wait(5) and requests_get.return_value
+            self.assertGreater(len(ec2_cloud.get_all_instance_types()), 20)
+            radl = radl_parse.parse_radl("system test (cpu.count>=8 and memory.size>=32g)")
+            instance_type = ec2_cloud.get_instance_type(radl.systems[0])
+            self.assertGreaterEqual(instance_type.num_cpu * instance_type.cores_per_cpu, 8)
+            self.assertGreaterEqual(instance_type.mem, 32768)
+            downloading.set()
+            InstanceTypeCatalog._refresh_thread.join(5)
+            requests_get.side_effect = None
+
+            instances = ec2_cloud.get_all_instance_types()
+            self.assertEqual([i.name for i in instances], ["t3.micro", "t3a.small", "t3.small", "m5.large"])
+            self.assertEqual(requests_get.call_count, 1)
+            self.assertTrue(os.path.isfile(Config.EC2_INSTANCE_TYPES_FILE))
+
+            radl = radl_parse.parse_radl("system test (cpu.count>=2 and memory.size>=2g)")
+            self.assertEqual(ec2_cloud.get_instance_type(radl.systems[0]).name, "t3a.small")
+            radl = radl_parse.parse_radl("system test (cpu.count>=2 and memory.size>=2g and instance_type='t3.small')")
+            self.assertEqual(ec2_cloud.get_instance_type(radl.systems[0]).name, "t3.small")
+            self.assertEqual(ec2_cloud.get_instance_type_by_name("m5.large").mem, 8192)
+
+            # Next time the stored copy is used
+            InstanceTypeCatalog._reinit()
+            instances = ec2_cloud.get_all_instance_types()
+            self.assertEqual(len(instances), 4)
+            self.assertEqual(instances[0].price, 0.0104)
+            self.assertEqual(requests_get.call_count, 1)
+
+            # An expired catalog is returned while it is refreshed in background
+            InstanceTypeCatalog.last_update = time.time() - Config.EC2_INSTANCE_TYPES_TTL - 1
+            requests_get.return_value.json.return_value = self.get_ec2instances_data()[:2]
+            downloading = threading.Event()
+            requests_get.side_effect = lambda url: downloading.wait(5) and requests_get.return_value
+            self.assertEqual(len(ec2_cloud.get_all_instance_types()), 4)
+            downloading.set()
+            InstanceTypeCatalog._refresh_thread.join(5)
+            self.assertEqual(requests_get.call_count, 2)
+            self.assertEqual(len(ec2_cloud.get_all_instance_types()), 2)
+        finally:
+            Config.EC2_INSTANCE_TYPES_FILE = old_file
+            InstanceTypeCatalog._reinit()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_17_breaker_endpoint(self):
+        ec2_cloud = self.get_ec2_cloud()
+        radl = radl_parse.parse_radl("system test (disk.0.image.url = 'aws://us-east-1/ami-id')")
+        self.assertEqual(ec2_cloud.get_breaker_endpoint("concreteSystem", radl.systems[0], None), "EC2@us-east-1")
+        self.assertEqual(ec2_cloud.get_breaker_endpoint("launch", None, radl, radl, 1, None), "EC2@us-east-1")
+        vm = MagicMock()
+        vm.id = "eu-west-1;i-id"
+        self.assertEqual(ec2_cloud.get_breaker_endpoint("finalize", vm, True, None), "EC2@eu-west-1")
+        self.assertEqual(ec2_cloud.get_breaker_endpoint("updateVMInfoBatch", [vm], None), "EC2@eu-west-1")
+        vm.id = None
+        self.assertIsNone(ec2_cloud.get_breaker_endpoint("finalize", vm, True, None))
+
+    def test_18_no_instance_type_catalog(self):
+        tmp_dir = tempfile.mkdtemp()
+        old_file = Config.EC2_INSTANCE_TYPES_FILE
+        old_seed = InstanceTypeCatalog.SEED_FILE
+        Config.EC2_INSTANCE_TYPES_FILE = os.path.join(tmp_dir, "ec2_instance_types.json")
+        InstanceTypeCatalog.SEED_FILE = os.path.join(tmp_dir, "seed.json")
+        InstanceTypeCatalog._reinit()
+        # The download has just failed
+        InstanceTypeCatalog._last_refresh = time.time()
+        try:
+            # Without any catalog the requirements are not ignored: EC2 fails with a clear error
+            radl = radl_parse.parse_radl("""
+                system test (
+                cpu.count>=8 and
+                memory.size>=32g and
+                disk.0.image.url = 'aws://us-east-1/ami-id'
+                )""")
+            auth = Authentication([{'id': 'ec2', 'type': 'EC2', 'username': 'user', 'password': 'pass'}])
+            ec2_cloud = self.get_ec2_cloud()
+            with self.assertRaises(Exception) as ex:
+                ec2_cloud.concreteSystem(radl.systems[0], auth)
+            self.assertEqual(str(ex.exception), EC2CloudConnector.NO_CATALOG_ERROR)
+            self.assertIsNone(ec2_cloud.get_instance_type(radl.systems[0]))
+
+            with patch.object(ec2_cloud, "get_connection") as get_connection:
+                res = ec2_cloud.launch(MagicMock(), radl, radl, 2, auth)
+                self.assertEqual(res, [(False, EC2CloudConnector.NO_CATALOG_ERROR)] * 2)
+                self.assertEqual(get_connection.return_value.run_instances.call_count, 0)
+
+            vm = MagicMock()
+            vm.id = "us-east-1;id-1"
+            with patch.object(ec2_cloud, "get_instance_by_id") as get_instance_by_id:
+                res = ec2_cloud.alterVM(vm, radl, auth)
+                self.assertEqual(res, (False, EC2CloudConnector.NO_CATALOG_ERROR))
+                self.assertEqual(get_instance_by_id.return_value.modify_attribute.call_count, 0)
+        finally:
+            Config.EC2_INSTANCE_TYPES_FILE = old_file
+            InstanceTypeCatalog.SEED_FILE = old_seed
+            InstanceTypeCatalog._reinit()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
     def get_all_subnets(self, subnet_ids=None, filters=None):
         subnet = MagicMock()
         subnet.id = "subnet-id"
@@ -469,6 +604,67 @@ class TestEC2Connector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: updating VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
+    @patch('IM.connectors.EC2.EC2CloudConnector.get_instance_type_by_name')
+    @patch('IM.connectors.EC2.EC2CloudConnector.get_connection')
+    def test_35_updateVMInfoBatch(self, get_connection, get_instance_type_by_name):
+        radl_data = """
+            network net (outbound = 'yes')
+            system test (
+            cpu.count=1 and
+            memory.size=512m and
+            net_interface.0.connection = 'net' and
+            disk.0.os.name = 'linux' and
+            disk.0.image.url = 'aws://us-east-1/ami-id' and
+            disk.0.os.credentials.username = 'user'
+            )"""
+        radl = radl_parse.parse_radl(radl_data)
+        radl.check()
+
+        auth = Authentication([{'id': 'ec2', 'type': 'EC2', 'username': 'user', 'password': 'pass'}])
+        ec2_cloud = self.get_ec2_cloud()
+
+        inf = MagicMock()
+        inf.vm_list = []
+        vms = [VirtualMachine(inf, "us-east-1;id-%d" % num, ec2_cloud.cloud, radl, radl, ec2_cloud, num)
+               for num in range(1, 4)]
+
+        conn = MagicMock()
+        get_connection.return_value = conn
+        get_instance_type_by_name.return_value = InstanceTypeInfo("t1.micro", ["x86_64"], 1, 1, 613, 0.02, 1)
+
+        instances = []
+        for num in range(1, 4):
+            instance = MagicMock()
+            instance.id = "id-%d" % num
+            instance.tags = {"IM-USER": "user"}
+            instance.virtualization_type = "vt"
+            instance.placement = "us-east-1"
+            instance.state = "running"
+            instance.instance_type = "t1.micro"
+            instance.launch_time = "2016-12-31T00:00:00"
+            instance.ip_address = "158.42.1.%d" % num
+            instance.private_ip_address = "10.0.0.%d" % num
+            instance.connection = conn
+            instances.append(instance)
+        reservation = MagicMock()
+        # The instance id-3 is not returned in the list
+        reservation.instances = instances[:2]
+        reservation3 = MagicMock()
+        reservation3.instances = [instances[2]]
+        conn.get_all_instances.side_effect = [[reservation], [reservation3]]
+        conn.get_all_addresses.return_value = []
+
+        res = ec2_cloud.updateVMInfoBatch(vms, auth)
+        self.assertEqual(len(res), 3)
+        for num, (success, vm) in enumerate(res, 1):
+            self.assertTrue(success, msg="ERROR: updating VM info.")
+            self.assertEqual(vm.state, VirtualMachine.RUNNING)
+            self.assertEqual(vm.getPublicIP(), "158.42.1.%d" % num)
+        self.assertEqual(conn.get_all_instances.call_args_list, [call(["id-1", "id-2", "id-3"]), call(["id-3"])])
+        # Only the instance not found in the list is updated
+        self.assertEqual([instance.update.call_count for instance in instances], [0, 0, 1])
+        self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
+
     @patch('IM.connectors.EC2.EC2CloudConnector.get_connection')
     def test_40_stop(self, get_connection):
         auth = Authentication([{'id': 'ec2', 'type': 'EC2', 'username': 'user', 'password': 'pass'}])
@@ -702,6 +898,73 @@ class TestEC2Connector(TestCloudConnectorBase):
         self.assertEquals(conn.delete_internet_gateway.call_args_list, [call('ig-id')])
         self.assertEquals(conn.detach_internet_gateway.call_args_list, [call('ig-id', 'vpc-id')])
 
+    @patch('IM.connectors.EC2.EC2CloudConnector.get_connection')
+    @patch('time.sleep')
+    @patch('boto.route53.connect_to_region')
+    def test_65_finalize_batch(self, connect_to_region, sleep, get_connection):
+        radl_data = """
+            network net ()
+            system test (
+            cpu.count=1 and
+            net_interface.0.connection = 'net' and
+            disk.0.image.url = 'aws://us-east-one/ami-id' and
+            disk.0.os.credentials.username = 'user'
+            )"""
+        radl = radl_parse.parse_radl(radl_data)
+
+        auth = Authentication([{'id': 'ec2', 'type': 'EC2', 'username': 'user', 'password': 'pass'}])
+        ec2_cloud = self.get_ec2_cloud()
+
+        inf = MagicMock()
+        inf.id = "1"
+        inf.radl = radl
+        vms = [VirtualMachine(inf, "us-east-1;i-%d" % i, ec2_cloud.cloud, radl, radl, ec2_cloud, i)
+               for i in range(1, 4)]
+
+        conn = MagicMock()
+        get_connection.return_value = conn
+        conn.get_all_addresses.return_value = []
+        instance = MagicMock()
+        instance.state = "shutting-down"
+        terminated = MagicMock()
+        terminated.state = "terminated"
+        conn.get_only_instances.side_effect = [[instance, terminated, terminated], [terminated] * 3]
+
+        sg = MagicMock()
+        sg.name = "im-1"
+        sg.description = "Security group created by the IM"
+        sg.instances.return_value = []
+        conn.get_all_security_groups.side_effect = lambda filters: ([sg] if filters['group-name'] in ["im-1", "default"]
+                                                                    else [])
+        conn.get_all_subnets.return_value = []
+
+        dns_conn = MagicMock()
+        connect_to_region.return_value = dns_conn
+
+        res = ec2_cloud.finalizeBatch(vms, True, auth)
+
+        self.assertEqual(res, [(True, "")] * 3)
+        self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
+        # All the instances are terminated with one call
+        self.assertEqual(conn.terminate_instances.call_args_list, [call(["i-1", "i-2", "i-3"])])
+        self.assertEqual(conn.get_only_instances.call_count, 2)
+        # and the SGs are deleted only once
+        self.assertEqual(sg.delete.call_args_list, [call()])
+
+        # If the batch call fails they are terminated one by one
+        conn.terminate_instances.side_effect = Exception("Instance not found")
+        conn.get_only_instances.side_effect = [[terminated] * 3]
+        instances = [MagicMock(), MagicMock(), MagicMock()]
+        instances[1].terminate.side_effect = Exception("Error terminating")
+        sg.delete.reset_mock()
+        with patch.object(ec2_cloud, "get_instance_by_id", side_effect=instances):
+            res = ec2_cloud.finalizeBatch(vms, True, auth)
+        # and only the VM that fails is marked as failed
+        self.assertEqual(res, [(True, ""), (False, "Error terminating the instance: Error terminating. "),
+                               (True, "")])
+        self.assertEqual(instances[2].terminate.call_count, 1)
+        self.assertEqual(sg.delete.call_args_list, [call()])
+
     @patch('IM.connectors.EC2.EC2CloudConnector.get_connection')
     @patch('time.sleep')
     def test_70_create_snapshot(self, sleep, get_connection):
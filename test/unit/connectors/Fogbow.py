@@ -41,6 +41,11 @@ class TestFogBowConnector(TestCloudConnectorBase):
     Class to test the IM connectors
     """
 
+    def setUp(self):
+        FogBowCloudConnector.token_cache.clear()
+        FogBowCloudConnector.public_key_cache.clear()
+        TestCloudConnectorBase.setUp(self)
+
     @staticmethod
     def get_fogbow_cloud():
         cloud_info = CloudInfo()
@@ -202,7 +207,7 @@ class TestFogBowConnector(TestCloudConnectorBase):
     def request(self, method, url, body=None, headers=None):
         self.__class__.last_op = method, url
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.InfrastructureList.InfrastructureList.save_data')
     def test_20_launch(self, save_data, requests):
         radl_data = """
@@ -264,7 +269,7 @@ class TestFogBowConnector(TestCloudConnectorBase):
         self.assertEqual(data["compute"]["requirements"], {'sgx:epc_size': '8', 'gpu': 'true'})
         self.assertEqual(data["federatedNetworkId"], "1")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('time.sleep')
     def test_30_updateVMInfo(self, sleep, requests):
         radl_data = """
@@ -319,7 +324,7 @@ class TestFogBowConnector(TestCloudConnectorBase):
         data = json.loads(requests.call_args_list[9][1]["data"])
         self.assertEqual(data, {"computeId": "1", "device": "/dev/hdb", "volumeId": "1"})
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_60_finalize(self, requests):
         auth = Authentication([{'id': 'fogbow', 'type': 'FogBow', 'host': 'server.com',
                                 'username': 'user', 'password': 'pass', 'as_host': 'server1.com'}])
@@ -343,10 +348,10 @@ class TestFogBowConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: finalizing VM.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-        self.assertEqual(requests.call_args_list[6][0], ('DELETE', 'http://server.com:8182/publicIps/1'))
-        self.assertEqual(requests.call_args_list[8][0], ('DELETE', 'http://server.com:8182/attachments/1'))
-        self.assertEqual(requests.call_args_list[10][0], ('DELETE', 'http://server.com:8182/computes/1'))
-        self.assertEqual(requests.call_args_list[12][0], ('DELETE', 'http://server.com:8182/volumes/1'))
+        self.assertEqual(requests.call_args_list[4][0], ('DELETE', 'http://server.com:8182/publicIps/1'))
+        self.assertEqual(requests.call_args_list[5][0], ('DELETE', 'http://server.com:8182/attachments/1'))
+        self.assertEqual(requests.call_args_list[6][0], ('DELETE', 'http://server.com:8182/computes/1'))
+        self.assertEqual(requests.call_args_list[7][0], ('DELETE', 'http://server.com:8182/volumes/1'))
 
         vm.attachments = ["2"]
         vm.volumes = ["2"]
@@ -354,6 +359,46 @@ class TestFogBowConnector(TestCloudConnectorBase):
         self.assertFalse(success, msg="ERROR not detected finalizing VM.")
         self.assertEqual(msg, "Error deleting attachments.\nError deleting Volumes.")
 
+    @patch('IM.http_pool.HTTPPool.request')
+    def test_token_cache(self, requests):
+        auth = Authentication([{'id': 'fogbow', 'type': 'FogBow', 'host': 'server.com',
+                                'username': 'user', 'password': 'pass', 'as_host': 'server1.com'}])
+        self.revoked = False
+
+        def get_response(method, url, verify, headers=None, data=None):
+            if self.revoked and url == "http://server.com:8182/computes/1":
+                self.revoked = False
+                resp = MagicMock()
+                resp.status_code = 401
+                return resp
+            return self.get_response(method, url, verify, headers, data)
+
+        requests.side_effect = get_response
+
+        fogbow_cloud = self.get_fogbow_cloud()
+        fogbow_cloud.create_request('GET', '/computes/1', auth)
+        fogbow_cloud.create_request('GET', '/computes/1', auth)
+        # The token is not validated before each request
+        self.assertEqual([c[0][0] for c in requests.call_args_list], ['GET', 'POST', 'GET', 'GET'])
+
+        # and it is shared with other connectors of the same user
+        fogbow_cloud2 = self.get_fogbow_cloud()
+        fogbow_cloud2.create_request('GET', '/computes/1', auth)
+        self.assertEqual(requests.call_count, 5)
+
+        auth2 = Authentication([{'id': 'fogbow', 'type': 'FogBow', 'host': 'server.com',
+                                 'username': 'user2', 'password': 'pass', 'as_host': 'server1.com'}])
+        fogbow_cloud2.create_request('GET', '/computes/1', auth2)
+        self.assertEqual([c[0][0] for c in requests.call_args_list[5:]], ['POST', 'GET'])
+
+        # A rejected token is renewed (with the cached public key) and the request retried once
+        self.revoked = True
+        resp = fogbow_cloud.create_request('GET', '/computes/1', auth)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([c[0] for c in requests.call_args_list[7:]],
+                         [('GET', 'http://server.com:8182/computes/1'), ('POST', 'server1.com/tokens/'),
+                          ('GET', 'http://server.com:8182/computes/1')])
+
 
 if __name__ == '__main__':
     unittest.main()
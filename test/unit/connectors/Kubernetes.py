@@ -89,6 +89,16 @@ class TestKubernetesConnector(TestCloudConnectorBase):
                 resp.text = ('{"metadata": {"namespace":"namespace", "name": "name"}, "status": '
                              '{"phase":"Running", "hostIP": "158.42.1.1", "podIP": "10.0.0.1"}, '
                              '"spec": {"volumes": [{"persistentVolumeClaim": {"claimName" : "cname"}}]}}')
+            elif url.endswith("/pods/3"):
+                resp.status_code = 200
+                resp.text = ('{"metadata": {"namespace":"namespace", "name": "3"}, "status": '
+                             '{"phase":"Pending"}}')
+            elif url.endswith("/namespaces/namespace/pods"):
+                resp.status_code = 200
+                resp.text = ('{"items": [{"metadata": {"namespace":"namespace", "name": "1"}, "status": '
+                             '{"phase":"Running", "hostIP": "158.42.1.1", "podIP": "10.0.0.1"}}, '
+                             '{"metadata": {"namespace":"namespace", "name": "2"}, "status": '
+                             '{"phase":"Running", "hostIP": "158.42.1.1", "podIP": "10.0.0.2"}}]}')
         elif method == "POST":
             if url.endswith("/pods"):
                 resp.status_code = 201
@@ -108,7 +118,7 @@ class TestKubernetesConnector(TestCloudConnectorBase):
 
         return resp
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.InfrastructureList.InfrastructureList.save_data')
     def test_20_launch(self, save_data, requests):
         radl_data = """
@@ -141,7 +151,7 @@ class TestKubernetesConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: launching a VM.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_30_updateVMInfo(self, requests):
         radl_data = """
             network net (outbound = 'yes')
@@ -173,7 +183,42 @@ class TestKubernetesConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: updating VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
+    def test_35_updateVMInfoBatch(self, requests):
+        radl_data = """
+            network net (outbound = 'yes')
+            system test (
+            cpu.count=1 and
+            memory.size=512m and
+            net_interface.0.connection = 'net' and
+            disk.0.os.name = 'linux' and
+            disk.0.image.url = 'docker://someimage' and
+            disk.0.os.credentials.username = 'user'
+            )"""
+        radl = radl_parse.parse_radl(radl_data)
+        radl.check()
+
+        auth = Authentication([{'id': 'fogbow', 'type': 'Kubernetes', 'host': 'http://server.com:8080'}])
+        kube_cloud = self.get_kube_cloud()
+
+        inf = MagicMock()
+        inf.id = "namespace"
+        vms = [VirtualMachine(inf, str(num), kube_cloud.cloud, radl, radl, kube_cloud, num) for num in range(1, 4)]
+
+        requests.side_effect = self.get_response
+
+        res = kube_cloud.updateVMInfoBatch(vms, auth)
+        self.assertEqual([success for success, _ in res], [True, True, True])
+        self.assertEqual([vm.state for vm in vms], [VirtualMachine.RUNNING, VirtualMachine.RUNNING,
+                                                    VirtualMachine.PENDING])
+        self.assertEqual(vms[1].getPrivateIP(), "10.0.0.2")
+        # One call to get the API version and one to list the PODs (the POD 3 is requested individually)
+        urls = [urlparse(call_args[0][1])[2] for call_args in requests.call_args_list]
+        self.assertEqual(urls, ["/api/", "/api/v1/namespaces/namespace/pods", "/api/",
+                                "/api/v1/namespaces/namespace/pods/3"])
+        self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
+
+    @patch('IM.http_pool.HTTPPool.request')
     def test_55_alter(self, requests):
         radl_data = """
             network net ()
@@ -211,7 +256,7 @@ class TestKubernetesConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: modifying VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_60_finalize(self, requests):
         auth = Authentication([{'id': 'fogbow', 'type': 'Kubernetes', 'host': 'http://server.com:8080'}])
         kube_cloud = self.get_kube_cloud()
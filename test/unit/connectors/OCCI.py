@@ -45,6 +45,8 @@ class TestOCCIConnector(TestCloudConnectorBase):
 
     def setUp(self):
         self.return_error = False
+        KeyStoneAuth.uri_cache.clear()
+        KeyStoneAuth.token_cache.clear()
         TestCloudConnectorBase.setUp(self)
 
     @staticmethod
@@ -242,7 +244,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
 
         return resp
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     @patch('IM.InfrastructureList.InfrastructureList.save_data')
     def test_20_launch(self, save_data, get_keystone_uri, requests):
@@ -292,7 +294,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
         self.assertEqual(self.call_count['DELETE']['/storage/1'], 1)
         self.assertNotIn('/storage/2', self.call_count['DELETE'])
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     def test_30_updateVMInfo(self, get_keystone_uri, requests):
         radl_data = """
@@ -329,7 +331,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
         memory = vm.info.systems[0].getValue("memory.size")
         self.assertEqual(memory, 1824522240)
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     def test_40_stop(self, get_keystone_uri, requests):
         auth = Authentication([{'id': 'occi', 'type': 'OCCI', 'proxy': 'proxy', 'host': 'https://server.com:11443'}])
@@ -347,7 +349,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: stopping VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     def test_50_start(self, get_keystone_uri, requests):
         auth = Authentication([{'id': 'occi', 'type': 'OCCI', 'proxy': 'proxy', 'host': 'https://server.com:11443'}])
@@ -365,7 +367,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: stopping VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     def test_52_reboot(self, get_keystone_uri, requests):
         auth = Authentication([{'id': 'occi', 'type': 'OCCI', 'proxy': 'proxy', 'host': 'https://server.com:11443'}])
@@ -383,7 +385,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: rebooting VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     def test_55_alter(self, get_keystone_uri, requests):
         radl_data = """
@@ -461,7 +463,7 @@ class TestOCCIConnector(TestCloudConnectorBase):
 
         self.assertEqual(vm.requested_radl.systems[0].getValue("net_interface.0.connection"), "net")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     @patch('IM.connectors.OCCI.KeyStoneAuth.get_keystone_uri')
     def test_60_finalize(self, get_keystone_uri, requests):
         auth = Authentication([{'id': 'occi', 'type': 'OCCI', 'proxy': 'proxy', 'host': 'https://server.com:11443'}])
@@ -567,7 +569,7 @@ users:
         res = occi_cloud.get_cloud_init_data(radl, None, "pub_key", "user")
         self.assertEqual(res, expected_res)
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_keystone_auth(self, requests):
         occi_cloud = self.get_occi_cloud()
 
@@ -587,6 +589,54 @@ users:
         token = KeyStoneAuth.get_keystone_token(occi_cloud, "https://keystone.com:5000", auth)
         self.assertEqual(token, "token3")
 
+    @patch('IM.http_pool.HTTPPool.request')
+    def test_keystone_token_cache(self, requests):
+        self.revoked = False
+
+        def get_response(method, url, verify, cert=None, headers=None, data=None):
+            path = urlparse(url)[2]
+            valid_token = headers.get('X-Auth-Token') == "token2" and not self.revoked
+            if url.startswith("https://server.com:11443") and not valid_token:
+                resp = MagicMock()
+                resp.status_code = 401
+                resp.headers = {'Www-Authenticate': "Keystone uri='https://keystone.com:5000/v2.0'"}
+                return resp
+            if method == "POST" and path == "/v2.0/tokens":
+                self.revoked = False
+            return self.get_response(method, url, verify, cert, headers, data)
+
+        requests.side_effect = get_response
+        auth = Authentication([{'id': 'occi', 'type': 'OCCI', 'proxy': 'proxy', 'host': 'https://server.com:11443'}])
+        occi_cloud = self.get_occi_cloud()
+
+        self.assertEqual(occi_cloud.get_auth_header(auth), {'X-Auth-Token': 'token2'})
+        self.assertEqual(self.call_count["POST"]["/v2.0/tokens"], 2)
+        self.assertEqual(requests.call_count, 5)
+
+        # The token is shared with other connectors without contacting any server
+        occi_cloud2 = self.get_occi_cloud()
+        self.assertEqual(occi_cloud2.get_auth_header(auth), {'X-Auth-Token': 'token2'})
+        self.assertEqual(requests.call_count, 5)
+
+        # but not with other credentials
+        auth2 = Authentication([{'id': 'occi', 'type': 'OCCI', 'proxy': 'proxy2',
+                                 'host': 'https://server.com:11443'}])
+        self.assertEqual(KeyStoneAuth.get_cached_token(occi_cloud2, auth2.getAuthInfo("OCCI")[0]), None)
+
+        # A revoked token is renewed and the request retried once
+        self.revoked = True
+        headers = {'Accept': 'text/plain'}
+        headers.update(occi_cloud2.get_auth_header(auth))
+        resp = occi_cloud2.create_request('GET', "/compute/1", auth, headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.call_count["POST"]["/v2.0/tokens"], 4)
+        self.assertEqual(self.call_count["GET"]["/compute/1"], 1)
+
+        # Tokens near their expiration date are not cached
+        self.assertLess(KeyStoneAuth.get_token_ttl("2014-12-30T17:10:49Z"), 0)
+        self.assertEqual(KeyStoneAuth.get_token_ttl(None),
+                         KeyStoneAuth.TOKEN_TTL - KeyStoneAuth.TOKEN_EXPIRATION_MARGIN)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -196,6 +196,64 @@ class TestONEConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: updating VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
+    @patch('IM.connectors.OpenNebula.ServerProxy')
+    def test_35_updateVMInfoBatch(self, server_proxy):
+        radl_data = """
+            network net (outbound = 'yes' and provider_id = 'publica')
+            network net1 (provider_id = 'privada')
+            system test (
+            cpu.count=1 and
+            memory.size=512m and
+            net_interface.0.connection = 'net' and
+            net_interface.1.connection = 'net1' and
+            disk.0.os.name = 'linux' and
+            disk.0.image.url = 'one://server.com/1' and
+            disk.0.os.credentials.username = 'user'
+            )"""
+        radl = radl_parse.parse_radl(radl_data)
+        radl.check()
+
+        auth = Authentication([{'id': 'one', 'type': 'OpenNebula', 'username': 'user',
+                                'password': 'pass', 'host': 'server.com:2633'}])
+        one_cloud = self.get_one_cloud()
+
+        inf = MagicMock()
+        vm1 = VirtualMachine(inf, "10908", one_cloud.cloud, radl, radl, one_cloud, 1)
+        vm2 = VirtualMachine(inf, "10909", one_cloud.cloud, radl, radl, one_cloud, 2)
+
+        vm_info = self.read_file_as_string("files/vm_info.xml").replace("10.0.0.01", "10.0.0.1")
+        one_server = MagicMock()
+        # The VM 10909 is not returned in the pool
+        one_server.one.vmpool.infoextended.return_value = (True, "<VM_POOL>%s</VM_POOL>" % vm_info, 0)
+
+        def get_vm_info(session_id, vm_id):
+            # The VMs are updated holding their lock
+            self.assertTrue(vm2._lock.locked())
+            return (True, vm_info.replace("10908", "10909"), 0)
+        one_server.one.vm.info.side_effect = get_vm_info
+        server_proxy.return_value = one_server
+
+        res = one_cloud.updateVMInfoBatch([vm1, vm2], auth)
+        self.assertEqual(len(res), 2)
+        for success, vm in res:
+            self.assertTrue(success, msg="ERROR: updating VM info.")
+            self.assertEquals(vm.info.systems[0].getValue("net_interface.0.ip"), "158.42.1.1")
+            self.assertEquals(vm.info.systems[0].getValue("net_interface.1.ip"), "10.0.0.1")
+        self.assertEqual(one_server.one.vmpool.infoextended.call_args_list, [call('user:pass', -3, 10908, 10909, -1)])
+        self.assertEqual(one_server.one.vm.info.call_args_list, [call('user:pass', 10909)])
+
+        # The IDs far away are requested in different ranges
+        self.assertEqual(OpenNebulaCloudConnector._get_id_ranges([10909, 10, 10908, 109, 110, 10]),
+                         [(10, 109), (110, 110), (10908, 10909)])
+
+        # Old ONE versions without vmpool.infoextended
+        one_server.one.vmpool.infoextended.side_effect = Exception("Method not found")
+        one_server.one.vmpool.info.return_value = (True, "<VM_POOL>%s</VM_POOL>" % vm_info, 0)
+        res = one_cloud.updateVMInfoBatch([vm1], auth)
+        self.assertTrue(res[0][0], msg="ERROR: updating VM info.")
+        self.assertEqual(one_server.one.vmpool.info.call_count, 1)
+        self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
+
     @patch('IM.connectors.OpenNebula.ServerProxy')
     def test_40_stop(self, server_proxy):
         auth = Authentication([{'id': 'one', 'type': 'OpenNebula', 'username': 'user',
@@ -341,6 +399,47 @@ class TestONEConnector(TestCloudConnectorBase):
         self.assertTrue(success, msg="ERROR: finalizing VM info.")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
+    @patch('IM.connectors.OpenNebula.ServerProxy')
+    @patch('IM.connectors.OpenNebula.MultiCall')
+    @patch('IM.connectors.OpenNebula.OpenNebulaCloudConnector._get_security_group')
+    @patch('IM.connectors.OpenNebula.OpenNebulaCloudConnector.getONEVersion')
+    def test_65_finalize_batch(self, getONEVersion, get_security_group, multicall, server_proxy):
+        auth = Authentication([{'id': 'one', 'type': 'OpenNebula', 'username': 'user',
+                                'password': 'pass', 'host': 'server.com:2633'}])
+        one_cloud = self.get_one_cloud()
+        radl = radl_parse.parse_radl("network net1 ()\nsystem test (net_interface.0.connection = 'net1')")
+
+        inf = MagicMock()
+        inf.id = "infid"
+        inf.radl = radl
+        vms = [VirtualMachine(inf, vm_id, one_cloud.cloud, radl, radl, one_cloud, 1) for vm_id in ["1", "2"]]
+
+        getONEVersion.return_value = "5.8.0"
+        one_server = MagicMock()
+        one_server.one.vm.action.return_value = (True, "", 0)
+        one_server.one.secgroup.delete.return_value = (True, "", 0)
+        server_proxy.return_value = one_server
+        get_security_group.return_value = 101
+        multicall.return_value.return_value = [(True, "", 0), (False, "Error deleting VM", 0)]
+
+        res = one_cloud.finalizeBatch(vms, True, auth)
+
+        self.assertEqual(res, [(True, ""), (False, "Error deleting VM")])
+        self.assertEqual(multicall.return_value.one.vm.action.call_args_list,
+                         [call('user:pass', 'delete', 1), call('user:pass', 'delete', 2)])
+        self.assertEqual(one_server.one.vm.action.call_count, 0)
+        # The SGs are not deleted if some VM has not been deleted
+        self.assertEqual(one_server.one.secgroup.delete.call_count, 0)
+
+        # Old ONE servers without system.multicall
+        multicall.return_value.side_effect = Exception("system.multicall not supported")
+        res = one_cloud.finalizeBatch(vms, True, auth)
+
+        self.assertEqual(res, [(True, ""), (True, "")])
+        self.assertEqual(one_server.one.vm.action.call_args_list,
+                         [call('user:pass', 'delete', 1), call('user:pass', 'delete', 2)])
+        self.assertEqual(one_server.one.secgroup.delete.call_args_list, [call('user:pass', 101)])
+
     @patch('IM.connectors.OpenNebula.ServerProxy')
     @patch('IM.connectors.OpenNebula.OpenNebulaCloudConnector.getONEVersion')
     @patch('time.sleep')
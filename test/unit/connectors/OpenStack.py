@@ -28,6 +28,7 @@ from radl import radl_parse
 from IM.VirtualMachine import VirtualMachine
 from IM.InfrastructureInfo import InfrastructureInfo
 from IM.connectors.OpenStack import OpenStackCloudConnector
+from libcloud.compute.drivers.openstack import OpenStack_2_FloatingIpPool
 from mock import patch, MagicMock, call
 
 
@@ -38,6 +39,7 @@ class TestOSTConnector(TestCloudConnectorBase):
 
     def setUp(self):
         self.error_in_create = True
+        OpenStackCloudConnector.catalog_cache.clear()
         TestCloudConnectorBase.setUp(self)
 
     @staticmethod
@@ -273,7 +275,10 @@ class TestOSTConnector(TestCloudConnectorBase):
         res = ost_cloud.launch(inf, radl, radl, 1, auth)
         success, _ = res[0]
         self.assertTrue(success, msg="ERROR: launching a VM.")
-        self.assertEqual(driver.get_image.call_args_list[3][0][0], "image_id2")
+        self.assertEqual(driver.get_image.call_args_list[-1][0][0], "image_id2")
+        # the flavors and the images are cached per credentials
+        self.assertEqual(driver.get_image.call_count, 3)
+        self.assertEqual(driver.list_sizes.call_count, 2)
 
         radl_data = """
             network net1 (outbound = 'yes')
@@ -445,6 +450,72 @@ class TestOSTConnector(TestCloudConnectorBase):
         self.assertEquals(vm.info.systems[0].getValue("net_interface.0.ipv6"), "2001:630:12:581:f816:3eff:fe92:2146")
         self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
 
+    @patch('libcloud.compute.drivers.openstack.OpenStackNodeDriver')
+    def test_35_updateVMInfoBatch(self, get_driver):
+        radl_data = """
+            network net (provider_id = 'os-lan')
+            system test (
+            cpu.count=1 and
+            memory.size=512m and
+            net_interface.0.connection = 'net' and
+            disk.0.os.name = 'linux' and
+            disk.0.image.url = 'ost://server.com/ami-id' and
+            disk.0.os.credentials.username = 'user'
+            )"""
+        radl = radl_parse.parse_radl(radl_data)
+        radl.check()
+
+        auth = Authentication([{'id': 'ost', 'type': 'OpenStack', 'username': 'user',
+                                'password': 'pass', 'tenant': 'tenant', 'host': 'https://server.com:5000'}])
+        ost_cloud = self.get_ost_cloud()
+
+        inf = MagicMock()
+        inf.vm_list = []
+        vms = [VirtualMachine(inf, str(num), ost_cloud.cloud, radl, radl, ost_cloud, num) for num in range(1, 4)]
+
+        driver = MagicMock()
+        get_driver.return_value = driver
+
+        nodes = {}
+        for num in range(1, 4):
+            node = MagicMock()
+            node.id = str(num)
+            node.state = "running"
+            node.extra = {'flavorId': 'small',
+                          'addresses': {'os-lan': [{'addr': '10.0.0.%d' % num, 'OS-EXT-IPS:type': 'fixed'}]}}
+            node.public_ips = []
+            node.private_ips = ['10.0.0.%d' % num]
+            node.driver = driver
+            nodes[node.id] = node
+        # The node 3 is not returned in the list
+        driver.list_nodes.return_value = [nodes["1"], nodes["2"]]
+        driver.ex_get_node_details.side_effect = lambda node_id: nodes.get(node_id)
+
+        node_size = MagicMock()
+        node_size.ram = 512
+        node_size.price = 1
+        node_size.disk = 1
+        node_size.vcpus = 1
+        node_size.name = "small"
+        driver.ex_get_size.return_value = node_size
+
+        res = ost_cloud.updateVMInfoBatch(vms, auth)
+        self.assertEqual(len(res), 3)
+        for num, (success, vm) in enumerate(res, 1):
+            self.assertTrue(success, msg="ERROR: updating VM info.")
+            self.assertIs(vm, vms[num - 1])
+            self.assertEqual(vm.state, VirtualMachine.RUNNING)
+            self.assertEqual(vm.info.systems[0].getValue("net_interface.0.ip"), "10.0.0.%d" % num)
+        self.assertEqual(driver.list_nodes.call_count, 1)
+        self.assertEqual(driver.ex_get_node_details.call_args_list, [call("3")])
+        self.assertEqual(driver.ex_get_size.call_count, 2)
+
+        # If the list fails, the VMs are updated one by one
+        driver.list_nodes.side_effect = Exception("Error listing nodes")
+        res = ost_cloud.updateVMInfoBatch(vms, auth)
+        self.assertEqual([success for success, _ in res], [True, True, True])
+        self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
+
     @patch('libcloud.compute.drivers.openstack.OpenStackNodeDriver')
     def test_40_stop(self, get_driver):
         auth = Authentication([{'id': 'ost', 'type': 'OpenStack', 'username': 'user',
@@ -756,6 +827,58 @@ class TestOSTConnector(TestCloudConnectorBase):
         self.assertEqual(fip.delete.call_args_list, [call()])
         self.assertEqual(node.destroy.call_args_list, [call(), call()])
 
+    @patch('libcloud.compute.drivers.openstack.OpenStackNodeDriver')
+    @patch('time.sleep')
+    def test_65_finalize_batch(self, sleep, get_driver):
+        auth = Authentication([{'id': 'ost', 'type': 'OpenStack', 'username': 'user',
+                                'password': 'pass', 'tenant': 'tenant', 'host': 'https://server.com:5000'}])
+        ost_cloud = self.get_ost_cloud()
+
+        radl_data = """
+            network private (create = 'yes')
+            system test (
+            cpu.count>=2 and
+            net_interface.0.connection = 'private'
+            )"""
+        radl = radl_parse.parse_radl(radl_data)
+
+        inf = MagicMock()
+        inf.id = "infid"
+        inf.radl = radl
+
+        driver = MagicMock()
+        driver.name = "OpenStack"
+        get_driver.return_value = driver
+
+        nodes = {}
+        vms = []
+        for node_id in ["1", "2", "3"]:
+            node = MagicMock()
+            node.id = node_id
+            node.public_ips = []
+            node.driver = driver
+            node.destroy.side_effect = lambda node_id=node_id: nodes.pop(node_id) is not None
+            nodes[node_id] = node
+            vm = VirtualMachine(inf, node_id, ost_cloud.cloud, radl, radl, ost_cloud, 1)
+            vm.volumes = []
+            vms.append(vm)
+        driver.ex_get_node_details.side_effect = lambda node_id: nodes.get(node_id)
+        driver.ex_list_floating_ips.return_value = []
+
+        sg = MagicMock()
+        sg.name = "im-infid-private"
+        sg.description = "Security group created by the IM"
+        driver.ex_list_security_groups.return_value = [sg]
+        driver.ex_list_networks.return_value = []
+
+        res = ost_cloud.finalizeBatch(vms, True, auth)
+
+        self.assertEqual([success for success, _ in res], [True, True, True])
+        self.assertEqual(nodes, {})
+        # The SGs are deleted only once
+        self.assertEqual(driver.ex_delete_security_group.call_args_list, [call(sg)])
+        self.assertNotIn("ERROR", self.log.getvalue(), msg="ERROR found in log: %s" % self.log.getvalue())
+
     @patch('libcloud.compute.drivers.openstack.OpenStackNodeDriver')
     def test_70_create_snapshot(self, get_driver):
         auth = Authentication([{'id': 'ost', 'type': 'OpenStack', 'username': 'user',
@@ -848,6 +971,48 @@ class TestOSTConnector(TestCloudConnectorBase):
         nets = ost_cloud.get_networks(driver, radl)
         self.assertEqual(nets, [net1])
 
+    @patch('libcloud.compute.drivers.openstack.OpenStackNodeDriver')
+    def test_catalog_cache(self, get_driver):
+        auth = Authentication([{'id': 'ost', 'type': 'OpenStack', 'username': 'user',
+                                'password': 'pass', 'tenant': 'tenant', 'host': 'https://server.com:5000'}])
+        driver = MagicMock()
+        get_driver.return_value = driver
+        driver.ex_list_networks.return_value = [MagicMock()]
+
+        ost_cloud = self.get_ost_cloud()
+        driver = ost_cloud.get_driver(auth)
+        self.assertEqual(len(ost_cloud.get_cached(driver, "ex_list_networks")), 1)
+        # it is shared by other connectors of the same site and credentials
+        ost_cloud2 = self.get_ost_cloud()
+        ost_cloud2.get_driver(auth)
+        self.assertEqual(len(ost_cloud2.get_cached(driver, "ex_list_networks")), 1)
+        self.assertEqual(driver.ex_list_networks.call_count, 1)
+
+        # the networks are requested again after creating or deleting one
+        ost_cloud.invalidate_networks_cache(driver)
+        ost_cloud.get_cached(driver, "ex_list_networks")
+        self.assertEqual(driver.ex_list_networks.call_count, 2)
+
+        # the cached floating IP pools are bound to the driver of each connector
+        driver.ex_list_floating_ip_pools.return_value = [OpenStack_2_FloatingIpPool("id", "public",
+                                                                                    driver.network_connection)]
+        self.assertIs(ost_cloud.get_cached(driver, "ex_list_floating_ip_pools")[0].connection,
+                      driver.network_connection)
+        driver2 = MagicMock()
+        get_driver.return_value = driver2
+        ost_cloud3 = self.get_ost_cloud()
+        ost_cloud3.get_driver(auth)
+        pools = ost_cloud3.get_cached(driver2, "ex_list_floating_ip_pools")
+        self.assertEqual(driver2.ex_list_floating_ip_pools.call_count, 0)
+        self.assertEqual(pools[0].name, "public")
+        self.assertIs(pools[0].connection, driver2.network_connection)
+
+        # other drivers are not cached
+        other_driver = MagicMock()
+        ost_cloud.get_cached(other_driver, "ex_list_networks")
+        ost_cloud.get_cached(other_driver, "ex_list_networks")
+        self.assertEqual(other_driver.ex_list_networks.call_count, 2)
+
     def test_cidr_wildcard_iterator(self):
         ost_cloud = self.get_ost_cloud()
         res = list(ost_cloud.cidr_wildcard_iterator("10.*.*.0/24"))
@@ -0,0 +1,176 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import sys
+
+import requests
+from mock import patch, call
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.http_pool import HTTPPool
+from IM.config import Config
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn, UnixStreamServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Stub HTTP server that counts the connections opened"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+    cookies = []
+
+    def setup(self):
+        StubHandler.connections += 1
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        StubHandler.cookies.append(self.headers.get("Cookie"))
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=secret; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return "stub"
+
+    def log_message(self, *args):
+        pass
+
+
+class UnixStubHandler(StubHandler):
+    """Stub HTTP server in a unix socket"""
+
+    disable_nagle_algorithm = False
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = UnixStreamServer.get_request(self)
+        return request, ("unix", 0)
+
+
+class TestHTTPPool(unittest.TestCase):
+    """
+    Class to test the HTTPPool class
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        HTTPPool._reinit()
+        StubHandler.connections = 0
+        StubHandler.cookies = []
+
+    def test_get_session(self):
+        session = HTTPPool.get_session(self.url + "/path1")
+        self.assertIs(HTTPPool.get_session(self.url + "/path2?a=b"), session)
+        self.assertIsNot(HTTPPool.get_session("http://127.0.0.2:80/path1"), session)
+        self.assertIsNot(HTTPPool.get_session(self.url.replace("http", "https")), session)
+
+    def test_request(self):
+        for _ in range(5):
+            resp = HTTPPool.request("GET", self.url + "/test")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json(), {"status": "ok"})
+        self.assertEqual(StubHandler.connections, 1)
+        # The cookies are not stored in the shared sessions
+        self.assertEqual(StubHandler.cookies, [None] * 5)
+
+        Config.HTTP_KEEP_ALIVE = False
+        try:
+            for _ in range(2):
+                HTTPPool.request("GET", self.url + "/test")
+        finally:
+            Config.HTTP_KEEP_ALIVE = True
+        self.assertEqual(StubHandler.connections, 3)
+
+        # The requests with client certificates are not pooled
+        with patch("requests.request") as request:
+            HTTPPool.request("GET", self.url + "/test", cert="/tmp/proxy")
+            self.assertEqual(request.call_args_list, [call("GET", self.url + "/test", cert="/tmp/proxy")])
+        self.assertEqual(HTTPPool.sessions.keys(), set([("http", self.url[7:])]))
+
+    def test_unix_socket(self):
+        tmp_dir = tempfile.mkdtemp()
+        socket_path = os.path.join(tmp_dir, "docker.sock")
+        server = ThreadingUnixHTTPServer(socket_path, UnixStubHandler)
+        threading.Thread(target=server.serve_forever).start()
+        try:
+            url = "http+unix://%s/containers/json" % socket_path.replace("/", "%2F")
+            for _ in range(3):
+                resp = HTTPPool.request("GET", url)
+                self.assertEqual(resp.json(), {"status": "ok"})
+            self.assertEqual(StubHandler.connections, 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_benchmark(self):
+        num_requests = 200
+
+        def bench(func):
+            StubHandler.connections = 0
+            init = time.time()
+            for _ in range(num_requests):
+                func("GET", self.url + "/test")
+            return time.time() - init, StubHandler.connections
+
+        elapsed, conns = bench(requests.request)
+        print("requests.request: %d requests in %.4f secs (%d connections)." % (num_requests, elapsed, conns))
+        self.assertEqual(conns, num_requests)
+
+        elapsed, conns = bench(HTTPPool.request)
+        print("HTTPPool.request: %d requests in %.4f secs (%d connections)." % (num_requests, elapsed, conns))
+        self.assertEqual(conns, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM import json_codec
+from IM.InfrastructureInfo import InfrastructureInfo
+from IM.VirtualMachine import VirtualMachine
+from IM.CloudInfo import CloudInfo
+from IM.auth import Authentication
+from radl.radl_parse import parse_radl
+
+RADL_DATA = """
+network publica (outbound = 'yes')
+system front (
+    cpu.count>=1 and
+    memory.size>=512m and
+    net_interface.0.connection = 'publica' and
+    net_interface.0.ip = '8.8.8.8' and
+    disk.0.os.name = 'linux' and
+    disk.0.image.url = 'one://server.com/1' and
+    disk.0.os.credentials.username = 'user' and
+    disk.0.os.credentials.password = 'pass'
+)
+deploy front 1
+"""
+
+
+def get_infrastructure(num_vms):
+    """Create an infrastructure with num_vms VMs"""
+    inf = InfrastructureInfo()
+    inf.auth = Authentication([{'type': 'InfrastructureManager', 'username': 'user', 'password': 'pass'},
+                               {'id': 'one', 'type': 'OpenNebula', 'host': 'server.com', 'username': 'user',
+                                'password': 'pass'}])
+    radl = parse_radl(RADL_DATA)
+    inf.radl = radl
+    cloud = CloudInfo()
+    cloud.id = "one"
+    cloud.type = "OpenNebula"
+    cloud.server = "server.com"
+    for num in range(num_vms):
+        vm = VirtualMachine(inf, str(num), cloud, radl, radl, None, num)
+        vm.cont_out = "Contextualization output of the VM\n" * 50
+        inf.vm_list.append(vm)
+    inf.vm_master = inf.vm_list[0]
+    return inf
+
+
+def serialize_old_format(inf):
+    """Serialize the infrastructure as the old versions (with the VMs as nested JSON strings)"""
+    dic = json.loads(inf.serialize())
+    vm_list = []
+    for vm in inf.vm_list:
+        vm_dict = vm.serialize_dict()
+        vm_dict['cloud'] = json.dumps(vm_dict['cloud'])
+        vm_list.append(json.dumps(vm_dict))
+    dic['vm_list'] = vm_list
+    dic['auth'] = json.dumps(dic['auth'], sort_keys=True)
+    return json.dumps(dic)
+
+
+class TestJSONCodec(unittest.TestCase):
+    """
+    Class to test the JSON codec
+    """
+
+    def get_libraries(self):
+        libraries = ["json"]
+        if json_codec.ORJSON_AVAILABLE:
+            libraries.append("orjson")
+        if json_codec.UJSON_AVAILABLE:
+            libraries.append("ujson")
+        return libraries
+
+    def test_codec(self):
+        data = {"b": [1, 2.5, None, True], "a": u"ñ/", "big": 2 ** 70}
+        for library in self.get_libraries():
+            res = json_codec.dumps(data, sort_keys=True, library=library)
+            self.assertIsInstance(res, str)
+            self.assertEqual(json.loads(res), data)
+            self.assertEqual(json_codec.loads(res, library=library), data)
+            self.assertEqual(json_codec.loads(res.encode("utf-8"), library=library), data)
+            self.assertLess(res.index('"a"'), res.index('"b"'))
+
+    def test_serialize(self):
+        inf = get_infrastructure(2)
+        str_inf = inf.serialize()
+        dic = json.loads(str_inf)
+        # The nested objects are not double encoded
+        self.assertIsInstance(dic['vm_list'][0], dict)
+        self.assertIsInstance(dic['vm_list'][0]['cloud'], dict)
+        self.assertIsInstance(dic['auth'], list)
+
+        new_inf = InfrastructureInfo.deserialize(str_inf)
+        self.assertEqual(len(new_inf.vm_list), 2)
+        self.assertIs(new_inf.vm_master, new_inf.vm_list[0])
+        self.assertIs(new_inf.vm_list[1].inf, new_inf)
+        self.assertEqual(new_inf.vm_list[1].cloud.server, "server.com")
+        self.assertEqual(new_inf.vm_list[1].getPublicIP(), "8.8.8.8")
+        self.assertEqual(new_inf.auth.auth_list, inf.auth.auth_list)
+
+        new_inf = InfrastructureInfo.deserialize_auth(str_inf)
+        self.assertEqual(new_inf.auth.auth_list, inf.auth.auth_list)
+
+    def test_deserialize_old_format(self):
+        inf = get_infrastructure(2)
+        old_data = serialize_old_format(inf)
+        new_inf = InfrastructureInfo.deserialize(old_data)
+        self.assertEqual(len(new_inf.vm_list), 2)
+        self.assertEqual(new_inf.vm_list[1].cloud.type, "OpenNebula")
+        self.assertEqual(new_inf.auth.auth_list, inf.auth.auth_list)
+        self.assertEqual(json.loads(new_inf.serialize()),
+                         json.loads(InfrastructureInfo.deserialize(inf.serialize()).serialize()))
+
+        new_inf = InfrastructureInfo.deserialize_auth(old_data)
+        self.assertEqual(new_inf.auth.auth_list, inf.auth.auth_list)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from mock import MagicMock
+from IM.metrics import Metrics
+from IM.db import DataBase
+from IM.CloudInfo import CloudInfo
+from IM.InfrastructureManager import InfrastructureManager as IM
+from IM.InfrastructureManager import IncorrectVMCrecentialsException
+from IM.auth import Authentication
+from IM.config import Config
+from IM.InfrastructureList import InfrastructureList
+from IM.request import get_system_queue
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Class to test the Metrics class
+    """
+
+    def setUp(self):
+        Config.ACTIVATE_METRICS = True
+        Metrics._reinit()
+
+    def tearDown(self):
+        Config.ACTIVATE_METRICS = False
+
+    def test_histogram(self):
+        Metrics.observe("test_duration_seconds", 0.02, {"op": "test"})
+        Metrics.observe("test_duration_seconds", 7, {"op": "test"})
+        Metrics.inc("test_total")
+        Metrics.inc("test_total", value=2)
+        Metrics.register_gauge("test_gauge", lambda: 5)
+
+        res = Metrics.generate_latest()
+        self.assertIn('test_duration_seconds_bucket{op="test",le="0.01"} 0\n', res)
+        self.assertIn('test_duration_seconds_bucket{op="test",le="0.025"} 1\n', res)
+        self.assertIn('test_duration_seconds_bucket{op="test",le="10.0"} 2\n', res)
+        self.assertIn('test_duration_seconds_bucket{op="test",le="+Inf"} 2\n', res)
+        self.assertIn('test_duration_seconds_sum{op="test"} 7.02\n', res)
+        self.assertIn('test_duration_seconds_count{op="test"} 2\n', res)
+        self.assertIn('# TYPE test_total counter\ntest_total 3\n', res)
+        self.assertIn('# TYPE test_gauge gauge\ntest_gauge 5\n', res)
+        del Metrics.gauges["test_gauge"]
+
+    def test_operation(self):
+        Config.DATA_DB = "/tmp/inf.dat"
+        InfrastructureList.load_data()
+        Metrics._reinit()
+        auth = Authentication([{'type': 'InfrastructureManager', 'username': 'user', 'password': 'pass'}])
+        IM.GetInfrastructureList(auth)
+        Metrics.set_transport(Metrics.TRANSPORT_REST)
+        with self.assertRaises(IncorrectVMCrecentialsException):
+            IM.GetInfrastructureList(Authentication([]))
+        Metrics.set_transport(Metrics.TRANSPORT_NONE)
+
+        res = Metrics.generate_latest()
+        self.assertIn('im_operation_duration_seconds_count{op="GetInfrastructureList",transport="internal"} 1\n', res)
+        self.assertIn('im_operation_duration_seconds_count{op="GetInfrastructureList",transport="REST"} 1\n', res)
+        self.assertIn('im_operation_errors_total{op="GetInfrastructureList",transport="REST"} 1\n', res)
+        self.assertIn('im_operation_duration_seconds_count{op="check_auth_data",transport="internal"} 1\n', res)
+        self.assertIn('im_db_query_duration_seconds_count{db_type="SQLite",operation="select"}', res)
+        self.assertIn('im_request_queue_size %d\n' % get_system_queue().qsize(), res)
+        self.assertIn('im_confmanager_threads %d\n' % Metrics.gauges["im_confmanager_threads"](), res)
+
+    def test_connector(self):
+        cloud_info = CloudInfo()
+        cloud_info.type = "Dummy"
+        conn = cloud_info.getCloudConnector(MagicMock())
+        conn.updateVMInfo(MagicMock(), None)
+        conn.finalize = MagicMock(side_effect=Exception("Error"))
+        Metrics.instrument_connector(conn, "Dummy", ["finalize"])
+        with self.assertRaises(Exception):
+            conn.finalize(MagicMock(), True, None)
+
+        res = Metrics.generate_latest()
+        self.assertIn('im_connector_call_duration_seconds_count{cloud_type="Dummy",method="updateVMInfo"} 1\n', res)
+        self.assertIn('im_connector_call_duration_seconds_count{cloud_type="Dummy",method="finalize"} 1\n', res)
+        self.assertIn('im_connector_call_errors_total{cloud_type="Dummy",method="finalize"} 1\n', res)
+
+    def test_db(self):
+        filename = "/tmp/test_metrics.db"
+        db = DataBase("sqlite://" + filename)
+        self.assertTrue(db.connect())
+        db.execute("CREATE TABLE test(id int)")
+        db.select("select * from test")
+        db.close()
+        os.unlink(filename)
+
+        res = Metrics.generate_latest()
+        self.assertIn('im_db_query_duration_seconds_count{db_type="SQLite",operation="execute"} 1\n', res)
+        self.assertIn('im_db_query_duration_seconds_count{db_type="SQLite",operation="select"} 1\n', res)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,10 +19,20 @@
 import unittest
 import os
 import json
+import time
+import base64
+import binascii
 
 from IM.openid.OpenIDClient import OpenIDClient
+from IM.openid.JWT import JWT, CRYPTOGRAPHY_AVAILABLE
 from mock import patch, MagicMock
 
+if CRYPTOGRAPHY_AVAILABLE:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import rsa, ec, padding
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
 
 def read_file_as_string(file_name):
     tests_path = os.path.dirname(os.path.abspath(__file__))
@@ -30,6 +40,40 @@ def read_file_as_string(file_name):
     return open(abs_file_path, 'r').read()
 
 
+def b64e(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("utf-8")
+
+
+def int_to_b64(num, size=None):
+    hex_num = "%x" % num
+    if len(hex_num) % 2:
+        hex_num = "0" + hex_num
+    data = binascii.unhexlify(hex_num)
+    if size:
+        data = data.rjust(size, b"\0")
+    return b64e(data)
+
+
+def gen_rsa_key(kid):
+    """Generate a RSA key and its public JSON Web Key"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    numbers = key.public_key().public_numbers()
+    return key, {"kty": "RSA", "kid": kid, "use": "sig", "n": int_to_b64(numbers.n), "e": int_to_b64(numbers.e)}
+
+
+def sign_token(key, payload, kid, alg="RS256"):
+    """Generate a signed JWT"""
+    header = {"alg": alg, "kid": kid, "typ": "JWT"}
+    signing_input = ("%s.%s" % (b64e(json.dumps(header).encode("utf-8")),
+                                b64e(json.dumps(payload).encode("utf-8")))).encode("utf-8")
+    if alg.startswith("RS"):
+        signature = key.sign(signing_input, padding.PKCS1v15(), hashes.SHA256())
+    else:
+        r, s = decode_dss_signature(key.sign(signing_input, ec.ECDSA(hashes.SHA256())))
+        signature = binascii.unhexlify(("%064x" % r) + ("%064x" % s))
+    return "%s.%s" % (signing_input.decode("utf-8"), b64e(signature))
+
+
 class TestOpenIDClient(unittest.TestCase):
     """
     Class to test the TTCLient class
@@ -48,7 +92,7 @@ class TestOpenIDClient(unittest.TestCase):
         self.assertTrue(expired)
         self.assertEqual(msg, "Token expired")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_user_info_request(self, requests):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -61,7 +105,7 @@ class TestOpenIDClient(unittest.TestCase):
         self.assertTrue(success)
         self.assertEqual(json.loads(user_info), user_info_resp)
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_get_token_introspection(self, requests):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -74,6 +118,84 @@ class TestOpenIDClient(unittest.TestCase):
         self.assertTrue(success)
         self.assertEqual(json.loads(token_info), token_info_resp)
 
+    @unittest.skipIf(not CRYPTOGRAPHY_AVAILABLE, "cryptography not available")
+    @patch('IM.http_pool.HTTPPool.request')
+    def test_verify_token(self, requests):
+        issuer = "https://iam.example.com/"
+        key1, jwk1 = gen_rsa_key("key1")
+        key2, jwk2 = gen_rsa_key("key2")
+        jwks = {"keys": [jwk1]}
+
+        def get_response(method, url, verify=False):
+            resp = MagicMock()
+            resp.status_code = 200
+            if url == "https://iam.example.com/.well-known/openid-configuration":
+                resp.text = json.dumps({"issuer": issuer, "jwks_uri": "https://iam.example.com/jwk"})
+            elif url == "https://iam.example.com/jwk":
+                resp.text = json.dumps(jwks)
+            else:
+                resp.status_code = 404
+            return resp
+
+        requests.side_effect = get_response
+        OpenIDClient.jwks = {}
+        payload = {"sub": "user", "iss": issuer, "exp": int(time.time()) + 600, "aud": ["aud1", "aud2"]}
+
+        token = sign_token(key1, payload, "key1")
+        success, decoded = OpenIDClient.verify_token(token, [issuer], "aud2")
+        self.assertTrue(success)
+        self.assertEqual(decoded, payload)
+        # The JWKS are cached
+        self.assertEqual(requests.call_count, 2)
+        success, _ = OpenIDClient.verify_token(token, [issuer], "aud1")
+        self.assertTrue(success)
+        self.assertEqual(requests.call_count, 2)
+
+        success, msg = OpenIDClient.verify_token(token, [issuer], "aud3")
+        self.assertEqual((success, msg), (False, "Audience not accepted"))
+        success, msg = OpenIDClient.verify_token(token, ["https://other.com/"])
+        self.assertEqual((success, msg), (False, "Issuer not accepted"))
+
+        # Tampered payload
+        parts = token.split(".")
+        parts[1] = b64e(json.dumps(dict(payload, sub="other")).encode("utf-8"))
+        success, msg = OpenIDClient.verify_token(".".join(parts), [issuer])
+        self.assertEqual((success, msg), (False, "Invalid token signature"))
+
+        expired_token = sign_token(key1, dict(payload, exp=int(time.time()) - 10), "key1")
+        success, msg = OpenIDClient.verify_token(expired_token, [issuer])
+        self.assertEqual((success, msg), (False, "Token expired"))
+
+        # The issuer rotates the keys some time after the JWKS were obtained
+        jwks["keys"] = [jwk2]
+        OpenIDClient.jwks[issuer] = (time.time() - OpenIDClient.JWKS_MIN_REFRESH_TIME,
+                                     OpenIDClient.jwks[issuer][1])
+        token2 = sign_token(key2, payload, "key2")
+        success, _ = OpenIDClient.verify_token(token2, [issuer])
+        self.assertTrue(success)
+        self.assertEqual(requests.call_count, 4)
+
+        # Unknown keys do not refresh the JWKS more than once every JWKS_MIN_REFRESH_TIME secs
+        success, msg = OpenIDClient.verify_token(sign_token(key1, payload, "key3"), [issuer])
+        self.assertEqual((success, msg), (False, "Signing key key3 not found"))
+        self.assertEqual(requests.call_count, 4)
+
+        # A token signed with the previous key is no longer valid
+        success, msg = OpenIDClient.verify_token(token, [issuer])
+        self.assertFalse(success)
+
+    @unittest.skipIf(not CRYPTOGRAPHY_AVAILABLE, "cryptography not available")
+    def test_verify_signature_ec(self):
+        key = ec.generate_private_key(ec.SECP256R1(), default_backend())
+        numbers = key.public_key().public_numbers()
+        jwk = {"kty": "EC", "crv": "P-256", "x": int_to_b64(numbers.x, 32), "y": int_to_b64(numbers.y, 32)}
+        token = sign_token(key, {"sub": "user"}, "ec1", "ES256")
+        self.assertTrue(JWT.verify_signature(token, jwk))
+        other_key = ec.generate_private_key(ec.SECP256R1(), default_backend())
+        self.assertFalse(JWT.verify_signature(sign_token(other_key, {"sub": "user"}, "ec1", "ES256"), jwk))
+        _, rsa_jwk = gen_rsa_key("rsa1")
+        self.assertFalse(JWT.verify_signature(token, rsa_jwk))
+
 
 if __name__ == '__main__':
     unittest.main()
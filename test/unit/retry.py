@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.retry import retry, RetryPolicy
+from mock import Mock, patch
+
+
+class TestRetry(unittest.TestCase):
+    """
+    Class to test the retry functions
+    """
+
+    def test_policy(self):
+        policy = RetryPolicy(tries=6, delay=1, backoff=2, max_delay=10, jitter=False)
+        self.assertEqual(list(policy.delays()), [1, 2, 4, 8, 10])
+
+        policy = RetryPolicy(tries=6, delay=1, backoff=2, max_delay=10)
+        for delay, max_delay in zip(policy.delays(), [1, 2, 4, 8, 10]):
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, max_delay)
+
+        policy = RetryPolicy(tries=None, delay=1, backoff=2, max_elapsed=10, jitter=False)
+        self.assertEqual(list(policy.delays()), [1, 2, 4, 8])
+
+    @patch('time.sleep')
+    def test_retry(self, sleep):
+        func = Mock(side_effect=[Exception("e1"), Exception("e2"), "ok"])
+        self.assertEqual(retry(Exception, ValueError, tries=3, delay=2)(func)(), "ok")
+        self.assertEqual([c[0][0] for c in sleep.call_args_list], [2, 4])
+
+        func = Mock(side_effect=ValueError("e1"))
+        self.assertRaises(ValueError, retry(Exception, ValueError, tries=3, delay=2)(func))
+        self.assertEqual(func.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.CloudInfo import CloudInfo
+
+
+def run_python(args):
+    """
+    Run a new interpreter with the IM in the PYTHONPATH and return its (stdout, stderr).
+    """
+    root_path = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([root_path, env.get("PYTHONPATH", "")])
+    proc = subprocess.Popen([sys.executable] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    return proc.communicate()
+
+
+def get_imported_modules(module):
+    """
+    Import a module in a new interpreter and return the list of modules loaded.
+    """
+    out, _ = run_python(["-c", "import sys, %s; print('\\n'.join(sys.modules))" % module])
+    return out.decode().split("\n")
+
+
+def get_import_times(module):
+    """
+    Import a module in a new interpreter with -X importtime and return
+    a dict from module name to its cumulative import time (in secs).
+    """
+    _, err = run_python(["-X", "importtime", "-c", "import %s" % module])
+    res = {}
+    for line in err.decode().split("\n"):
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[1].strip().isdigit():
+            res[parts[2].strip()] = int(parts[1]) / 1000000.0
+    return res
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Class to test the modules loaded at the start of the IM service
+    """
+
+    def test_lazy_imports(self):
+        for module in ["IM.REST", "IM.ServiceRequests"]:
+            modules = get_imported_modules(module)
+            self.assertIn(module, modules)
+            # The TOSCA parser must only be loaded when a TOSCA document is used
+            self.assertNotIn("IM.tosca.Tosca", modules)
+            self.assertNotIn("toscaparser", modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "-X importtime requires Python 3.7")
+    def test_import_time(self):
+        for module in ["IM.REST", "IM.ServiceRequests"]:
+            times = get_import_times(module)
+            self.assertIn(module, times)
+            self.assertNotIn("toscaparser", times)
+            # Report the slowest imports to track the startup time
+            slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:10]
+            sys.stderr.write("\nImport time of %s: %.3f s. Slowest imports: %s\n" %
+                             (module, times[module], ", ".join("%s (%.3f s)" % item for item in slowest)))
+            # Only a generous bound, the import time depends on the load of the host
+            self.assertLess(times[module], 30)
+
+    def test_prewarm_connectors(self):
+        failed = CloudInfo.prewarm_connectors(["Dummy", " ", "Invalid", "Not.valid"])
+        self.assertEqual(failed, ["Invalid", "Not.valid"])
+        self.assertIn("IM.connectors.Dummy", sys.modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,9 +23,15 @@ import unittest
 import sys
 import json
 import base64
+import threading
 
 from mock import Mock, patch, MagicMock
 
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
 sys.path.append("..")
 sys.path.append(".")
 
@@ -37,6 +43,7 @@ from IM.VirtualMachine import VirtualMachine
 from IM.InfrastructureManager import InfrastructureManager as IM
 from IM.InfrastructureManager import DisabledFunctionException
 from IM.InfrastructureList import InfrastructureList
+from IM.db import DataBase
 from IM.auth import Authentication
 from radl.radl import RADL, system, deploy, Feature, SoftFeatures
 from radl.radl_parse import parse_radl
@@ -53,6 +60,31 @@ def read_file_as_string(file_name):
     return open(abs_file_path, 'r').read()
 
 
+class StubIssuerHandler(BaseHTTPRequestHandler):
+    """Stub OIDC issuer that counts the userinfo and introspect requests"""
+
+    requests = []
+    fail = False
+
+    def do_GET(self):
+        StubIssuerHandler.requests.append(self.path.split("?")[0])
+        if StubIssuerHandler.fail:
+            self.send_response(401)
+            body = b"Invalid token"
+        elif self.path.startswith("/userinfo"):
+            self.send_response(200)
+            body = b'{"sub": "user_sub", "preferred_username": "micafer"}'
+        else:
+            self.send_response(200)
+            body = b'{"scope": "openid scope1"}'
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
 class TestIM(unittest.TestCase):
 
     def __init__(self, *args):
@@ -129,10 +161,10 @@ class TestIM(unittest.TestCase):
         cloud.launch = Mock(side_effect=self.gen_launch_res)
         return cloud
 
-    def gen_token(self, aud=None, exp=None):
+    def gen_token(self, aud=None, exp=None, iss="https://iam-test.indigo-datacloud.eu/"):
         data = {
             "sub": "user_sub",
-            "iss": "https://iam-test.indigo-datacloud.eu/",
+            "iss": iss,
             "exp": 1465471354,
             "iat": 1465467755,
             "jti": "jti",
@@ -454,6 +486,68 @@ class TestIM(unittest.TestCase):
             self.assertEqual(call[3], 1)
         IM.DestroyInfrastructure(infId, auth0)
 
+    def test_inf_addresources_scheduler(self):
+        """Launch independent deploy groups in two cloud providers concurrently."""
+
+        n0, n1 = 2, 4  # Machines to deploy
+        radl = RADL()
+        radl.add(system("s0", [Feature("disk.0.image.url", "=", "mock0://linux.for.ev.er"),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(system("s1", [Feature("disk.0.image.url", "=", "mock1://linux.for.ev.er"),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(deploy("s0", n0))
+        radl.add(deploy("s1", n1))
+
+        Config.MAX_SIMULTANEOUS_LAUNCHES = 10
+        Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = ["MyMock1:2", "*:5"]
+
+        running = {}
+        max_running = {}
+        lock = threading.Lock()
+
+        def launch(cloud_type, inf, radl, requested_radl, num_vm, auth_data):
+            with lock:
+                running[cloud_type] = running.get(cloud_type, 0) + 1
+                max_running[cloud_type] = max(max_running.get(cloud_type, 0), running[cloud_type])
+            time.sleep(0.5)
+            with lock:
+                running[cloud_type] -= 1
+            return self.gen_launch_res(inf, radl, requested_radl, num_vm, auth_data)
+
+        def concreteSystem(s, cloud_id):
+            url = s.getValue("disk.0.image.url")
+            return [s.clone()] if url.partition(":")[0] == cloud_id else []
+        cloud0 = self.get_cloud_connector_mock("MyMock0")
+        cloud0.launch = Mock(side_effect=lambda *args: launch("MyMock0", *args))
+        cloud0.concreteSystem = lambda _0, s, _1: concreteSystem(s, "mock0")
+        self.register_cloudconnector("MyMock0", cloud0)
+        cloud1 = self.get_cloud_connector_mock("MyMock1")
+        cloud1.launch = Mock(side_effect=lambda *args: launch("MyMock1", *args))
+        cloud1.concreteSystem = lambda _0, s, _1: concreteSystem(s, "mock1")
+        self.register_cloudconnector("MyMock1", cloud1)
+        auth0 = self.getAuth([0], [], [("MyMock0", 0), ("MyMock1", 1)])
+        infId = IM.CreateInfrastructure("", auth0)
+        try:
+            before = time.time()
+            vms = IM.AddResource(infId, str(radl), auth0)
+            elapsed = time.time() - before
+        finally:
+            Config.MAX_SIMULTANEOUS_LAUNCHES_BY_CLOUD = []
+        self.assertEqual(len(vms), n0 + n1)
+        # The groups are launched at the same time, but respecting the limit of each cloud
+        self.assertEqual(max_running, {"MyMock0": n0, "MyMock1": 2})
+        self.assertLess(elapsed, 1.5)
+
+        sel_inf = IM.get_infrastructure(infId, auth0)
+        self.assertEqual(sorted([t["cloud_id"] for t in sel_inf.launch_times]),
+                         ["cloud0"] * n0 + ["cloud1"] * n1)
+        for times in sel_inf.launch_times:
+            self.assertGreaterEqual(times["duration"], 0.5)
+            self.assertEqual(times["end"] - times["start"], times["duration"])
+        IM.DestroyInfrastructure(infId, auth0)
+
     @patch('IM.VMRC.Client')
     def test_inf_addresources3(self, suds_cli):
         """Test cloud selection."""
@@ -491,6 +585,63 @@ class TestIM(unittest.TestCase):
             self.assertEqual(call[3], 1)
         IM.DestroyInfrastructure(infId, auth0)
 
+    def test_inf_addresources_concrete(self):
+        """Test the concurrent concrete of the systems with the cloud providers."""
+
+        radl = RADL()
+        radl.add(system("s0", [Feature("disk.0.image.url", "=", "mock0://linux.for.ev.er"),
+                               SoftFeatures(10, [Feature("memory.size", ">=", 800)]),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(deploy("s0", 1))
+
+        def concreteSystem(s, mem, delay):
+            time.sleep(delay)
+            return [system(s.name, [Feature("memory.size", "=", mem)])]
+        cloud0 = self.get_cloud_connector_mock("MyMock0")
+        cloud0.concreteSystem = Mock(side_effect=lambda s, _1: concreteSystem(s, 500, 1))
+        self.register_cloudconnector("Mock0", cloud0)
+        cloud1 = self.get_cloud_connector_mock("MyMock1")
+        cloud1.concreteSystem = Mock(side_effect=lambda s, _1: concreteSystem(s, 1000, 1))
+        self.register_cloudconnector("Mock1", cloud1)
+        auth0 = self.getAuth([0], [], [("Mock0", 0), ("Mock1", 1)])
+        infId = IM.CreateInfrastructure("", auth0)
+
+        # The clouds are evaluated concurrently
+        before = time.time()
+        IM.AddResource(infId, str(radl), auth0)
+        self.assertLess(time.time() - before, 2)
+        self.assertEqual(cloud1.launch.call_count, 1)
+
+        # and the results are cached
+        IM.AddResource(infId, str(radl), auth0)
+        self.assertEqual(cloud0.concreteSystem.call_count, 1)
+        self.assertEqual(cloud1.concreteSystem.call_count, 1)
+        self.assertEqual(cloud1.launch.call_count, 2)
+
+        # The clouds that do not answer in time are discarded
+        IM.concrete_cache.clear()
+        cloud1.concreteSystem.side_effect = lambda s, _1: concreteSystem(s, 1000, 4)
+        Config.CONCRETE_SYSTEM_TIMEOUT = 2
+        IM.MAX_STUCK_CONCRETE_TASKS = 1
+        try:
+            IM.AddResource(infId, str(radl), auth0)
+            self.assertEqual(cloud0.launch.call_count, 1)
+            self.assertEqual(cloud1.launch.call_count, 2)
+            self.assertEqual(sum(IM._concrete_stuck.values()), 1)
+
+            # and while their tasks are still running they are not contacted again
+            IM.concrete_cache.clear()
+            IM.AddResource(infId, str(radl), auth0)
+            self.assertEqual(cloud1.concreteSystem.call_count, 2)
+            self.assertEqual(cloud0.launch.call_count, 2)
+        finally:
+            Config.CONCRETE_SYSTEM_TIMEOUT = 60
+            IM.MAX_STUCK_CONCRETE_TASKS = 2
+        time.sleep(2.5)
+        self.assertEqual(sum(IM._concrete_stuck.values()), 0)
+        IM.DestroyInfrastructure(infId, auth0)
+
     def test_inf_addresources_parallel(self):
         """Deploy parallel virtual machines."""
 
@@ -618,7 +769,38 @@ class TestIM(unittest.TestCase):
         inf_ids = IM.GetInfrastructureList(auth0, ".*nonexist.*")
         self.assertEqual(inf_ids, [])
 
+        # Not valid regex are searched as plain substrings
+        inf_ids = IM.GetInfrastructureList(auth0, "micafer.hadoop')")
+        self.assertEqual(inf_ids, [infId])
+
+        # The search uses the text stored in the DB, so the infrastructures are not loaded
+        InfrastructureList.infrastructure_list = {}
+        with patch.object(InfrastructureList, "get_infrastructure") as get_infrastructure:
+            inf_ids = IM.GetInfrastructureList(auth0, ".*hadoop.*")
+            self.assertEqual(get_infrastructure.call_count, 0)
+        self.assertEqual(inf_ids, [infId])
+        InfrastructureList.load_data()
+
+        infId2 = IM.CreateInfrastructure(radl, auth0)
+        inf_ids = IM.GetInfrastructureList(auth0)
+        self.assertEqual(inf_ids, [infId2, infId])
+        inf_ids = IM.GetInfrastructureList(auth0, limit=1)
+        self.assertEqual(inf_ids, [infId2])
+        inf_ids = IM.GetInfrastructureList(auth0, ".*hadoop.*", limit=1, offset=1)
+        self.assertEqual(inf_ids, [infId])
+        inf_ids = IM.GetInfrastructureList(auth0, offset=2)
+        self.assertEqual(inf_ids, [])
+
+        # The index must be updated when the infrastructure changes
+        radl = parse_radl("""system front (
+            disk.0.applications contains (name = 'newapp')
+            )""")
+        IM.AddResource(infId2, radl, auth0)
+        inf_ids = IM.GetInfrastructureList(auth0, "newapp")
+        self.assertEqual(inf_ids, [infId2])
+
         IM.DestroyInfrastructure(infId, auth0)
+        IM.DestroyInfrastructure(infId2, auth0)
 
     def test_reconfigure(self):
         """Reconfigure."""
@@ -710,7 +892,8 @@ class TestIM(unittest.TestCase):
 
         InfrastructureList.infrastructure_list[infId].cont_out = "Header"
         InfrastructureList.infrastructure_list[infId].vm_list[0].cloud_connector = MagicMock()
-        InfrastructureList.infrastructure_list[infId].vm_list[0].cloud_connector.error_messages = "TESTMSG"
+        InfrastructureList.infrastructure_list[infId].vm_list[0].cloud_connector.get_error_messages.return_value = \
+            "TESTMSG"
         contmsg = IM.GetInfrastructureContMsg(infId, auth0)
         header_contmsg = IM.GetInfrastructureContMsg(infId, auth0, True)
         InfrastructureList.infrastructure_list[infId].vm_list[0].cloud_connector = None
@@ -798,6 +981,174 @@ class TestIM(unittest.TestCase):
         state = IM.GetInfrastructureState("1", auth0)
         self.assertEqual(state["state"], "pending")
 
+    def test_get_inf_state_batch(self):
+        """
+        Test that GetInfrastructureState updates the VMs of each cloud with updateVMInfoBatch.
+        """
+        radl = RADL()
+        radl.add(system("s0", [Feature("disk.0.image.url", "=", "mock0://linux.for.ev.er"),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(deploy("s0", 3))
+
+        auth0 = self.getAuth([0], [], [("Dummy", 0)])
+        infId = IM.CreateInfrastructure("", auth0)
+        # Do not contextualize to avoid the ConfManager thread updating the VMs
+        IM.AddResource(infId, str(radl), auth0, context=False)
+        inf = IM.get_infrastructure(infId, auth0)
+        # Discard the shared connector created in AddResource to use the patched methods
+        inf.reset_cloud_connectors()
+        for vm in inf.get_vm_list():
+            vm.last_update = 0
+
+        with patch('IM.connectors.Dummy.DummyCloudConnector.updateVMInfoBatch') as update_batch:
+            with patch('IM.connectors.Dummy.DummyCloudConnector.updateVMInfo') as update_vm:
+                update_batch.side_effect = lambda vms, auth: [(True, vm) for vm in vms]
+                state = IM.GetInfrastructureState(infId, auth0)
+                # A failed update would set the VMs to unknown (last_update is 0)
+                self.assertNotEqual(state["state"], VirtualMachine.UNKNOWN)
+                self.assertEqual(update_batch.call_count, 1)
+                self.assertEqual(len(update_batch.call_args[0][0]), 3)
+                self.assertEqual(update_vm.call_count, 0)
+
+                # If the batch call fails the VMs are updated one by one
+                for vm in inf.get_vm_list():
+                    vm.last_update = 0
+                update_batch.side_effect = Exception("Error")
+                update_vm.side_effect = lambda vm, auth: (True, vm)
+                state = IM.GetInfrastructureState(infId, auth0)
+                self.assertNotEqual(state["state"], VirtualMachine.UNKNOWN)
+                self.assertEqual(update_vm.call_count, 3)
+
+        IM.DestroyInfrastructure(infId, auth0)
+
+    def test_inf_destroy_batch(self):
+        """
+        Test that DestroyInfrastructure terminates the VMs of each cloud with finalizeBatch.
+        """
+        radl = RADL()
+        radl.add(system("s0", [Feature("disk.0.image.url", "=", "mock0://linux.for.ev.er"),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(deploy("s0", 3))
+
+        auth0 = self.getAuth([0], [], [("Dummy", 0)])
+        infId = IM.CreateInfrastructure("", auth0)
+        IM.AddResource(infId, str(radl), auth0, context=False)
+        inf = IM.get_infrastructure(infId, auth0)
+        vms = inf.get_vm_list()
+        # Discard the shared connector created in AddResource to use the patched methods
+        inf.reset_cloud_connectors()
+
+        with patch('IM.connectors.Dummy.DummyCloudConnector.finalizeBatch') as finalize_batch:
+            with patch('IM.connectors.Dummy.DummyCloudConnector.finalize') as finalize:
+                finalize_batch.side_effect = lambda vms, last, auth: [(True, "")] * len(vms)
+                IM.DestroyInfrastructure(infId, auth0)
+                self.assertEqual(finalize.call_count, 0)
+                self.assertEqual(finalize_batch.call_count, 1)
+                # The VMs are deleted in reverse order with the last flag
+                self.assertEqual(finalize_batch.call_args[0][0], list(reversed(vms)))
+                self.assertTrue(finalize_batch.call_args[0][1])
+
+    def test_get_inf_state_concurrent(self):
+        """
+        Test that GetInfrastructureState updates the VMs concurrently with a deadline.
+        """
+        radl = RADL()
+        radl.add(system("s0", [Feature("disk.0.image.url", "=", "mock0://linux.for.ev.er"),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(deploy("s0", 3))
+
+        auth0 = self.getAuth([0], [], [("Dummy", 0)])
+        infId = IM.CreateInfrastructure("", auth0)
+        IM.AddResource(infId, str(radl), auth0, context=False)
+        inf = IM.get_infrastructure(infId, auth0)
+        # Discard the shared connector created in AddResource to use the patched methods
+        inf.reset_cloud_connectors()
+        vms = inf.get_vm_list()
+        for vm in vms:
+            vm.state = VirtualMachine.RUNNING
+
+        def update_vm(vm, auth, delay):
+            time.sleep(delay)
+            vm.state = VirtualMachine.STOPPED
+            return True, vm
+
+        with patch('IM.connectors.Dummy.DummyCloudConnector.updateVMInfo') as update_vm_info:
+            update_vm_info.side_effect = lambda vm, auth: update_vm(vm, auth, 1)
+            for vm in vms:
+                vm.last_update = 0
+            start = time.time()
+            state = IM.GetInfrastructureState(infId, auth0)
+            self.assertLess(time.time() - start, 2.5)
+            self.assertEqual(update_vm_info.call_count, 3)
+            self.assertEqual(state["state"], VirtualMachine.STOPPED)
+
+            # The VMs not updated before the deadline return the last known state
+            for vm in vms:
+                vm.state = VirtualMachine.RUNNING
+                vm.last_update = int(time.time())
+            vms[0].last_update = 0
+            update_vm_info.side_effect = lambda vm, auth: update_vm(vm, auth, 2)
+            Config.VM_INFO_UPDATE_TIMEOUT = 0.5
+            start = time.time()
+            state = IM.GetInfrastructureState(infId, auth0)
+            Config.VM_INFO_UPDATE_TIMEOUT = 30
+            self.assertLess(time.time() - start, 1.5)
+            self.assertEqual(state["vm_states"][str(vms[0].im_id)], VirtualMachine.RUNNING)
+            # Wait the update to finish
+            with vms[0]._lock:
+                self.assertEqual(vms[0].state, VirtualMachine.STOPPED)
+
+        IM.DestroyInfrastructure(infId, auth0)
+
+    def test_shared_cloud_connectors(self):
+        """
+        Test that the VMs of the same cloud share the CloudConnector.
+        """
+        radl = RADL()
+        radl.add(system("s0", [Feature("disk.0.image.url", "=", "mock0://linux.for.ev.er"),
+                               Feature("disk.0.os.credentials.username", "=", "user"),
+                               Feature("disk.0.os.credentials.password", "=", "pass")]))
+        radl.add(deploy("s0", 3))
+
+        auth0 = self.getAuth([0], [], [("Dummy", 0)])
+        infId = IM.CreateInfrastructure("", auth0)
+        IM.AddResource(infId, str(radl), auth0, context=False)
+        inf = IM.get_infrastructure(infId, auth0)
+        vms = inf.get_vm_list()
+
+        conns = [vm.getCloudConnector(auth0) for vm in vms]
+        self.assertIs(conns[0], conns[1])
+        self.assertIs(conns[0], conns[2])
+        self.assertEqual(len(inf.cloud_connectors), 1)
+
+        # The error messages are shown only in the contmsg of the affected VM
+        conns[0].add_error_message(vms[1], "Error adding a floating IP.\n")
+        self.assertNotIn("Error adding a floating IP.", vms[0].get_cont_msg())
+        self.assertIn("Error adding a floating IP.", vms[1].get_cont_msg())
+
+        # If the credentials change a new connector is created
+        auth1 = self.getAuth([0], [], [("Dummy", 1)])
+        self.assertIs(vms[0].getCloudConnector(), conns[0])
+        conn = vms[0].getCloudConnector(auth1)
+        self.assertIsNot(conn, conns[0])
+        self.assertIs(vms[1].getCloudConnector(auth1), conn)
+        conns = [vm.getCloudConnector(auth0) for vm in vms]
+
+        # If the data of the cloud changes a new connector is created
+        vms[2].cloud = CloudInfo.deserialize(vms[2].cloud.serialize())
+        vms[2].cloud.server = "otherserver"
+        vms[2].cloud_connector = None
+        self.assertIsNot(vms[2].getCloudConnector(), conns[0])
+        self.assertIsNot(inf.get_cloud_connector(vms[0].cloud), conns[0])
+
+        # The connectors are not serialized
+        self.assertNotIn("cloud_connectors", json.loads(inf.serialize()))
+
+        IM.DestroyInfrastructure(infId, auth0)
+
     def test_altervm(self):
         """Test AlterVM"""
         radl = RADL()
@@ -1059,7 +1410,7 @@ configure step2 (
 
         IM.DestroyInfrastructure(infId, auth0)
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_check_oidc_invalid_token(self, request):
         im_auth = {"token": self.gen_token()}
 
@@ -1134,6 +1485,90 @@ configure step2 (
         self.assertEqual(im_auth['username'], InfrastructureInfo.OPENID_USER_PREFIX + "micafer")
         self.assertEqual(im_auth['password'], "https://iam-test.indigo-datacloud.eu/sub")
 
+    def test_check_oidc_token_cache(self):
+        server = HTTPServer(("127.0.0.1", 0), StubIssuerHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        issuer = "http://127.0.0.1:%d" % server.server_address[1]
+        StubIssuerHandler.requests = []
+        StubIssuerHandler.fail = False
+        Config.OIDC_ISSUERS = [issuer]
+        Config.OIDC_SCOPES = ["scope1"]
+        Config.OIDC_CLIENT_ID = "client"
+        Config.OIDC_CLIENT_SECRET = "secret"
+        try:
+            token = self.gen_token(exp=100, iss=issuer)
+            for _ in range(3):
+                im_auth = {"token": token}
+                IM.check_oidc_token(im_auth)
+                self.assertEqual(im_auth['username'], InfrastructureInfo.OPENID_USER_PREFIX + "micafer")
+                self.assertEqual(im_auth['password'], issuer + "user_sub")
+            # Only the first call contacts the issuer
+            self.assertEqual(StubIssuerHandler.requests, ["/introspect", "/userinfo"])
+
+            # Failed requests are also cached
+            StubIssuerHandler.fail = True
+            token = self.gen_token(exp=200, iss=issuer)
+            for _ in range(2):
+                with self.assertRaises(Exception) as ex:
+                    IM.check_oidc_token({"token": token})
+                self.assertIn("Invalid token or Client credentials", str(ex.exception))
+            self.assertEqual(StubIssuerHandler.requests, ["/introspect", "/userinfo", "/introspect"])
+
+            # The cache entries do not outlive the token
+            StubIssuerHandler.fail = False
+            Config.OIDC_SCOPES = []
+            token = self.gen_token(exp=1, iss=issuer)
+            IM.check_oidc_token({"token": token})
+            time.sleep(2.1)
+            with self.assertRaises(Exception) as ex:
+                IM.check_oidc_token({"token": token})
+            self.assertIn("Token expired", str(ex.exception))
+            self.assertEqual(StubIssuerHandler.requests, ["/introspect", "/userinfo", "/introspect", "/userinfo"])
+        finally:
+            server.shutdown()
+            server.server_close()
+            Config.OIDC_ISSUERS = []
+            Config.OIDC_SCOPES = []
+            Config.OIDC_CLIENT_ID = None
+            Config.OIDC_CLIENT_SECRET = None
+
+    def test_check_oidc_token_verify_signature(self):
+        server = HTTPServer(("127.0.0.1", 0), StubIssuerHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        issuer = "http://127.0.0.1:%d" % server.server_address[1]
+        StubIssuerHandler.requests = []
+        StubIssuerHandler.fail = False
+        Config.OIDC_ISSUERS = [issuer]
+        Config.OIDC_VERIFY_SIGNATURE = True
+        Config.OIDC_CACHE_TIME = 0
+        try:
+            token = self.gen_token(exp=100, iss=issuer)
+            with patch('IM.InfrastructureManager.OpenIDClient.verify_token') as verify_token:
+                verify_token.return_value = (False, "Invalid token signature")
+                with self.assertRaises(Exception) as ex:
+                    IM.check_oidc_token({"token": token})
+                self.assertIn("Invalid token signature", str(ex.exception))
+                self.assertEqual(StubIssuerHandler.requests, [])
+
+                verify_token.return_value = (True, {})
+                for _ in range(3):
+                    im_auth = {"token": token}
+                    IM.check_oidc_token(im_auth)
+                    self.assertEqual(im_auth['username'], InfrastructureInfo.OPENID_USER_PREFIX + "micafer")
+                self.assertEqual(verify_token.call_count, 4)
+            # The userinfo is requested only once per token
+            self.assertEqual(StubIssuerHandler.requests, ["/userinfo"])
+        finally:
+            server.shutdown()
+            server.server_close()
+            Config.OIDC_ISSUERS = []
+            Config.OIDC_VERIFY_SIGNATURE = False
+            Config.OIDC_CACHE_TIME = 60
+
     def test_inf_auth_with_token(self):
         im_auth = {"token": (self.gen_token())}
         im_auth['username'] = InfrastructureInfo.OPENID_USER_PREFIX + "micafer"
@@ -1191,6 +1626,7 @@ configure step2 (
         vm2 = VirtualMachine(inf, "2", cloud, radl, radl, None, 2)
         inf.vm_list = [vm1, vm2]
         inf.vm_master = vm1
+        inf.radl = radl
         # first create the DB table
         Config.DATA_DB = "sqlite:///tmp/ind.dat"
         InfrastructureList.load_data()
@@ -1204,6 +1640,23 @@ configure step2 (
         self.assertEqual(res['1'].vm_list[0], res['1'].vm_master)
         self.assertEqual(res['1'].vm_master.info.systems[0].getValue("disk.0.image.url"), "mock0://linux.for.ev.er")
         self.assertTrue(res['1'].auth.compare(inf.auth, "InfrastructureManager"))
+        self.assertIn("mock0://linux.for.ev.er", InfrastructureList._get_search_texts_from_db(["1"])["1"])
+
+        # The tables of old versions are updated to store the searchable text
+        Config.DATA_DB = "sqlite:///tmp/ind_old.dat"
+        if os.path.exists("/tmp/ind_old.dat"):
+            os.unlink("/tmp/ind_old.dat")
+        db = DataBase(Config.DATA_DB)
+        db.connect()
+        db.execute("CREATE TABLE inf_list(id VARCHAR(255) PRIMARY KEY, deleted INTEGER, date TIMESTAMP, data LONGBLOB)")
+        db.execute("insert into inf_list (id, deleted, data, date) values (%s, %s, %s, now())",
+                   ("1", 0, inf.serialize()))
+        db.close()
+        InfrastructureList.load_data()
+        self.assertEqual(InfrastructureList._get_search_texts_from_db(["1"]), {"1": None})
+        self.assertEqual(InfrastructureList.search_inf_ids(["1"], "mock0://"), ["1"])
+        InfrastructureList.save_data("1")
+        self.assertIn("mock0://linux.for.ev.er", InfrastructureList._get_search_texts_from_db(["1"])["1"])
 
     def test_inf_remove_two_clouds(self):
         """ Test remove VMs from 2 cloud providers """
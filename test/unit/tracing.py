@@ -0,0 +1,171 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import threading
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from mock import MagicMock
+from IM.tracing import Tracer, FileSpanExporter
+from IM.db import DataBase
+from IM.CloudInfo import CloudInfo
+from IM.InfrastructureManager import InfrastructureManager as IM
+from IM.auth import Authentication
+from IM.config import Config
+from IM.InfrastructureList import InfrastructureList
+from IM.SSH import SSH
+
+
+class TestTracing(unittest.TestCase):
+    """
+    Class to test the Tracer class
+    """
+
+    def setUp(self):
+        Config.TRACING_EXPORTER = "memory"
+        Tracer._reinit()
+
+    def tearDown(self):
+        Config.TRACING_EXPORTER = ""
+        Tracer._reinit()
+
+    def get_spans(self, name=None):
+        return [span for span in Tracer.exporter.get_finished_spans() if name is None or span.name == name]
+
+    def test_span(self):
+        with Tracer.span("parent", {"key": "value"}) as parent:
+            with self.assertRaises(Exception):
+                with Tracer.span("child"):
+                    raise Exception("Error")
+
+            context = Tracer.get_context()
+            res = []
+
+            def child_thread():
+                with Tracer.span("thread_child"):
+                    res.append(Tracer.get_context())
+
+            t = threading.Thread(target=Tracer.wrap(child_thread))
+            t.start()
+            t.join()
+
+        self.assertEqual(context, (parent.trace_id, parent.span_id))
+        self.assertEqual(len(parent.trace_id), 32)
+        self.assertEqual(len(parent.span_id), 16)
+        child = self.get_spans("child")[0]
+        self.assertEqual(child.parent_id, parent.span_id)
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.error, "Error")
+        thread_child = self.get_spans("thread_child")[0]
+        self.assertEqual(thread_child.parent_id, parent.span_id)
+        self.assertEqual(res[0][0], parent.trace_id)
+        self.assertIsNone(Tracer.get_context())
+
+        span = parent.to_dict()
+        self.assertEqual(span["traceId"], parent.trace_id)
+        self.assertNotIn("parentSpanId", span)
+        self.assertEqual(span["attributes"], [{"key": "key", "value": {"stringValue": "value"}}])
+        self.assertEqual(span["status"], {"code": "STATUS_CODE_OK"})
+        self.assertEqual(child.to_dict()["status"], {"code": "STATUS_CODE_ERROR", "message": "Error"})
+
+    def test_traceparent(self):
+        header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        context = Tracer.parse_traceparent(header)
+        self.assertEqual(context, ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"))
+        self.assertIsNone(Tracer.parse_traceparent("invalid"))
+        with Tracer.span("request", context=context) as span:
+            self.assertEqual(Tracer.get_traceparent(), "00-0af7651916cd43dd8448eb211c80319c-%s-01" % span.span_id)
+        self.assertEqual(span.parent_id, "b7ad6b7169203331")
+
+    def test_disabled(self):
+        Config.TRACING_EXPORTER = ""
+        Tracer._reinit()
+        with Tracer.span("test") as span:
+            self.assertIsNone(span)
+        func = MagicMock()
+        self.assertIs(Tracer.wrap(func), func)
+        obj = MagicMock()
+        self.assertIs(Tracer.instrument(obj, "test", ["method"]).method, obj.method)
+
+    def test_file_exporter(self):
+        filename = "/tmp/test_traces.json"
+        if os.path.exists(filename):
+            os.unlink(filename)
+        Tracer.exporter = FileSpanExporter(filename)
+        with Tracer.span("test1"):
+            with Tracer.span("test2"):
+                pass
+        with open(filename) as f:
+            spans = [json.loads(line) for line in f.readlines()]
+        os.unlink(filename)
+        self.assertEqual(spans[0]["name"], "test2")
+        self.assertEqual(spans[1]["name"], "test1")
+        self.assertEqual(spans[0]["parentSpanId"], spans[1]["spanId"])
+
+    def test_operation(self):
+        Config.DATA_DB = "/tmp/inf.dat"
+        InfrastructureList.load_data()
+        auth = Authentication([{'type': 'InfrastructureManager', 'username': 'user', 'password': 'pass'}])
+        with Tracer.span("request") as root:
+            IM.GetInfrastructureList(auth)
+
+        check_auth = self.get_spans("check_auth_data")[0]
+        self.assertEqual(check_auth.parent_id, root.span_id)
+        db_spans = [span for span in self.get_spans("db.select") if span.trace_id == root.trace_id]
+        self.assertTrue(db_spans)
+        self.assertEqual(db_spans[0].attributes, {"db.system": "SQLite"})
+
+    def test_connector(self):
+        cloud_info = CloudInfo()
+        cloud_info.id = "dummy"
+        cloud_info.type = "Dummy"
+        conn = cloud_info.getCloudConnector(MagicMock())
+        conn.updateVMInfo(MagicMock(), None)
+
+        span = self.get_spans("Dummy.updateVMInfo")[0]
+        self.assertEqual(span.attributes, {"im.cloud_type": "Dummy", "im.cloud_id": "dummy"})
+
+    def test_ssh(self):
+        ssh = Tracer.instrument_ssh(SSH("host", "user", "pass"))
+        ssh.connect = MagicMock(side_effect=Exception("Connection error"))
+        with self.assertRaises(Exception):
+            ssh.execute("ls")
+
+        span = self.get_spans("SSH.execute")[0]
+        self.assertEqual(span.attributes, {"net.peer.name": "host"})
+        self.assertEqual(span.error, "Connection error")
+
+    def test_db(self):
+        filename = "/tmp/test_tracing.db"
+        db = DataBase("sqlite://" + filename)
+        self.assertTrue(db.connect())
+        with Tracer.span("test"):
+            db.execute("CREATE TABLE test(id int)")
+        db.close()
+        os.unlink(filename)
+
+        self.assertEqual(len(self.get_spans("db.execute")), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -65,7 +65,7 @@ class TestTTSClient(unittest.TestCase):
 
         return resp
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_list_providers(self, requests):
         requests.side_effect = self.get_response
 
@@ -76,7 +76,7 @@ class TestTTSClient(unittest.TestCase):
         self.assertTrue(success, msg="ERROR: getting providers: %s." % providers)
         self.assertEqual(providers, expected_providers, msg="ERROR: getting providers: Unexpected providers.")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_list_endservices(self, requests):
         requests.side_effect = self.get_response
 
@@ -88,7 +88,7 @@ class TestTTSClient(unittest.TestCase):
         self.assertTrue(success, msg="ERROR: getting services: %s." % services)
         self.assertEqual(services, expected_services, msg="ERROR: getting services: Unexpected services.")
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_find_service(self, requests):
         requests.side_effect = self.get_response
 
@@ -99,7 +99,7 @@ class TestTTSClient(unittest.TestCase):
         self.assertTrue(success)
         self.assertEqual(service, expected_service)
 
-    @patch('requests.request')
+    @patch('IM.http_pool.HTTPPool.request')
     def test_request_credential(self, requests):
         requests.side_effect = self.get_response
 
@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+#
+# IM - Infrastructure Manager
+# Copyright (C) 2011 - GRyCAP - Universitat Politecnica de Valencia
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+
+sys.path.append("..")
+sys.path.append(".")
+
+from IM.userdb import UserDB, BCRYPT_AVAILABLE
+from mock import patch
+
+if BCRYPT_AVAILABLE:
+    import bcrypt
+
+
+class TestUserDB(unittest.TestCase):
+    """
+    Class to test the UserDB class
+    """
+
+    def setUp(self):
+        UserDB._reinit()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, "users.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_users(self, users):
+        tmp_file = self.filename + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"users": [{"username": u, "password": p} for u, p in users]}, f)
+        # replace the file (as most editors do) so the inode changes
+        os.rename(tmp_file, self.filename)
+
+    def test_check_user(self):
+        self.write_users([("user1", "pass1"), ("user2", "pass2")])
+        with patch("IM.userdb.open", create=True, side_effect=open) as open_mock:
+            self.assertTrue(UserDB.check_user(self.filename, "user1", "pass1"))
+            self.assertTrue(UserDB.check_user(self.filename, "user2", "pass2"))
+            self.assertFalse(UserDB.check_user(self.filename, "user1", "pass2"))
+            self.assertFalse(UserDB.check_user(self.filename, "user3", "pass3"))
+            self.assertFalse(UserDB.check_user(self.filename, "user1", None))
+            # The file is only read once
+            self.assertEqual(open_mock.call_count, 1)
+
+            # The file is read again if it changes
+            self.write_users([("user1", "newpass"), ("user3", "pass3")])
+            self.assertFalse(UserDB.check_user(self.filename, "user1", "pass1"))
+            self.assertTrue(UserDB.check_user(self.filename, "user1", "newpass"))
+            self.assertTrue(UserDB.check_user(self.filename, "user3", "pass3"))
+            self.assertEqual(open_mock.call_count, 2)
+
+    def test_errors(self):
+        self.assertFalse(UserDB.check_user(self.filename, "user1", "pass1"))
+        with open(self.filename, "w") as f:
+            f.write("{invalid")
+        self.assertFalse(UserDB.check_user(self.filename, "user1", "pass1"))
+        self.write_users([("user1", "pass1")])
+        self.assertTrue(UserDB.check_user(self.filename, "user1", "pass1"))
+
+    @unittest.skipIf(not BCRYPT_AVAILABLE, "bcrypt not available")
+    def test_bcrypt(self):
+        hashed = bcrypt.hashpw(b"pass1", bcrypt.gensalt(4)).decode("utf-8")
+        self.write_users([("user1", hashed)])
+        with patch("IM.userdb.bcrypt.checkpw", side_effect=bcrypt.checkpw) as checkpw:
+            for _ in range(3):
+                self.assertTrue(UserDB.check_user(self.filename, "user1", "pass1"))
+            self.assertFalse(UserDB.check_user(self.filename, "user1", hashed))
+            self.assertFalse(UserDB.check_user(self.filename, "user1", "pass2"))
+            # The successful verifications are cached
+            self.assertEqual(checkpw.call_count, 3)
+
+    def test_argon2(self):
+        hashed = "$argon2id$v=19$m=65536,t=3,p=4$c2FsdHNhbHQ$aGFzaGhhc2g"
+        with patch("IM.userdb.ARGON2_AVAILABLE", True):
+            with patch("IM.userdb.PasswordHasher", create=True) as hasher:
+                hasher.return_value.verify.return_value = True
+                self.assertTrue(UserDB.verify_password(hashed, "pass1"))
+                hasher.return_value.verify.assert_called_with(hashed, "pass1")
+                hasher.return_value.verify.side_effect = Exception("VerifyMismatchError")
+                self.assertFalse(UserDB.verify_password(hashed, "pass2"))
+        with patch("IM.userdb.ARGON2_AVAILABLE", False):
+            self.assertFalse(UserDB.verify_password(hashed, "pass1"))
+
+
+if __name__ == '__main__':
+    unittest.main()